@@ -0,0 +1,53 @@
+import cluster from 'cluster';
+import os from 'os';
+import dotenv from 'dotenv';
+import { relayClusterBroker } from './services/cluster/brokers.js';
+
+dotenv.config();
+
+/**
+ * Cluster entry point: runs one backend node per worker
+ * Each worker gets a stable NODE_ID (kept across restarts) and the full
+ * node list, which decides file ownership (see services/cluster/ClusterRouter.js).
+ * The primary only relays broker messages between workers.
+ *
+ * Run: node cluster.js   (CLUSTER_WORKERS defaults to the CPU count)
+ */
+
+const WORKERS = parseInt(process.env.CLUSTER_WORKERS) || os.cpus().length;
+
+if (cluster.isPrimary) {
+  const nodes = Array.from({ length: WORKERS }, (_, i) => `node-${i}`);
+
+  // Structured clone over IPC so Yjs/Buffer payloads stay binary
+  cluster.setupPrimary({ serialization: 'advanced' });
+  relayClusterBroker(cluster);
+
+  const fork = (nodeId) => {
+    const worker = cluster.fork({ NODE_ID: nodeId, CLUSTER_NODES: nodes.join(',') });
+    worker.nodeId = nodeId;
+  };
+
+  nodes.forEach(fork);
+
+  let shuttingDown = false;
+
+  cluster.on('exit', (worker, code, signal) => {
+    if (shuttingDown || worker.exitedAfterDisconnect) return;
+
+    console.error(`❌ Worker ${worker.nodeId} exited (${signal || code}), restarting`);
+    fork(worker.nodeId);
+  });
+
+  // Workers run their own graceful shutdown (server.js)
+  process.on('SIGTERM', () => {
+    shuttingDown = true;
+    for (const worker of Object.values(cluster.workers)) {
+      worker.process.kill('SIGTERM');
+    }
+  });
+
+  console.log(`🧩 Cluster primary ${process.pid}: starting ${WORKERS} workers`);
+} else {
+  await import('./server.js');
+}
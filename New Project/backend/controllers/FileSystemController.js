@@ -1,126 +1,52 @@
-import fs from 'fs/promises';
-import path from 'path';
-import { fileURLToPath } from 'url';
-
-const __filename = fileURLToPath(import.meta.url);
-const __dirname = path.dirname(__filename);
-
-// Path to store file structure
-const STRUCTURE_FILE = path.join(__dirname, '../uploads/file-structures');
+import fileTreeStore, { FileTreeError } from '../services/FileTreeStore.js';
 
 /**
- * Ensure directory exists
+ * Respond with a store error's status, or 500 for unexpected errors
  */
-const ensureDir = async (dirPath) => {
-  try {
-    await fs.access(dirPath);
-  } catch {
-    await fs.mkdir(dirPath, { recursive: true });
+const sendError = (res, error, message) => {
+  if (error instanceof FileTreeError) {
+    return res.status(error.status).json({
+      success: false,
+      message: error.message
+    });
   }
-};
 
-/**
- * Get structure file path for a project
- */
-const getStructurePath = (projectId) => {
-  return path.join(STRUCTURE_FILE, `${projectId}.json`);
+  res.status(500).json({
+    success: false,
+    message,
+    error: error.message
+  });
 };
 
 /**
- * Initialize default structure
+ * Push a tree change to sockets subscribed to the project's file tree
+ * (filesystem:subscribe). Only the changed node travels, never contents.
  */
-const getDefaultStructure = () => ({
-  id: 'root',
-  name: 'root',
-  type: 'folder',
-  children: [
-    {
-      id: 'src',
-      name: 'src',
-      type: 'folder',
-      children: [
-        {
-          id: 'index.js',
-          name: 'index.js',
-          type: 'file',
-          content: '// Start coding here\nconsole.log("Hello World!");'
-        }
-      ]
-    },
-    {
-      id: 'readme.md',
-      name: 'README.md',
-      type: 'file',
-      content: '# Welcome to your project\n\nStart building something amazing!'
-    }
-  ]
-});
-
-/**
- * Load file structure from disk
- */
-const loadStructure = async (projectId) => {
-  try {
-    await ensureDir(STRUCTURE_FILE);
-    const structurePath = getStructurePath(projectId);
-    
-    try {
-      const data = await fs.readFile(structurePath, 'utf-8');
-      return JSON.parse(data);
-    } catch {
-      // If file doesn't exist, create default structure
-      const defaultStructure = getDefaultStructure();
-      await saveStructure(projectId, defaultStructure);
-      return defaultStructure;
-    }
-  } catch (error) {
-    console.error('Error loading structure:', error);
-    return getDefaultStructure();
-  }
-};
+const pushChange = async (req, projectId, event, payload) => {
+  const io = req.app.get('io');
+  if (!io) return;
 
-/**
- * Save file structure to disk
- */
-const saveStructure = async (projectId, structure) => {
   try {
-    await ensureDir(STRUCTURE_FILE);
-    const structurePath = getStructurePath(projectId);
-    await fs.writeFile(structurePath, JSON.stringify(structure, null, 2), 'utf-8');
-    return true;
+    const version = await fileTreeStore.getVersion(projectId);
+    io.to(`filesystem:${projectId}`).emit(event, { projectId, ...payload, version });
   } catch (error) {
-    console.error('Error saving structure:', error);
-    return false;
+    console.error('Push file tree change error:', error);
   }
 };
 
 /**
- * Find node by path in tree
+ * Revalidation headers; clients always revalidate with If-None-Match
  */
-const findNodeByPath = (tree, pathArray) => {
-  if (pathArray.length === 0) return tree;
-  
-  // Skip 'root' in path since tree itself is root
-  const actualPath = pathArray[0] === 'root' ? pathArray.slice(1) : pathArray;
-  
-  if (actualPath.length === 0) return tree;
-  
-  let current = tree;
-  for (let i = 0; i < actualPath.length; i++) {
-    if (!current.children) return null;
-    current = current.children.find(child => child.id === actualPath[i]);
-    if (!current) return null;
-  }
-  return current;
+const setETag = (res, etag) => {
+  res.set({
+    ETag: etag,
+    'Cache-Control': 'private, no-cache'
+  });
 };
 
-/**
- * Find parent node
- */
-const findParentNode = (tree, pathArray) => {
-  if (pathArray.length === 0) return null;
-  const parentPath = pathArray.slice(0, -1);
-  return findNodeByPath(tree, parentPath);
+const parsePath = (nodePath) => {
+  if (!nodePath) return [];
+  return typeof nodePath === 'string' ? JSON.parse(nodePath) : nodePath;
 };
 
 /**
@@ -135,6 +61,8 @@ const generateId = (name, parentPath = []) => {
 /**
  * GET /api/filesystem/:projectId
  * Get entire file structure for a project
+ * With ?content=false file contents are left out and the response carries
+ * an ETag for If-None-Match revalidation.
  */
 export const getFileStructure = async (req, res) => {
   try {
@@ -147,7 +75,16 @@ export const getFileStructure = async (req, res) => {
       });
     }
 
-    const structure = await loadStructure(projectId);
+    if (req.query.content === 'false') {
+      setETag(res, `W/"${await fileTreeStore.getVersion(projectId)}"`);
+      if (req.fresh) {
+        return res.status(304).end();
+      }
+    }
+
+    const structure = await fileTreeStore.getStructure(projectId, {
+      withContent: req.query.content !== 'false'
+    });
     
     res.json({
       success: true,
@@ -155,11 +92,37 @@ export const getFileStructure = async (req, res) => {
     });
   } catch (error) {
     console.error('Get file structure error:', error);
-    res.status(500).json({
-      success: false,
-      message: 'Failed to get file structure',
-      error: error.message
+    sendError(res, error, 'Failed to get file structure');
+  }
+};
+
+/**
+ * GET /api/filesystem/:projectId/children
+ * One page of a folder's children, without contents
+ * Query: path (JSON array, default root), cursor, limit
+ */
+export const getFolderChildren = async (req, res) => {
+  try {
+    const { projectId } = req.params;
+    const { path: nodePath, cursor, limit } = req.query;
+
+    const page = await fileTreeStore.listChildren(projectId, parsePath(nodePath), {
+      offset: Math.max(parseInt(cursor) || 0, 0),
+      limit: Math.min(Math.max(parseInt(limit) || 200, 1), 1000)
+    });
+
+    setETag(res, `W/"${page.version}"`);
+    if (req.fresh) {
+      return res.status(304).end();
+    }
+
+    res.json({
+      success: true,
+      data: page
     });
+  } catch (error) {
+    console.error('Get folder children error:', error);
+    sendError(res, error, 'Failed to get folder children');
   }
 };
 
@@ -188,66 +151,19 @@ export const createFileOrFolder = async (req, res) => {
       });
     }
 
-    // Load current structure
-    const structure = await loadStructure(projectId);
-    console.log('📂 Loaded structure:', JSON.stringify(structure, null, 2).substring(0, 500));
-
-    // Find parent node
-    const parent = parentPath.length === 0 ? structure : findNodeByPath(structure, parentPath);
-    console.log('👨‍👦 Parent node:', parent ? { id: parent.id, name: parent.name, type: parent.type } : 'NOT FOUND');
-    
-    if (!parent) {
-      return res.status(404).json({
-        success: false,
-        message: 'Parent folder not found',
-        debug: { parentPath, structureKeys: Object.keys(structure) }
-      });
-    }
-
-    if (parent.type !== 'folder') {
-      return res.status(400).json({
-        success: false,
-        message: 'Parent must be a folder'
-      });
-    }
-
-    // Ensure children array exists
-    if (!parent.children) {
-      parent.children = [];
-    }
-
-    // Check if name already exists
-    const exists = parent.children.some(child => child.name === name);
-    if (exists) {
-      return res.status(409).json({
-        success: false,
-        message: `A ${type} with name "${name}" already exists`
-      });
-    }
-
-    // Create new node
-    const newNode = {
+    const newNode = await fileTreeStore.create(projectId, parentPath, {
       id: generateId(name, parentPath),
       name,
       type,
-      ...(type === 'folder' ? { children: [] } : { content })
-    };
-
-    // Add to parent
-    parent.children.push(newNode);
-
-    // Save structure
-    await saveStructure(projectId, structure);
-
-    // Emit socket event
-    const io = req.app.get('io');
-    if (io) {
-      io.to(projectId).emit('file_created', {
-        projectId,
-        node: newNode,
-        parentPath
-      });
-    }
+      content
+    });
+
+    pushChange(req, projectId, 'filesystem:created', {
+      node: type === 'folder'
+        ? { id: newNode.id, name, type, childCount: 0 }
+        : { id: newNode.id, name, type },
+      parentPath
+    });
 
     res.status(201).json({
       success: true,
@@ -256,11 +172,7 @@ export const createFileOrFolder = async (req, res) => {
     });
   } catch (error) {
     console.error('Create file/folder error:', error);
-    res.status(500).json({
-      success: false,
-      message: 'Failed to create file/folder',
-      error: error.message
-    });
+    sendError(res, error, 'Failed to create file/folder');
   }
 };
 
@@ -280,51 +192,13 @@ export const renameFileOrFolder = async (req, res) => {
       });
     }
 
-    // Load current structure
-    const structure = await loadStructure(projectId);
-
-    // Find the node
-    const node = findNodeByPath(structure, nodePath);
-    if (!node) {
-      return res.status(404).json({
-        success: false,
-        message: 'File or folder not found'
-      });
-    }
-
-    // Find parent to check for duplicates
-    const parent = nodePath.length === 1 ? structure : findParentNode(structure, nodePath);
-    if (parent && parent.children) {
-      const exists = parent.children.some(
-        child => child.name === newName && child.id !== node.id
-      );
-      if (exists) {
-        return res.status(409).json({
-          success: false,
-          message: `A ${node.type} with name "${newName}" already exists`
-        });
-      }
-    }
-
-    // Store old name for response
-    const oldName = node.name;
-
-    // Rename the node
-    node.name = newName;
+    const { oldName, node } = await fileTreeStore.rename(projectId, nodePath, newName);
 
-    // Save structure
-    await saveStructure(projectId, structure);
-
-    // Emit socket event
-    const io = req.app.get('io');
-    if (io) {
-      io.to(projectId).emit('file_renamed', {
-        projectId,
-        path: nodePath,
-        oldName,
-        newName
-      });
-    }
+    pushChange(req, projectId, 'filesystem:renamed', {
+      path: nodePath,
+      oldName,
+      newName
+    });
 
     res.json({
       success: true,
@@ -333,11 +207,7 @@ export const renameFileOrFolder = async (req, res) => {
     });
   } catch (error) {
     console.error('Rename file/folder error:', error);
-    res.status(500).json({
-      success: false,
-      message: 'Failed to rename file/folder',
-      error: error.message
-    });
+    sendError(res, error, 'Failed to rename file/folder');
   }
 };
 
@@ -357,45 +227,11 @@ export const deleteFileOrFolder = async (req, res) => {
       });
     }
 
-    // Load current structure
-    const structure = await loadStructure(projectId);
-
-    // Find parent node
-    const parent = nodePath.length === 1 ? structure : findParentNode(structure, nodePath);
-    
-    if (!parent || !parent.children) {
-      return res.status(404).json({
-        success: false,
-        message: 'Parent folder not found'
-      });
-    }
-
-    // Find and remove the node
-    const nodeId = nodePath[nodePath.length - 1];
-    const nodeIndex = parent.children.findIndex(child => child.id === nodeId);
-    
-    if (nodeIndex === -1) {
-      return res.status(404).json({
-        success: false,
-        message: 'File or folder not found'
-      });
-    }
+    const deletedNode = await fileTreeStore.remove(projectId, nodePath);
 
-    const deletedNode = parent.children[nodeIndex];
-    parent.children.splice(nodeIndex, 1);
-
-    // Save structure
-    await saveStructure(projectId, structure);
-
-    // Emit socket event
-    const io = req.app.get('io');
-    if (io) {
-      io.to(projectId).emit('file_deleted', {
-        projectId,
-        path: nodePath,
-        deletedNode
-      });
-    }
+    pushChange(req, projectId, 'filesystem:deleted', {
+      path: nodePath
+    });
 
     res.json({
       success: true,
@@ -404,11 +240,7 @@ export const deleteFileOrFolder = async (req, res) => {
     });
   } catch (error) {
     console.error('Delete file/folder error:', error);
-    res.status(500).json({
-      success: false,
-      message: 'Failed to delete file/folder',
-      error: error.message
-    });
+    sendError(res, error, 'Failed to delete file/folder');
   }
 };
 
@@ -428,44 +260,26 @@ export const getFileContent = async (req, res) => {
       });
     }
 
-    // Parse path if it's a string
-    const pathArray = typeof nodePath === 'string' ? JSON.parse(nodePath) : nodePath;
-
-    // Load structure
-    const structure = await loadStructure(projectId);
-
-    // Find the file
-    const file = findNodeByPath(structure, pathArray);
-    
-    if (!file) {
-      return res.status(404).json({
-        success: false,
-        message: 'File not found'
-      });
-    }
+    const file = await fileTreeStore.getFile(projectId, parsePath(nodePath), {
+      ifNoneMatch: req.get('If-None-Match')
+    });
 
-    if (file.type !== 'file') {
-      return res.status(400).json({
-        success: false,
-        message: 'Path does not point to a file'
-      });
+    setETag(res, file.etag);
+    if (file.notModified) {
+      return res.status(304).end();
     }
 
     res.json({
       success: true,
       data: {
         name: file.name,
-        content: file.content || '',
+        content: file.content,
         id: file.id
       }
     });
   } catch (error) {
     console.error('Get file content error:', error);
-    res.status(500).json({
-      success: false,
-      message: 'Failed to get file content',
-      error: error.message
-    });
+    sendError(res, error, 'Failed to get file content');
   }
 };
 
@@ -485,41 +299,13 @@ export const updateFileContent = async (req, res) => {
       });
     }
 
-    // Load structure
-    const structure = await loadStructure(projectId);
-
-    // Find the file
-    const file = findNodeByPath(structure, nodePath);
-    
-    if (!file) {
-      return res.status(404).json({
-        success: false,
-        message: 'File not found'
-      });
-    }
-
-    if (file.type !== 'file') {
-      return res.status(400).json({
-        success: false,
-        message: 'Path does not point to a file'
-      });
-    }
-
-    // Update content
-    file.content = content || '';
+    const file = await fileTreeStore.updateContent(projectId, nodePath, content || '');
 
-    // Save structure
-    await saveStructure(projectId, structure);
-
-    // Emit socket event
-    const io = req.app.get('io');
-    if (io) {
-      io.to(projectId).emit('file_updated', {
-        projectId,
-        path: nodePath,
-        content: file.content
-      });
-    }
+    // Subscribers refetch the content only if they have the file open
+    pushChange(req, projectId, 'filesystem:file-updated', {
+      path: nodePath,
+      etag: file.etag
+    });
 
     res.json({
       success: true,
@@ -528,16 +314,13 @@ export const updateFileContent = async (req, res) => {
     });
   } catch (error) {
     console.error('Update file content error:', error);
-    res.status(500).json({
-      success: false,
-      message: 'Failed to update file content',
-      error: error.message
-    });
+    sendError(res, error, 'Failed to update file content');
   }
 };
 
 export default {
   getFileStructure,
+  getFolderChildren,
   createFileOrFolder,
   renameFileOrFolder,
   deleteFileOrFolder,
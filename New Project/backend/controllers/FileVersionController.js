@@ -1,12 +1,37 @@
 import File from '../models/File.js';
 import FileVersion from '../models/FileVersion.js';
-import { calculateHash, generateUnifiedDiff, getDiffStats } from '../utils/diffUtil.js';
+import blobStore from '../services/BlobStore.js';
+import yjsManager from '../services/YjsManager.js';
+import { calculateHash, generateUnifiedDiff, diffVersions } from '../utils/diffUtil.js';
 
 /**
  * File Version Controller
  * Handles file snapshots, version history, and reverts
+ * Version content lives in the blob store; versions only hold its hash
  */
 
+/**
+ * Content of a version (inline for versions saved before the blob store)
+ */
+const loadContent = async (version) => {
+  const content = version.contentBlob
+    ? await blobStore.get(version.contentBlob)
+    : version.content;
+  return content ?? '';
+};
+
+/**
+ * Save a version; drops the blob reference it took if the save fails
+ */
+const saveVersion = async (version) => {
+  try {
+    await version.save();
+  } catch (error) {
+    await blobStore.release(version.contentBlob);
+    throw error;
+  }
+};
+
 /**
  * @route   POST /files/:id/save-snapshot
  * @desc    Save a snapshot of the file
@@ -50,22 +75,19 @@ export const saveSnapshot = async (req, res) => {
       });
     }
 
-    // Generate diff
-    const diffString = generateUnifiedDiff(
-      oldContent, 
+    // Generate diff and statistics in one pass
+    const { diff: diffString, stats } = diffVersions(
+      oldContent,
       newContent,
       `v${lastVersion?.versionNumber || 0}`,
       `v${versionNumber}`
     );
 
-    // Get diff statistics
-    const stats = getDiffStats(oldContent, newContent);
-
     // Create new version
     const version = new FileVersion({
       fileId: id,
       versionNumber,
-      content: newContent,
+      contentBlob: await blobStore.put(newContent),
       contentHash,
       diff: diffString,
       createdBy: req.userId,
@@ -81,7 +103,7 @@ export const saveSnapshot = async (req, res) => {
       }
     });
 
-    await version.save();
+    await saveVersion(version);
 
     // Update file
     file.content = newContent;
@@ -90,8 +112,12 @@ export const saveSnapshot = async (req, res) => {
     file.metadata.lineCount = newContent.split('\n').length;
     await file.save();
 
+    // Collaborative sessions load from the Yjs log, not file.content
+    await yjsManager.applyExternalContent(id, newContent);
+
     // Populate creator info
     await version.populate('createdBy', 'username email avatar');
+    version.content = newContent;
 
     res.status(201).json({
       success: true,
@@ -144,7 +170,7 @@ export const getVersionHistory = async (req, res) => {
       .sort({ versionNumber: -1 })
       .limit(limit * 1)
       .skip((page - 1) * limit)
-      .select('-diff'); // Exclude diff for list view
+      .select('-diff -content'); // Exclude bodies for list view
 
     const total = await FileVersion.countDocuments(query);
 
@@ -197,6 +223,8 @@ export const getVersionDetails = async (req, res) => {
       });
     }
 
+    version.content = await loadContent(version);
+
     res.json({
       success: true,
       data: { version }
@@ -244,8 +272,8 @@ export const revertToVersion = async (req, res) => {
       });
     }
 
-    const oldContent = file.content;
-    const newContent = targetVersion.content;
+    const oldContent = file.content || '';
+    const newContent = await loadContent(targetVersion);
 
     // Create a snapshot of current state before reverting
     if (createSnapshot) {
@@ -258,7 +286,7 @@ export const revertToVersion = async (req, res) => {
       const snapshot = new FileVersion({
         fileId: id,
         versionNumber: snapshotNumber,
-        content: oldContent,
+        contentBlob: await blobStore.put(oldContent),
         contentHash: calculateHash(oldContent),
         diff: generateUnifiedDiff(oldContent, oldContent, `v${snapshotNumber}`, `v${snapshotNumber}`),
         createdBy: req.userId,
@@ -268,11 +296,11 @@ export const revertToVersion = async (req, res) => {
         tags: ['pre-revert', 'snapshot']
       });
 
-      await snapshot.save();
+      await saveVersion(snapshot);
     }
 
-    // Calculate stats for the revert
-    const stats = getDiffStats(oldContent, newContent);
+    // Diff and stats for the revert
+    const { diff: revertDiff, stats } = diffVersions(oldContent, newContent, 'current', `reverted to v${versionNumber}`);
 
     // Update the file
     file.content = newContent;
@@ -281,6 +309,8 @@ export const revertToVersion = async (req, res) => {
     file.metadata.lineCount = newContent.split('\n').length;
     await file.save();
 
+    await yjsManager.applyExternalContent(id, newContent);
+
     // Get latest version number for new revert version
     const latestVersion = await FileVersion.findOne({ fileId: id })
       .sort({ versionNumber: -1 })
@@ -288,13 +318,18 @@ export const revertToVersion = async (req, res) => {
 
     const newVersionNumber = latestVersion ? latestVersion.versionNumber + 1 : 1;
 
+    // The revert version points at the target's blob
+    const contentBlob = targetVersion.contentBlob && await blobStore.retain(targetVersion.contentBlob)
+      ? targetVersion.contentBlob
+      : await blobStore.put(newContent);
+
     // Create new version for the revert
     const revertVersion = new FileVersion({
       fileId: id,
       versionNumber: newVersionNumber,
-      content: newContent,
+      contentBlob,
       contentHash: targetVersion.contentHash,
-      diff: generateUnifiedDiff(oldContent, newContent, 'current', `reverted to v${versionNumber}`),
+      diff: revertDiff,
       createdBy: req.userId,
       message: `Reverted to version ${versionNumber}`,
       size: targetVersion.size,
@@ -308,8 +343,9 @@ export const revertToVersion = async (req, res) => {
       }
     });
 
-    await revertVersion.save();
+    await saveVersion(revertVersion);
     await revertVersion.populate('createdBy', 'username email avatar');
+    revertVersion.content = newContent;
 
     res.json({
       success: true,
@@ -341,8 +377,8 @@ export const compareVersions = async (req, res) => {
     const { id, versionA, versionB } = req.params;
 
     const [versionADoc, versionBDoc] = await Promise.all([
-      FileVersion.findOne({ fileId: id, versionNumber: parseInt(versionA) }),
-      FileVersion.findOne({ fileId: id, versionNumber: parseInt(versionB) })
+      FileVersion.findOne({ fileId: id, versionNumber: parseInt(versionA) }).select('-diff'),
+      FileVersion.findOne({ fileId: id, versionNumber: parseInt(versionB) }).select('-diff')
     ]);
 
     if (!versionADoc || !versionBDoc) {
@@ -352,15 +388,32 @@ export const compareVersions = async (req, res) => {
       });
     }
 
-    // Generate diff
-    const diffString = generateUnifiedDiff(
-      versionADoc.content,
-      versionBDoc.content,
-      `v${versionA}`,
-      `v${versionB}`
-    );
-
-    const stats = getDiffStats(versionADoc.content, versionBDoc.content);
+    let diffString;
+    let stats;
+
+    if (versionADoc.contentHash === versionBDoc.contentHash) {
+      // Identical content: one body to count lines, no diff
+      const lineCount = (await loadContent(versionADoc)).split('\n').length;
+      diffString = `--- v${versionA}\n+++ v${versionB}\n`;
+      stats = {
+        linesAdded: 0,
+        linesRemoved: 0,
+        linesChanged: 0,
+        oldLineCount: lineCount,
+        newLineCount: lineCount,
+        charactersAdded: 0,
+        charactersRemoved: 0,
+        totalChanges: 0
+      };
+    } else {
+      const [contentA, contentB] = await Promise.all([
+        loadContent(versionADoc),
+        loadContent(versionBDoc)
+      ]);
+
+      // Generate diff
+      ({ diff: diffString, stats } = diffVersions(contentA, contentB, `v${versionA}`, `v${versionB}`));
+    }
 
     res.json({
       success: true,
@@ -422,6 +475,8 @@ export const deleteVersion = async (req, res) => {
       });
     }
 
+    await blobStore.release(version.contentBlob);
+
     res.json({
       success: true,
       message: 'Version deleted successfully'
@@ -3,6 +3,7 @@ import path from 'path';
 import fs from 'fs';
 import { fileURLToPath } from 'url';
 import os from 'os';
+import terminalOutput from '../services/TerminalOutput.js';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
@@ -228,22 +229,9 @@ export const executeCommand = async (req, res) => {
 
     const io = req.app.get('io');
 
-    // Handle stdout
-    childProcess.stdout.on('data', (data) => {
-      const output = data.toString();
-      io.to(`project:${projectId}`).emit('terminal:output', {
-        terminalId,
-        output,
-      });
-    });
-
-    // Handle stderr
-    childProcess.stderr.on('data', (data) => {
-      const output = data.toString();
-      io.to(`project:${projectId}`).emit('terminal:output', {
-        terminalId,
-        output: `\x1b[31m${output}\x1b[0m`, // Red color for errors
-      });
+    // Stream stdout/stderr to the project room (batched, with scrollback)
+    const output = terminalOutput.open(io, terminalId, projectId).attach(childProcess, {
+      decorateStderr: (text) => `\x1b[31m${text}\x1b[0m`, // Red color for errors
     });
 
     // Handle process exit
@@ -273,10 +261,7 @@ export const executeCommand = async (req, res) => {
           process.kill(proc.pid);
           processMap.delete(terminalId);
           
-          io.to(`project:${projectId}`).emit('terminal:output', {
-            terminalId,
-            output: '\r\n\x1b[33m[Command timeout - process killed after 2 minutes]\x1b[0m\r\n',
-          });
+          output.notice('\r\n\x1b[33m[Command timeout - process killed after 2 minutes]\x1b[0m\r\n');
         } catch (error) {
           console.error('Error killing timed out process:', error);
         }
@@ -399,6 +384,7 @@ export const closeTerminal = async (req, res) => {
 
     // Remove session
     terminalSessions.delete(terminalId);
+    terminalOutput.close(terminalId);
 
     res.json({
       success: true,
@@ -55,7 +55,8 @@ const activitySchema = new mongoose.Schema({
 });
 
 // Compound index for efficient queries
-activitySchema.index({ projectId: 1, timestamp: -1 });
+activitySchema.index({ projectId: 1, timestamp: -1, _id: -1 });
+activitySchema.index({ projectId: 1, type: 1, timestamp: -1, _id: -1 });
 activitySchema.index({ userId: 1, timestamp: -1 });
 
 // Helper method to create activity
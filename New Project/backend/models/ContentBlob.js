@@ -0,0 +1,47 @@
+import mongoose from 'mongoose';
+
+/**
+ * ContentBlob Model
+ * Immutable file bodies keyed by the SHA-256 of their content, shared by
+ * every FileVersion and checkpoint DeltaSnapshot with that content.
+ * refCount counts the documents pointing at the blob; blobs at zero are
+ * deleted by BlobStore.collectGarbage after a grace period.
+ */
+const contentBlobSchema = new mongoose.Schema({
+  // SHA-256 (hex) of the UTF-8 content
+  _id: {
+    type: String,
+    required: true
+  },
+
+  // Encoded bytes; codec null = raw UTF-8 (see DeltaEngine/utils/codecs.js)
+  data: {
+    type: Buffer,
+    required: true
+  },
+
+  codec: {
+    type: String,
+    default: null
+  },
+
+  // Content bytes before encoding
+  size: {
+    type: Number,
+    default: 0
+  },
+
+  refCount: {
+    type: Number,
+    default: 0
+  }
+}, {
+  timestamps: true
+});
+
+// Garbage collection: unreferenced blobs, oldest release first
+contentBlobSchema.index({ refCount: 1, updatedAt: 1 });
+
+const ContentBlob = mongoose.model('ContentBlob', contentBlobSchema);
+
+export default ContentBlob;
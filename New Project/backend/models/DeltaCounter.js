@@ -0,0 +1,129 @@
+import mongoose from 'mongoose';
+
+/**
+ * DeltaCounter Model
+ * One document per file holding the last allocated snapshot version, the
+ * head snapshotId and the replay cost accumulated since the last
+ * checkpoint, updated atomically so any backend process can allocate
+ * versions (and place checkpoints) without in-memory state
+ */
+const deltaCounterSchema = new mongoose.Schema({
+  fileId: {
+    type: mongoose.Schema.Types.ObjectId,
+    ref: 'File',
+    required: true,
+    unique: true
+  },
+
+  // Last allocated version number
+  seq: {
+    type: Number,
+    default: 0
+  },
+
+  // snapshotId of the most recently allocated version
+  headSnapshotId: {
+    type: String,
+    default: null
+  },
+
+  // Head before the last allocation (base of the allocated version)
+  baseSnapshotId: {
+    type: String,
+    default: null
+  },
+
+  // Replay cost and delta count since the last checkpoint
+  replayCost: {
+    type: Number,
+    default: 0
+  },
+  depth: {
+    type: Number,
+    default: 0
+  },
+
+  // Whether the last allocated version is a checkpoint
+  checkpoint: {
+    type: Boolean,
+    default: false
+  }
+}, {
+  timestamps: true
+});
+
+/**
+ * Atomically allocate the next version for a file and decide whether it is
+ * a checkpoint (see CheckpointPolicy). Returns the updated counter
+ * ({ seq, baseSnapshotId, checkpoint, ... }), or null if the file has no
+ * counter yet.
+ */
+deltaCounterSchema.statics.allocate = async function(fileId, snapshotId, {
+  cost = 0,
+  maxReplayCost = Number.MAX_SAFE_INTEGER,
+  maxDepth = Number.MAX_SAFE_INTEGER
+} = {}) {
+  const replayCost = { $add: [{ $ifNull: ['$replayCost', 0] }, cost] };
+  const depth = { $add: [{ $ifNull: ['$depth', 0] }, 1] };
+
+  return this.findOneAndUpdate(
+    { fileId },
+    [
+      {
+        $set: {
+          seq: { $add: ['$seq', 1] },
+          baseSnapshotId: '$headSnapshotId',
+          headSnapshotId: { $literal: snapshotId },
+          checkpoint: {
+            $or: [{ $gt: [replayCost, maxReplayCost] }, { $gte: [depth, maxDepth] }]
+          }
+        }
+      },
+      {
+        $set: {
+          replayCost: { $cond: ['$checkpoint', 0, replayCost] },
+          depth: { $cond: ['$checkpoint', 0, depth] }
+        }
+      }
+    ],
+    { new: true }
+  ).lean();
+};
+
+/**
+ * Set the replay state after re-checkpointing, unless new versions were
+ * allocated in the meantime (their own allocations keep the state right)
+ */
+deltaCounterSchema.statics.resetReplayState = async function(fileId, seq, { replayCost, depth }) {
+  const result = await this.updateOne(
+    { fileId, seq },
+    { $set: { replayCost, depth } }
+  );
+
+  return result.modifiedCount > 0;
+};
+
+/**
+ * Create the counter for a file if it does not exist yet.
+ * Concurrent seeders are harmless: the loser hits the unique index.
+ */
+deltaCounterSchema.statics.seed = async function(fileId, seq, headSnapshotId) {
+  try {
+    const result = await this.updateOne(
+      { fileId },
+      { $setOnInsert: { seq, headSnapshotId } },
+      { upsert: true }
+    );
+
+    return result.upsertedCount > 0;
+  } catch (error) {
+    if (error.code === 11000) {
+      return false;
+    }
+    throw error;
+  }
+};
+
+const DeltaCounter = mongoose.model('DeltaCounter', deltaCounterSchema);
+
+export default DeltaCounter;
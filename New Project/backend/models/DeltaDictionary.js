@@ -0,0 +1,40 @@
+import mongoose from 'mongoose';
+
+/**
+ * DeltaDictionary Model
+ * Compression dictionary trained on a project's own patches, used by the
+ * deflate-dict delta codec. Dictionaries are immutable: snapshots keep
+ * the dictionaryId they were encoded with, retraining adds a new one.
+ */
+const deltaDictionarySchema = new mongoose.Schema({
+  dictionaryId: {
+    type: String,
+    required: true,
+    unique: true
+  },
+  projectId: {
+    type: mongoose.Schema.Types.ObjectId,
+    ref: 'Project',
+    required: true
+  },
+
+  // Dictionary bytes (at most the 32KB deflate window)
+  data: {
+    type: Buffer,
+    required: true
+  },
+
+  // Number of patches it was trained on
+  sampleCount: {
+    type: Number,
+    default: 0
+  }
+}, {
+  timestamps: true
+});
+
+deltaDictionarySchema.index({ projectId: 1, createdAt: -1 });
+
+const DeltaDictionary = mongoose.model('DeltaDictionary', deltaDictionarySchema);
+
+export default DeltaDictionary;
@@ -30,13 +30,21 @@ const deltaSnapshotSchema = new mongoose.Schema({
     index: true
   },
   
-  // Delta content (compressed patch)
+  // Delta content: plain patch text, or base64 gzip for older snapshots
   delta: {
     type: String,
-    required: true,
-    // Store compressed delta patches
+    // Encoded deltas live in deltaData; the initial snapshot has no delta
+    required: function() {
+      return !this.deltaData && this.baseVersion !== null;
+    },
     default: ''
   },
+
+  // Encoded delta bytes (BSON Binary), see metadata.codec
+  deltaData: {
+    type: Buffer,
+    default: null
+  },
   
   // Base version this delta is based on
   baseVersion: {
@@ -60,7 +68,10 @@ const deltaSnapshotSchema = new mongoose.Schema({
     charsRemoved: { type: Number, default: 0 },
     deltaSize: { type: Number, default: 0 }, // Size in bytes
     compressed: { type: Boolean, default: false },
-    compressionRatio: { type: Number, default: 1.0 }
+    compressionRatio: { type: Number, default: 1.0 },
+    codec: { type: String, default: null }, // gzip | deflate | brotli | deflate-dict; null = legacy
+    dictionaryId: { type: String, default: null }, // DeltaDictionary used by deflate-dict
+    replayCost: { type: Number, default: 0 } // Base length + delta size, see CheckpointPolicy
   },
   
   // Trigger information
@@ -76,7 +87,13 @@ const deltaSnapshotSchema = new mongoose.Schema({
     }
   },
   
-  // Full content snapshot (stored periodically for faster rollback)
+  // Full content of a checkpoint: hash in the blob store (see services/BlobStore.js)
+  contentBlob: {
+    type: String,
+    default: null
+  },
+
+  // Inline full content of checkpoints written before the blob store
   fullSnapshot: {
     type: String,
     default: null
@@ -142,6 +159,7 @@ const deltaSnapshotSchema = new mongoose.Schema({
 // Compound indexes for efficient querying
 deltaSnapshotSchema.index({ projectId: 1, fileId: 1, versionNumber: -1 });
 deltaSnapshotSchema.index({ fileId: 1, createdAt: -1 });
+deltaSnapshotSchema.index({ fileId: 1, status: 1, versionNumber: -1, _id: -1 }); // History pages (keyset)
 deltaSnapshotSchema.index({ userId: 1, createdAt: -1 });
 deltaSnapshotSchema.index({ checksum: 1 });
 deltaSnapshotSchema.index({ baseVersion: 1 });
@@ -184,24 +202,6 @@ deltaSnapshotSchema.statics.getDeltasSince = async function(fileId, baseVersion)
   }).sort({ versionNumber: 1 });
 };
 
-// Static method to cleanup old deltas
-deltaSnapshotSchema.statics.cleanupOldDeltas = async function(fileId, keepCount = 100) {
-  const snapshots = await this.find({ fileId, status: 'active' })
-    .sort({ createdAt: -1 })
-    .skip(keepCount);
-  
-  const idsToArchive = snapshots.map(s => s._id);
-  
-  if (idsToArchive.length > 0) {
-    await this.updateMany(
-      { _id: { $in: idsToArchive } },
-      { status: 'archived', expiresAt: new Date(Date.now() + 30 * 24 * 60 * 60 * 1000) } // 30 days
-    );
-  }
-  
-  return idsToArchive.length;
-};
-
 const DeltaSnapshot = mongoose.model('DeltaSnapshot', deltaSnapshotSchema);
 
 export default DeltaSnapshot;
@@ -0,0 +1,150 @@
+import mongoose from 'mongoose';
+
+/**
+ * DeltaStats Model
+ * One document per file with running totals over its active snapshots,
+ * kept current with $inc from the snapshot write path (and negative $inc
+ * when versions are archived), so stats reads are a point lookup instead
+ * of an aggregation. The worst-case replay run is a high-water mark since
+ * the last rebuild; rebuildFileStats recomputes everything from scratch.
+ */
+const deltaStatsSchema = new mongoose.Schema({
+  fileId: {
+    type: mongoose.Schema.Types.ObjectId,
+    ref: 'File',
+    required: true,
+    unique: true
+  },
+
+  projectId: {
+    type: mongoose.Schema.Types.ObjectId,
+    ref: 'Project',
+    default: null,
+    index: true
+  },
+
+  totalSnapshots: { type: Number, default: 0 },
+  totalCheckpoints: { type: Number, default: 0 },
+  totalSize: { type: Number, default: 0 }, // Sum of metadata.deltaSize
+  compressionRatioSum: { type: Number, default: 0 }, // Average = sum / totalSnapshots
+  linesAdded: { type: Number, default: 0 },
+  linesRemoved: { type: Number, default: 0 },
+
+  // Longest delta run between checkpoints (see DeltaManager.getReplayProfile)
+  worstCaseReplayDepth: { type: Number, default: 0 },
+  worstCaseReplayCost: { type: Number, default: 0 },
+
+  // When the totals were last recomputed from the snapshots
+  rebuiltAt: {
+    type: Date,
+    default: null
+  }
+}, {
+  timestamps: true
+});
+
+/**
+ * Counter increments contributed by a set of snapshot documents
+ */
+deltaStatsSchema.statics.totalsOf = function(snapshots) {
+  const totals = {
+    totalSnapshots: 0,
+    totalCheckpoints: 0,
+    totalSize: 0,
+    compressionRatioSum: 0,
+    linesAdded: 0,
+    linesRemoved: 0
+  };
+
+  for (const snapshot of snapshots) {
+    const metadata = snapshot.metadata || {};
+    totals.totalSnapshots++;
+    totals.totalCheckpoints += snapshot.isCheckpoint ? 1 : 0;
+    totals.totalSize += metadata.deltaSize || 0;
+    totals.compressionRatioSum += metadata.compressionRatio ?? 1;
+    totals.linesAdded += metadata.linesAdded || 0;
+    totals.linesRemoved += metadata.linesRemoved || 0;
+  }
+
+  return totals;
+};
+
+/**
+ * Add newly persisted snapshots: one upsert per file. A snapshot's replay
+ * run at allocation ({ depth, cost }) is read from `$locals.replay`.
+ */
+deltaStatsSchema.statics.record = async function(snapshots) {
+  const byFile = new Map();
+
+  for (const snapshot of snapshots) {
+    const fileId = String(snapshot.fileId);
+    if (!byFile.has(fileId)) {
+      byFile.set(fileId, []);
+    }
+    byFile.get(fileId).push(snapshot);
+  }
+
+  const operations = [...byFile.values()].map(fileSnapshots => {
+    let depth = 0;
+    let cost = 0;
+    for (const snapshot of fileSnapshots) {
+      const replay = snapshot.$locals?.replay;
+      depth = Math.max(depth, replay?.depth || 0);
+      cost = Math.max(cost, replay?.cost || 0);
+    }
+
+    return {
+      updateOne: {
+        filter: { fileId: fileSnapshots[0].fileId },
+        update: {
+          $inc: this.totalsOf(fileSnapshots),
+          $max: { worstCaseReplayDepth: depth, worstCaseReplayCost: cost },
+          $set: { projectId: fileSnapshots[0].projectId }
+        },
+        upsert: true
+      }
+    };
+  });
+
+  if (operations.length > 0) {
+    await this.bulkWrite(operations, { ordered: false });
+  }
+};
+
+/**
+ * Apply counter changes (e.g. negative totals for archived versions).
+ * Files without a stats document are left for rebuildFileStats.
+ */
+deltaStatsSchema.statics.adjust = async function(fileId, inc) {
+  await this.updateOne({ fileId }, { $inc: inc });
+};
+
+/**
+ * Totals over every file of a project
+ */
+deltaStatsSchema.statics.projectTotals = async function(projectId) {
+  const [totals] = await this.aggregate([
+    { $match: { projectId: new mongoose.Types.ObjectId(String(projectId)) } },
+    {
+      $group: {
+        _id: null,
+        files: { $sum: 1 },
+        totalSnapshots: { $sum: '$totalSnapshots' },
+        totalCheckpoints: { $sum: '$totalCheckpoints' },
+        totalSize: { $sum: '$totalSize' },
+        compressionRatioSum: { $sum: '$compressionRatioSum' },
+        linesAdded: { $sum: '$linesAdded' },
+        linesRemoved: { $sum: '$linesRemoved' },
+        worstCaseReplayDepth: { $max: '$worstCaseReplayDepth' },
+        worstCaseReplayCost: { $max: '$worstCaseReplayCost' }
+      }
+    },
+    { $project: { _id: 0 } }
+  ]);
+
+  return totals || null;
+};
+
+const DeltaStats = mongoose.model('DeltaStats', deltaStatsSchema);
+
+export default DeltaStats;
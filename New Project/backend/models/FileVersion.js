@@ -12,9 +12,15 @@ const fileVersionSchema = new mongoose.Schema({
     required: true,
     min: 1
   },
+  // SHA-256 of the content in the blob store (see services/BlobStore.js)
+  contentBlob: {
+    type: String,
+    default: null
+  },
+  // Inline content of versions saved before the blob store
   content: {
     type: String,
-    required: true
+    default: undefined
   },
   contentHash: {
     type: String,
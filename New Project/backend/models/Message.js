@@ -101,11 +101,32 @@ const messageSchema = new mongoose.Schema({
 
 // Indexes
 messageSchema.index({ projectId: 1, createdAt: -1 });
-messageSchema.index({ roomId: 1, createdAt: -1 });
+messageSchema.index({ roomId: 1, createdAt: -1, _id: -1 });
 messageSchema.index({ senderId: 1 });
-messageSchema.index({ projectId: 1, isDeleted: 1, createdAt: -1 });
+messageSchema.index({ projectId: 1, isDeleted: 1, createdAt: -1, _id: -1 });
 messageSchema.index({ roomId: 1, isDeleted: 1, createdAt: -1 });
 
+// Chat feed entry for a lean message whose senderId holds a user profile
+messageSchema.statics.toFeedItem = function(msg, userId) {
+  const sender = msg.senderId || {};
+  return {
+    _id: msg._id,
+    userId: sender._id || null,
+    username: sender.username,
+    message: msg.content,
+    sender: {
+      _id: sender._id || null,
+      username: sender.username,
+      email: sender.email,
+      avatar: sender.avatar
+    },
+    timestamp: msg.createdAt.toISOString(),
+    createdAt: msg.createdAt,
+    type: msg.type,
+    isRead: msg.readBy?.some(id => String(id) === String(userId)) || false
+  };
+};
+
 const Message = mongoose.model('Message', messageSchema);
 
 export default Message;
@@ -0,0 +1,55 @@
+import mongoose from 'mongoose';
+
+/**
+ * YjsUpdate Model
+ * Append-only log of binary Yjs updates per file. A document's state is
+ * the merge of all of its rows: compaction replaces many rows with one
+ * 'snapshot' row, and because merging Yjs updates is idempotent, readers
+ * that see both old and new rows mid-compaction still load the right state.
+ */
+const yjsUpdateSchema = new mongoose.Schema({
+  fileId: {
+    type: mongoose.Schema.Types.ObjectId,
+    ref: 'File',
+    required: true
+  },
+
+  // 'update' = edits since the last save, 'snapshot' = compacted state
+  kind: {
+    type: String,
+    enum: ['update', 'snapshot'],
+    default: 'update'
+  },
+
+  // Encoded Yjs update (Y.encodeStateAsUpdate / Y.mergeUpdates)
+  data: {
+    type: Buffer,
+    required: true
+  },
+
+  size: {
+    type: Number,
+    default: 0
+  },
+
+  // Set on the first snapshot of a file, so only one process seeds it
+  seed: {
+    type: Boolean,
+    default: undefined
+  },
+
+  // Rows folded into a snapshot
+  mergedCount: {
+    type: Number,
+    default: 0
+  }
+}, {
+  timestamps: { createdAt: true, updatedAt: false }
+});
+
+yjsUpdateSchema.index({ fileId: 1, _id: 1 });
+yjsUpdateSchema.index({ fileId: 1 }, { unique: true, partialFilterExpression: { seed: true } });
+
+const YjsUpdate = mongoose.model('YjsUpdate', yjsUpdateSchema);
+
+export default YjsUpdate;
@@ -2,6 +2,7 @@ import express from 'express';
 import { authenticate } from '../middleware/auth.js';
 import deltaManager from '../services/DeltaEngine/DeltaManager.js';
 import DeltaSnapshot from '../models/DeltaSnapshot.js';
+import { pageSize } from '../utils/pagination.js';
 
 const router = express.Router();
 
@@ -103,10 +104,10 @@ router.post('/snapshot', authenticate, async (req, res) => {
 router.get('/history/:fileId', authenticate, async (req, res) => {
   try {
     const { fileId } = req.params;
-    const limit = parseInt(req.query.limit) || 50;
-    const skip = parseInt(req.query.skip) || 0;
-
-    const snapshots = await deltaManager.getVersionHistory(fileId, limit, skip);
+    const { snapshots, nextCursor } = await deltaManager.getVersionHistory(fileId, {
+      limit: pageSize(req.query.limit),
+      cursor: req.query.cursor || null
+    });
 
     res.json({
       success: true,
@@ -125,11 +126,12 @@ router.get('/history/:fileId', authenticate, async (req, res) => {
         } : null,
         createdAt: s.createdAt
       })),
-      total: snapshots.length
+      total: snapshots.length,
+      nextCursor
     });
   } catch (error) {
     console.error('[Delta Routes] Get history error:', error);
-    res.status(500).json({
+    res.status(error.status || 500).json({
       success: false,
       message: error.message
     });
@@ -226,18 +228,38 @@ router.post('/rollback', authenticate, async (req, res) => {
 });
 
 /**
- * Get latest file content
+ * Get file content (latest, or at ?version=N)
  * GET /delta/content/:fileId
  */
 router.get('/content/:fileId', authenticate, async (req, res) => {
   try {
     const { fileId } = req.params;
+    const version = req.query.version !== undefined ? parseInt(req.query.version) : null;
+
+    if (version !== null && (isNaN(version) || version < 1)) {
+      return res.status(400).json({
+        success: false,
+        message: 'Invalid version number'
+      });
+    }
+
+    const result = await deltaManager.getContentAtVersion(fileId, version);
 
-    const content = await deltaManager.getLatestContent(fileId);
+    if (!result) {
+      if (version === null) {
+        return res.json({ success: true, content: '', versionNumber: null });
+      }
+
+      return res.status(404).json({
+        success: false,
+        message: 'Version not found'
+      });
+    }
 
     res.json({
       success: true,
-      content
+      content: result.content,
+      versionNumber: result.versionNumber
     });
   } catch (error) {
     console.error('[Delta Routes] Get content error:', error);
@@ -282,6 +304,69 @@ router.post('/compare', authenticate, async (req, res) => {
   }
 });
 
+/**
+ * Recompute per-file delta statistics from the snapshots (runs in the background)
+ * POST /delta/stats/rebuild
+ */
+router.post('/stats/rebuild', authenticate, async (req, res) => {
+  try {
+    const job = deltaManager.startStatsRepair(req.body.fileId || null);
+
+    res.status(202).json({
+      success: true,
+      job
+    });
+  } catch (error) {
+    console.error('[Delta Routes] Rebuild stats error:', error);
+    res.status(500).json({
+      success: false,
+      message: error.message
+    });
+  }
+});
+
+/**
+ * Get stats rebuild progress
+ * GET /delta/stats/rebuild
+ */
+router.get('/stats/rebuild', authenticate, async (req, res) => {
+  try {
+    res.json({
+      success: true,
+      job: deltaManager.getStatsRepairStatus()
+    });
+  } catch (error) {
+    console.error('[Delta Routes] Get stats rebuild status error:', error);
+    res.status(500).json({
+      success: false,
+      message: error.message
+    });
+  }
+});
+
+/**
+ * Get project-wide statistics
+ * GET /delta/stats/project/:projectId
+ */
+router.get('/stats/project/:projectId', authenticate, async (req, res) => {
+  try {
+    const { projectId } = req.params;
+
+    const stats = await deltaManager.getProjectStats(projectId);
+
+    res.json({
+      success: true,
+      stats
+    });
+  } catch (error) {
+    console.error('[Delta Routes] Get project stats error:', error);
+    res.status(500).json({
+      success: false,
+      message: error.message
+    });
+  }
+});
+
 /**
  * Get file statistics
  * GET /delta/stats/:fileId
@@ -305,6 +390,174 @@ router.get('/stats/:fileId', authenticate, async (req, res) => {
   }
 });
 
+/**
+ * Get delta cache statistics (content + snapshot)
+ * GET /delta/cache/stats
+ */
+router.get('/cache/stats', authenticate, async (req, res) => {
+  try {
+    res.json({
+      success: true,
+      stats: deltaManager.getCacheStats()
+    });
+  } catch (error) {
+    console.error('[Delta Routes] Get cache stats error:', error);
+    res.status(500).json({
+      success: false,
+      message: error.message
+    });
+  }
+});
+
+/**
+ * Get snapshot write-behind queue statistics
+ * GET /delta/writer/stats
+ */
+router.get('/writer/stats', authenticate, async (req, res) => {
+  try {
+    res.json({
+      success: true,
+      stats: deltaManager.getWriterStats()
+    });
+  } catch (error) {
+    console.error('[Delta Routes] Get writer stats error:', error);
+    res.status(500).json({
+      success: false,
+      message: error.message
+    });
+  }
+});
+
+/**
+ * Get delta worker pool statistics
+ * GET /delta/workers/stats
+ */
+router.get('/workers/stats', authenticate, async (req, res) => {
+  try {
+    res.json({
+      success: true,
+      stats: deltaManager.getWorkerStats()
+    });
+  } catch (error) {
+    console.error('[Delta Routes] Get worker stats error:', error);
+    res.status(500).json({
+      success: false,
+      message: error.message
+    });
+  }
+});
+
+/**
+ * Train a delta compression dictionary for a project
+ * POST /delta/dictionary/:projectId/train
+ */
+router.post('/dictionary/:projectId/train', authenticate, async (req, res) => {
+  try {
+    const { projectId } = req.params;
+    const sampleSize = Math.min(parseInt(req.body.sampleSize) || 500, 5000);
+
+    const dictionary = await deltaManager.trainProjectDictionary(projectId, sampleSize);
+
+    if (!dictionary) {
+      return res.status(409).json({
+        success: false,
+        message: 'Not enough snapshot history to train a dictionary'
+      });
+    }
+
+    res.json({
+      success: true,
+      dictionary
+    });
+  } catch (error) {
+    console.error('[Delta Routes] Train dictionary error:', error);
+    res.status(500).json({
+      success: false,
+      message: error.message
+    });
+  }
+});
+
+/**
+ * Re-place checkpoints with the current policy (runs in the background)
+ * POST /delta/checkpoints/rebuild
+ */
+router.post('/checkpoints/rebuild', authenticate, async (req, res) => {
+  try {
+    const job = deltaManager.startRecheckpoint(req.body.fileId || null);
+
+    res.status(202).json({
+      success: true,
+      job
+    });
+  } catch (error) {
+    console.error('[Delta Routes] Rebuild checkpoints error:', error);
+    res.status(500).json({
+      success: false,
+      message: error.message
+    });
+  }
+});
+
+/**
+ * Get checkpoint rebuild progress
+ * GET /delta/checkpoints/rebuild
+ */
+router.get('/checkpoints/rebuild', authenticate, async (req, res) => {
+  try {
+    res.json({
+      success: true,
+      job: deltaManager.getRecheckpointStatus()
+    });
+  } catch (error) {
+    console.error('[Delta Routes] Get rebuild status error:', error);
+    res.status(500).json({
+      success: false,
+      message: error.message
+    });
+  }
+});
+
+/**
+ * Run a retention sweep over every file (runs in the background)
+ * POST /delta/retention
+ */
+router.post('/retention', authenticate, async (req, res) => {
+  try {
+    deltaManager.runRetention({ full: true });
+
+    res.status(202).json({
+      success: true,
+      retention: deltaManager.getRetentionStats()
+    });
+  } catch (error) {
+    console.error('[Delta Routes] Start retention error:', error);
+    res.status(500).json({
+      success: false,
+      message: error.message
+    });
+  }
+});
+
+/**
+ * Get retention progress and totals (archived versions, bytes, duration)
+ * GET /delta/retention
+ */
+router.get('/retention', authenticate, async (req, res) => {
+  try {
+    res.json({
+      success: true,
+      retention: deltaManager.getRetentionStats()
+    });
+  } catch (error) {
+    console.error('[Delta Routes] Get retention stats error:', error);
+    res.status(500).json({
+      success: false,
+      message: error.message
+    });
+  }
+});
+
 /**
  * Cleanup old deltas
  * POST /delta/cleanup/:fileId
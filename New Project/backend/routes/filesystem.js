@@ -1,6 +1,7 @@
 import express from 'express';
 import {
   getFileStructure,
+  getFolderChildren,
   createFileOrFolder,
   renameFileOrFolder,
   deleteFileOrFolder,
@@ -17,6 +18,13 @@ const router = express.Router();
  */
 router.get('/:projectId', getFileStructure);
 
+/**
+ * @route   GET /api/filesystem/:projectId/children
+ * @desc    Get one page of a folder's children (lazy tree)
+ * @access  Private
+ */
+router.get('/:projectId/children', getFolderChildren);
+
 /**
  * @route   POST /api/filesystem/:projectId/create
  * @desc    Create a new file or folder
@@ -4,6 +4,8 @@ import Project from '../models/Project.js';
 import Activity from '../models/Activity.js';
 import Message from '../models/Message.js';
 import { authenticate } from '../middleware/auth.js';
+import userCache from '../services/UserCache.js';
+import { pageSize, keysetPage, countUpTo } from '../utils/pagination.js';
 
 const router = express.Router();
 
@@ -308,11 +310,12 @@ router.post('/join', authenticate, [
  */
 router.get('/:id/activity', authenticate, async (req, res) => {
   try {
-    const { page = 1, limit = 50, type } = req.query;
+    const { cursor, type } = req.query;
+    const limit = pageSize(req.query.limit);
     const projectId = req.params.id;
 
     // Verify user has access to project
-    const project = await Project.findById(projectId);
+    const project = await Project.findById(projectId).select('ownerId members.userId').lean();
     if (!project) {
       return res.status(404).json({
         success: false,
@@ -336,29 +339,32 @@ router.get('/:id/activity', authenticate, async (req, res) => {
       query.type = type;
     }
 
-    // Fetch activities
-    const activities = await Activity.find(query)
-      .populate('userId', 'username email avatar')
-      .sort({ timestamp: -1 })
-      .limit(limit * 1)
-      .skip((page - 1) * limit);
+    // Fetch one page after the cursor (newest first)
+    const { items: activities, nextCursor } = await keysetPage(Activity, query, {
+      sortField: 'timestamp',
+      limit,
+      cursor
+    });
+    await userCache.attach(activities, 'userId');
 
-    const total = await Activity.countDocuments(query);
+    // Counted on the first page only
+    const count = cursor ? {} : await countUpTo(Activity, query);
 
     res.json({
       success: true,
       data: {
         activities,
         pagination: {
-          total,
-          page: parseInt(page),
-          pages: Math.ceil(total / limit)
+          ...count,
+          limit,
+          nextCursor,
+          hasMore: nextCursor !== null
         }
       }
     });
   } catch (error) {
     console.error('Get activity error:', error);
-    res.status(500).json({
+    res.status(error.status || 500).json({
       success: false,
       message: 'Error fetching activity',
       error: error.message
@@ -374,10 +380,11 @@ router.get('/:id/activity', authenticate, async (req, res) => {
 router.get('/:id/messages', authenticate, async (req, res) => {
   try {
     const projectId = req.params.id;
-    const { page = 1, limit = 50, before } = req.query;
+    const { cursor, before } = req.query;
+    const limit = pageSize(req.query.limit);
 
     // Verify project access
-    const project = await Project.findById(projectId);
+    const project = await Project.findById(projectId).select('ownerId members.userId').lean();
     if (!project) {
       return res.status(404).json({
         success: false,
@@ -405,46 +412,35 @@ router.get('/:id/messages', authenticate, async (req, res) => {
       query.createdAt = { $lt: new Date(before) };
     }
 
-    // Fetch messages
-    const messages = await Message.find(query)
-      .populate('senderId', 'username email avatar')
-      .sort({ createdAt: -1 })
-      .limit(limit * 1)
-      .skip((page - 1) * limit);
+    // Fetch one page after the cursor (newest first)
+    const { items: messages, nextCursor } = await keysetPage(Message, query, {
+      sortField: 'createdAt',
+      limit,
+      cursor,
+      select: 'senderId content type createdAt readBy'
+    });
+    await userCache.attach(messages, 'senderId');
 
-    const total = await Message.countDocuments(query);
-
-    const formattedMessages = messages.reverse().map(msg => ({
-      _id: msg._id,
-      userId: msg.senderId._id,
-      username: msg.senderId.username,
-      message: msg.content,
-      sender: {
-        _id: msg.senderId._id,
-        username: msg.senderId.username,
-        email: msg.senderId.email,
-        avatar: msg.senderId.avatar
-      },
-      timestamp: msg.createdAt.toISOString(),
-      createdAt: msg.createdAt,
-      type: msg.type,
-      isRead: msg.readBy?.includes(req.userId) || false
-    }));
+    // Counted on the first page only
+    const count = cursor ? {} : await countUpTo(Message, query);
+
+    const formattedMessages = messages.reverse().map(msg => Message.toFeedItem(msg, req.userId));
 
     res.json({
       success: true,
       data: {
         messages: formattedMessages,
         pagination: {
-          total,
-          page: parseInt(page),
-          pages: Math.ceil(total / limit)
+          ...count,
+          limit,
+          nextCursor,
+          hasMore: nextCursor !== null
         }
       }
     });
   } catch (error) {
     console.error('Get messages error:', error);
-    res.status(500).json({
+    res.status(error.status || 500).json({
       success: false,
       message: 'Error fetching messages',
       error: error.message
@@ -4,6 +4,7 @@ import User from '../models/User.js';
 import UserAPIKey from '../models/UserAPIKey.js';
 import { authenticate } from '../middleware/auth.js';
 import encryptionHelper from '../utils/encryption.js';
+import userCache from '../services/UserCache.js';
 import multer from 'multer';
 import path from 'path';
 import fs from 'fs';
@@ -145,6 +146,7 @@ router.post('/update', authenticate, upload.single('avatar'), [
 
     user.updatedAt = Date.now();
     await user.save();
+    userCache.invalidate(user._id);
 
     res.json({
       success: true,
@@ -1,4 +1,5 @@
 import express from 'express';
+import cluster from 'cluster';
 import { createServer } from 'http';
 import { Server } from 'socket.io';
 import cors from 'cors';
@@ -24,8 +25,19 @@ import terminalRoutes from './routes/terminal.js';
 
 // Import Yjs handlers
 import setupYjsHandlers from './services/SocketHandlers.js';
-import setupDeltaSockets from './services/DeltaEngine/DeltaSocketHandlers.js';
+import setupDeltaSockets, { deltaScheduler } from './services/DeltaEngine/DeltaSocketHandlers.js';
 import setupTerminalSockets from './services/TerminalSocketHandlers.js';
+import terminalOutput from './services/TerminalOutput.js';
+import shellSessions from './services/ShellSessionPool.js';
+import userCache from './services/UserCache.js';
+import blobStore from './services/BlobStore.js';
+import deltaManager from './services/DeltaEngine/DeltaManager.js';
+import yjsManager from './services/YjsManager.js';
+import yjsBroadcaster from './services/YjsBroadcaster.js';
+import presenceManager from './services/PresenceManager.js';
+import clusterRouter from './services/cluster/ClusterRouter.js';
+import { ClusterIpcBroker } from './services/cluster/brokers.js';
+import { createBrokerAdapter } from './services/cluster/BrokerAdapter.js';
 
 // Load environment variables
 dotenv.config();
@@ -69,16 +81,36 @@ app.use(cookieParser());
 app.use(express.json());
 app.use(express.urlencoded({ extended: true }));
 
+// Cluster mode (see cluster.js): each worker is a node, files are owned
+// by one node and rooms are shared through the broker adapter
+const NODE_ID = process.env.NODE_ID || 'node-0';
+const CLUSTER_NODES = (process.env.CLUSTER_NODES || '').split(',').filter(Boolean);
+const broker = cluster.isWorker && CLUSTER_NODES.length > 1 ? new ClusterIpcBroker() : null;
+
 // ✅ Socket.IO Setup (same origins)
 const io = new Server(httpServer, {
   cors: corsOptions,
   maxHttpBufferSize: 1e8, // 100 MB for large Yjs updates
   pingTimeout: 60000,
   pingInterval: 25000,
+  // Workers share the port round-robin, so long-polling (several HTTP
+  // requests per session) would hit different workers
+  ...(broker && {
+    adapter: createBrokerAdapter(broker),
+    transports: ['websocket']
+  })
 });
 
 // Setup Yjs collaboration handlers
-setupYjsHandlers(io);
+const registerSocketHandlers = setupYjsHandlers(io);
+
+clusterRouter.configure({
+  nodeId: NODE_ID,
+  nodes: broker ? CLUSTER_NODES : [NODE_ID],
+  broker,
+  io,
+  registerHandlers: registerSocketHandlers
+});
 
 // Setup Terminal socket handlers
 setupTerminalSockets(io);
@@ -101,6 +133,12 @@ app.use('/uploads', express.static('uploads'));
 // Connect to MongoDB
 connectDB();
 
+// Archive snapshot versions past retention in the background
+deltaManager.startRetention();
+
+// Delete unreferenced content blobs periodically
+blobStore.start();
+
 // API Routes
 app.use('/auth', authRoutes);
 app.use('/user', userRoutes);
@@ -130,6 +168,15 @@ app.get('/health', (req, res) => {
     status: 'ok',
     mongodb: mongoose.connection.readyState === 1 ? 'connected' : 'disconnected',
     uptime: process.uptime(),
+    yjs: yjsManager.getStats(),
+    yjsBroadcast: yjsBroadcaster.getStats(),
+    deltaScheduler: deltaScheduler.getStats(),
+    presence: presenceManager.getStats(),
+    cluster: clusterRouter.getStats(),
+    terminals: terminalOutput.getStats(),
+    shells: shellSessions.getStats(),
+    userCache: userCache.getStats(),
+    blobStore: blobStore.getStats(),
     timestamp: new Date().toISOString()
   });
 });
@@ -157,15 +204,27 @@ httpServer.on('error', (err) => {
 });
 
 // Graceful shutdown
-process.on('SIGTERM', () => {
+process.on('SIGTERM', async () => {
   console.log('SIGTERM signal received: closing HTTP server');
-  httpServer.close(() => {
-    console.log('HTTP server closed');
-    mongoose.connection.close(false, () => {
-      console.log('MongoDB connection closed');
-      process.exit(0);
-    });
-  });
+  try {
+    shellSessions.closeAll();
+    // Disconnects every socket and closes the HTTP server; httpServer.close
+    // alone waits for open sockets, which would never let the flushes run
+    io.close(() => console.log('HTTP server closed'));
+
+    // Persist any snapshots still queued in the write-behind buffer
+    await deltaManager.shutdown();
+    // and collaborative edits still inside the save debounce
+    await yjsManager.flushAll();
+    await presenceManager.flush();
+
+    await mongoose.connection.close(false);
+    console.log('MongoDB connection closed');
+  } catch (error) {
+    console.error('[Server] Shutdown error:', error);
+  } finally {
+    process.exit(0);
+  }
 });
 
 export { app, io };
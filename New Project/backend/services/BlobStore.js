@@ -0,0 +1,232 @@
+import crypto from 'crypto';
+import ContentBlob from '../models/ContentBlob.js';
+import { encodeDelta, decodeStoredDelta, toBytes } from './DeltaEngine/utils/codecs.js';
+
+/**
+ * Blob Store
+ * Content-addressed, reference-counted storage for full file bodies
+ * (FileVersion content and DeltaSnapshot checkpoints). Identical content
+ * is stored once: put() on existing content is a single $inc, and
+ * pointing a new document at an existing blob (revert) is retain().
+ * Bodies over COMPRESS_MIN_BYTES are brotli-encoded when that pays off.
+ * Blobs are immutable, so decoded bodies are cached without invalidation.
+ */
+class BlobStore {
+  constructor() {
+    this.CODEC = 'brotli';
+    this.COMPRESS_MIN_BYTES = 1024;
+    this.MAX_RATIO = 0.9; // Store raw unless encoding saves at least 10%
+    this.MAX_CACHED_BYTES = 16 * 1024 * 1024;
+    this.MAX_CACHED_BLOB = 1024 * 1024;
+    this.GC_GRACE_MS = 60 * 60 * 1000; // Unreferenced blobs survive an hour
+    this.GC_INTERVAL_MS = 60 * 60 * 1000;
+
+    this.cache = new Map(); // hash -> content; insertion order is LRU order
+    this.cachedBytes = 0;
+    this.gcTimer = null;
+
+    this.stats = {
+      stored: 0,
+      deduplicated: 0,
+      released: 0,
+      underflows: 0,
+      hits: 0,
+      misses: 0,
+      bytesStored: 0,
+      bytesDeduplicated: 0,
+      collected: 0
+    };
+  }
+
+  hash(content) {
+    return crypto.createHash('sha256').update(content || '', 'utf8').digest('hex');
+  }
+
+  /**
+   * Store content (or add `count` references to it); returns its hash
+   */
+  async put(content, count = 1) {
+    content = content || '';
+    const hash = this.hash(content);
+    const size = Buffer.byteLength(content, 'utf8');
+
+    if (await this.retain(hash, count)) {
+      this.stats.deduplicated++;
+      this.stats.bytesDeduplicated += size;
+      this.remember(hash, content);
+      return hash;
+    }
+
+    const { data, codec } = await this.encode(content);
+
+    try {
+      await ContentBlob.updateOne(
+        { _id: hash },
+        { $setOnInsert: { data, codec, size }, $inc: { refCount: count } },
+        { upsert: true }
+      );
+      this.stats.stored++;
+      this.stats.bytesStored += data.length;
+    } catch (error) {
+      if (error.code !== 11000) throw error;
+
+      // A concurrent put inserted it first
+      await this.retain(hash, count);
+    }
+
+    this.remember(hash, content);
+    return hash;
+  }
+
+  /**
+   * Add references to an existing blob; false if it does not exist
+   */
+  async retain(hash, count = 1) {
+    const result = await ContentBlob.updateOne({ _id: hash }, { $inc: { refCount: count } });
+    return result.matchedCount > 0;
+  }
+
+  /**
+   * Drop references; unreferenced blobs are left for collectGarbage.
+   * A release that would take refCount below zero is logged, not applied.
+   */
+  async release(hash, count = 1) {
+    if (!hash) return;
+
+    const result = await ContentBlob.updateOne(
+      { _id: hash, refCount: { $gte: count } },
+      { $inc: { refCount: -count } }
+    );
+
+    if (result.matchedCount === 0) {
+      this.stats.underflows++;
+      console.error(`[BlobStore] Release underflow: ${hash} has fewer than ${count} references`);
+      return;
+    }
+    this.stats.released += count;
+  }
+
+  /**
+   * Content of a blob, or null if it does not exist
+   */
+  async get(hash) {
+    return (await this.getMany([hash])).get(hash) ?? null;
+  }
+
+  /**
+   * Contents of several blobs in one query: Map of hash -> content
+   */
+  async getMany(hashes) {
+    const contents = new Map();
+    const missing = [];
+
+    for (const hash of new Set(hashes.filter(Boolean))) {
+      const content = this.cache.get(hash);
+      if (content !== undefined) {
+        this.remember(hash, content);
+        contents.set(hash, content);
+        this.stats.hits++;
+      } else {
+        missing.push(hash);
+      }
+    }
+
+    if (missing.length > 0) {
+      this.stats.misses += missing.length;
+      const blobs = await ContentBlob.find({ _id: { $in: missing } }).select('data codec').lean();
+
+      for (const blob of blobs) {
+        const content = this.decode(blob);
+        this.remember(blob._id, content);
+        contents.set(blob._id, content);
+      }
+    }
+
+    return contents;
+  }
+
+  async encode(content) {
+    const raw = Buffer.from(content, 'utf8');
+
+    if (raw.length >= this.COMPRESS_MIN_BYTES) {
+      const encoded = await encodeDelta(content, this.CODEC);
+      if (encoded.ratio <= this.MAX_RATIO) {
+        return { data: encoded.data, codec: encoded.codec };
+      }
+    }
+
+    return { data: raw, codec: null };
+  }
+
+  decode(blob) {
+    if (blob.codec) {
+      return decodeStoredDelta({ deltaData: blob.data, codec: blob.codec });
+    }
+    return Buffer.from(toBytes(blob.data)).toString('utf8');
+  }
+
+  remember(hash, content) {
+    if (content.length > this.MAX_CACHED_BLOB) return;
+
+    if (this.cache.has(hash)) {
+      this.cache.delete(hash);
+    } else {
+      this.cachedBytes += content.length;
+    }
+    this.cache.set(hash, content);
+
+    while (this.cachedBytes > this.MAX_CACHED_BYTES) {
+      const [oldest, evicted] = this.cache.entries().next().value;
+      this.cache.delete(oldest);
+      this.cachedBytes -= evicted.length;
+    }
+  }
+
+  /**
+   * Delete blobs unreferenced for longer than graceMs. A put() in the
+   * meantime raises refCount and updatedAt, so the blob no longer matches.
+   */
+  async collectGarbage(graceMs = this.GC_GRACE_MS) {
+    const result = await ContentBlob.deleteMany({
+      refCount: { $lte: 0 },
+      updatedAt: { $lt: new Date(Date.now() - graceMs) }
+    });
+
+    this.stats.collected += result.deletedCount;
+    return result.deletedCount;
+  }
+
+  /**
+   * Run garbage collection periodically (after the database is connected)
+   */
+  start() {
+    if (this.gcTimer) return;
+
+    this.gcTimer = setInterval(() => {
+      this.collectGarbage().catch(error => {
+        console.error('[BlobStore] Garbage collection error:', error);
+      });
+    }, this.GC_INTERVAL_MS);
+    this.gcTimer.unref();
+  }
+
+  stop() {
+    clearInterval(this.gcTimer);
+    this.gcTimer = null;
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      cachedBlobs: this.cache.size,
+      cachedBytes: this.cachedBytes
+    };
+  }
+}
+
+export { BlobStore };
+
+// Singleton instance
+const blobStore = new BlobStore();
+
+export default blobStore;
@@ -0,0 +1,54 @@
+/**
+ * CheckpointPolicy - Decides which snapshots store full content
+ *
+ * Replaying a delta costs roughly the length of the content it is applied
+ * to (applyPatch re-splits the whole document) plus the size of the delta.
+ * A version becomes a checkpoint once the replay cost accumulated since the
+ * previous checkpoint would exceed maxReplayCost, or after maxDepth deltas.
+ * Small files therefore checkpoint rarely, large files with large deltas
+ * often, and reconstructing any version stays within the same budget.
+ */
+class CheckpointPolicy {
+  constructor({
+    maxReplayCost = 4 * 1024 * 1024, // characters processed to reach any version
+    maxDepth = 100 // deltas replayed to reach any version
+  } = {}) {
+    this.maxReplayCost = maxReplayCost;
+    this.maxDepth = maxDepth;
+  }
+
+  /**
+   * Replay cost of a delta applied to content of the given length
+   */
+  cost(baseLength, deltaSize) {
+    return baseLength + deltaSize;
+  }
+
+  /**
+   * Should the next version be a checkpoint, given { replayCost, depth }
+   * accumulated since the last one?
+   */
+  shouldCheckpoint(state, cost) {
+    return state.depth + 1 >= this.maxDepth || state.replayCost + cost > this.maxReplayCost;
+  }
+
+  /**
+   * State after adding a version with the given cost
+   */
+  advance(state, cost) {
+    if (this.shouldCheckpoint(state, cost)) {
+      return { replayCost: 0, depth: 0, checkpoint: true };
+    }
+
+    return { replayCost: state.replayCost + cost, depth: state.depth + 1, checkpoint: false };
+  }
+
+  toJSON() {
+    return {
+      maxReplayCost: this.maxReplayCost,
+      maxDepth: this.maxDepth
+    };
+  }
+}
+
+export default CheckpointPolicy;
@@ -0,0 +1,177 @@
+/**
+ * ContentCache - Bounded LRU of materialized file contents
+ * Keyed by (fileId, versionNumber) so reads can skip the checkpoint + patch replay
+ */
+class ContentCache {
+  constructor({ maxBytes = 64 * 1024 * 1024, maxEntries = 5000 } = {}) {
+    this.entries = new Map(); // Insertion order doubles as LRU order
+    this.fileVersions = new Map(); // fileId -> Set of cached version numbers
+    this.maxBytes = maxBytes;
+    this.maxEntries = maxEntries;
+    this.bytes = 0;
+
+    this.stats = {
+      hits: 0,
+      misses: 0,
+      evictions: 0,
+      sets: 0
+    };
+  }
+
+  /**
+   * Build cache key for a file version
+   */
+  key(fileId, versionNumber) {
+    return `${fileId}:${versionNumber}`;
+  }
+
+  /**
+   * Estimate bytes held by a cached string (UTF-16 in V8)
+   */
+  sizeOf(content) {
+    return content.length * 2;
+  }
+
+  /**
+   * Get content for an exact version
+   */
+  get(fileId, versionNumber) {
+    const key = this.key(fileId, versionNumber);
+    const entry = this.entries.get(key);
+
+    if (!entry) {
+      this.stats.misses++;
+      return null;
+    }
+
+    // Refresh LRU position
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    this.stats.hits++;
+
+    return entry.content;
+  }
+
+  /**
+   * Get the highest cached version at or below maxVersion
+   */
+  getNearest(fileId, maxVersion) {
+    const versions = this.fileVersions.get(String(fileId));
+    if (!versions) return null;
+
+    let best = -1;
+    for (const version of versions) {
+      if (version <= maxVersion && version > best) {
+        best = version;
+      }
+    }
+
+    if (best < 0) return null;
+
+    const content = this.get(fileId, best);
+    return content === null ? null : { versionNumber: best, content };
+  }
+
+  /**
+   * Store content for a version
+   */
+  set(fileId, versionNumber, content) {
+    if (typeof content !== 'string') return false;
+
+    const size = this.sizeOf(content);
+    if (size > this.maxBytes) return false;
+
+    const key = this.key(fileId, versionNumber);
+    this.remove(key);
+
+    this.entries.set(key, { fileId: String(fileId), versionNumber, content, size });
+    this.bytes += size;
+    this.stats.sets++;
+
+    const file = String(fileId);
+    if (!this.fileVersions.has(file)) {
+      this.fileVersions.set(file, new Set());
+    }
+    this.fileVersions.get(file).add(versionNumber);
+
+    this.evict();
+    return true;
+  }
+
+  /**
+   * Evict least recently used entries until within bounds
+   */
+  evict() {
+    while (this.bytes > this.maxBytes || this.entries.size > this.maxEntries) {
+      const oldestKey = this.entries.keys().next().value;
+      if (oldestKey === undefined) break;
+
+      this.remove(oldestKey);
+      this.stats.evictions++;
+    }
+  }
+
+  /**
+   * Remove a single entry by key
+   */
+  remove(key) {
+    const entry = this.entries.get(key);
+    if (!entry) return false;
+
+    this.entries.delete(key);
+    this.bytes -= entry.size;
+
+    const versions = this.fileVersions.get(entry.fileId);
+    if (versions) {
+      versions.delete(entry.versionNumber);
+      if (versions.size === 0) {
+        this.fileVersions.delete(entry.fileId);
+      }
+    }
+
+    return true;
+  }
+
+  /**
+   * Drop every cached version of a file
+   */
+  invalidate(fileId) {
+    const versions = this.fileVersions.get(String(fileId));
+    if (!versions) return 0;
+
+    let removed = 0;
+    for (const version of Array.from(versions)) {
+      if (this.remove(this.key(fileId, version))) removed++;
+    }
+
+    return removed;
+  }
+
+  /**
+   * Clear the whole cache
+   */
+  clear() {
+    this.entries.clear();
+    this.fileVersions.clear();
+    this.bytes = 0;
+  }
+
+  /**
+   * Get cache statistics
+   */
+  getStats() {
+    const lookups = this.stats.hits + this.stats.misses;
+
+    return {
+      ...this.stats,
+      hitRate: lookups > 0 ? this.stats.hits / lookups : 0,
+      entries: this.entries.size,
+      files: this.fileVersions.size,
+      bytes: this.bytes,
+      maxBytes: this.maxBytes,
+      maxEntries: this.maxEntries
+    };
+  }
+}
+
+export default ContentCache;
@@ -1,12 +1,37 @@
-import pako from 'pako';
+import zlib from 'zlib';
+import { promisify } from 'util';
+import { encodeDelta, decodeStoredDelta } from './utils/codecs.js';
+
+const gzip = promisify(zlib.gzip);
 
 /**
  * DeltaCompressor - Handles compression and decompression of delta patches
- * Uses gzip compression for efficient storage
+ * New snapshots are encoded with a native zlib codec (see utils/codecs.js)
+ * and stored as binary; compress/decompress keep the original base64 gzip
+ * format for reading and writing older snapshots
  */
 class DeltaCompressor {
   /**
-   * Compress a delta patch
+   * Encode a patch with a codec; `data` is a Buffer for deltaData
+   */
+  static async encode(patch, codec, dictionary = null) {
+    try {
+      return await encodeDelta(patch, codec, dictionary);
+    } catch (error) {
+      console.error('[DeltaCompressor] Encode error:', error);
+      throw error;
+    }
+  }
+
+  /**
+   * Decode a stored delta ({ delta, deltaData, codec, compressed, dictionaryId })
+   */
+  static decodeSync(stored, dictionaries = {}) {
+    return decodeStoredDelta(stored, dictionaries);
+  }
+
+  /**
+   * Compress a delta patch (legacy base64 gzip format)
    */
   static async compress(deltaString) {
     try {
@@ -19,24 +44,17 @@ class DeltaCompressor {
         };
       }
 
-      const originalSize = Buffer.byteLength(deltaString, 'utf8');
-      
-      // Convert string to Uint8Array
-      const input = new TextEncoder().encode(deltaString);
-      
-      // Compress using pako (gzip)
-      const compressed = pako.gzip(input, { level: 6 });
-      
+      const input = Buffer.from(deltaString, 'utf8');
+      const compressed = await gzip(input, { level: 6 });
+
       // Convert to base64 for storage
-      const base64 = Buffer.from(compressed).toString('base64');
+      const base64 = compressed.toString('base64');
       const compressedSize = Buffer.byteLength(base64, 'utf8');
-      
-      const ratio = originalSize > 0 ? compressedSize / originalSize : 1.0;
 
       return {
         data: base64,
-        ratio,
-        originalSize,
+        ratio: compressedSize / input.length,
+        originalSize: input.length,
         compressedSize
       };
     } catch (error) {
@@ -46,24 +64,11 @@ class DeltaCompressor {
   }
 
   /**
-   * Decompress a delta patch
+   * Decompress a delta patch (legacy base64 gzip format)
    */
   static async decompress(compressedData) {
     try {
-      if (!compressedData || compressedData.length === 0) {
-        return '';
-      }
-
-      // Convert from base64
-      const compressed = Buffer.from(compressedData, 'base64');
-      
-      // Decompress using pako
-      const decompressed = pako.ungzip(compressed);
-      
-      // Convert back to string
-      const result = new TextDecoder().decode(decompressed);
-
-      return result;
+      return decodeStoredDelta({ delta: compressedData, compressed: true });
     } catch (error) {
       console.error('[DeltaCompressor] Decompression error:', error);
       throw error;
@@ -74,14 +79,7 @@ class DeltaCompressor {
    * Batch compress multiple deltas
    */
   static async batchCompress(deltas) {
-    const results = [];
-    
-    for (const delta of deltas) {
-      const compressed = await this.compress(delta);
-      results.push(compressed);
-    }
-
-    return results;
+    return Promise.all(deltas.map(delta => this.compress(delta)));
   }
 
   /**
@@ -1,8 +1,20 @@
+import mongoose from 'mongoose';
 import DeltaSnapshot from '../../models/DeltaSnapshot.js';
-import { createChecksum, generateSnapshotId } from './utils/checksum.js';
-import { computeDiff, applyPatch } from './utils/diffUtils.js';
-import { compressDelta, decompressDelta } from './DeltaCompressor.js';
+import DeltaCounter from '../../models/DeltaCounter.js';
+import DeltaStats from '../../models/DeltaStats.js';
+import DeltaDictionary from '../../models/DeltaDictionary.js';
+import { createChecksum, generateSnapshotId, generateDictionaryId } from './utils/checksum.js';
+import { DICTIONARY_CODEC, toBytes, trainDictionary } from './utils/codecs.js';
+import deltaWorkerPool from './DeltaWorkerPool.js';
+import DeltaCompressor from './DeltaCompressor.js';
+import CheckpointPolicy from './CheckpointPolicy.js';
 import RedisCache from './RedisCache.js';
+import ContentCache from './ContentCache.js';
+import SnapshotWriter from './SnapshotWriter.js';
+import RetentionEngine from './RetentionEngine.js';
+import userCache from '../UserCache.js';
+import blobStore from '../BlobStore.js';
+import { keysetPage } from '../../utils/pagination.js';
 
 /**
  * DeltaManager - Main orchestrator for delta snapshot system
@@ -11,10 +23,25 @@ import RedisCache from './RedisCache.js';
 class DeltaManager {
   constructor() {
     this.cache = new RedisCache();
+    this.contentCache = new ContentCache(); // Materialized content per (fileId, version)
+    this.writer = new SnapshotWriter({
+      onBatch: (snapshots) => Promise.all([
+        this.updateCacheForBatch(snapshots),
+        this.updateStatsForBatch(snapshots)
+      ])
+    });
     this.pendingDeltas = new Map(); // Buffer for unsaved edits
-    this.versionCounters = new Map(); // Track version numbers per file
-    this.CHECKPOINT_INTERVAL = 20; // Create full checkpoint every N deltas
+    this.pendingContent = new Map(); // `${fileId}:${version}` -> content allocated but not yet persisted
+    this.dictionaries = new Map(); // dictionaryId -> bytes
+    this.projectDictionaries = new Map(); // projectId -> { dictionary, loadedAt }
+    this.checkpointPolicy = new CheckpointPolicy(); // Where full content is stored
+    this.recheckpointJob = null; // Background checkpoint re-placement
+    this.statsRepairJob = null; // Background DeltaStats rebuild
+    this.staleStats = new Set(); // fileIds whose stats update failed; rebuilt on next read
+    this.retention = new RetentionEngine(this); // Background archival past 100 versions
     this.MAX_CACHE_SIZE = 10; // Keep last N deltas in Redis
+    this.DELTA_CODEC = 'brotli'; // Codec for deltas > 1KB without a project dictionary
+    this.DICTIONARY_REFRESH_MS = 5 * 60 * 1000; // Re-check for newer project dictionaries
   }
 
   /**
@@ -29,12 +56,19 @@ class DeltaManager {
       }).sort({ versionNumber: -1 });
 
       if (latestSnapshot) {
-        this.versionCounters.set(fileId, latestSnapshot.versionNumber);
+        await DeltaCounter.seed(fileId, latestSnapshot.versionNumber, latestSnapshot.snapshotId);
         return latestSnapshot;
       }
 
-      // Create initial checkpoint
+      // Claim version 1 atomically; a concurrent initializer that loses
+      // returns the winner's snapshot instead of writing a duplicate
       const snapshotId = generateSnapshotId();
+      const claimed = await DeltaCounter.seed(fileId, 1, snapshotId);
+
+      if (!claimed) {
+        return await this.waitForInitialSnapshot(fileId);
+      }
+
       const checksum = createChecksum(initialContent);
 
       const initialSnapshot = new DeltaSnapshot({
@@ -45,7 +79,7 @@ class DeltaManager {
         delta: '',
         baseVersion: null,
         checksum,
-        fullSnapshot: initialContent,
+        contentBlob: await blobStore.put(initialContent),
         isCheckpoint: true,
         versionNumber: 1,
         message: 'Initial snapshot',
@@ -55,11 +89,17 @@ class DeltaManager {
         }
       });
 
-      await initialSnapshot.save();
-      this.versionCounters.set(fileId, 1);
+      try {
+        await initialSnapshot.save();
+      } catch (error) {
+        await blobStore.release(initialSnapshot.contentBlob);
+        throw error;
+      }
+      await this.updateStatsForBatch([initialSnapshot]);
+      this.contentCache.set(fileId, 1, initialContent);
       
       // Cache initial snapshot
-      await this.cache.set(`snapshot:${fileId}:latest`, initialSnapshot);
+      await this.cache.set(`snapshot:${fileId}:latest`, this.toCacheEntry(initialSnapshot));
 
       return initialSnapshot;
     } catch (error) {
@@ -82,87 +122,326 @@ class DeltaManager {
     tags = []
   }) {
     try {
-      // Get current version number
-      let versionNumber = this.versionCounters.get(fileId) || 1;
-      versionNumber++;
-      this.versionCounters.set(fileId, versionNumber);
-
-      // Compute delta
-      const delta = computeDiff(oldContent, newContent);
-      const checksum = createChecksum(newContent);
       const snapshotId = generateSnapshotId();
+      const checksum = createChecksum(newContent);
 
-      // Get base version
-      const latestSnapshot = await DeltaSnapshot.findOne({
-        fileId,
-        status: 'active'
-      }).sort({ createdAt: -1 });
+      // Diff against the caller's base first: when no other write raced
+      // this one, it is the version allocated below
+      let delta = await deltaWorkerPool.diff(oldContent, newContent);
+      let replayCost = this.checkpointPolicy.cost(
+        (oldContent || '').length,
+        Buffer.byteLength(delta.patch, 'utf8')
+      );
 
-      const baseVersion = latestSnapshot ? latestSnapshot.snapshotId : null;
+      // Allocate version and base snapshot in one atomic round-trip; the
+      // counter also decides whether this version is a checkpoint
+      const allocated = await this.allocateVersion(fileId, snapshotId, replayCost);
+      const { versionNumber, baseVersion, replay } = allocated;
+      let { isCheckpoint } = allocated;
 
-      // Determine if this should be a checkpoint
-      const isCheckpoint = versionNumber % this.CHECKPOINT_INTERVAL === 0;
+      // Base for the next writer of this file until this version is persisted
+      const pendingKey = `${fileId}:${versionNumber}`;
+      this.pendingContent.set(pendingKey, newContent);
 
-      // Compress delta if necessary
-      const deltaSize = Buffer.byteLength(delta.patch, 'utf8');
-      let compressedDelta = delta.patch;
-      let compressionRatio = 1.0;
-      let isCompressed = false;
+      try {
+        // The delta must apply to the allocated base, not to whatever the
+        // caller last saw
+        const baseContent = versionNumber > 1
+          ? await this.getBaseContent(fileId, versionNumber - 1)
+          : null;
 
-      if (deltaSize > 1024) { // Compress if > 1KB
-        const compressed = await compressDelta(delta.patch);
-        compressedDelta = compressed.data;
-        compressionRatio = compressed.ratio;
-        isCompressed = true;
+        if (baseContent === null) {
+          // Base unknown (not persisted, or failed): store full content
+          isCheckpoint = true;
+        } else if (baseContent !== (oldContent || '')) {
+          delta = await deltaWorkerPool.diff(baseContent, newContent);
+          replayCost = this.checkpointPolicy.cost(baseContent.length, Buffer.byteLength(delta.patch, 'utf8'));
+        }
+
+        return await this.persistSnapshot({
+          snapshotId,
+          projectId,
+          fileId,
+          userId,
+          newContent,
+          delta,
+          checksum,
+          versionNumber,
+          baseVersion,
+          isCheckpoint,
+          replay,
+          replayCost,
+          trigger,
+          message,
+          tags
+        });
+      } finally {
+        this.pendingContent.delete(pendingKey);
       }
+    } catch (error) {
+      console.error('[DeltaManager] Create snapshot error:', error);
+      throw error;
+    }
+  }
 
-      // Create snapshot document
-      const snapshot = new DeltaSnapshot({
-        snapshotId,
-        projectId,
-        fileId,
-        userId,
-        delta: compressedDelta,
-        baseVersion,
-        checksum,
-        fullSnapshot: isCheckpoint ? newContent : null,
-        isCheckpoint,
-        versionNumber,
-        message,
-        tags,
-        metadata: {
-          linesAdded: delta.stats.linesAdded,
-          linesRemoved: delta.stats.linesRemoved,
-          charsAdded: delta.stats.charsAdded,
-          charsRemoved: delta.stats.charsRemoved,
-          deltaSize,
-          compressed: isCompressed,
-          compressionRatio
-        },
-        trigger: {
-          type: trigger,
-          timestamp: new Date()
-        }
-      });
+  /**
+   * Content of the version a new delta is based on: in flight in this
+   * process, cached, or persisted. Another process may still be writing
+   * it, so a few short retries are made; null if it never appears.
+   */
+  async getBaseContent(fileId, versionNumber, attempts = 5, delayMs = 50) {
+    for (let i = 0; i < attempts; i++) {
+      const pending = this.pendingContent.get(`${fileId}:${versionNumber}`);
+      if (pending !== undefined) return pending;
 
-      await snapshot.save();
+      try {
+        const content = await this.materializeVersion(fileId, versionNumber);
+        if (content !== null) return content;
+      } catch (error) {
+        // Not persisted yet
+      }
+
+      await new Promise(resolve => setTimeout(resolve, delayMs));
+    }
 
-      // Update cache
-      await this.cache.addDelta(fileId, snapshot);
-      await this.cache.set(`snapshot:${fileId}:latest`, snapshot);
+    return null;
+  }
 
-      // Cleanup old deltas periodically
-      if (versionNumber % 50 === 0) {
-        await this.cleanupOldDeltas(fileId);
+  /**
+   * Encode the delta and persist the snapshot through the write-behind queue
+   */
+  async persistSnapshot({
+    snapshotId,
+    projectId,
+    fileId,
+    userId,
+    newContent,
+    delta,
+    checksum,
+    versionNumber,
+    baseVersion,
+    isCheckpoint,
+    replay,
+    replayCost,
+    trigger,
+    message,
+    tags
+  }) {
+    // Encode delta if necessary (stored as binary, codec in metadata)
+    const deltaSize = Buffer.byteLength(delta.patch, 'utf8');
+    let storedDelta = delta.patch;
+    let deltaData = null;
+    let codec = null;
+    let dictionaryId = null;
+    let compressionRatio = 1.0;
+    let isCompressed = false;
+
+    if (deltaSize > 1024) { // Compress if > 1KB
+      const dictionary = await this.getProjectDictionary(projectId);
+      const encoded = dictionary
+        ? await DeltaCompressor.encode(delta.patch, DICTIONARY_CODEC, dictionary.data)
+        : await DeltaCompressor.encode(delta.patch, this.DELTA_CODEC);
+
+      storedDelta = '';
+      deltaData = encoded.data;
+      codec = encoded.codec;
+      dictionaryId = dictionary ? dictionary.dictionaryId : null;
+      compressionRatio = encoded.ratio;
+      isCompressed = true;
+    }
+
+    // Create snapshot document
+    const snapshot = new DeltaSnapshot({
+      snapshotId,
+      projectId,
+      fileId,
+      userId,
+      delta: storedDelta,
+      deltaData,
+      baseVersion,
+      checksum,
+      contentBlob: isCheckpoint ? await blobStore.put(newContent) : null,
+      isCheckpoint,
+      versionNumber,
+      message,
+      tags,
+      metadata: {
+        linesAdded: delta.stats.linesAdded,
+        linesRemoved: delta.stats.linesRemoved,
+        charsAdded: delta.stats.charsAdded,
+        charsRemoved: delta.stats.charsRemoved,
+        deltaSize,
+        compressed: isCompressed,
+        compressionRatio,
+        codec,
+        dictionaryId,
+        replayCost
+      },
+      trigger: {
+        type: trigger,
+        timestamp: new Date()
       }
+    });
 
-      console.log(`[DeltaManager] Created snapshot ${snapshotId} (v${versionNumber}) for file ${fileId}`);
+    // Replay run at allocation, for the file's worst-case stats
+    snapshot.$locals.replay = replay;
 
-      return snapshot;
+    // Persist through the write-behind queue (batched insertMany + cache update)
+    try {
+      await this.writer.enqueue(snapshot);
     } catch (error) {
-      console.error('[DeltaManager] Create snapshot error:', error);
+      await blobStore.release(snapshot.contentBlob);
       throw error;
     }
+
+    // New version's content is already known - no replay needed on next read.
+    // Cached only once persisted, so a failed write never serves content.
+    this.contentCache.set(fileId, versionNumber, newContent);
+
+    // Old versions are archived in the background, off the write path
+    if (versionNumber % 50 === 0) {
+      this.retention.markFile(fileId);
+    }
+
+    console.log(`[DeltaManager] Created snapshot ${snapshotId} (v${versionNumber}) for file ${fileId}`);
+
+    return snapshot;
+  }
+
+  /**
+   * Update snapshot caches once per persisted batch
+   */
+  async updateCacheForBatch(snapshots) {
+    const byFile = new Map();
+
+    for (const snapshot of snapshots) {
+      const fileId = String(snapshot.fileId);
+      if (!byFile.has(fileId)) {
+        byFile.set(fileId, []);
+      }
+      byFile.get(fileId).push(snapshot);
+    }
+
+    const latestEntries = [];
+
+    for (const [fileId, fileSnapshots] of byFile) {
+      await this.cache.addDeltas(fileId, fileSnapshots);
+
+      const latest = fileSnapshots[fileSnapshots.length - 1];
+      latestEntries.push([`snapshot:${fileId}:latest`, this.toCacheEntry(latest)]);
+    }
+
+    await this.cache.mset(latestEntries);
+  }
+
+  /**
+   * Add persisted snapshots to their files' DeltaStats (one upsert per file)
+   */
+  async updateStatsForBatch(snapshots) {
+    try {
+      await DeltaStats.record(snapshots);
+    } catch (error) {
+      console.error('[DeltaManager] Update stats error:', error);
+      for (const snapshot of snapshots) {
+        this.staleStats.add(String(snapshot.fileId));
+      }
+    }
+  }
+
+  /**
+   * Flush queued snapshots and release cache resources (graceful shutdown)
+   */
+  async shutdown() {
+    this.retention.stop();
+    await this.writer.close();
+    await this.cache.close();
+    await deltaWorkerPool.close();
+  }
+
+  /**
+   * Get write-behind queue statistics
+   */
+  getWriterStats() {
+    return this.writer.getStats();
+  }
+
+  /**
+   * Get worker pool statistics (queue depth, event loop delay)
+   */
+  getWorkerStats() {
+    return deltaWorkerPool.getStats();
+  }
+
+  /**
+   * Atomically allocate the next version number for a file.
+   * Safe across processes: the per-file counter document is the only
+   * source of truth, and it also yields the previous head snapshot and
+   * whether the new version must be a checkpoint.
+   */
+  async allocateVersion(fileId, snapshotId, replayCost = 0) {
+    const options = {
+      cost: replayCost,
+      maxReplayCost: this.checkpointPolicy.maxReplayCost,
+      maxDepth: this.checkpointPolicy.maxDepth
+    };
+
+    let counter = await DeltaCounter.allocate(fileId, snapshotId, options);
+
+    if (!counter) {
+      // First allocation through the counter: seed it from existing history
+      const latest = await DeltaSnapshot.findOne({ fileId })
+        .sort({ versionNumber: -1 })
+        .select('versionNumber snapshotId')
+        .lean();
+
+      await DeltaCounter.seed(
+        fileId,
+        latest ? latest.versionNumber : 1,
+        latest ? latest.snapshotId : null
+      );
+
+      counter = await DeltaCounter.allocate(fileId, snapshotId, options);
+    }
+
+    return {
+      versionNumber: counter.seq,
+      baseVersion: counter.baseSnapshotId,
+      isCheckpoint: counter.checkpoint,
+      replay: { depth: counter.depth || 0, cost: counter.replayCost || 0 }
+    };
+  }
+
+
+  /**
+   * Wait briefly for a concurrent initializer to persist version 1
+   */
+  async waitForInitialSnapshot(fileId, attempts = 5, delayMs = 50) {
+    for (let i = 0; i < attempts; i++) {
+      const snapshot = await DeltaSnapshot.findOne({ fileId, status: 'active' })
+        .sort({ versionNumber: -1 });
+
+      if (snapshot) return snapshot;
+
+      await new Promise(resolve => setTimeout(resolve, delayMs));
+    }
+
+    throw new Error('Initial snapshot is still being created, please retry');
+  }
+
+  /**
+   * Compact, plain snapshot for the cache (bodies live in the content cache)
+   */
+  toCacheEntry(snapshot) {
+    const plain = typeof snapshot.toObject === 'function'
+      ? snapshot.toObject({ versionKey: false })
+      : { ...snapshot };
+
+    delete plain.delta;
+    delete plain.deltaData;
+    delete plain.fullSnapshot;
+    delete plain.contentBlob;
+
+    return plain;
   }
 
   /**
@@ -179,7 +458,7 @@ class DeltaManager {
         .populate('userId', 'username email avatar');
 
       if (snapshot) {
-        await this.cache.set(`snapshot:id:${snapshotId}`, snapshot);
+        await this.cache.set(`snapshot:id:${snapshotId}`, this.toCacheEntry(snapshot));
       }
 
       return snapshot;
@@ -190,20 +469,22 @@ class DeltaManager {
   }
 
   /**
-   * Get file version history
+   * Get file version history, newest first
+   * Keyset-paginated on (versionNumber, _id): pass the returned nextCursor
+   * to get the next page. Delta bodies are not loaded and authors come
+   * from the shared user cache.
    */
-  async getVersionHistory(fileId, limit = 50, skip = 0) {
+  async getVersionHistory(fileId, { limit = 50, cursor = null } = {}) {
     try {
-      const snapshots = await DeltaSnapshot.find({
-        fileId,
-        status: 'active'
-      })
-        .populate('userId', 'username email avatar')
-        .sort({ createdAt: -1 })
-        .limit(limit)
-        .skip(skip);
+      const { items, nextCursor } = await keysetPage(DeltaSnapshot, { fileId, status: 'active' }, {
+        sortField: 'versionNumber',
+        limit,
+        cursor,
+        select: 'snapshotId versionNumber checksum message trigger metadata isCheckpoint userId createdAt'
+      });
 
-      return snapshots;
+      await userCache.attach(items, 'userId');
+      return { snapshots: items, nextCursor };
     } catch (error) {
       console.error('[DeltaManager] Get version history error:', error);
       throw error;
@@ -222,9 +503,9 @@ class DeltaManager {
       }
 
       // If it's a checkpoint, we have the full content
-      if (targetSnapshot.isCheckpoint && targetSnapshot.fullSnapshot) {
+      if (targetSnapshot.isCheckpoint) {
         return {
-          content: targetSnapshot.fullSnapshot,
+          content: await this.materializeVersion(fileId, targetSnapshot.versionNumber),
           snapshot: targetSnapshot
         };
       }
@@ -262,94 +543,268 @@ class DeltaManager {
    */
   async reconstructContent(fileId, targetSnapshotId) {
     try {
-      // Find nearest checkpoint before target
       const targetSnapshot = await this.getSnapshot(targetSnapshotId);
       
       if (!targetSnapshot) {
         throw new Error('Target snapshot not found');
       }
 
-      // Get the nearest checkpoint at or before this version
-      const checkpoint = await DeltaSnapshot.findOne({
-        fileId,
-        versionNumber: { $lte: targetSnapshot.versionNumber },
-        isCheckpoint: true,
-        status: 'active'
-      }).sort({ versionNumber: -1 });
+      return await this.materializeVersion(fileId, targetSnapshot.versionNumber);
+    } catch (error) {
+      console.error('[DeltaManager] Reconstruct content error:', error);
+      throw error;
+    }
+  }
 
-      if (!checkpoint) {
-        throw new Error('No checkpoint found for reconstruction');
-      }
+  /**
+   * Materialize content for a version, starting from the closest cached
+   * version or checkpoint. Returns null if the version does not exist.
+   */
+  async materializeVersion(fileId, versionNumber) {
+    const cached = this.contentCache.get(fileId, versionNumber);
+    if (cached !== null) {
+      return cached;
+    }
+
+    // Start from the nearest cached version unless a checkpoint is closer;
+    // only a checkpoint newer than the cached base is read
+    let base = this.contentCache.getNearest(fileId, versionNumber);
+
+    const checkpoint = await DeltaSnapshot.findOne({
+      fileId,
+      versionNumber: { $lte: versionNumber, $gt: base ? base.versionNumber : 0 },
+      isCheckpoint: true,
+      status: 'active'
+    })
+      .sort({ versionNumber: -1 })
+      .select('versionNumber contentBlob fullSnapshot')
+      .lean();
+
+    if (checkpoint) {
+      base = {
+        versionNumber: checkpoint.versionNumber,
+        content: await this.checkpointContent(checkpoint)
+      };
+      this.contentCache.set(fileId, base.versionNumber, base.content);
+    }
+
+    if (!base) {
+      throw new Error('No checkpoint found for reconstruction');
+    }
 
-      let content = checkpoint.fullSnapshot || '';
+    if (base.versionNumber === versionNumber) {
+      return base.content;
+    }
+
+    // Get all deltas between base and target
+    const deltas = await DeltaSnapshot.find({
+      fileId,
+      versionNumber: {
+        $gt: base.versionNumber,
+        $lte: versionNumber
+      },
+      status: 'active'
+    })
+      .sort({ versionNumber: 1 })
+      .select('versionNumber delta deltaData metadata.compressed metadata.codec metadata.dictionaryId')
+      .lean();
+
+    // Every version from base + 1 to the target must be present; a gap
+    // (not yet persisted, or archived) would replay onto the wrong base
+    const contiguous = deltas.length === versionNumber - base.versionNumber &&
+      deltas.every((delta, i) => delta.versionNumber === base.versionNumber + 1 + i);
+    if (!contiguous) {
+      return null;
+    }
+
+    // Decode and apply each delta in order (off-thread for large replays)
+    const stored = deltas.map(delta => this.toStoredDelta(delta));
+    const dictionaries = await this.loadDictionaries(stored);
+    const content = await deltaWorkerPool.replay(base.content, stored, dictionaries);
+
+    this.contentCache.set(fileId, versionNumber, content);
+
+    return content;
+  }
+
+  /**
+   * Full content of a checkpoint (inline for checkpoints written before
+   * the blob store)
+   */
+  async checkpointContent(snapshot) {
+    if (!snapshot.contentBlob) {
+      return snapshot.fullSnapshot || '';
+    }
+
+    const content = await blobStore.get(snapshot.contentBlob);
+    if (content === null) {
+      throw new Error(`Checkpoint blob ${snapshot.contentBlob} not found`);
+    }
+    return content;
+  }
+
+  /**
+   * Encoded form of a lean snapshot, as understood by the replay task
+   */
+  toStoredDelta(doc) {
+    const bytes = toBytes(doc.deltaData);
+
+    return {
+      delta: doc.delta,
+      // Own buffer, so the worker pool can transfer it instead of cloning
+      deltaData: bytes ? new Uint8Array(bytes) : null,
+      codec: doc.metadata?.codec || null,
+      compressed: !!doc.metadata?.compressed,
+      dictionaryId: doc.metadata?.dictionaryId || null
+    };
+  }
 
-      // If target is the checkpoint itself, return it
-      if (checkpoint.snapshotId === targetSnapshotId) {
-        return content;
+  /**
+   * Dictionaries needed to decode the given deltas, as { dictionaryId: bytes }
+   */
+  async loadDictionaries(storedDeltas) {
+    const ids = [...new Set(storedDeltas.map(d => d.dictionaryId).filter(Boolean))];
+    const missing = ids.filter(id => !this.dictionaries.has(id));
+
+    if (missing.length > 0) {
+      const docs = await DeltaDictionary.find({ dictionaryId: { $in: missing } })
+        .select('dictionaryId data')
+        .lean();
+
+      for (const doc of docs) {
+        this.dictionaries.set(doc.dictionaryId, new Uint8Array(toBytes(doc.data)));
       }
+    }
 
-      // Get all deltas between checkpoint and target
-      const deltas = await DeltaSnapshot.find({
-        fileId,
-        versionNumber: {
-          $gt: checkpoint.versionNumber,
-          $lte: targetSnapshot.versionNumber
-        },
-        status: 'active'
-      }).sort({ versionNumber: 1 });
+    const dictionaries = {};
+    for (const id of ids) {
+      if (this.dictionaries.has(id)) {
+        dictionaries[id] = this.dictionaries.get(id);
+      }
+    }
 
-      // Apply each delta sequentially
-      for (const delta of deltas) {
-        let patch = delta.delta;
+    return dictionaries;
+  }
 
-        // Decompress if necessary
-        if (delta.metadata.compressed) {
-          patch = await decompressDelta(patch);
-        }
+  /**
+   * Latest trained dictionary for a project, or null
+   */
+  async getProjectDictionary(projectId) {
+    const key = String(projectId);
+    const cached = this.projectDictionaries.get(key);
 
-        content = applyPatch(content, patch);
+    if (cached && Date.now() - cached.loadedAt < this.DICTIONARY_REFRESH_MS) {
+      return cached.dictionary;
+    }
+
+    const doc = await DeltaDictionary.findOne({ projectId })
+      .sort({ createdAt: -1 })
+      .select('dictionaryId data')
+      .lean();
+
+    const dictionary = doc
+      ? { dictionaryId: doc.dictionaryId, data: new Uint8Array(toBytes(doc.data)) }
+      : null;
+
+    if (dictionary) {
+      this.dictionaries.set(dictionary.dictionaryId, dictionary.data);
+    }
+
+    this.projectDictionaries.set(key, { dictionary, loadedAt: Date.now() });
+
+    return dictionary;
+  }
+
+  /**
+   * Train a compression dictionary on a project's recent patches.
+   * New deltas for the project use it (deflate-dict) from then on.
+   */
+  async trainProjectDictionary(projectId, sampleSize = 500) {
+    try {
+      const samples = await DeltaSnapshot.find({
+        projectId,
+        status: 'active',
+        baseVersion: { $ne: null }
+      })
+        .sort({ createdAt: -1 })
+        .limit(sampleSize)
+        .select('delta deltaData metadata.compressed metadata.codec metadata.dictionaryId')
+        .lean();
+
+      const stored = samples.map(sample => this.toStoredDelta(sample));
+      const dictionaries = await this.loadDictionaries(stored);
+      const patches = stored
+        .map(delta => DeltaCompressor.decodeSync(delta, dictionaries))
+        .filter(patch => patch.length > 0);
+
+      if (patches.length < 10) {
+        return null; // Not enough history to learn from
       }
 
-      return content;
+      const dictionary = await DeltaDictionary.create({
+        dictionaryId: generateDictionaryId(),
+        projectId,
+        data: trainDictionary(patches),
+        sampleCount: patches.length
+      });
+
+      const data = new Uint8Array(dictionary.data);
+      this.dictionaries.set(dictionary.dictionaryId, data);
+      this.projectDictionaries.set(String(projectId), {
+        dictionary: { dictionaryId: dictionary.dictionaryId, data },
+        loadedAt: Date.now()
+      });
+
+      return {
+        dictionaryId: dictionary.dictionaryId,
+        size: data.length,
+        sampleCount: patches.length
+      };
     } catch (error) {
-      console.error('[DeltaManager] Reconstruct content error:', error);
+      console.error('[DeltaManager] Train dictionary error:', error);
       throw error;
     }
   }
 
   /**
-   * Get latest file content
+   * Get latest active version number for a file
    */
-  async getLatestContent(fileId) {
-    try {
-      // Try to get from latest checkpoint
-      const latestCheckpoint = await DeltaSnapshot.getLatestCheckpoint(fileId);
-      
-      if (!latestCheckpoint) {
-        return '';
-      }
+  async getLatestVersionNumber(fileId) {
+    const latest = await DeltaSnapshot.findOne({ fileId, status: 'active' })
+      .sort({ versionNumber: -1 })
+      .select('versionNumber')
+      .lean();
 
-      // Get all deltas after the checkpoint
-      const deltas = await DeltaSnapshot.find({
-        fileId,
-        versionNumber: { $gt: latestCheckpoint.versionNumber },
-        status: 'active'
-      }).sort({ versionNumber: 1 });
+    return latest ? latest.versionNumber : null;
+  }
 
-      let content = latestCheckpoint.fullSnapshot || '';
+  /**
+   * Get file content at a specific version (latest if omitted)
+   */
+  async getContentAtVersion(fileId, versionNumber = null) {
+    try {
+      const target = versionNumber || await this.getLatestVersionNumber(fileId);
 
-      // Apply remaining deltas
-      for (const delta of deltas) {
-        let patch = delta.delta;
-        
-        if (delta.metadata.compressed) {
-          patch = await decompressDelta(patch);
-        }
-        
-        content = applyPatch(content, patch);
+      if (!target) {
+        return null;
       }
 
-      return content;
+      const content = await this.materializeVersion(fileId, target);
+
+      return content === null ? null : { content, versionNumber: target };
+    } catch (error) {
+      console.error('[DeltaManager] Get content at version error:', error);
+      throw error;
+    }
+  }
+
+  /**
+   * Get latest file content
+   */
+  async getLatestContent(fileId) {
+    try {
+      const result = await this.getContentAtVersion(fileId);
+      return result ? result.content : '';
     } catch (error) {
       console.error('[DeltaManager] Get latest content error:', error);
       throw error;
@@ -361,17 +816,19 @@ class DeltaManager {
    */
   async compareSnapshots(snapshotId1, snapshotId2) {
     try {
-      const content1 = await this.reconstructContent(
-        (await this.getSnapshot(snapshotId1)).fileId,
-        snapshotId1
-      );
-      
-      const content2 = await this.reconstructContent(
-        (await this.getSnapshot(snapshotId2)).fileId,
-        snapshotId2
-      );
+      const [snapshot1, snapshot2] = await Promise.all([
+        this.getSnapshot(snapshotId1),
+        this.getSnapshot(snapshotId2)
+      ]);
 
-      return computeDiff(content1, content2);
+      if (!snapshot1 || !snapshot2) {
+        throw new Error('Snapshot not found');
+      }
+
+      const content1 = await this.materializeVersion(snapshot1.fileId, snapshot1.versionNumber);
+      const content2 = await this.materializeVersion(snapshot2.fileId, snapshot2.versionNumber);
+
+      return deltaWorkerPool.diff(content1, content2);
     } catch (error) {
       console.error('[DeltaManager] Compare snapshots error:', error);
       throw error;
@@ -379,13 +836,24 @@ class DeltaManager {
   }
 
   /**
-   * Cleanup old deltas for a file
+   * Get content and snapshot cache statistics
+   */
+  getCacheStats() {
+    return {
+      content: this.contentCache.getStats(),
+      snapshots: this.cache.getStats()
+    };
+  }
+
+  /**
+   * Archive a file's versions past keepCount now (re-anchoring the oldest
+   * kept version as a checkpoint); returns the number archived
    */
   async cleanupOldDeltas(fileId, keepCount = 100) {
     try {
-      const archived = await DeltaSnapshot.cleanupOldDeltas(fileId, keepCount);
-      console.log(`[DeltaManager] Archived ${archived} old deltas for file ${fileId}`);
-      return archived;
+      const summary = await this.retention.run({ fileId, keepCount });
+      console.log(`[DeltaManager] Archived ${summary.versionsArchived} old deltas for file ${fileId}`);
+      return summary.versionsArchived;
     } catch (error) {
       console.error('[DeltaManager] Cleanup error:', error);
       throw error;
@@ -393,39 +861,419 @@ class DeltaManager {
   }
 
   /**
-   * Get delta statistics for a file
+   * Start background retention sweeps (after the database is connected)
+   */
+  startRetention() {
+    this.retention.start();
+  }
+
+  /**
+   * Run a retention sweep now; resolves with its summary
+   */
+  runRetention(options = {}) {
+    return this.retention.run(options);
+  }
+
+  getRetentionStats() {
+    return this.retention.getStats();
+  }
+
+  /**
+   * Get delta statistics for a file: its DeltaStats document and the
+   * counter's replay state since the last checkpoint (two point lookups)
    */
   async getFileStats(fileId) {
     try {
-      const stats = await DeltaSnapshot.aggregate([
-        { $match: { fileId: fileId, status: 'active' } },
-        {
-          $group: {
-            _id: null,
-            totalSnapshots: { $sum: 1 },
-            totalCheckpoints: {
-              $sum: { $cond: ['$isCheckpoint', 1, 0] }
-            },
-            totalSize: { $sum: '$metadata.deltaSize' },
-            avgCompressionRatio: { $avg: '$metadata.compressionRatio' },
-            linesAdded: { $sum: '$metadata.linesAdded' },
-            linesRemoved: { $sum: '$metadata.linesRemoved' }
-          }
-        }
+      let [stats, counter] = await Promise.all([
+        DeltaStats.findOne({ fileId }).lean(),
+        DeltaCounter.findOne({ fileId }).select('replayCost depth').lean()
       ]);
 
-      return stats[0] || {
+      // Files written before stats were kept, or whose last update failed
+      if (!stats || this.staleStats.has(String(fileId))) {
+        stats = await this.rebuildFileStats(fileId);
+      }
+
+      return {
+        totalSnapshots: stats.totalSnapshots,
+        totalCheckpoints: stats.totalCheckpoints,
+        totalSize: stats.totalSize,
+        avgCompressionRatio: stats.totalSnapshots > 0
+          ? stats.compressionRatioSum / stats.totalSnapshots
+          : 1.0,
+        linesAdded: stats.linesAdded,
+        linesRemoved: stats.linesRemoved,
+        worstCaseReplayDepth: stats.worstCaseReplayDepth,
+        worstCaseReplayCost: stats.worstCaseReplayCost,
+        headReplayDepth: counter?.depth || 0,
+        headReplayCost: counter?.replayCost || 0,
+        rebuiltAt: stats.rebuiltAt,
+        checkpointPolicy: this.checkpointPolicy.toJSON()
+      };
+    } catch (error) {
+      console.error('[DeltaManager] Get file stats error:', error);
+      throw error;
+    }
+  }
+
+  /**
+   * Get delta statistics rolled up over a project's files
+   */
+  async getProjectStats(projectId) {
+    const totals = await DeltaStats.projectTotals(projectId);
+
+    if (!totals) {
+      return { files: 0, totalSnapshots: 0, totalCheckpoints: 0, totalSize: 0, avgCompressionRatio: 1.0, linesAdded: 0, linesRemoved: 0 };
+    }
+
+    const { compressionRatioSum, ...rest } = totals;
+    return {
+      ...rest,
+      avgCompressionRatio: totals.totalSnapshots > 0 ? compressionRatioSum / totals.totalSnapshots : 1.0
+    };
+  }
+
+  /**
+   * Recompute a file's DeltaStats from its active snapshots. Retried when
+   * versions are allocated during the scan, so concurrent writes are not
+   * double counted.
+   */
+  async rebuildFileStats(fileId, attempts = 3) {
+    const _id = new mongoose.Types.ObjectId(String(fileId));
+
+    for (let attempt = 1; ; attempt++) {
+      // Snapshots queued in this process are counted by their own batch
+      await this.writer.flush();
+      const before = await DeltaCounter.findOne({ fileId: _id }).select('seq').lean();
+
+      const [[totals], profile] = await Promise.all([
+        DeltaSnapshot.aggregate([
+          { $match: { fileId: _id, status: 'active' } },
+          {
+            $group: {
+              _id: null,
+              projectId: { $first: '$projectId' },
+              totalSnapshots: { $sum: 1 },
+              totalCheckpoints: { $sum: { $cond: ['$isCheckpoint', 1, 0] } },
+              totalSize: { $sum: '$metadata.deltaSize' },
+              compressionRatioSum: { $sum: { $ifNull: ['$metadata.compressionRatio', 1] } },
+              linesAdded: { $sum: '$metadata.linesAdded' },
+              linesRemoved: { $sum: '$metadata.linesRemoved' }
+            }
+          },
+          { $project: { _id: 0 } }
+        ]),
+        this.getReplayProfile(_id)
+      ]);
+
+      const after = await DeltaCounter.findOne({ fileId: _id }).select('seq').lean();
+      if (before?.seq !== after?.seq && attempt < attempts) {
+        continue;
+      }
+
+      const { projectId = null, ...counts } = totals || {};
+      const stats = {
+        projectId,
         totalSnapshots: 0,
         totalCheckpoints: 0,
         totalSize: 0,
-        avgCompressionRatio: 1.0,
+        compressionRatioSum: 0,
         linesAdded: 0,
-        linesRemoved: 0
+        linesRemoved: 0,
+        ...counts,
+        worstCaseReplayDepth: profile.worstCaseReplayDepth,
+        worstCaseReplayCost: profile.worstCaseReplayCost,
+        rebuiltAt: new Date()
       };
+
+      this.staleStats.delete(String(fileId));
+      return DeltaStats.findOneAndUpdate(
+        { fileId: _id },
+        { $set: stats },
+        { upsert: true, new: true }
+      ).lean();
+    }
+  }
+
+  /**
+   * Rebuild DeltaStats for one file, or every file, in the background.
+   * Returns the job status; only one job runs at a time.
+   */
+  startStatsRepair(fileId = null) {
+    if (this.statsRepairJob?.running) {
+      return this.statsRepairJob;
+    }
+
+    const job = {
+      running: true,
+      startedAt: new Date(),
+      finishedAt: null,
+      filesDone: 0,
+      errors: 0
+    };
+    this.statsRepairJob = job;
+
+    const repair = async (id) => {
+      try {
+        await this.rebuildFileStats(id);
+      } catch (error) {
+        console.error('[DeltaManager] Stats repair error:', error);
+        job.errors++;
+      }
+      job.filesDone++;
+
+      // Let socket traffic through between files
+      await new Promise(resolve => setImmediate(resolve));
+    };
+
+    const run = async () => {
+      if (fileId) {
+        await repair(fileId);
+        return;
+      }
+
+      const counters = DeltaCounter.find().select('fileId').lean().cursor({ batchSize: 500 });
+      for await (const counter of counters) {
+        await repair(counter.fileId);
+      }
+    };
+
+    run()
+      .catch(error => {
+        console.error('[DeltaManager] Stats repair job error:', error);
+        job.errors++;
+      })
+      .finally(() => {
+        job.running = false;
+        job.finishedAt = new Date();
+      });
+
+    return job;
+  }
+
+  getStatsRepairStatus() {
+    return this.statsRepairJob || { running: false };
+  }
+
+  /**
+   * Worst-case reconstruction work for a file: the longest run of deltas
+   * (and their summed replay cost) between consecutive checkpoints
+   */
+  async getReplayProfile(fileId) {
+    const versions = DeltaSnapshot.find({ fileId, status: 'active' })
+      .sort({ versionNumber: 1 })
+      .select('versionNumber isCheckpoint metadata.replayCost')
+      .lean()
+      .cursor();
+
+    const profile = {
+      worstCaseReplayDepth: 0,
+      worstCaseReplayCost: 0,
+      headReplayDepth: 0,
+      headReplayCost: 0
+    };
+
+    let depth = 0;
+    let cost = 0;
+
+    for await (const version of versions) {
+      if (version.isCheckpoint) {
+        depth = 0;
+        cost = 0;
+        continue;
+      }
+
+      depth++;
+      cost += version.metadata?.replayCost || 0;
+      profile.worstCaseReplayDepth = Math.max(profile.worstCaseReplayDepth, depth);
+      profile.worstCaseReplayCost = Math.max(profile.worstCaseReplayCost, cost);
+    }
+
+    profile.headReplayDepth = depth;
+    profile.headReplayCost = cost;
+
+    return profile;
+  }
+
+  /**
+   * Re-place checkpoints over a file's existing history with the current
+   * policy: versions where the replay budget runs out are promoted, and
+   * checkpoints the policy no longer needs are demoted to plain deltas.
+   * Walks the history in pages, replaying each delta once.
+   */
+  async recheckpointFile(fileId, pageSize = 100) {
+    const summary = { fileId: String(fileId), versions: 0, promoted: 0, demoted: 0 };
+
+    let state = { replayCost: 0, depth: 0 };
+    let content = null;
+    let lastVersion = 0;
+
+    for (;;) {
+      const page = await DeltaSnapshot.find({
+        fileId,
+        status: 'active',
+        versionNumber: { $gt: lastVersion }
+      })
+        .sort({ versionNumber: 1 })
+        .limit(pageSize)
+        .select('versionNumber isCheckpoint contentBlob fullSnapshot delta deltaData metadata')
+        .lean();
+
+      if (page.length === 0) break;
+
+      const updates = [];
+      const stored = []; // Blobs of promoted versions
+      const released = []; // Blobs of demoted versions
+
+      for (const version of page) {
+        const replayed = await this.replayForRecheckpoint(content, version, lastVersion);
+        const checkpointContent = version.isCheckpoint ? await this.checkpointContent(version) : null;
+        const cost = this.checkpointPolicy.cost(
+          content === null ? 0 : content.length,
+          version.metadata?.deltaSize || 0
+        );
+
+        // The oldest version, versions after a gap and checkpoints the
+        // deltas disagree with stay checkpoints
+        const anchor = replayed === null || (version.isCheckpoint && replayed !== checkpointContent);
+        const next = anchor
+          ? { replayCost: 0, depth: 0, checkpoint: true }
+          : this.checkpointPolicy.advance(state, cost);
+
+        content = anchor ? (checkpointContent ?? '') : replayed;
+        state = { replayCost: next.replayCost, depth: next.depth };
+        lastVersion = version.versionNumber;
+        summary.versions++;
+
+        const set = {};
+        if (next.checkpoint && !version.isCheckpoint) {
+          set.isCheckpoint = true;
+          set.contentBlob = await blobStore.put(content);
+          set.fullSnapshot = null;
+          stored.push(set.contentBlob);
+          summary.promoted++;
+        } else if (!next.checkpoint && version.isCheckpoint) {
+          set.isCheckpoint = false;
+          set.contentBlob = null;
+          set.fullSnapshot = null;
+          if (version.contentBlob) released.push(version.contentBlob);
+          summary.demoted++;
+        }
+        if (version.metadata?.replayCost !== cost) {
+          set['metadata.replayCost'] = cost;
+        }
+
+        if (Object.keys(set).length > 0) {
+          updates.push({ updateOne: { filter: { _id: version._id }, update: { $set: set } } });
+        }
+      }
+
+      if (updates.length > 0) {
+        try {
+          await DeltaSnapshot.bulkWrite(updates, { ordered: false });
+        } catch (error) {
+          await Promise.all(stored.map(hash => blobStore.release(hash)));
+          throw error;
+        }
+        await Promise.all(released.map(hash => blobStore.release(hash)));
+      }
+
+      // Let socket traffic through between pages
+      await new Promise(resolve => setImmediate(resolve));
+    }
+
+    if (lastVersion > 0) {
+      await DeltaCounter.resetReplayState(fileId, lastVersion, state);
+    }
+
+    if (summary.promoted > 0 || summary.demoted > 0) {
+      this.contentCache.invalidate(fileId);
+    }
+
+    // Checkpoint counts and replay runs have changed
+    if (summary.versions > 0) {
+      await this.rebuildFileStats(fileId);
+    }
+
+    return summary;
+  }
+
+  /**
+   * Content of `version` replayed from the previous version's content,
+   * or null when it cannot be derived (first version, gap, bad patch)
+   */
+  async replayForRecheckpoint(content, version, previousVersion) {
+    if (content === null || version.versionNumber !== previousVersion + 1) {
+      return null;
+    }
+
+    try {
+      const stored = this.toStoredDelta(version);
+      const dictionaries = await this.loadDictionaries([stored]);
+      return await deltaWorkerPool.replay(content, [stored], dictionaries);
     } catch (error) {
-      console.error('[DeltaManager] Get file stats error:', error);
-      throw error;
+      console.error('[DeltaManager] Recheckpoint replay error:', error);
+      return null;
+    }
+  }
+
+  /**
+   * Re-checkpoint one file, or every file, in the background.
+   * Returns the job status; only one job runs at a time.
+   */
+  startRecheckpoint(fileId = null) {
+    if (this.recheckpointJob?.running) {
+      return this.recheckpointJob;
     }
+
+    const job = {
+      running: true,
+      startedAt: new Date(),
+      finishedAt: null,
+      filesTotal: 0,
+      filesDone: 0,
+      versions: 0,
+      promoted: 0,
+      demoted: 0,
+      errors: 0
+    };
+    this.recheckpointJob = job;
+
+    const run = async () => {
+      const fileIds = fileId
+        ? [fileId]
+        : await DeltaSnapshot.distinct('fileId', { status: 'active' });
+      job.filesTotal = fileIds.length;
+
+      for (const id of fileIds) {
+        try {
+          const summary = await this.recheckpointFile(id);
+          job.versions += summary.versions;
+          job.promoted += summary.promoted;
+          job.demoted += summary.demoted;
+        } catch (error) {
+          console.error('[DeltaManager] Recheckpoint error:', error);
+          job.errors++;
+        }
+        job.filesDone++;
+      }
+    };
+
+    run()
+      .catch(error => {
+        console.error('[DeltaManager] Recheckpoint job error:', error);
+        job.errors++;
+      })
+      .finally(() => {
+        job.running = false;
+        job.finishedAt = new Date();
+      });
+
+    return job;
+  }
+
+  getRecheckpointStatus() {
+    return this.recheckpointJob || { running: false };
   }
 
   /**
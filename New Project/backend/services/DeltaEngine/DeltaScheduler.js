@@ -1,15 +1,21 @@
+import TimerWheel from './TimerWheel.js';
+
 /**
  * DeltaScheduler - Smart trigger system for snapshot creation
  * Implements event-based + time-based hybrid scheduling
+ *
+ * All deadlines (idle, periodic, batch) live on one TimerWheel keyed by
+ * `<kind>:<fileId>`: an edit moves the file's idle deadline instead of
+ * replacing a setTimeout, and per-file state holds ids and counters only -
+ * content is read from the document buffer when a snapshot fires.
  */
 class DeltaScheduler {
-  constructor(deltaManager) {
+  constructor(deltaManager, buffers) {
     this.deltaManager = deltaManager;
-    this.timers = new Map(); // Track timers per file
-    this.lastEditTime = new Map(); // Track last edit timestamp
-    this.editCounts = new Map(); // Track edit count since last snapshot
-    this.lastCursorPosition = new Map(); // Track cursor jumps
-    
+    this.buffers = buffers; // DocumentBuffers - content is read at snapshot time
+    this.files = new Map(); // fileId -> { projectId, userId, lastEdit, editCount, lastCursor, pending }
+    this.snapshotChains = new Map(); // fileId -> tail of the file's queued snapshot work
+
     // Configuration
     this.config = {
       idleThreshold: 10000, // 10 seconds of no edits
@@ -18,23 +24,51 @@ class DeltaScheduler {
       cursorJumpThreshold: 30, // Lines
       editCountThreshold: 50 // Edits before auto-snapshot
     };
+
+    this.wheel = new TimerWheel({
+      tickMs: 50,
+      onExpire: (key, payload) => this.onDeadline(payload)
+    });
+
+    this.stats = {
+      triggers: 0, // triggerSnapshot calls
+      coalesced: 0, // Triggers merged into an already pending batch
+      due: 0, // Batches whose deadline came
+      fired: 0, // Snapshots created
+      unchanged: 0, // Due batches with nothing new to save
+      failed: 0
+    };
+  }
+
+  /**
+   * Scheduling state of a file, created on first use
+   */
+  ensureFile(fileId, projectId, userId) {
+    let state = this.files.get(fileId);
+    if (!state) {
+      state = {
+        projectId,
+        userId,
+        lastEdit: Date.now(),
+        editCount: 0,
+        lastCursor: null,
+        pending: null // { projectId, userId, trigger, message } of the next batch
+      };
+      this.files.set(fileId, state);
+    }
+    return state;
   }
 
   /**
    * Register a file for snapshot scheduling
    */
   registerFile(fileId, projectId, userId) {
-    if (this.timers.has(fileId)) {
+    if (this.files.has(fileId)) {
       return; // Already registered
     }
 
     console.log(`[DeltaScheduler] Registered file ${fileId} for snapshot scheduling`);
-    
-    this.lastEditTime.set(fileId, Date.now());
-    this.editCounts.set(fileId, 0);
-    
-    // Start time-based interval
-    this.startTimeInterval(fileId, projectId, userId);
+    this.ensureFile(fileId, projectId, userId);
   }
 
   /**
@@ -42,196 +76,224 @@ class DeltaScheduler {
    */
   unregisterFile(fileId) {
     this.stopAllTimers(fileId);
-    this.timers.delete(fileId);
-    this.lastEditTime.delete(fileId);
-    this.editCounts.delete(fileId);
-    this.lastCursorPosition.delete(fileId);
+    this.files.delete(fileId);
     
     console.log(`[DeltaScheduler] Unregistered file ${fileId}`);
   }
 
   /**
-   * Handle edit event
+   * Handle edit event (content already applied to the document buffer)
    */
   onEdit({
     fileId,
     projectId,
     userId,
-    newContent,
-    oldContent,
     cursorPosition = null
   }) {
-    const now = Date.now();
-    const lastEdit = this.lastEditTime.get(fileId) || 0;
-    const timeSinceLastEdit = now - lastEdit;
-
-    // Update tracking
-    this.lastEditTime.set(fileId, now);
-    const editCount = (this.editCounts.get(fileId) || 0) + 1;
-    this.editCounts.set(fileId, editCount);
+    const state = this.ensureFile(fileId, projectId, userId);
+    state.userId = userId; // Idle/periodic snapshots go to the last editor
+    state.lastEdit = Date.now();
+    state.editCount++;
 
     // Check for cursor jump
-    if (cursorPosition && this.lastCursorPosition.has(fileId)) {
-      const lastPos = this.lastCursorPosition.get(fileId);
-      const lineDiff = Math.abs(cursorPosition.line - lastPos.line);
+    if (cursorPosition && state.lastCursor) {
+      const lineDiff = Math.abs(cursorPosition.line - state.lastCursor.line);
       
       if (lineDiff > this.config.cursorJumpThreshold) {
         console.log(`[DeltaScheduler] Cursor jump detected (${lineDiff} lines)`);
-        this.triggerSnapshot(fileId, projectId, userId, newContent, oldContent, 'cursor_jump');
+        this.triggerSnapshot(fileId, projectId, userId, 'cursor_jump');
       }
     }
     
     if (cursorPosition) {
-      this.lastCursorPosition.set(fileId, cursorPosition);
+      state.lastCursor = { line: cursorPosition.line };
     }
 
+    // Periodic snapshots run only while the file is being edited
+    this.startTimeInterval(fileId);
+
     // Check edit count threshold
-    if (editCount >= this.config.editCountThreshold) {
-      console.log(`[DeltaScheduler] Edit count threshold reached (${editCount})`);
-      this.triggerSnapshot(fileId, projectId, userId, newContent, oldContent, 'auto_save');
-      this.editCounts.set(fileId, 0);
+    if (state.editCount >= this.config.editCountThreshold) {
+      console.log(`[DeltaScheduler] Edit count threshold reached (${state.editCount})`);
+      this.triggerSnapshot(fileId, projectId, userId, 'auto_save');
+      state.editCount = 0;
       return;
     }
 
     // Reset idle timer
-    this.resetIdleTimer(fileId, projectId, userId, newContent, oldContent);
+    this.resetIdleTimer(fileId);
+  }
+
+  /**
+   * Sync the document buffer when a client sends full content
+   */
+  syncContent(fileId, newContent) {
+    if (typeof newContent === 'string') {
+      this.buffers.sync(fileId, newContent);
+    }
   }
 
   /**
    * Handle save event
    */
-  onSave({ fileId, projectId, userId, newContent, oldContent }) {
+  onSave({ fileId, projectId, userId, newContent }) {
     console.log(`[DeltaScheduler] Save event for file ${fileId}`);
-    this.triggerSnapshot(fileId, projectId, userId, newContent, oldContent, 'auto_save');
-    this.editCounts.set(fileId, 0);
+    this.syncContent(fileId, newContent);
+    this.triggerSnapshot(fileId, projectId, userId, 'auto_save');
+    this.ensureFile(fileId, projectId, userId).editCount = 0;
   }
 
   /**
    * Handle focus loss event
    */
-  onFocusLoss({ fileId, projectId, userId, newContent, oldContent }) {
+  onFocusLoss({ fileId, projectId, userId, newContent }) {
     console.log(`[DeltaScheduler] Focus loss for file ${fileId}`);
-    this.triggerSnapshot(fileId, projectId, userId, newContent, oldContent, 'focus_loss');
+    this.syncContent(fileId, newContent);
+    this.triggerSnapshot(fileId, projectId, userId, 'focus_loss');
   }
 
   /**
    * Handle undo/redo boundary
    */
-  onUndoRedo({ fileId, projectId, userId, newContent, oldContent }) {
+  onUndoRedo({ fileId, projectId, userId, newContent }) {
     console.log(`[DeltaScheduler] Undo/Redo boundary for file ${fileId}`);
-    this.triggerSnapshot(fileId, projectId, userId, newContent, oldContent, 'undo_redo');
+    this.syncContent(fileId, newContent);
+    this.triggerSnapshot(fileId, projectId, userId, 'undo_redo');
   }
 
   /**
    * Manual snapshot trigger
    */
-  onManualSave({ fileId, projectId, userId, newContent, oldContent, message }) {
+  onManualSave({ fileId, projectId, userId, newContent, message }) {
     console.log(`[DeltaScheduler] Manual save for file ${fileId}`);
-    this.triggerSnapshot(fileId, projectId, userId, newContent, oldContent, 'manual', message);
+    this.syncContent(fileId, newContent);
+    this.triggerSnapshot(fileId, projectId, userId, 'manual', message);
   }
 
   /**
-   * Start time-based interval timer
+   * Arm the periodic snapshot deadline if it is not pending
    */
-  startTimeInterval(fileId, projectId, userId) {
-    // Clear existing timer
-    if (this.timers.has(`${fileId}:interval`)) {
-      clearInterval(this.timers.get(`${fileId}:interval`));
+  startTimeInterval(fileId) {
+    const key = `interval:${fileId}`;
+    if (!this.wheel.has(key)) {
+      this.wheel.schedule(key, this.config.timeInterval, { kind: 'interval', fileId });
     }
+  }
 
-    // Set new interval
-    const intervalId = setInterval(() => {
-      const lastEdit = this.lastEditTime.get(fileId);
-      const now = Date.now();
-      
-      // Only create snapshot if there were recent edits
-      if (lastEdit && (now - lastEdit) < this.config.timeInterval) {
-        console.log(`[DeltaScheduler] Time interval trigger for file ${fileId}`);
-        // This will be handled by the socket handler to get current content
-        this.emitSnapshotRequest(fileId, 'time_interval');
-      }
-    }, this.config.timeInterval);
+  /**
+   * Reset idle timer
+   */
+  resetIdleTimer(fileId) {
+    this.wheel.schedule(`idle:${fileId}`, this.config.idleThreshold, { kind: 'idle', fileId });
+  }
 
-    this.timers.set(`${fileId}:interval`, intervalId);
+  /**
+   * Trigger snapshot creation (content is read from the buffer when it fires)
+   * Triggers within batchDelay of each other coalesce into one snapshot,
+   * labelled with the latest trigger.
+   */
+  triggerSnapshot(fileId, projectId, userId, trigger, message = null) {
+    const state = this.ensureFile(fileId, projectId, userId);
+
+    this.stats.triggers++;
+    if (state.pending) this.stats.coalesced++;
+
+    state.pending = { projectId, userId, trigger, message };
+    this.wheel.schedule(`batch:${fileId}`, this.config.batchDelay, { kind: 'batch', fileId });
   }
 
   /**
-   * Reset idle timer
+   * A deadline on the wheel came due
    */
-  resetIdleTimer(fileId, projectId, userId, newContent, oldContent) {
-    // Clear existing idle timer
-    if (this.timers.has(`${fileId}:idle`)) {
-      clearTimeout(this.timers.get(`${fileId}:idle`));
-    }
+  onDeadline({ kind, fileId }) {
+    const state = this.files.get(fileId);
+    if (!state) return;
 
-    // Set new idle timer
-    const timerId = setTimeout(() => {
+    if (kind === 'idle') {
       console.log(`[DeltaScheduler] Idle threshold reached for file ${fileId}`);
-      this.triggerSnapshot(fileId, projectId, userId, newContent, oldContent, 'idle');
-    }, this.config.idleThreshold);
-
-    this.timers.set(`${fileId}:idle`, timerId);
+      this.triggerSnapshot(fileId, state.projectId, state.userId, 'idle');
+    } else if (kind === 'interval') {
+      // Only snapshot (and keep ticking) if there were recent edits
+      if (Date.now() - state.lastEdit < this.config.timeInterval) {
+        console.log(`[DeltaScheduler] Time interval trigger for file ${fileId}`);
+        this.triggerSnapshot(fileId, state.projectId, state.userId, 'time_interval');
+        this.startTimeInterval(fileId);
+      }
+    } else if (kind === 'batch') {
+      const pending = state.pending;
+      state.pending = null;
+      if (pending) {
+        this.stats.due++;
+        this.flushSnapshot(fileId, pending);
+      }
+    }
   }
 
   /**
-   * Trigger snapshot creation
+   * Create the batched snapshot from the current buffer contents
    */
-  async triggerSnapshot(fileId, projectId, userId, newContent, oldContent, trigger, message = null) {
+  async flushSnapshot(fileId, { projectId, userId, trigger, message }) {
     try {
-      // Buffer the delta first (batching)
-      const batchTimerKey = `${fileId}:batch`;
-      
-      if (this.timers.has(batchTimerKey)) {
-        clearTimeout(this.timers.get(batchTimerKey));
-      }
+      await this.runExclusive(fileId, async () => {
+        const buffer = this.buffers.get(fileId);
+
+        // Nothing changed since the last snapshot
+        if (!buffer || buffer.content === buffer.snapshotContent) {
+          this.stats.unchanged++;
+          return;
+        }
+
+        const newContent = buffer.content;
 
-      // Batch rapid edits
-      const timerId = setTimeout(async () => {
         await this.deltaManager.createSnapshot({
           projectId,
           fileId,
           userId,
           newContent,
-          oldContent,
+          oldContent: buffer.snapshotContent,
           trigger,
           message: message || this.getDefaultMessage(trigger),
           tags: []
         });
 
-        this.timers.delete(batchTimerKey);
-      }, this.config.batchDelay);
-
-      this.timers.set(batchTimerKey, timerId);
+        this.buffers.markSnapshot(fileId, newContent);
+        this.stats.fired++;
+      });
     } catch (error) {
-      console.error('[DeltaScheduler] Trigger snapshot error:', error);
+      this.stats.failed++;
+      console.error('[DeltaScheduler] Snapshot creation error:', error);
     }
   }
 
   /**
-   * Emit snapshot request event (for socket handlers)
+   * Run snapshot work for a file after its previously queued work settles,
+   * so every snapshot path reads the base the previous snapshot left behind
    */
-  emitSnapshotRequest(fileId, trigger) {
-    // This will be caught by socket handlers
-    console.log(`[DeltaScheduler] Emitting snapshot request for ${fileId} (${trigger})`);
+  runExclusive(fileId, task) {
+    const key = String(fileId);
+    const previous = this.snapshotChains.get(key) || Promise.resolve();
+
+    const run = previous.then(task);
+    const tail = run.catch(() => {});
+    this.snapshotChains.set(key, tail);
+
+    tail.then(() => {
+      if (this.snapshotChains.get(key) === tail) {
+        this.snapshotChains.delete(key);
+      }
+    });
+
+    return run;
   }
 
+
   /**
    * Stop all timers for a file
    */
   stopAllTimers(fileId) {
-    const keys = Array.from(this.timers.keys()).filter(k => k.startsWith(fileId));
-    
-    keys.forEach(key => {
-      const timer = this.timers.get(key);
-      if (timer) {
-        if (key.includes(':interval')) {
-          clearInterval(timer);
-        } else {
-          clearTimeout(timer);
-        }
-        this.timers.delete(key);
-      }
-    });
+    this.wheel.cancel(`idle:${fileId}`);
+    this.wheel.cancel(`interval:${fileId}`);
+    this.wheel.cancel(`batch:${fileId}`);
   }
 
   /**
@@ -263,15 +325,19 @@ class DeltaScheduler {
    * Get scheduler statistics
    */
   getStats() {
+    let totalEdits = 0;
+    let pendingSnapshots = 0;
+    for (const state of this.files.values()) {
+      totalEdits += state.editCount;
+      if (state.pending) pendingSnapshots++;
+    }
+
     return {
-      activeFiles: this.timers.size,
-      totalEdits: Array.from(this.editCounts.values()).reduce((a, b) => a + b, 0),
-      files: Array.from(this.lastEditTime.keys()).map(fileId => ({
-        fileId,
-        lastEdit: this.lastEditTime.get(fileId),
-        editCount: this.editCounts.get(fileId),
-        timers: Array.from(this.timers.keys()).filter(k => k.startsWith(fileId))
-      }))
+      activeFiles: this.files.size,
+      totalEdits,
+      pendingSnapshots,
+      ...this.stats,
+      wheel: this.wheel.getStats()
     };
   }
 }
@@ -1,9 +1,13 @@
 import deltaManager from './DeltaManager.js';
 import DeltaScheduler from './DeltaScheduler.js';
-import { createChecksum } from './utils/checksum.js';
+import DocumentBuffers from './DocumentBuffers.js';
+import { pageSize } from '../../utils/pagination.js';
+
+// Server-side document copies that edit ops are applied to
+const documentBuffers = new DocumentBuffers();
 
 // Create scheduler instance
-const deltaScheduler = new DeltaScheduler(deltaManager);
+const deltaScheduler = new DeltaScheduler(deltaManager, documentBuffers);
 
 /**
  * Setup Delta Sync Socket Handlers
@@ -26,6 +30,14 @@ export function setupDeltaSockets(io, socket) {
         initialContent || ''
       );
 
+      // Load the server-side buffer that edit ops apply to from the stored
+      // head, not the client's copy; a client that differs resyncs in full
+      const buffer = documentBuffers.get(fileId) ||
+        await deltaScheduler.runExclusive(fileId, async () => {
+          const headContent = await deltaManager.getLatestContent(fileId);
+          return documentBuffers.ensure(fileId, headContent);
+        });
+
       // Register with scheduler
       deltaScheduler.registerFile(fileId, projectId, socket.userId);
 
@@ -36,6 +48,7 @@ export function setupDeltaSockets(io, socket) {
       if (callback) {
         callback({
           success: true,
+          checksum: buffer.checksum,
           snapshot: {
             snapshotId: snapshot.snapshotId,
             versionNumber: snapshot.versionNumber,
@@ -53,22 +66,60 @@ export function setupDeltaSockets(io, socket) {
 
   /**
    * Client sends delta update
+   *
+   * Wire format: { projectId, fileId, baseChecksum, ops: [{ from, to, insert }] }
+   * with offsets relative to the document identified by baseChecksum.
+   * Sending { newContent } instead performs a full resync.
    */
   socket.on('delta:update', async (data, callback) => {
     try {
       const {
         projectId,
         fileId,
+        ops,
+        baseChecksum,
         newContent,
-        oldContent,
-        cursorPosition,
-        checksum
+        cursorPosition
       } = data;
 
-      // Verify checksum
-      const computedChecksum = createChecksum(newContent);
-      if (checksum && checksum !== computedChecksum) {
-        console.warn('[DeltaSync] Checksum mismatch detected');
+      let frame;
+
+      if (Array.isArray(ops)) {
+        const result = documentBuffers.applyEdit(fileId, baseChecksum, ops);
+
+        if (!result.ok) {
+          // Client is out of sync - it must resync with full content
+          if (callback) {
+            callback({
+              success: false,
+              resync: true,
+              reason: result.reason,
+              checksum: result.checksum
+            });
+          }
+          return;
+        }
+
+        frame = {
+          ops,
+          baseChecksum,
+          checksum: result.buffer.checksum,
+          timestamp: Date.now()
+        };
+      } else if (typeof newContent === 'string') {
+        const buffer = documentBuffers.load(fileId, newContent);
+
+        frame = {
+          newContent,
+          checksum: buffer.checksum,
+          full: true,
+          timestamp: Date.now()
+        };
+      } else {
+        if (callback) {
+          callback({ success: false, message: 'ops or newContent is required' });
+        }
+        return;
       }
 
       // Notify scheduler about the edit
@@ -76,8 +127,6 @@ export function setupDeltaSockets(io, socket) {
         fileId,
         projectId,
         userId: socket.userId,
-        newContent,
-        oldContent,
         cursorPosition
       });
 
@@ -88,15 +137,11 @@ export function setupDeltaSockets(io, socket) {
         userId: socket.userId,
         username: socket.username,
         fileId,
-        delta: {
-          newContent,
-          checksum: computedChecksum,
-          timestamp: Date.now()
-        }
+        delta: frame
       });
 
       if (callback) {
-        callback({ success: true });
+        callback({ success: true, checksum: frame.checksum });
       }
     } catch (error) {
       console.error('[DeltaSync] Update error:', error);
@@ -106,6 +151,33 @@ export function setupDeltaSockets(io, socket) {
     }
   });
 
+  /**
+   * Client fetches the server buffer after a checksum mismatch
+   */
+  socket.on('delta:resync', async (data, callback) => {
+    try {
+      const { fileId } = data;
+
+      let buffer = documentBuffers.get(fileId);
+      if (!buffer) {
+        buffer = documentBuffers.load(fileId, await deltaManager.getLatestContent(fileId));
+      }
+
+      if (callback) {
+        callback({
+          success: true,
+          content: buffer.content,
+          checksum: buffer.checksum
+        });
+      }
+    } catch (error) {
+      console.error('[DeltaSync] Resync error:', error);
+      if (callback) {
+        callback({ success: false, message: error.message });
+      }
+    }
+  });
+
   /**
    * Client saves file (trigger snapshot)
    */
@@ -115,16 +187,26 @@ export function setupDeltaSockets(io, socket) {
 
       console.log(`[DeltaSync] Save event for file ${fileId}`);
 
-      // Create snapshot
-      const snapshot = await deltaManager.createSnapshot({
-        projectId,
-        fileId,
-        userId: socket.userId,
-        newContent: content,
-        oldContent: oldContent || '',
-        trigger: 'auto_save',
-        message: message || 'Saved',
-        tags: []
+      // Create snapshot once earlier snapshots of this file have settled,
+      // diffing against the server's last snapshot when we have one
+      const snapshot = await deltaScheduler.runExclusive(fileId, async () => {
+        const buffer = documentBuffers.get(fileId);
+        const baseContent = buffer ? buffer.snapshotContent : (oldContent || '');
+
+        const created = await deltaManager.createSnapshot({
+          projectId,
+          fileId,
+          userId: socket.userId,
+          newContent: content,
+          oldContent: baseContent,
+          trigger: 'auto_save',
+          message: message || 'Saved',
+          tags: []
+        });
+
+        documentBuffers.sync(fileId, content);
+        documentBuffers.markSnapshot(fileId, content);
+        return created;
       });
 
       // Notify scheduler
@@ -132,8 +214,7 @@ export function setupDeltaSockets(io, socket) {
         fileId,
         projectId,
         userId: socket.userId,
-        newContent: content,
-        oldContent: oldContent || ''
+        newContent: content
       });
 
       // Broadcast acknowledgment
@@ -174,15 +255,25 @@ export function setupDeltaSockets(io, socket) {
 
       console.log(`[DeltaSync] Manual snapshot for file ${fileId}`);
 
-      const snapshot = await deltaManager.createSnapshot({
-        projectId,
-        fileId,
-        userId: socket.userId,
-        newContent: content,
-        oldContent: oldContent || '',
-        trigger: 'manual',
-        message: message || 'Manual snapshot',
-        tags: tags || []
+      // Queued behind other snapshots of this file
+      const snapshot = await deltaScheduler.runExclusive(fileId, async () => {
+        const buffer = documentBuffers.get(fileId);
+        const baseContent = buffer ? buffer.snapshotContent : (oldContent || '');
+
+        const created = await deltaManager.createSnapshot({
+          projectId,
+          fileId,
+          userId: socket.userId,
+          newContent: content,
+          oldContent: baseContent,
+          trigger: 'manual',
+          message: message || 'Manual snapshot',
+          tags: tags || []
+        });
+
+        documentBuffers.sync(fileId, content);
+        documentBuffers.markSnapshot(fileId, content);
+        return created;
       });
 
       // Broadcast to room
@@ -230,12 +321,18 @@ export function setupDeltaSockets(io, socket) {
         socket.userId
       );
 
+      documentBuffers.sync(fileId, result.content);
+      if (result.rolledBackFrom) {
+        documentBuffers.markSnapshot(fileId, result.content);
+      }
+
       // Broadcast rollback to all clients
       const roomKey = `project:${projectId}:file:${fileId}`;
       
       io.to(roomKey).emit('delta:rollback-complete', {
         fileId,
         content: result.content,
+        checksum: documentBuffers.get(fileId).checksum,
         snapshot: {
           snapshotId: result.snapshot.snapshotId,
           versionNumber: result.snapshot.versionNumber,
@@ -249,6 +346,7 @@ export function setupDeltaSockets(io, socket) {
         callback({
           success: true,
           content: result.content,
+          checksum: documentBuffers.get(fileId).checksum,
           snapshot: {
             snapshotId: result.snapshot.snapshotId,
             versionNumber: result.snapshot.versionNumber
@@ -268,17 +366,17 @@ export function setupDeltaSockets(io, socket) {
    */
   socket.on('delta:get-history', async (data, callback) => {
     try {
-      const { fileId, limit, skip } = data;
+      const { fileId, limit, cursor } = data;
 
-      const snapshots = await deltaManager.getVersionHistory(
-        fileId,
-        limit || 50,
-        skip || 0
-      );
+      const { snapshots, nextCursor } = await deltaManager.getVersionHistory(fileId, {
+        limit: pageSize(limit),
+        cursor
+      });
 
       if (callback) {
         callback({
           success: true,
+          nextCursor,
           snapshots: snapshots.map(s => ({
             snapshotId: s.snapshotId,
             versionNumber: s.versionNumber,
@@ -314,7 +412,7 @@ export function setupDeltaSockets(io, socket) {
       console.log(`[DeltaSync] Sync request for file ${fileId} from version ${lastVersionNumber}`);
 
       const content = await deltaManager.getLatestContent(fileId);
-      const latestSnapshot = await deltaManager.getVersionHistory(fileId, 1);
+      const { snapshots: latestSnapshot } = await deltaManager.getVersionHistory(fileId, { limit: 1 });
 
       if (callback) {
         callback({
@@ -340,14 +438,13 @@ export function setupDeltaSockets(io, socket) {
    */
   socket.on('delta:focus-loss', async (data) => {
     try {
-      const { projectId, fileId, content, oldContent } = data;
+      const { projectId, fileId, content } = data;
 
       deltaScheduler.onFocusLoss({
         fileId,
         projectId,
         userId: socket.userId,
-        newContent: content,
-        oldContent: oldContent || ''
+        newContent: content
       });
     } catch (error) {
       console.error('[DeltaSync] Focus loss error:', error);
@@ -359,14 +456,13 @@ export function setupDeltaSockets(io, socket) {
    */
   socket.on('delta:undo-redo', async (data) => {
     try {
-      const { projectId, fileId, content, oldContent } = data;
+      const { projectId, fileId, content } = data;
 
       deltaScheduler.onUndoRedo({
         fileId,
         projectId,
         userId: socket.userId,
-        newContent: content,
-        oldContent: oldContent || ''
+        newContent: content
       });
     } catch (error) {
       console.error('[DeltaSync] Undo/Redo error:', error);
@@ -386,4 +482,6 @@ export function setupDeltaSockets(io, socket) {
   });
 }
 
+export { deltaScheduler };
+
 export default setupDeltaSockets;
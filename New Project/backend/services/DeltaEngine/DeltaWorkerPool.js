@@ -0,0 +1,259 @@
+import os from 'os';
+import { Worker } from 'worker_threads';
+import { monitorEventLoopDelay, performance } from 'perf_hooks';
+import { runTask } from './workers/deltaTasks.js';
+
+const WORKER_FILE = new URL('./workers/deltaWorker.js', import.meta.url);
+
+/**
+ * DeltaWorkerPool - worker_threads pool for CPU-heavy delta work
+ * Diffing and patch replay above inlineThreshold run on workers so a
+ * large paste or rollback does not stall every socket on the process;
+ * smaller inputs stay inline where a thread hop would cost more than the work
+ */
+class DeltaWorkerPool {
+  constructor({
+    size = Math.max(1, Math.min(4, os.cpus().length - 1)),
+    inlineThreshold = 64 * 1024 // characters of input
+  } = {}) {
+    this.size = size;
+    this.inlineThreshold = inlineThreshold;
+
+    this.slots = []; // { worker, task }
+    this.queue = [];
+    this.nextTaskId = 1;
+    this.closed = false;
+
+    this.stats = {
+      submitted: 0,
+      completed: 0,
+      failed: 0,
+      inline: 0,
+      respawns: 0,
+      maxQueueDepth: 0,
+      totalWaitMs: 0,
+      totalRunMs: 0,
+      byType: {}
+    };
+
+    // Event loop delay histogram, to see what offloading buys
+    this.loopDelay = monitorEventLoopDelay({ resolution: 10 });
+    this.loopDelay.enable();
+  }
+
+  /**
+   * Diff two contents (off-thread when large). Strings cannot be
+   * transferred; posting them is a flat copy, small next to the diff.
+   */
+  async diff(oldContent, newContent, options = {}) {
+    const payload = { oldContent: oldContent || '', newContent: newContent || '', options };
+    const size = payload.oldContent.length + payload.newContent.length;
+
+    if (size < this.inlineThreshold) {
+      return this.runInline('diff', payload);
+    }
+
+    return this.run('diff', payload);
+  }
+
+  /**
+   * Replay stored deltas over content (off-thread when large)
+   * Each delta is { delta, deltaData, codec, compressed, dictionaryId }.
+   * Off-thread, deltaData buffers are transferred to the worker and are
+   * detached afterwards. Dictionaries are shared, cached bytes and are
+   * cloned instead (they are few and small).
+   */
+  async replay(content, deltas, dictionaries = {}) {
+    const payload = { content: content || '', deltas, dictionaries };
+    const size = deltas.reduce(
+      (total, d) => total + (d.deltaData ? d.deltaData.length : (d.delta || '').length),
+      payload.content.length
+    );
+
+    if (size < this.inlineThreshold) {
+      return this.runInline('replay', payload);
+    }
+
+    const transferList = [];
+    payload.deltas = deltas.map(stored => {
+      if (!stored.deltaData) return stored;
+
+      const deltaData = this.standalone(stored.deltaData);
+      transferList.push(deltaData.buffer);
+      return { ...stored, deltaData };
+    });
+
+    return this.run('replay', payload, transferList);
+  }
+
+  /**
+   * Bytes backed by their own ArrayBuffer, safe to transfer: views into a
+   * larger (or pooled) buffer are copied out first
+   */
+  standalone(bytes) {
+    const view = bytes instanceof Uint8Array ? bytes : new Uint8Array(bytes);
+    if (view.byteOffset === 0 && view.byteLength === view.buffer.byteLength) {
+      return view;
+    }
+    return new Uint8Array(view);
+  }
+
+  runInline(type, payload) {
+    this.stats.inline++;
+    return runTask(type, payload);
+  }
+
+  /**
+   * Queue a task for the next idle worker
+   */
+  run(type, payload, transferList = []) {
+    if (this.closed) {
+      return Promise.reject(new Error('DeltaWorkerPool is closed'));
+    }
+
+    return new Promise((resolve, reject) => {
+      this.queue.push({
+        id: this.nextTaskId++,
+        type,
+        payload,
+        transferList,
+        resolve,
+        reject,
+        queuedAt: performance.now(),
+        startedAt: 0
+      });
+
+      this.stats.submitted++;
+      this.stats.byType[type] = (this.stats.byType[type] || 0) + 1;
+      this.stats.maxQueueDepth = Math.max(this.stats.maxQueueDepth, this.queue.length);
+
+      this.dispatch();
+    });
+  }
+
+  dispatch() {
+    while (this.queue.length > 0) {
+      const slot = this.idleSlot();
+      if (!slot) return;
+
+      const task = this.queue.shift();
+      task.startedAt = performance.now();
+      this.stats.totalWaitMs += task.startedAt - task.queuedAt;
+
+      slot.task = task;
+      slot.worker.ref(); // Busy workers keep the process alive
+      slot.worker.postMessage({ id: task.id, type: task.type, payload: task.payload }, task.transferList);
+    }
+  }
+
+  idleSlot() {
+    const idle = this.slots.find(slot => !slot.task);
+    if (idle) return idle;
+
+    return this.slots.length < this.size ? this.spawn() : null;
+  }
+
+  spawn() {
+    const worker = new Worker(WORKER_FILE);
+    const slot = { worker, task: null };
+
+    worker.on('message', ({ id, result, error }) => {
+      const task = slot.task;
+      if (!task || task.id !== id) return;
+
+      slot.task = null;
+      worker.unref();
+      this.settle(task, error ? new Error(error) : null, result);
+      this.dispatch();
+    });
+
+    worker.on('error', (error) => {
+      console.error('[DeltaWorkerPool] Worker error:', error);
+      this.retire(slot, error);
+    });
+
+    worker.on('exit', (code) => {
+      this.retire(slot, new Error(`Delta worker exited with code ${code}`));
+    });
+
+    worker.unref();
+    this.slots.push(slot);
+
+    return slot;
+  }
+
+  /**
+   * Drop a dead worker, fail its task and let dispatch spawn a replacement
+   */
+  retire(slot, error) {
+    const index = this.slots.indexOf(slot);
+    if (index === -1) return;
+
+    this.slots.splice(index, 1);
+
+    if (slot.task) {
+      this.settle(slot.task, error);
+      slot.task = null;
+    }
+
+    if (!this.closed) {
+      this.stats.respawns++;
+      this.dispatch();
+    }
+  }
+
+  settle(task, error, result) {
+    this.stats.totalRunMs += performance.now() - task.startedAt;
+
+    if (error) {
+      this.stats.failed++;
+      task.reject(error);
+    } else {
+      this.stats.completed++;
+      task.resolve(result);
+    }
+  }
+
+  /**
+   * Reject queued work and stop all workers (graceful shutdown)
+   */
+  async close() {
+    this.closed = true;
+    this.loopDelay.disable();
+
+    for (const task of this.queue.splice(0)) {
+      task.reject(new Error('DeltaWorkerPool is closed'));
+    }
+
+    await Promise.all(this.slots.map(slot => slot.worker.terminate()));
+  }
+
+  getStats() {
+    const finished = this.stats.completed + this.stats.failed;
+    const toMs = ns => Math.round(ns / 1e4) / 100;
+
+    return {
+      ...this.stats,
+      size: this.size,
+      workers: this.slots.length,
+      busy: this.slots.filter(slot => slot.task).length,
+      queueDepth: this.queue.length,
+      avgWaitMs: finished > 0 ? this.stats.totalWaitMs / finished : 0,
+      avgRunMs: finished > 0 ? this.stats.totalRunMs / finished : 0,
+      inlineThreshold: this.inlineThreshold,
+      eventLoopDelay: {
+        meanMs: toMs(this.loopDelay.mean || 0),
+        p50Ms: toMs(this.loopDelay.percentile(50) || 0),
+        p99Ms: toMs(this.loopDelay.percentile(99) || 0),
+        maxMs: toMs(this.loopDelay.max || 0)
+      }
+    };
+  }
+}
+
+export { DeltaWorkerPool };
+
+// Singleton instance
+const deltaWorkerPool = new DeltaWorkerPool();
+
+export default deltaWorkerPool;
@@ -0,0 +1,143 @@
+import ChunkedChecksum from './utils/chunkedChecksum.js';
+import { validateOps, applyOps, opsSize } from './utils/editOps.js';
+
+/**
+ * DocumentBuffers - Server-side copy of each file being edited
+ * Edit ops from delta:update are applied here, so clients only send ranges
+ * and the scheduler reads content at snapshot time instead of capturing it
+ */
+class DocumentBuffers {
+  constructor({ maxDocuments = 2000 } = {}) {
+    this.buffers = new Map(); // fileId -> buffer, in least-recently-edited order
+    this.maxDocuments = maxDocuments;
+
+    this.stats = {
+      opsApplied: 0,
+      opBytes: 0,
+      fullLoads: 0,
+      mismatches: 0,
+      evictions: 0
+    };
+  }
+
+  /**
+   * Get buffer for a file
+   */
+  get(fileId) {
+    return this.buffers.get(String(fileId)) || null;
+  }
+
+  /**
+   * Replace buffer content (initial load or full resync)
+   */
+  load(fileId, content) {
+    const key = String(fileId);
+    const existing = this.buffers.get(key);
+    const text = content || '';
+
+    const tree = new ChunkedChecksum(text);
+
+    const buffer = {
+      content: text,
+      tree, // Incremental checksum; edits only rehash touched chunks
+      checksum: tree.digest(),
+      // Content of the last snapshot, used as oldContent for the next one
+      snapshotContent: existing ? existing.snapshotContent : text,
+      updatedAt: Date.now()
+    };
+
+    this.touch(key, buffer);
+    this.stats.fullLoads++;
+
+    return buffer;
+  }
+
+  /**
+   * Load only if the file has no buffer yet
+   */
+  ensure(fileId, content) {
+    return this.get(fileId) || this.load(fileId, content);
+  }
+
+  /**
+   * Load only if content differs from the buffer (full-content clients)
+   */
+  sync(fileId, content) {
+    const buffer = this.get(fileId);
+    if (buffer && buffer.content === content) {
+      return buffer;
+    }
+
+    return this.load(fileId, content);
+  }
+
+  /**
+   * Apply edit ops based on baseChecksum.
+   * Returns { ok: true, buffer } or { ok: false, reason, checksum }.
+   */
+  applyEdit(fileId, baseChecksum, ops) {
+    const key = String(fileId);
+    const buffer = this.buffers.get(key);
+
+    if (!buffer) {
+      return { ok: false, reason: 'not_loaded', checksum: null };
+    }
+
+    if (baseChecksum !== buffer.checksum) {
+      this.stats.mismatches++;
+      return { ok: false, reason: 'checksum_mismatch', checksum: buffer.checksum };
+    }
+
+    const invalid = validateOps(ops, buffer.content.length);
+    if (invalid) {
+      return { ok: false, reason: invalid, checksum: buffer.checksum };
+    }
+
+    buffer.content = applyOps(buffer.content, ops);
+    buffer.checksum = buffer.tree.applyOps(buffer.content, ops).digest();
+    buffer.updatedAt = Date.now();
+    this.touch(key, buffer);
+
+    this.stats.opsApplied += ops.length;
+    this.stats.opBytes += opsSize(ops);
+
+    return { ok: true, buffer };
+  }
+
+  /**
+   * Record that a snapshot now covers the given content
+   */
+  markSnapshot(fileId, content) {
+    const buffer = this.get(fileId);
+    if (buffer) {
+      buffer.snapshotContent = content;
+    }
+  }
+
+  /**
+   * Drop a file's buffer
+   */
+  release(fileId) {
+    return this.buffers.delete(String(fileId));
+  }
+
+  touch(key, buffer) {
+    this.buffers.delete(key);
+    this.buffers.set(key, buffer);
+
+    while (this.buffers.size > this.maxDocuments) {
+      const oldestKey = this.buffers.keys().next().value;
+      this.buffers.delete(oldestKey);
+      this.stats.evictions++;
+    }
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      documents: this.buffers.size
+    };
+  }
+}
+
+export default DocumentBuffers;
@@ -1,42 +1,34 @@
+import MemoryStore from './cache/MemoryStore.js';
+
 /**
- * RedisCache - In-memory caching layer for delta snapshots
- * Simulates Redis functionality with Map (can be replaced with actual Redis client)
+ * RedisCache - Caching layer for delta snapshots
+ * Backed by a pluggable store: a bounded in-process LRU by default, or a
+ * RedisStore wrapping a Redis-compatible client for multi-process setups
  */
 class RedisCache {
-  constructor() {
-    this.cache = new Map();
-    this.expiryTimers = new Map();
+  constructor({ backend = null, maxEntries, maxBytes } = {}) {
+    this.store = backend || new MemoryStore({ maxEntries, maxBytes });
     this.DEFAULT_TTL = 24 * 60 * 60 * 1000; // 24 hours
     this.MAX_DELTAS_PER_FILE = 10;
   }
 
+  /**
+   * Convert Mongoose documents to compact plain objects before caching
+   */
+  toCacheable(value) {
+    if (value && typeof value.toObject === 'function') {
+      return value.toObject({ versionKey: false });
+    }
+
+    return value;
+  }
+
   /**
    * Set a value in cache
    */
   async set(key, value, ttl = this.DEFAULT_TTL) {
     try {
-      // Clear existing expiry timer
-      if (this.expiryTimers.has(key)) {
-        clearTimeout(this.expiryTimers.get(key));
-      }
-
-      // Store value
-      this.cache.set(key, {
-        value,
-        timestamp: Date.now()
-      });
-
-      // Set expiry timer
-      if (ttl > 0) {
-        const timer = setTimeout(() => {
-          this.cache.delete(key);
-          this.expiryTimers.delete(key);
-        }, ttl);
-        
-        this.expiryTimers.set(key, timer);
-      }
-
-      return true;
+      return await this.store.set(key, this.toCacheable(value), ttl);
     } catch (error) {
       console.error('[RedisCache] Set error:', error);
       return false;
@@ -48,13 +40,7 @@ class RedisCache {
    */
   async get(key) {
     try {
-      const cached = this.cache.get(key);
-      
-      if (!cached) {
-        return null;
-      }
-
-      return cached.value;
+      return await this.store.get(key);
     } catch (error) {
       console.error('[RedisCache] Get error:', error);
       return null;
@@ -66,13 +52,7 @@ class RedisCache {
    */
   async delete(key) {
     try {
-      // Clear expiry timer
-      if (this.expiryTimers.has(key)) {
-        clearTimeout(this.expiryTimers.get(key));
-        this.expiryTimers.delete(key);
-      }
-
-      return this.cache.delete(key);
+      return await this.store.delete(key);
     } catch (error) {
       console.error('[RedisCache] Delete error:', error);
       return false;
@@ -83,7 +63,12 @@ class RedisCache {
    * Check if key exists
    */
   async exists(key) {
-    return this.cache.has(key);
+    try {
+      return await this.store.has(key);
+    } catch (error) {
+      console.error('[RedisCache] Exists error:', error);
+      return false;
+    }
   }
 
   /**
@@ -92,22 +77,17 @@ class RedisCache {
   async addDelta(fileId, delta) {
     try {
       const key = `deltas:${fileId}`;
-      let deltas = await this.get(key) || [];
+      const deltas = await this.get(key) || [];
 
-      // Add new delta
-      deltas.push({
+      // Keep only last N deltas (new list, stored lists are never mutated)
+      const updated = [...deltas, {
         snapshotId: delta.snapshotId,
         versionNumber: delta.versionNumber,
         checksum: delta.checksum,
         timestamp: delta.createdAt
-      });
+      }].slice(-this.MAX_DELTAS_PER_FILE);
 
-      // Keep only last N deltas
-      if (deltas.length > this.MAX_DELTAS_PER_FILE) {
-        deltas = deltas.slice(-this.MAX_DELTAS_PER_FILE);
-      }
-
-      await this.set(key, deltas);
+      await this.set(key, updated);
       return true;
     } catch (error) {
       console.error('[RedisCache] Add delta error:', error);
@@ -115,6 +95,29 @@ class RedisCache {
     }
   }
 
+  /**
+   * Append several deltas for a file in one read-modify-write
+   */
+  async addDeltas(fileId, newDeltas) {
+    try {
+      const key = `deltas:${fileId}`;
+      const deltas = await this.get(key) || [];
+
+      const updated = deltas.concat(newDeltas.map(delta => ({
+        snapshotId: delta.snapshotId,
+        versionNumber: delta.versionNumber,
+        checksum: delta.checksum,
+        timestamp: delta.createdAt
+      }))).slice(-this.MAX_DELTAS_PER_FILE);
+
+      await this.set(key, updated);
+      return true;
+    } catch (error) {
+      console.error('[RedisCache] Add deltas error:', error);
+      return false;
+    }
+  }
+
   /**
    * Get recent deltas for a file
    */
@@ -122,7 +125,7 @@ class RedisCache {
     try {
       const key = `deltas:${fileId}`;
       const deltas = await this.get(key) || [];
-      
+
       return deltas.slice(-count);
     } catch (error) {
       console.error('[RedisCache] Get recent deltas error:', error);
@@ -149,24 +152,16 @@ class RedisCache {
    */
   getStats() {
     return {
-      totalKeys: this.cache.size,
-      totalTimers: this.expiryTimers.size,
-      keys: Array.from(this.cache.keys()),
+      ...this.store.getStats(),
       memoryUsage: this.estimateMemoryUsage()
     };
   }
 
   /**
-   * Estimate memory usage (rough calculation)
+   * Estimate memory usage (from write-time accounting, no serialization)
    */
   estimateMemoryUsage() {
-    let totalSize = 0;
-
-    for (const [key, data] of this.cache.entries()) {
-      const keySize = Buffer.byteLength(key, 'utf8');
-      const valueSize = Buffer.byteLength(JSON.stringify(data.value), 'utf8');
-      totalSize += keySize + valueSize;
-    }
+    const totalSize = this.store.getStats().bytes || 0;
 
     return {
       bytes: totalSize,
@@ -180,13 +175,7 @@ class RedisCache {
    */
   async flush() {
     try {
-      // Clear all timers
-      for (const timer of this.expiryTimers.values()) {
-        clearTimeout(timer);
-      }
-
-      this.cache.clear();
-      this.expiryTimers.clear();
+      await this.store.clear();
 
       console.log('[RedisCache] Cache flushed');
       return true;
@@ -196,12 +185,23 @@ class RedisCache {
     }
   }
 
+  /**
+   * Release backend resources (timers, connections)
+   */
+  async close() {
+    try {
+      await this.store.close();
+    } catch (error) {
+      console.error('[RedisCache] Close error:', error);
+    }
+  }
+
   /**
    * Set multiple values at once
    */
   async mset(entries) {
     try {
-      const promises = entries.map(([key, value, ttl]) => 
+      const promises = entries.map(([key, value, ttl]) =>
         this.set(key, value, ttl)
       );
 
@@ -246,11 +246,11 @@ class RedisCache {
    */
   async keys(pattern) {
     try {
-      const allKeys = Array.from(this.cache.keys());
-      
+      const allKeys = await this.store.keys();
+
       // Simple pattern matching (supports * wildcard)
       const regex = new RegExp(
-        '^' + pattern.replace(/\*/g, '.*') + '$'
+        '^' + pattern.replace(/[.+?^${}()|[\]\\]/g, '\\$&').replace(/\*/g, '.*') + '$'
       );
 
       return allKeys.filter(key => regex.test(key));
@@ -0,0 +1,346 @@
+import mongoose from 'mongoose';
+import { performance } from 'perf_hooks';
+import DeltaSnapshot from '../../models/DeltaSnapshot.js';
+import DeltaCounter from '../../models/DeltaCounter.js';
+import DeltaStats from '../../models/DeltaStats.js';
+import blobStore from '../BlobStore.js';
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+/**
+ * RetentionEngine - Background archival of old snapshot versions
+ * Keeps the newest keepCount active versions of each file. Per file:
+ * 1. the oldest retained version is found by a short index walk,
+ * 2. it is re-anchored as a checkpoint (full content) if it is not one,
+ *    so retained versions still reconstruct without the archived ones,
+ * 3. older versions are archived in bounded batches, read through a
+ *    projection that only carries _id, the document's BSON size and the
+ *    counters its DeltaStats totals are decremented by.
+ *
+ * Files are queued by createSnapshot (markFile) and swept on an interval;
+ * a full sweep streams every file's counter. Work is paced to
+ * maxDocsPerSecond and pauses while the snapshot writer or the event loop
+ * is busy with foreground traffic.
+ */
+class RetentionEngine {
+  constructor(deltaManager, {
+    keepCount = 100,
+    batchSize = 200,
+    maxDocsPerSecond = 2000,
+    archiveTtlMs = 30 * 24 * 60 * 60 * 1000, // Archived versions expire after 30 days
+    intervalMs = 5 * 60 * 1000, // Sweep of queued files
+    fullSweepMs = 24 * 60 * 60 * 1000, // Sweep of every file
+    maxWriterBacklog = 50, // Queued snapshot writes that count as foreground load
+    maxLoopLagMs = 50,
+    backoffMs = 250
+  } = {}) {
+    this.deltaManager = deltaManager;
+    this.config = {
+      keepCount,
+      batchSize,
+      maxDocsPerSecond,
+      archiveTtlMs,
+      intervalMs,
+      fullSweepMs,
+      maxWriterBacklog,
+      maxLoopLagMs,
+      backoffMs
+    };
+
+    this.dirty = new Set(); // fileIds with new versions since their last pass
+    this.timer = null;
+    this.running = null; // Promise of the current run
+    this.lastFullSweepAt = 0;
+
+    this.stats = {
+      runs: 0,
+      filesScanned: 0,
+      filesArchived: 0,
+      versionsArchived: 0,
+      bytesArchived: 0,
+      reanchored: 0,
+      throttledMs: 0,
+      errors: 0
+    };
+    this.lastRun = null;
+  }
+
+  /**
+   * Queue a file for the next sweep (cheap; called on the write path)
+   */
+  markFile(fileId) {
+    this.dirty.add(String(fileId));
+  }
+
+  start() {
+    if (this.timer) return;
+
+    this.timer = setInterval(() => {
+      const full = Date.now() - this.lastFullSweepAt >= this.config.fullSweepMs;
+      this.run({ full }).catch(error => {
+        console.error('[RetentionEngine] Run error:', error);
+      });
+    }, this.config.intervalMs);
+    this.timer.unref();
+  }
+
+  stop() {
+    clearInterval(this.timer);
+    this.timer = null;
+  }
+
+  /**
+   * Sweep queued files, or every file with `full`, or one file. Only one
+   * run at a time: a sweep request during a run returns that run, a
+   * single-file request waits for it.
+   */
+  run({ full = false, fileId = null, keepCount = this.config.keepCount } = {}) {
+    if (this.running) {
+      return fileId
+        ? this.running.then(() => this.run({ fileId, keepCount }))
+        : this.running;
+    }
+
+    const summary = {
+      full,
+      startedAt: new Date(),
+      finishedAt: null,
+      durationMs: 0,
+      filesScanned: 0,
+      filesArchived: 0,
+      versionsArchived: 0,
+      bytesArchived: 0,
+      reanchored: 0,
+      throttledMs: 0,
+      errors: 0
+    };
+    this.lastRun = summary;
+    this.stats.runs++;
+
+    const started = performance.now();
+    this.running = this.sweep(summary, { full, fileId, keepCount })
+      .catch(error => {
+        console.error('[RetentionEngine] Sweep error:', error);
+        summary.errors++;
+      })
+      .then(() => {
+        summary.finishedAt = new Date();
+        summary.durationMs = Math.round(performance.now() - started);
+        for (const key of ['filesScanned', 'filesArchived', 'versionsArchived', 'bytesArchived', 'reanchored', 'throttledMs', 'errors']) {
+          this.stats[key] += summary[key];
+        }
+        if (summary.versionsArchived > 0) {
+          console.log(`[RetentionEngine] Archived ${summary.versionsArchived} versions (${summary.bytesArchived} bytes) across ${summary.filesArchived} files in ${summary.durationMs}ms`);
+        }
+        this.running = null;
+        return summary;
+      });
+
+    return this.running;
+  }
+
+  async sweep(summary, { full, fileId, keepCount }) {
+    if (fileId) {
+      this.dirty.delete(String(fileId));
+      await this.retainFile(fileId, summary, keepCount);
+      return;
+    }
+
+    if (full) {
+      this.lastFullSweepAt = Date.now();
+      this.dirty.clear();
+
+      // Only files with more versions than are kept can have work
+      const counters = DeltaCounter.find({ seq: { $gt: keepCount } })
+        .select('fileId')
+        .lean()
+        .cursor({ batchSize: 500 });
+
+      for await (const counter of counters) {
+        await this.retainFile(counter.fileId, summary, keepCount);
+      }
+      return;
+    }
+
+    const fileIds = [...this.dirty];
+    this.dirty.clear();
+    for (const id of fileIds) {
+      await this.retainFile(id, summary, keepCount);
+    }
+  }
+
+  /**
+   * Re-anchor and archive one file's versions past keepCount
+   */
+  async retainFile(fileId, summary, keepCount) {
+    summary.filesScanned++;
+
+    try {
+      // keepCount-th newest active version: a bounded walk of the
+      // (fileId, status, versionNumber) index
+      const [anchor] = await DeltaSnapshot.find({ fileId, status: 'active' })
+        .sort({ versionNumber: -1 })
+        .skip(keepCount - 1)
+        .limit(1)
+        .select('versionNumber isCheckpoint')
+        .lean();
+
+      if (!anchor) return;
+
+      const older = await DeltaSnapshot.exists({
+        fileId,
+        status: 'active',
+        versionNumber: { $lt: anchor.versionNumber }
+      });
+      if (!older) return;
+
+      if (!anchor.isCheckpoint) {
+        await this.reanchor(fileId, anchor);
+        summary.reanchored++;
+      }
+
+      const archived = await this.archiveBefore(fileId, anchor.versionNumber, summary);
+      if (archived > 0) {
+        summary.filesArchived++;
+        this.deltaManager.contentCache.invalidate(fileId);
+      }
+    } catch (error) {
+      console.error(`[RetentionEngine] Retention error for file ${fileId}:`, error);
+      summary.errors++;
+    }
+  }
+
+  /**
+   * Store full content on the oldest retained version (while the versions
+   * it is reconstructed from are still active)
+   */
+  async reanchor(fileId, anchor) {
+    const content = await this.deltaManager.materializeVersion(fileId, anchor.versionNumber);
+    if (content === null) {
+      throw new Error(`Version ${anchor.versionNumber} cannot be reconstructed; not archiving`);
+    }
+
+    const contentBlob = await blobStore.put(content);
+    try {
+      await DeltaSnapshot.updateOne(
+        { _id: anchor._id },
+        { $set: { isCheckpoint: true, contentBlob, 'metadata.replayCost': 0 } }
+      );
+    } catch (error) {
+      await blobStore.release(contentBlob);
+      throw error;
+    }
+    await DeltaStats.adjust(fileId, { totalCheckpoints: 1 });
+  }
+
+  /**
+   * Archive active versions below `versionNumber` in paced batches
+   */
+  async archiveBefore(fileId, versionNumber, summary) {
+    const match = {
+      fileId: new mongoose.Types.ObjectId(String(fileId)),
+      status: 'active',
+      versionNumber: { $lt: versionNumber }
+    };
+    let archived = 0;
+
+    for (;;) {
+      await this.yieldToForeground(summary);
+
+      // Sizes are computed server-side: bodies never leave the database
+      const batch = await DeltaSnapshot.aggregate([
+        { $match: match },
+        { $sort: { versionNumber: 1 } },
+        { $limit: this.config.batchSize },
+        {
+          $project: {
+            _id: 1,
+            bytes: { $bsonSize: '$$ROOT' },
+            isCheckpoint: 1,
+            contentBlob: 1,
+            'metadata.deltaSize': 1,
+            'metadata.compressionRatio': 1,
+            'metadata.linesAdded': 1,
+            'metadata.linesRemoved': 1
+          }
+        }
+      ]);
+      if (batch.length === 0) break;
+
+      const expiresAt = new Date(Date.now() + this.config.archiveTtlMs);
+      const result = await DeltaSnapshot.updateMany(
+        { _id: { $in: batch.map(doc => doc._id) }, status: 'active' },
+        { $set: { status: 'archived', expiresAt } }
+      );
+
+      let transitioned = batch;
+      if (result.modifiedCount !== batch.length) {
+        // Some were archived concurrently: only the rows carrying this
+        // run's expiresAt are ours to count and release
+        const ours = await DeltaSnapshot.find({
+          _id: { $in: batch.map(doc => doc._id) },
+          status: 'archived',
+          expiresAt
+        }).select('_id').lean();
+        const ids = new Set(ours.map(doc => String(doc._id)));
+        transitioned = batch.filter(doc => ids.has(String(doc._id)));
+      }
+
+      const totals = DeltaStats.totalsOf(transitioned);
+      await DeltaStats.adjust(fileId, Object.fromEntries(
+        Object.entries(totals).map(([key, value]) => [key, -value])
+      ));
+
+      // Archived checkpoints no longer hold their content blobs
+      await Promise.all(transitioned
+        .filter(doc => doc.contentBlob)
+        .map(doc => blobStore.release(doc.contentBlob)));
+
+      archived += transitioned.length;
+      summary.versionsArchived += transitioned.length;
+      summary.bytesArchived += transitioned.reduce((total, doc) => total + doc.bytes, 0);
+
+      // Pace to maxDocsPerSecond
+      const paceMs = (batch.length / this.config.maxDocsPerSecond) * 1000;
+      await sleep(paceMs);
+      summary.throttledMs += Math.round(paceMs);
+
+      if (batch.length < this.config.batchSize) break;
+    }
+
+    return archived;
+  }
+
+  /**
+   * Wait while foreground work is backed up: queued snapshot writes or
+   * a slow event loop
+   */
+  async yieldToForeground(summary) {
+    for (;;) {
+      const backlog = this.deltaManager.writer.queue.length;
+
+      const before = performance.now();
+      await new Promise(resolve => setImmediate(resolve));
+      const lag = performance.now() - before;
+
+      if (backlog <= this.config.maxWriterBacklog && lag <= this.config.maxLoopLagMs) {
+        return;
+      }
+
+      await sleep(this.config.backoffMs);
+      summary.throttledMs += this.config.backoffMs;
+    }
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      queuedFiles: this.dirty.size,
+      running: !!this.running,
+      lastRun: this.lastRun,
+      config: this.config
+    };
+  }
+}
+
+export default RetentionEngine;
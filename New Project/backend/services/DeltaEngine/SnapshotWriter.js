@@ -0,0 +1,191 @@
+import DeltaSnapshot from '../../models/DeltaSnapshot.js';
+
+/**
+ * SnapshotWriter - Write-behind queue for snapshot persistence
+ * Groups snapshots across files into ordered insertMany batches, flushed
+ * every flushInterval ms or once maxBatchSize documents are queued
+ */
+class SnapshotWriter {
+  constructor({
+    flushInterval = 100, // ms
+    maxBatchSize = 100, // documents per insertMany
+    maxQueueSize = 1000, // enqueue waits for a flush beyond this
+    onBatch = null // (docs) => cache updates after a successful write
+  } = {}) {
+    this.queue = [];
+    this.timer = null;
+    this.flushing = null; // Promise of the in-flight flush
+    this.closed = false;
+
+    this.config = { flushInterval, maxBatchSize, maxQueueSize };
+    this.onBatch = onBatch;
+
+    this.stats = {
+      enqueued: 0,
+      written: 0,
+      failed: 0,
+      batches: 0,
+      lastBatchSize: 0,
+      maxBatchSeen: 0,
+      maxQueueDepth: 0,
+      backpressureWaits: 0,
+      lastFlushMs: 0
+    };
+  }
+
+  /**
+   * Queue a snapshot document; resolves once it is persisted
+   */
+  async enqueue(doc) {
+    if (this.closed) {
+      throw new Error('SnapshotWriter is closed');
+    }
+
+    // Backpressure: make producers wait for the queue to drain
+    while (this.queue.length >= this.config.maxQueueSize) {
+      this.stats.backpressureWaits++;
+      await this.flush();
+    }
+
+    const persisted = new Promise((resolve, reject) => {
+      this.queue.push({ doc, resolve, reject });
+    });
+
+    this.stats.enqueued++;
+    this.stats.maxQueueDepth = Math.max(this.stats.maxQueueDepth, this.queue.length);
+
+    if (this.queue.length >= this.config.maxBatchSize) {
+      this.flush();
+    } else {
+      this.scheduleFlush();
+    }
+
+    return persisted;
+  }
+
+  scheduleFlush() {
+    if (this.timer) return;
+
+    this.timer = setTimeout(() => {
+      this.timer = null;
+      this.flush();
+    }, this.config.flushInterval);
+
+    if (this.timer.unref) this.timer.unref();
+  }
+
+  /**
+   * Flush the queue. Flushes are serialized so batches land in enqueue
+   * order, which keeps versions of the same file in order.
+   */
+  async flush() {
+    if (this.timer) {
+      clearTimeout(this.timer);
+      this.timer = null;
+    }
+
+    while (this.flushing) {
+      await this.flushing;
+    }
+
+    if (this.queue.length === 0) return;
+
+    this.flushing = this.drain();
+
+    try {
+      await this.flushing;
+    } finally {
+      this.flushing = null;
+    }
+
+    if (this.queue.length > 0) {
+      this.scheduleFlush();
+    }
+  }
+
+  /**
+   * Write queued snapshots in batches of maxBatchSize
+   */
+  async drain() {
+    while (this.queue.length > 0) {
+      const batch = this.queue.splice(0, this.config.maxBatchSize);
+      const startedAt = Date.now();
+
+      const written = await this.writeBatch(batch);
+
+      this.stats.batches++;
+      this.stats.lastBatchSize = batch.length;
+      this.stats.maxBatchSeen = Math.max(this.stats.maxBatchSeen, batch.length);
+      this.stats.lastFlushMs = Date.now() - startedAt;
+
+      if (written.length > 0 && this.onBatch) {
+        try {
+          await this.onBatch(written);
+        } catch (error) {
+          console.error('[SnapshotWriter] Batch callback error:', error);
+        }
+      }
+    }
+  }
+
+  /**
+   * Insert one batch; on failure fall back to per-document saves so a
+   * single bad snapshot does not fail the whole batch
+   */
+  async writeBatch(batch) {
+    // Stable sort keeps each file's versions ascending within the batch
+    batch.sort((a, b) => a.doc.versionNumber - b.doc.versionNumber);
+    const docs = batch.map(item => item.doc);
+
+    try {
+      await DeltaSnapshot.insertMany(docs, { ordered: true });
+
+      batch.forEach(item => item.resolve(item.doc));
+      this.stats.written += batch.length;
+      return docs;
+    } catch (error) {
+      console.error('[SnapshotWriter] Batch insert error, retrying individually:', error.message);
+    }
+
+    const written = [];
+
+    for (const item of batch) {
+      try {
+        const exists = await DeltaSnapshot.exists({ snapshotId: item.doc.snapshotId });
+        if (!exists) {
+          await item.doc.save();
+        }
+
+        item.resolve(item.doc);
+        written.push(item.doc);
+        this.stats.written++;
+      } catch (error) {
+        item.reject(error);
+        this.stats.failed++;
+      }
+    }
+
+    return written;
+  }
+
+  /**
+   * Flush everything and refuse new work (used on shutdown)
+   */
+  async close() {
+    this.closed = true;
+    await this.flush();
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      queueDepth: this.queue.length,
+      avgBatchSize: this.stats.batches > 0
+        ? (this.stats.written + this.stats.failed) / this.stats.batches
+        : 0,
+      config: this.config
+    };
+  }
+}
+
+export default SnapshotWriter;
@@ -0,0 +1,163 @@
+/**
+ * TimerWheel - Hashed timing wheel shared by many keyed deadlines
+ * One interval ticks every tickMs and expires the slot(s) it passed;
+ * schedule / reschedule / cancel are O(1) (a Map lookup and a Set move).
+ * Deadlines beyond one revolution (slots * tickMs) stay in their slot
+ * until the matching revolution comes round.
+ *
+ * Expired keys are passed to a single onExpire(key, payload) handler,
+ * so callers do not allocate a closure per timer.
+ */
+class TimerWheel {
+  constructor({
+    tickMs = 50,
+    slots = 512,
+    onExpire = () => {}
+  } = {}) {
+    this.tickMs = tickMs;
+    this.slots = Array.from({ length: slots }, () => new Set());
+    this.entries = new Map(); // key -> { key, tick, deadline, payload }
+    this.onExpire = onExpire;
+
+    this.timer = null;
+    this.currentTick = this.tickOf(Date.now()); // Last tick processed
+
+    this.stats = {
+      scheduled: 0,
+      rescheduled: 0,
+      cancelled: 0,
+      expired: 0,
+      ticks: 0,
+      maxLateMs: 0,
+      errors: 0
+    };
+  }
+
+  tickOf(time) {
+    return Math.floor(time / this.tickMs);
+  }
+
+  /**
+   * Set (or move) the deadline of `key` to delayMs from now
+   */
+  schedule(key, delayMs, payload = null) {
+    this.start();
+
+    const deadline = Date.now() + delayMs;
+    // Never into a tick that was already processed
+    const tick = Math.max(Math.ceil(deadline / this.tickMs), this.currentTick + 1);
+
+    let entry = this.entries.get(key);
+    if (entry) {
+      this.slots[entry.tick % this.slots.length].delete(entry);
+      this.stats.rescheduled++;
+    } else {
+      entry = { key, tick: 0, deadline: 0, payload: null };
+      this.entries.set(key, entry);
+      this.stats.scheduled++;
+    }
+
+    entry.tick = tick;
+    entry.deadline = deadline;
+    entry.payload = payload;
+    this.slots[tick % this.slots.length].add(entry);
+
+    return deadline;
+  }
+
+  cancel(key) {
+    const entry = this.entries.get(key);
+    if (!entry) return false;
+
+    this.slots[entry.tick % this.slots.length].delete(entry);
+    this.entries.delete(key);
+    this.stats.cancelled++;
+
+    if (this.entries.size === 0) this.stop();
+    return true;
+  }
+
+  has(key) {
+    return this.entries.has(key);
+  }
+
+  /**
+   * Pending deadline (ms epoch) of a key, or null
+   */
+  deadline(key) {
+    return this.entries.get(key)?.deadline ?? null;
+  }
+
+  /**
+   * Expire everything due up to now
+   */
+  tick(now = Date.now()) {
+    const target = this.tickOf(now);
+    if (target <= this.currentTick) return 0;
+
+    // A late tick walks each slot at most once
+    const steps = Math.min(target - this.currentTick, this.slots.length);
+    const due = [];
+    for (let step = 1; step <= steps; step++) {
+      const slot = this.slots[(this.currentTick + step) % this.slots.length];
+      for (const entry of slot) {
+        if (entry.tick <= target) {
+          slot.delete(entry);
+          this.entries.delete(entry.key);
+          due.push(entry);
+        }
+      }
+    }
+    this.currentTick = target;
+    this.stats.ticks++;
+
+    // Handlers may schedule or cancel; they run after the wheel is consistent
+    for (const entry of due) {
+      const late = now - entry.deadline;
+      if (late > this.stats.maxLateMs) this.stats.maxLateMs = late;
+      this.stats.expired++;
+
+      try {
+        this.onExpire(entry.key, entry.payload);
+      } catch (error) {
+        this.stats.errors++;
+        console.error('[TimerWheel] Expire handler error:', error);
+      }
+    }
+
+    if (this.entries.size === 0) this.stop();
+    return due.length;
+  }
+
+  /**
+   * The interval only runs while something is scheduled
+   */
+  start() {
+    if (this.timer) return;
+
+    this.currentTick = Math.max(this.currentTick, this.tickOf(Date.now()));
+    this.timer = setInterval(() => this.tick(), this.tickMs);
+    this.timer.unref?.();
+  }
+
+  stop() {
+    clearInterval(this.timer);
+    this.timer = null;
+  }
+
+  clear() {
+    this.slots.forEach(slot => slot.clear());
+    this.entries.clear();
+    this.stop();
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      pending: this.entries.size,
+      running: !!this.timer
+    };
+  }
+}
+
+export default TimerWheel;
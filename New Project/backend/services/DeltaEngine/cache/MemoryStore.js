@@ -0,0 +1,221 @@
+/**
+ * MemoryStore - Default in-process backend for RedisCache
+ * Capacity-bounded LRU with byte accounting and a single expiry wheel
+ *
+ * Backend interface (shared with RedisStore):
+ *   get(key), set(key, value, ttl), delete(key), has(key),
+ *   keys(), clear(), getStats(), close()
+ */
+class MemoryStore {
+  constructor({
+    maxEntries = 10000,
+    maxBytes = 32 * 1024 * 1024,
+    wheelResolution = 60 * 1000 // Expiry bucket width
+  } = {}) {
+    this.entries = new Map(); // Insertion order doubles as LRU order
+    this.wheel = new Map(); // bucket -> Set of keys expiring in that bucket
+    this.maxEntries = maxEntries;
+    this.maxBytes = maxBytes;
+    this.wheelResolution = wheelResolution;
+    this.bytes = 0;
+    this.ticker = null;
+
+    this.stats = {
+      hits: 0,
+      misses: 0,
+      evictions: 0,
+      expirations: 0
+    };
+  }
+
+  /**
+   * Estimate bytes held by a value (computed once, at write time)
+   */
+  sizeOf(key, value) {
+    let valueSize;
+
+    if (typeof value === 'string') {
+      valueSize = value.length * 2;
+    } else if (typeof value === 'number' || typeof value === 'boolean' || value == null) {
+      valueSize = 8;
+    } else {
+      valueSize = JSON.stringify(value).length * 2;
+    }
+
+    return key.length * 2 + valueSize;
+  }
+
+  bucketFor(expiresAt) {
+    return Math.ceil(expiresAt / this.wheelResolution);
+  }
+
+  /**
+   * Get a live value (expired entries are dropped lazily)
+   */
+  async get(key) {
+    const entry = this.entries.get(key);
+
+    if (!entry) {
+      this.stats.misses++;
+      return null;
+    }
+
+    if (entry.expiresAt && entry.expiresAt <= Date.now()) {
+      this.remove(key);
+      this.stats.expirations++;
+      this.stats.misses++;
+      return null;
+    }
+
+    // Refresh LRU position
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    this.stats.hits++;
+
+    return entry.value;
+  }
+
+  /**
+   * Store a value with optional TTL (ms)
+   */
+  async set(key, value, ttl = 0) {
+    const size = this.sizeOf(key, value);
+    if (size > this.maxBytes) {
+      this.remove(key);
+      return false;
+    }
+
+    this.remove(key);
+
+    const expiresAt = ttl > 0 ? Date.now() + ttl : 0;
+    this.entries.set(key, { value, size, expiresAt });
+    this.bytes += size;
+
+    if (expiresAt) {
+      const bucket = this.bucketFor(expiresAt);
+      if (!this.wheel.has(bucket)) {
+        this.wheel.set(bucket, new Set());
+      }
+      this.wheel.get(bucket).add(key);
+      this.startTicker();
+    }
+
+    this.evict();
+    return true;
+  }
+
+  async delete(key) {
+    return this.remove(key);
+  }
+
+  async has(key) {
+    return (await this.get(key)) !== null;
+  }
+
+  async keys() {
+    const now = Date.now();
+    const live = [];
+
+    for (const [key, entry] of this.entries) {
+      if (!entry.expiresAt || entry.expiresAt > now) {
+        live.push(key);
+      }
+    }
+
+    return live;
+  }
+
+  async clear() {
+    this.entries.clear();
+    this.wheel.clear();
+    this.bytes = 0;
+  }
+
+  /**
+   * Remove an entry and its wheel slot
+   */
+  remove(key) {
+    const entry = this.entries.get(key);
+    if (!entry) return false;
+
+    this.entries.delete(key);
+    this.bytes -= entry.size;
+
+    if (entry.expiresAt) {
+      const bucket = this.bucketFor(entry.expiresAt);
+      const slot = this.wheel.get(bucket);
+      if (slot) {
+        slot.delete(key);
+        if (slot.size === 0) this.wheel.delete(bucket);
+      }
+    }
+
+    return true;
+  }
+
+  /**
+   * Evict least recently used entries until within bounds
+   */
+  evict() {
+    while (this.entries.size > this.maxEntries || this.bytes > this.maxBytes) {
+      const oldestKey = this.entries.keys().next().value;
+      if (oldestKey === undefined) break;
+
+      this.remove(oldestKey);
+      this.stats.evictions++;
+    }
+  }
+
+  /**
+   * Single shared timer that expires whole wheel buckets
+   */
+  startTicker() {
+    if (this.ticker) return;
+
+    this.ticker = setInterval(() => this.tick(), this.wheelResolution);
+    if (this.ticker.unref) this.ticker.unref();
+  }
+
+  tick(now = Date.now()) {
+    const current = this.bucketFor(now);
+
+    for (const [bucket, keys] of this.wheel) {
+      if (bucket > current) continue;
+
+      for (const key of Array.from(keys)) {
+        const entry = this.entries.get(key);
+        if (entry && entry.expiresAt <= now) {
+          this.remove(key);
+          this.stats.expirations++;
+        }
+      }
+    }
+
+    if (this.wheel.size === 0 && this.ticker) {
+      clearInterval(this.ticker);
+      this.ticker = null;
+    }
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      backend: 'memory',
+      totalKeys: this.entries.size,
+      totalTimers: this.ticker ? 1 : 0,
+      wheelBuckets: this.wheel.size,
+      bytes: this.bytes,
+      maxBytes: this.maxBytes,
+      maxEntries: this.maxEntries
+    };
+  }
+
+  async close() {
+    if (this.ticker) {
+      clearInterval(this.ticker);
+      this.ticker = null;
+    }
+  }
+}
+
+export default MemoryStore;
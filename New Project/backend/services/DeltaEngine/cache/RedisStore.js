@@ -0,0 +1,88 @@
+/**
+ * RedisStore - Optional RedisCache backend for multi-process deployments
+ * Wraps a Redis client (ioredis or node-redis v4) passed in by the caller,
+ * so no Redis package is required here. The two differ in how SET options
+ * and multi-key DEL are passed; node-redis v4 clients are recognized by
+ * their isOpen property.
+ */
+class RedisStore {
+  constructor(client, { prefix = 'delta:' } = {}) {
+    if (!client) {
+      throw new Error('RedisStore requires a Redis-compatible client');
+    }
+
+    this.client = client;
+    this.prefix = prefix;
+    this.nodeRedis = 'isOpen' in client; // node-redis v4; otherwise ioredis call style
+
+    this.stats = {
+      hits: 0,
+      misses: 0
+    };
+  }
+
+  async get(key) {
+    const raw = await this.client.get(this.prefix + key);
+
+    if (raw === null || raw === undefined) {
+      this.stats.misses++;
+      return null;
+    }
+
+    this.stats.hits++;
+    return JSON.parse(raw);
+  }
+
+  async set(key, value, ttl = 0) {
+    const payload = JSON.stringify(value);
+
+    if (ttl > 0) {
+      if (this.nodeRedis) {
+        await this.client.set(this.prefix + key, payload, { PX: ttl });
+      } else {
+        await this.client.set(this.prefix + key, payload, 'PX', ttl);
+      }
+    } else {
+      await this.client.set(this.prefix + key, payload);
+    }
+
+    return true;
+  }
+
+  async delete(key) {
+    const removed = await this.client.del(this.prefix + key);
+    return removed > 0;
+  }
+
+  async has(key) {
+    const count = await this.client.exists(this.prefix + key);
+    return count > 0;
+  }
+
+  async keys() {
+    const keys = await this.client.keys(`${this.prefix}*`);
+    return keys.map(key => key.slice(this.prefix.length));
+  }
+
+  async clear() {
+    const keys = await this.client.keys(`${this.prefix}*`);
+    if (keys.length > 0) {
+      await (this.nodeRedis ? this.client.del(keys) : this.client.del(...keys));
+    }
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      backend: 'redis'
+    };
+  }
+
+  async close() {
+    if (typeof this.client.quit === 'function') {
+      await this.client.quit();
+    }
+  }
+}
+
+export default RedisStore;
@@ -28,6 +28,13 @@ export function generateSnapshotId() {
   return `snap_${uuidv4().replace(/-/g, '')}`;
 }
 
+/**
+ * Generate unique compression dictionary ID
+ */
+export function generateDictionaryId() {
+  return `dict_${uuidv4().replace(/-/g, '')}`;
+}
+
 /**
  * Create MD5 hash (faster, for delta hashing)
  */
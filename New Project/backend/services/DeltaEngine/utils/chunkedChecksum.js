@@ -0,0 +1,216 @@
+import crypto from 'crypto';
+
+/**
+ * Incremental content checksum over content-defined chunks
+ *
+ * Content is split into chunks at line ends whose tail hashes match a mask
+ * (bounded by MIN/MAX chunk sizes), so boundaries depend on content, not
+ * position: an edit only changes the chunks it touches. Each chunk has a
+ * SHA-256 digest and the root is SHA-256 over the ordered chunk digests
+ * (a one-level Merkle tree). A small edit rehashes the touched chunks plus
+ * 32 bytes per chunk for the root, instead of the whole file.
+ */
+
+const MIN_CHUNK = 512; // chars
+const MAX_CHUNK = 16384; // chars
+const BOUNDARY_MASK = 0x1f; // ~1 in 32 eligible line ends is a boundary
+const TAIL_CHARS = 8;
+
+const EMPTY_ROOT = crypto.createHash('sha256').update('').digest('hex');
+
+/**
+ * Is the line ending at lineEnd a chunk boundary? (FNV-1a over its tail)
+ */
+function isBoundaryLine(content, lineStart, lineEnd) {
+  let hash = 0x811c9dc5 ^ (lineEnd - lineStart);
+  const from = Math.max(lineStart, lineEnd - TAIL_CHARS);
+
+  for (let i = from; i < lineEnd; i++) {
+    hash ^= content.charCodeAt(i);
+    hash = Math.imul(hash, 0x01000193);
+  }
+
+  return (hash & BOUNDARY_MASK) === 0;
+}
+
+/**
+ * End offset of the chunk that starts at `start`
+ */
+function chunkEnd(content, start) {
+  const length = content.length;
+  let pos = start;
+
+  while (pos < length) {
+    const newline = content.indexOf('\n', pos);
+    const lineEnd = newline === -1 ? length : newline + 1;
+
+    if (lineEnd - start >= MAX_CHUNK) {
+      return Math.min(lineEnd, start + MAX_CHUNK);
+    }
+
+    if (lineEnd >= length) {
+      return length;
+    }
+
+    if (lineEnd - start >= MIN_CHUNK && isBoundaryLine(content, pos, lineEnd)) {
+      return lineEnd;
+    }
+
+    pos = lineEnd;
+  }
+
+  return length;
+}
+
+function hashChunk(content, start, end) {
+  return crypto.createHash('sha256').update(content.slice(start, end), 'utf8').digest();
+}
+
+class ChunkedChecksum {
+  constructor(content = '') {
+    this.lengths = [];
+    this.digests = [];
+    this.root = null;
+
+    this.stats = {
+      chunksHashed: 0,
+      charsHashed: 0
+    };
+
+    this.build(content);
+  }
+
+  /**
+   * Chunk and hash the whole document
+   */
+  build(content) {
+    const chunks = this.chunkRange(content, 0, content.length);
+    this.lengths = chunks.lengths;
+    this.digests = chunks.digests;
+    this.root = null;
+    return this;
+  }
+
+  /**
+   * Chunk content from `start` until `end` is reached and a boundary is hit.
+   * `stopAt(pos)` may end the scan early once boundaries re-align.
+   */
+  chunkRange(content, start, end, stopAt = null) {
+    const lengths = [];
+    const digests = [];
+    let pos = start;
+
+    while (pos < content.length) {
+      const next = chunkEnd(content, pos);
+      lengths.push(next - pos);
+      digests.push(hashChunk(content, pos, next));
+      this.stats.chunksHashed++;
+      this.stats.charsHashed += next - pos;
+      pos = next;
+
+      if (pos >= end && (!stopAt || stopAt(pos))) {
+        break;
+      }
+    }
+
+    return { lengths, digests, end: pos };
+  }
+
+  /**
+   * Update after base[from..to) was replaced; `content` is the new document
+   */
+  update(content, from, to, insertedLength) {
+    if (this.lengths.length === 0) {
+      return this.build(content);
+    }
+
+    const delta = insertedLength - (to - from);
+
+    // First chunk touched: the one containing `from` (or the last chunk on append)
+    let first = 0;
+    let firstStart = 0;
+    while (first < this.lengths.length - 1 && firstStart + this.lengths[first] <= from) {
+      firstStart += this.lengths[first];
+      first++;
+    }
+
+    // A chunk cut mid-line (MAX_CHUNK) depends on where that line ends
+    while (first > 0 && content.charCodeAt(firstStart - 1) !== 10) {
+      first--;
+      firstStart -= this.lengths[first];
+    }
+
+    // Last chunk touched: the one containing `to`
+    let last = first;
+    let lastEnd = firstStart + this.lengths[first];
+    while (last < this.lengths.length - 1 && lastEnd <= to) {
+      last++;
+      lastEnd += this.lengths[last];
+    }
+
+    // Old chunk ends after `last`, shifted into new-document coordinates
+    const oldEnds = new Map();
+    let cursor = lastEnd;
+    for (let i = last + 1; i < this.lengths.length; i++) {
+      cursor += this.lengths[i];
+      oldEnds.set(cursor + delta, i);
+    }
+
+    const region = this.chunkRange(
+      content,
+      firstStart,
+      lastEnd + delta,
+      pos => pos === lastEnd + delta || oldEnds.has(pos)
+    );
+
+    // Old chunks up to the re-aligned boundary are replaced
+    const resumeAfter = region.end === lastEnd + delta
+      ? last
+      : (oldEnds.has(region.end) ? oldEnds.get(region.end) : this.lengths.length - 1);
+
+    this.lengths.splice(first, resumeAfter - first + 1, ...region.lengths);
+    this.digests.splice(first, resumeAfter - first + 1, ...region.digests);
+    this.root = null;
+
+    return this;
+  }
+
+  /**
+   * Apply delta:update ops (offsets relative to the previous document)
+   */
+  applyOps(content, ops) {
+    if (!ops || ops.length === 0) return this;
+
+    const from = ops[0].from;
+    const to = ops[ops.length - 1].to;
+    const delta = ops.reduce((sum, op) => sum + (op.insert ? op.insert.length : 0) - (op.to - op.from), 0);
+
+    return this.update(content, from, to, to - from + delta);
+  }
+
+  /**
+   * Root checksum (hex)
+   */
+  digest() {
+    if (this.root === null) {
+      this.root = this.digests.length === 0
+        ? EMPTY_ROOT
+        : crypto.createHash('sha256').update(Buffer.concat(this.digests)).digest('hex');
+    }
+
+    return this.root;
+  }
+
+  get chunkCount() {
+    return this.lengths.length;
+  }
+}
+
+/**
+ * One-shot root checksum for a document
+ */
+export function createChunkedChecksum(content) {
+  return new ChunkedChecksum(content || '').digest();
+}
+
+export default ChunkedChecksum;
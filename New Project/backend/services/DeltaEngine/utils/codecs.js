@@ -0,0 +1,154 @@
+import zlib from 'zlib';
+import { promisify } from 'util';
+
+/**
+ * Delta codecs (native zlib)
+ *
+ * Async encoders run on the libuv threadpool, so compression never blocks
+ * the event loop. Each codec also has a sync decoder for patch replay on
+ * pool workers. Encoded bytes are stored as BSON Binary (deltaData) with
+ * the codec name in metadata.codec.
+ *
+ * Snapshots written before codecs existed have no metadata.codec: their
+ * `delta` string is either plain patch text or base64 gzip (pako) when
+ * metadata.compressed is set. See decodeStoredDelta.
+ */
+
+const gzip = promisify(zlib.gzip);
+const deflateRaw = promisify(zlib.deflateRaw);
+const brotliCompress = promisify(zlib.brotliCompress);
+
+const { constants } = zlib;
+
+export const CODECS = {
+  gzip: {
+    encode: (bytes) => gzip(bytes, { level: 6 }),
+    decodeSync: (bytes) => zlib.gunzipSync(bytes)
+  },
+
+  deflate: {
+    encode: (bytes) => deflateRaw(bytes, { level: 6 }),
+    decodeSync: (bytes) => zlib.inflateRawSync(bytes)
+  },
+
+  brotli: {
+    encode: (bytes) => brotliCompress(bytes, {
+      params: {
+        [constants.BROTLI_PARAM_MODE]: constants.BROTLI_MODE_TEXT,
+        [constants.BROTLI_PARAM_QUALITY]: 5,
+        [constants.BROTLI_PARAM_SIZE_HINT]: bytes.length
+      }
+    }),
+    decodeSync: (bytes) => zlib.brotliDecompressSync(bytes)
+  },
+
+  // Raw deflate primed with a dictionary trained on the project's own patches
+  'deflate-dict': {
+    encode: (bytes, dictionary) => deflateRaw(bytes, { level: 6, dictionary }),
+    decodeSync: (bytes, dictionary) => zlib.inflateRawSync(bytes, { dictionary })
+  }
+};
+
+export const DICTIONARY_CODEC = 'deflate-dict';
+export const MAX_DICTIONARY_SIZE = 32 * 1024; // Deflate window
+
+/**
+ * Encode patch text. Returns { data: Buffer, codec, originalSize, compressedSize, ratio }
+ */
+export async function encodeDelta(patch, codec, dictionary = null) {
+  const impl = CODECS[codec];
+  if (!impl) {
+    throw new Error(`Unknown delta codec: ${codec}`);
+  }
+
+  if (codec === DICTIONARY_CODEC && !dictionary) {
+    throw new Error('deflate-dict codec requires a dictionary');
+  }
+
+  const input = Buffer.from(patch || '', 'utf8');
+  const data = await impl.encode(input, dictionary);
+
+  return {
+    data,
+    codec,
+    originalSize: input.length,
+    compressedSize: data.length,
+    ratio: input.length > 0 ? data.length / input.length : 1.0
+  };
+}
+
+/**
+ * Bytes of a stored delta (Buffer, or BSON Binary from lean reads)
+ */
+export function toBytes(data) {
+  if (!data) return null;
+  if (data instanceof Uint8Array) return data;
+  if (data.buffer instanceof Uint8Array) {
+    return data.buffer.subarray(0, data.position ?? data.buffer.length);
+  }
+  return null;
+}
+
+/**
+ * Decode a stored delta back to patch text (sync; runs on pool workers)
+ * `stored` is { delta, deltaData, codec, compressed, dictionaryId }
+ */
+export function decodeStoredDelta(stored, dictionaries = {}) {
+  const { delta, deltaData, codec, compressed, dictionaryId } = stored;
+
+  if (codec) {
+    const impl = CODECS[codec];
+    if (!impl) {
+      throw new Error(`Unknown delta codec: ${codec}`);
+    }
+
+    const dictionary = dictionaryId ? dictionaries[dictionaryId] : null;
+    if (codec === DICTIONARY_CODEC && !dictionary) {
+      throw new Error(`Delta dictionary not loaded: ${dictionaryId}`);
+    }
+
+    return Buffer.from(impl.decodeSync(toBytes(deltaData), dictionary)).toString('utf8');
+  }
+
+  // Legacy: base64 gzip in the string field
+  if (compressed) {
+    return delta ? zlib.gunzipSync(Buffer.from(delta, 'base64')).toString('utf8') : '';
+  }
+
+  return delta || '';
+}
+
+/**
+ * Train a dictionary from sample patches: the most valuable repeated
+ * lines (frequency x length), most valuable last since deflate reaches
+ * the end of the dictionary with the shortest distances
+ */
+export function trainDictionary(patches, maxSize = MAX_DICTIONARY_SIZE) {
+  const counts = new Map();
+
+  for (const patch of patches) {
+    const seen = new Set();
+    for (const line of patch.split('\n')) {
+      // Hunk headers carry line numbers that rarely repeat exactly
+      if (line.length < 4 || line.startsWith('@@') || seen.has(line)) continue;
+      seen.add(line);
+      counts.set(line, (counts.get(line) || 0) + 1);
+    }
+  }
+
+  const ranked = [...counts.entries()]
+    .filter(([, count]) => count > 1)
+    .sort((a, b) => (b[1] * b[0].length) - (a[1] * a[0].length));
+
+  const chosen = [];
+  let size = 0;
+
+  for (const [line] of ranked) {
+    const length = Buffer.byteLength(line, 'utf8') + 1;
+    if (size + length > maxSize) continue;
+    chosen.push(line);
+    size += length;
+  }
+
+  return Buffer.from(chosen.reverse().join('\n') + '\n', 'utf8');
+}
@@ -0,0 +1,416 @@
+/**
+ * Line diff engine
+ *
+ * Produces the same unified patch format as `Diff.createPatch` (so stored
+ * deltas keep replaying through `Diff.applyPatch`), plus line and character
+ * statistics, in a single pass:
+ *
+ *   1. Trim the common prefix/suffix at character level and widen it to
+ *      whole lines, so only the edited region is diffed.
+ *   2. Intern the remaining lines to integers and run a linear-space Myers
+ *      diff over them.
+ *   3. If the edit cost exceeds the budget, fall back to a coarse diff that
+ *      replaces the whole trimmed region (still a valid, applicable patch).
+ *   4. Character stats are counted inside each changed block only, by
+ *      trimming the block's common prefix/suffix.
+ */
+
+export const DEFAULT_OPTIONS = {
+  context: 4, // Context lines around each hunk (Diff.createPatch default)
+  maxCost: 20000000, // Myers inner-loop steps before falling back to coarse
+  timeBudgetMs: 250, // Wall time before falling back to coarse
+  fileName: 'file'
+};
+
+const NO_NEWLINE = '\\ No newline at end of file';
+
+// Characters that Diff.parsePatch treats as line breaks besides \n / \r\n
+const EXOTIC_BREAKS = /[\v\f\x85]|\r(?!\n)/;
+
+class BudgetExceeded extends Error {}
+
+/**
+ * Start offset of every line (lines keep their trailing \n)
+ */
+function lineStarts(text) {
+  const starts = [];
+  if (text.length === 0) return starts;
+
+  let pos = 0;
+  while (pos < text.length) {
+    starts.push(pos);
+    const newline = text.indexOf('\n', pos);
+    if (newline === -1) break;
+    pos = newline + 1;
+  }
+
+  return starts;
+}
+
+function lineEnd(text, starts, index) {
+  return index + 1 < starts.length ? starts[index + 1] : text.length;
+}
+
+/**
+ * Number of leading lines identical in both documents
+ */
+function commonPrefixLines(oldText, newText, oldStarts, newStarts) {
+  const limit = Math.min(oldText.length, newText.length);
+  let chars = 0;
+  while (chars < limit && oldText.charCodeAt(chars) === newText.charCodeAt(chars)) {
+    chars++;
+  }
+
+  const maxLines = Math.min(oldStarts.length, newStarts.length);
+  let lines = 0;
+  while (lines < maxLines) {
+    const oldEnd = lineEnd(oldText, oldStarts, lines);
+    if (oldEnd > chars || oldEnd !== lineEnd(newText, newStarts, lines)) break;
+    lines++;
+  }
+
+  return lines;
+}
+
+/**
+ * Number of trailing lines identical in both documents (not overlapping the prefix)
+ */
+function commonSuffixLines(oldText, newText, oldStarts, newStarts, prefixLines) {
+  const limit = Math.min(oldText.length, newText.length);
+  let chars = 0;
+  while (chars < limit &&
+    oldText.charCodeAt(oldText.length - 1 - chars) === newText.charCodeAt(newText.length - 1 - chars)) {
+    chars++;
+  }
+
+  let lines = 0;
+  let oldIndex = oldStarts.length - 1;
+  let newIndex = newStarts.length - 1;
+
+  while (oldIndex >= prefixLines && newIndex >= prefixLines) {
+    const oldFromEnd = oldText.length - oldStarts[oldIndex];
+    if (oldFromEnd > chars || oldFromEnd !== newText.length - newStarts[newIndex]) break;
+    lines++;
+    oldIndex--;
+    newIndex--;
+  }
+
+  return lines;
+}
+
+/**
+ * Map each line in [from, to) to an integer id shared across both documents
+ */
+function internLines(text, starts, from, to, ids) {
+  const out = new Int32Array(to - from);
+  for (let i = from; i < to; i++) {
+    const line = text.slice(starts[i], lineEnd(text, starts, i));
+    let id = ids.get(line);
+    if (id === undefined) {
+      id = ids.size;
+      ids.set(line, id);
+    }
+    out[i - from] = id;
+  }
+  return out;
+}
+
+/**
+ * Linear-space Myers diff (middle snake, divide and conquer).
+ * Appends changed ranges [oldStart, oldEnd, newStart, newEnd] to `out`.
+ */
+class Myers {
+  constructor(a, b, { maxCost, timeBudgetMs }) {
+    this.a = a;
+    this.b = b;
+    const size = 2 * (a.length + b.length) + 3;
+    this.vf = new Int32Array(size);
+    this.vb = new Int32Array(size);
+    this.offset = a.length + b.length + 1;
+    this.cost = 0;
+    this.maxCost = maxCost;
+    this.deadline = Date.now() + timeBudgetMs;
+  }
+
+  charge(steps) {
+    this.cost += steps;
+    if (this.cost > this.maxCost) {
+      throw new BudgetExceeded('cost');
+    }
+    if ((this.cost & 0xffff) < steps && Date.now() > this.deadline) {
+      throw new BudgetExceeded('time');
+    }
+  }
+
+  diff(aStart, aEnd, bStart, bEnd, out) {
+    const { a, b } = this;
+
+    while (aStart < aEnd && bStart < bEnd && a[aStart] === b[bStart]) {
+      aStart++;
+      bStart++;
+    }
+    while (aStart < aEnd && bStart < bEnd && a[aEnd - 1] === b[bEnd - 1]) {
+      aEnd--;
+      bEnd--;
+    }
+
+    if (aStart === aEnd || bStart === bEnd) {
+      if (aStart < aEnd || bStart < bEnd) {
+        out.push([aStart, aEnd, bStart, bEnd]);
+      }
+      return;
+    }
+
+    const [x, y] = this.middleSnake(aStart, aEnd, bStart, bEnd);
+
+    // Degenerate split cannot make progress; emit the block as one change
+    if ((x === aStart && y === bStart) || (x === aEnd && y === bEnd)) {
+      out.push([aStart, aEnd, bStart, bEnd]);
+      return;
+    }
+
+    this.diff(aStart, x, bStart, y, out);
+    this.diff(x, aEnd, y, bEnd, out);
+  }
+
+  middleSnake(aStart, aEnd, bStart, bEnd) {
+    const { a, b, vf, vb, offset } = this;
+    const n = aEnd - aStart;
+    const m = bEnd - bStart;
+    const delta = n - m;
+    const odd = (delta & 1) !== 0;
+    const maxD = Math.ceil((n + m) / 2);
+
+    vf[offset + 1] = 0;
+    vb[offset + 1] = 0;
+
+    for (let d = 0; d <= maxD; d++) {
+      this.charge(2 * d + 1);
+
+      for (let k = -d; k <= d; k += 2) {
+        let x = (k === -d || (k !== d && vf[offset + k - 1] < vf[offset + k + 1]))
+          ? vf[offset + k + 1]
+          : vf[offset + k - 1] + 1;
+        let y = x - k;
+        while (x < n && y < m && a[aStart + x] === b[bStart + y]) {
+          x++;
+          y++;
+        }
+        vf[offset + k] = x;
+
+        if (odd && k >= delta - (d - 1) && k <= delta + (d - 1) &&
+          x + vb[offset + delta - k] >= n) {
+          return [aStart + x, bStart + y];
+        }
+      }
+
+      for (let k = -d; k <= d; k += 2) {
+        let x = (k === -d || (k !== d && vb[offset + k - 1] < vb[offset + k + 1]))
+          ? vb[offset + k + 1]
+          : vb[offset + k - 1] + 1;
+        let y = x - k;
+        while (x < n && y < m && a[aEnd - 1 - x] === b[bEnd - 1 - y]) {
+          x++;
+          y++;
+        }
+        vb[offset + k] = x;
+
+        if (!odd && delta - k >= -d && delta - k <= d &&
+          x + vf[offset + delta - k] >= n) {
+          return [aEnd - x, bEnd - y];
+        }
+      }
+    }
+
+    // Unreachable for consistent inputs
+    return [aStart, bStart];
+  }
+}
+
+/**
+ * Merge touching ranges produced by the recursion
+ */
+function mergeAdjacent(changes) {
+  const merged = [];
+  for (const change of changes) {
+    const last = merged[merged.length - 1];
+    if (last && last[1] === change[0] && last[3] === change[2]) {
+      last[1] = change[1];
+      last[3] = change[3];
+    } else {
+      merged.push(change);
+    }
+  }
+  return merged;
+}
+
+/**
+ * Characters added/removed inside one changed block
+ */
+function blockCharStats(oldText, oldFrom, oldTo, newText, newFrom, newTo) {
+  while (oldFrom < oldTo && newFrom < newTo && oldText.charCodeAt(oldFrom) === newText.charCodeAt(newFrom)) {
+    oldFrom++;
+    newFrom++;
+  }
+  while (oldFrom < oldTo && newFrom < newTo && oldText.charCodeAt(oldTo - 1) === newText.charCodeAt(newTo - 1)) {
+    oldTo--;
+    newTo--;
+  }
+  return { removed: oldTo - oldFrom, added: newTo - newFrom };
+}
+
+/**
+ * Diff two documents into changed line ranges.
+ * Returns { changes: [[oldStart, oldEnd, newStart, newEnd]], oldStarts, newStarts, coarse }
+ */
+export function diffLineRanges(oldText, newText, options = {}) {
+  const config = { ...DEFAULT_OPTIONS, ...options };
+  const oldStarts = lineStarts(oldText);
+  const newStarts = lineStarts(newText);
+
+  if (oldText === newText) {
+    return { changes: [], oldStarts, newStarts, coarse: false };
+  }
+
+  const prefix = commonPrefixLines(oldText, newText, oldStarts, newStarts);
+  const suffix = commonSuffixLines(oldText, newText, oldStarts, newStarts, prefix);
+  const oldEnd = oldStarts.length - suffix;
+  const newEnd = newStarts.length - suffix;
+
+  const coarseChange = [[prefix, oldEnd, prefix, newEnd]];
+
+  if (prefix === oldEnd || prefix === newEnd) {
+    return { changes: coarseChange, oldStarts, newStarts, coarse: false };
+  }
+
+  const ids = new Map();
+  const a = internLines(oldText, oldStarts, prefix, oldEnd, ids);
+  const b = internLines(newText, newStarts, prefix, newEnd, ids);
+
+  try {
+    const raw = [];
+    new Myers(a, b, config).diff(0, a.length, 0, b.length, raw);
+
+    const changes = mergeAdjacent(raw).map(([os, oe, ns, ne]) =>
+      [os + prefix, oe + prefix, ns + prefix, ne + prefix]);
+
+    return { changes, oldStarts, newStarts, coarse: false };
+  } catch (error) {
+    if (!(error instanceof BudgetExceeded)) throw error;
+    return { changes: coarseChange, oldStarts, newStarts, coarse: true };
+  }
+}
+
+/**
+ * Format changed ranges as a unified patch (Diff.createPatch layout by
+ * default; `index: false` and oldFileName/newFileName give a plain
+ * `--- old` / `+++ new` header)
+ */
+export function formatUnifiedPatch(oldText, newText, diff, options = {}) {
+  const {
+    context,
+    fileName,
+    oldFileName = fileName,
+    newFileName = fileName,
+    index = true
+  } = { ...DEFAULT_OPTIONS, ...options };
+  const { changes, oldStarts, newStarts } = diff;
+
+  const out = index
+    ? [`Index: ${fileName}`, '===================================================================']
+    : [];
+  out.push(`--- ${oldFileName}`, `+++ ${newFileName}`);
+
+  const emit = (prefix, text, starts, index) => {
+    const end = lineEnd(text, starts, index);
+    const terminated = text.charCodeAt(end - 1) === 10;
+    out.push(prefix + text.slice(starts[index], terminated ? end - 1 : end));
+    if (!terminated) out.push(NO_NEWLINE);
+  };
+
+  let i = 0;
+  while (i < changes.length) {
+    // Group changes separated by at most 2 * context unchanged lines
+    let j = i;
+    while (j + 1 < changes.length && changes[j + 1][0] - changes[j][1] <= context * 2) {
+      j++;
+    }
+
+    const first = changes[i];
+    const last = changes[j];
+    const lead = Math.min(context, first[0]);
+    const trail = Math.min(context, oldStarts.length - last[1]);
+
+    const oldStart = first[0] - lead;
+    const newStart = first[2] - lead;
+    const oldLines = last[1] + trail - oldStart;
+    const newLines = last[3] + trail - newStart;
+
+    out.push(`@@ -${oldLines === 0 ? oldStart : oldStart + 1},${oldLines} ` +
+      `+${newLines === 0 ? newStart : newStart + 1},${newLines} @@`);
+
+    let oldPos = oldStart;
+    for (let c = i; c <= j; c++) {
+      const [os, oe, ns, ne] = changes[c];
+      for (; oldPos < os; oldPos++) emit(' ', oldText, oldStarts, oldPos);
+      for (let k = os; k < oe; k++) emit('-', oldText, oldStarts, k);
+      for (let k = ns; k < ne; k++) emit('+', newText, newStarts, k);
+      oldPos = oe;
+    }
+    for (; oldPos < last[1] + trail; oldPos++) emit(' ', oldText, oldStarts, oldPos);
+
+    i = j + 1;
+  }
+
+  return out.join('\n') + '\n';
+}
+
+/**
+ * Line and character statistics for changed ranges
+ */
+export function diffStats(oldText, newText, diff) {
+  const { changes, oldStarts, newStarts } = diff;
+  const stats = {
+    linesAdded: 0,
+    linesRemoved: 0,
+    charsAdded: 0,
+    charsRemoved: 0
+  };
+
+  for (const [os, oe, ns, ne] of changes) {
+    stats.linesRemoved += oe - os;
+    stats.linesAdded += ne - ns;
+
+    const oldFrom = os < oldStarts.length ? oldStarts[os] : oldText.length;
+    const oldTo = oe < oldStarts.length ? oldStarts[oe] : oldText.length;
+    const newFrom = ns < newStarts.length ? newStarts[ns] : newText.length;
+    const newTo = ne < newStarts.length ? newStarts[ne] : newText.length;
+
+    const block = blockCharStats(oldText, oldFrom, oldTo, newText, newFrom, newTo);
+    stats.charsRemoved += block.removed;
+    stats.charsAdded += block.added;
+  }
+
+  return stats;
+}
+
+/**
+ * Can this engine produce a patch Diff.applyPatch reads back identically?
+ * Diff.parsePatch also splits on lone \r, \v, \f and \x85.
+ */
+export function isPatchSafe(text) {
+  return !EXOTIC_BREAKS.test(text);
+}
+
+/**
+ * Full diff: patch, stats and whether the budget forced a coarse result
+ */
+export function diffTexts(oldText, newText, options = {}) {
+  const diff = diffLineRanges(oldText, newText, options);
+
+  return {
+    patch: formatUnifiedPatch(oldText, newText, diff, options),
+    stats: diffStats(oldText, newText, diff),
+    coarse: diff.coarse
+  };
+}
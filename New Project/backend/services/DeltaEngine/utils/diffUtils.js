@@ -1,48 +1,26 @@
 import * as Diff from 'diff';
+import { diffTexts, isPatchSafe } from './diffEngine.js';
 
 /**
  * Compute delta diff between two text contents
+ * Line and character stats come from the same pass as the patch; inputs
+ * Diff.parsePatch would split differently (lone \r etc.) use jsdiff
  */
-export function computeDiff(oldContent, newContent) {
+export function computeDiff(oldContent, newContent, options = {}) {
   try {
     const oldText = oldContent || '';
     const newText = newContent || '';
 
-    // Compute line-based diff
-    const patches = Diff.createPatch('file', oldText, newText);
-    
-    // Compute character-based diff for statistics
-    const charDiff = Diff.diffChars(oldText, newText);
-    
-    // Calculate statistics
-    const stats = {
-      linesAdded: 0,
-      linesRemoved: 0,
-      charsAdded: 0,
-      charsRemoved: 0
-    };
-
-    charDiff.forEach(part => {
-      if (part.added) {
-        stats.charsAdded += part.count || 0;
-      } else if (part.removed) {
-        stats.charsRemoved += part.count || 0;
-      }
-    });
+    if (!isPatchSafe(oldText) || !isPatchSafe(newText)) {
+      return computeDiffFallback(oldText, newText);
+    }
 
-    // Count line changes
-    const lines = patches.split('\n');
-    lines.forEach(line => {
-      if (line.startsWith('+') && !line.startsWith('+++')) {
-        stats.linesAdded++;
-      } else if (line.startsWith('-') && !line.startsWith('---')) {
-        stats.linesRemoved++;
-      }
-    });
+    const { patch, stats, coarse } = diffTexts(oldText, newText, options);
 
     return {
-      patch: patches,
+      patch,
       stats,
+      coarse,
       hasChanges: oldText !== newText
     };
   } catch (error) {
@@ -51,6 +29,38 @@ export function computeDiff(oldContent, newContent) {
   }
 }
 
+/**
+ * jsdiff path for content with non-\n line breaks
+ */
+function computeDiffFallback(oldText, newText) {
+  const patch = Diff.createPatch('file', oldText, newText);
+
+  const stats = {
+    linesAdded: 0,
+    linesRemoved: 0,
+    charsAdded: 0,
+    charsRemoved: 0
+  };
+
+  // Count stats from the patch itself instead of a second character diff
+  patch.split('\n').forEach(line => {
+    if (line.startsWith('+') && !line.startsWith('+++')) {
+      stats.linesAdded++;
+      stats.charsAdded += line.length - 1;
+    } else if (line.startsWith('-') && !line.startsWith('---')) {
+      stats.linesRemoved++;
+      stats.charsRemoved += line.length - 1;
+    }
+  });
+
+  return {
+    patch,
+    stats,
+    coarse: false,
+    hasChanges: oldText !== newText
+  };
+}
+
 /**
  * Apply patch to content
  */
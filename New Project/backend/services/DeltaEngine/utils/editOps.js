@@ -0,0 +1,90 @@
+/**
+ * Edit operation utilities for the delta:update wire format
+ *
+ * An edit is a list of ops `{ from, to, insert }` whose offsets all refer
+ * to the base document, sorted ascending and non-overlapping:
+ *   { from: 4, to: 9, insert: 'abc' } replaces base[4..9) with 'abc'
+ */
+
+/**
+ * Validate ops against a base document length
+ */
+export function validateOps(ops, baseLength) {
+  if (!Array.isArray(ops)) {
+    return 'ops must be an array';
+  }
+
+  let lastEnd = 0;
+
+  for (const op of ops) {
+    if (!op || !Number.isInteger(op.from) || !Number.isInteger(op.to)) {
+      return 'op.from and op.to must be integers';
+    }
+
+    if (op.from < lastEnd || op.to < op.from || op.to > baseLength) {
+      return 'ops must be sorted, non-overlapping and within the document';
+    }
+
+    if (op.insert !== undefined && typeof op.insert !== 'string') {
+      return 'op.insert must be a string';
+    }
+
+    lastEnd = op.to;
+  }
+
+  return null;
+}
+
+/**
+ * Apply ops to a base document
+ */
+export function applyOps(base, ops) {
+  if (ops.length === 0) return base;
+
+  const parts = [];
+  let cursor = 0;
+
+  for (const op of ops) {
+    parts.push(base.slice(cursor, op.from));
+    if (op.insert) parts.push(op.insert);
+    cursor = op.to;
+  }
+
+  parts.push(base.slice(cursor));
+
+  return parts.join('');
+}
+
+/**
+ * Compute a single replace op between two documents by trimming the
+ * common prefix and suffix (what an editor change event usually is)
+ */
+export function computeEditOps(oldContent, newContent) {
+  const oldText = oldContent || '';
+  const newText = newContent || '';
+
+  if (oldText === newText) return [];
+
+  let start = 0;
+  const minLength = Math.min(oldText.length, newText.length);
+  while (start < minLength && oldText.charCodeAt(start) === newText.charCodeAt(start)) {
+    start++;
+  }
+
+  let oldEnd = oldText.length;
+  let newEnd = newText.length;
+  while (oldEnd > start && newEnd > start &&
+    oldText.charCodeAt(oldEnd - 1) === newText.charCodeAt(newEnd - 1)) {
+    oldEnd--;
+    newEnd--;
+  }
+
+  return [{ from: start, to: oldEnd, insert: newText.slice(start, newEnd) }];
+}
+
+/**
+ * Size of an edit on the wire (inserted characters plus op overhead)
+ */
+export function opsSize(ops) {
+  return ops.reduce((total, op) => total + (op.insert ? op.insert.length : 0) + 16, 0);
+}
@@ -0,0 +1,37 @@
+import { computeDiff, applyPatch } from '../utils/diffUtils.js';
+import DeltaCompressor from '../DeltaCompressor.js';
+
+/**
+ * CPU-heavy delta tasks, run either inline or on a pool worker
+ */
+export const tasks = {
+  /**
+   * Diff two contents into a patch + stats
+   */
+  diff({ oldContent, newContent, options }) {
+    return computeDiff(oldContent, newContent, options);
+  },
+
+  /**
+   * Decode stored deltas and apply them to content in order.
+   * `dictionaries` maps dictionaryId -> bytes for deflate-dict deltas.
+   */
+  replay({ content, deltas, dictionaries = {} }) {
+    let result = content;
+
+    for (const stored of deltas) {
+      result = applyPatch(result, DeltaCompressor.decodeSync(stored, dictionaries));
+    }
+
+    return result;
+  }
+};
+
+export function runTask(type, payload) {
+  const task = tasks[type];
+  if (!task) {
+    throw new Error(`Unknown delta task: ${type}`);
+  }
+
+  return task(payload);
+}
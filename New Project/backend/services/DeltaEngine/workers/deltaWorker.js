@@ -0,0 +1,21 @@
+import { parentPort } from 'worker_threads';
+import { runTask } from './deltaTasks.js';
+
+/**
+ * Delta worker - runs DeltaWorkerPool tasks off the main event loop
+ */
+parentPort.on('message', ({ id, type, payload }) => {
+  try {
+    const result = runTask(type, payload);
+
+    // Hand binary results back without copying when they own their buffer
+    const transfer = result instanceof Uint8Array &&
+      result.byteOffset === 0 && result.byteLength === result.buffer.byteLength
+      ? [result.buffer]
+      : [];
+
+    parentPort.postMessage({ id, result }, transfer);
+  } catch (error) {
+    parentPort.postMessage({ id, error: error.message });
+  }
+});
@@ -0,0 +1,791 @@
+import fs from 'fs/promises';
+import path from 'path';
+import crypto from 'crypto';
+import { fileURLToPath } from 'url';
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = path.dirname(__filename);
+
+/**
+ * File Tree Store
+ *
+ * Project file trees for the file explorer. Each project lives in
+ * uploads/file-structures/<projectId>/:
+ *
+ *   tree.json     structure snapshot (ids, names, types), no file contents
+ *   ops.log       append-only JSON lines: create / rename / delete
+ *   content/<id>  one file per file node's content
+ *   lock          held (O_EXCL) by the process changing the structure
+ *
+ * A loaded project is held in memory with a path -> node index, so lookups
+ * are O(depth). A mutation appends one op line and content edits rewrite
+ * only that file's blob. The op log is folded into tree.json after
+ * COMPACT_AFTER_OPS ops. Writes to a project run one at a time.
+ *
+ * Other processes (cluster workers) may share the directory: before each
+ * operation the store picks up ops they appended and reloads after they
+ * compact. Structure changes (check, append, compaction) hold the
+ * project's lockfile, so two processes never validate against the same
+ * state. Replaying an op is idempotent.
+ */
+
+const ROOT_DIR = path.join(__dirname, '../uploads/file-structures');
+const KEY_SEPARATOR = '\0';
+
+export class FileTreeError extends Error {
+  constructor(status, message) {
+    super(message);
+    this.name = 'FileTreeError';
+    this.status = status;
+  }
+}
+
+const getDefaultStructure = () => ({
+  id: 'root',
+  name: 'root',
+  type: 'folder',
+  children: [
+    {
+      id: 'src',
+      name: 'src',
+      type: 'folder',
+      children: [
+        {
+          id: 'index.js',
+          name: 'index.js',
+          type: 'file',
+          content: '// Start coding here\nconsole.log("Hello World!");'
+        }
+      ]
+    },
+    {
+      id: 'readme.md',
+      name: 'README.md',
+      type: 'file',
+      content: '# Welcome to your project\n\nStart building something amazing!'
+    }
+  ]
+});
+
+const newBlobId = () => crypto.randomBytes(12).toString('hex');
+
+/**
+ * In-memory tree of one project with a path -> node index
+ * Paths are arrays of node ids below the root (a leading 'root' is ignored).
+ */
+export class ProjectTree {
+  constructor() {
+    this.root = this.makeNode({ id: 'root', name: 'root', type: 'folder' }, null);
+    this.index = new Map([['', this.root]]);
+  }
+
+  makeNode({ id, name, type, blob }, parent) {
+    const node = { id, name, type, parent, key: '' };
+    if (parent) {
+      node.key = parent === this.root ? id : `${parent.key}${KEY_SEPARATOR}${id}`;
+    }
+    if (type === 'folder') {
+      node.children = new Map(); // id -> node, in creation order
+      node.names = new Map(); // name -> id
+    } else {
+      node.blob = blob;
+    }
+    return node;
+  }
+
+  static keyOf(pathArray = []) {
+    const ids = pathArray[0] === 'root' ? pathArray.slice(1) : pathArray;
+    return ids.map(String).join(KEY_SEPARATOR);
+  }
+
+  find(pathArray) {
+    return this.index.get(ProjectTree.keyOf(pathArray)) || null;
+  }
+
+  /**
+   * Apply a create; false if it does not apply (replayed or stale op)
+   */
+  applyCreate(parentKey, spec) {
+    const parent = this.index.get(parentKey);
+    if (!parent || parent.type !== 'folder') return false;
+    if (parent.children.has(spec.id) || parent.names.has(spec.name)) return false;
+
+    const node = this.makeNode(spec, parent);
+    parent.children.set(node.id, node);
+    parent.names.set(node.name, node.id);
+    this.index.set(node.key, node);
+    return node;
+  }
+
+  applyRename(key, name) {
+    const node = this.index.get(key);
+    if (!node || !node.parent) return false;
+    if (node.name === name) return node;
+
+    const { names } = node.parent;
+    if (names.has(name)) return false;
+
+    names.delete(node.name);
+    names.set(name, node.id);
+    node.name = name;
+    return node;
+  }
+
+  /**
+   * Apply a delete; returns the removed subtree's file blobs, or false
+   */
+  applyDelete(key) {
+    const node = this.index.get(key);
+    if (!node || !node.parent) return false;
+
+    node.parent.children.delete(node.id);
+    node.parent.names.delete(node.name);
+
+    const blobs = [];
+    this.walk(node, (child) => {
+      this.index.delete(child.key);
+      if (child.type === 'file') blobs.push(child.blob);
+    });
+    return blobs;
+  }
+
+  apply(op) {
+    switch (op.op) {
+      case 'create': return this.applyCreate(op.parent, op.node);
+      case 'rename': return this.applyRename(op.path, op.name);
+      case 'delete': return this.applyDelete(op.path);
+      default: return false;
+    }
+  }
+
+  walk(node, visit) {
+    visit(node);
+    if (node.children) {
+      for (const child of node.children.values()) {
+        this.walk(child, visit);
+      }
+    }
+  }
+
+  /**
+   * Structure without contents (the tree.json format)
+   */
+  serialize(node = this.root) {
+    if (node.type === 'file') {
+      return { id: node.id, name: node.name, type: 'file', blob: node.blob };
+    }
+    return {
+      id: node.id,
+      name: node.name,
+      type: 'folder',
+      children: [...node.children.values()].map(child => this.serialize(child))
+    };
+  }
+
+  static fromSnapshot(snapshot) {
+    const tree = new ProjectTree();
+    const load = (parent, children = []) => {
+      for (const child of children) {
+        const node = tree.applyCreate(parent.key, child);
+        if (node && node.type === 'folder') load(node, child.children);
+      }
+    };
+    load(tree.root, snapshot.children);
+    return tree;
+  }
+
+  get size() {
+    return this.index.size - 1;
+  }
+}
+
+class FileTreeStore {
+  constructor({ rootDir = ROOT_DIR } = {}) {
+    this.rootDir = rootDir;
+
+    this.COMPACT_AFTER_OPS = 500;
+    this.MAX_CACHED_PROJECTS = 200;
+    this.ORPHAN_BLOB_GRACE_MS = 60 * 1000;
+    this.LOCK_TIMEOUT_MS = 10 * 1000;
+    this.LOCK_STALE_MS = 30 * 1000; // A live holder never keeps the lockfile this long
+
+    // projectId -> { tree, treeStamp, logOffset, opsSinceCompaction }
+    this.projects = new Map(); // Insertion order doubles as LRU order
+    this.locks = new Map(); // projectId -> tail of the write queue
+
+    this.stats = {
+      loads: 0,
+      migrations: 0,
+      opsAppended: 0,
+      opsReplayed: 0,
+      contentWrites: 0,
+      compactions: 0,
+      lockWaits: 0,
+      staleLocks: 0
+    };
+  }
+
+  projectDir(projectId) {
+    if (!/^[\w-]+$/.test(String(projectId))) {
+      throw new FileTreeError(400, 'Invalid project ID');
+    }
+    return path.join(this.rootDir, String(projectId));
+  }
+
+  paths(projectId) {
+    const dir = this.projectDir(projectId);
+    return {
+      dir,
+      tree: path.join(dir, 'tree.json'),
+      log: path.join(dir, 'ops.log'),
+      lock: path.join(dir, 'lock'),
+      content: path.join(dir, 'content'),
+      legacy: path.join(this.rootDir, `${projectId}.json`)
+    };
+  }
+
+  /**
+   * Run fn with the project's write queue held
+   */
+  async withLock(projectId, fn) {
+    const previous = this.locks.get(projectId) || Promise.resolve();
+    let release;
+    const current = new Promise(resolve => { release = resolve; });
+    const tail = previous.then(() => current);
+    this.locks.set(projectId, tail);
+
+    await previous;
+    try {
+      return await fn();
+    } finally {
+      release();
+      if (this.locks.get(projectId) === tail) {
+        this.locks.delete(projectId);
+      }
+    }
+  }
+
+  /**
+   * Run fn with the project's write queue and its lockfile held, for
+   * operations that validate against the tree and append to the log
+   */
+  async withWriteLock(projectId, fn) {
+    return this.withLock(projectId, async () => {
+      const files = this.paths(projectId);
+      await fs.mkdir(files.dir, { recursive: true });
+      await this.acquireFileLock(files.lock);
+
+      try {
+        return await fn();
+      } finally {
+        await fs.unlink(files.lock).catch(() => {});
+      }
+    });
+  }
+
+  async acquireFileLock(lockFile) {
+    const deadline = Date.now() + this.LOCK_TIMEOUT_MS;
+
+    for (let delay = 5; ; delay = Math.min(delay * 2, 100)) {
+      try {
+        const handle = await fs.open(lockFile, 'wx');
+        await handle.writeFile(String(process.pid), 'utf-8');
+        await handle.close();
+        return;
+      } catch (error) {
+        if (error.code !== 'EEXIST') throw error;
+      }
+
+      if (await this.breakStaleLock(lockFile)) continue;
+      if (Date.now() > deadline) {
+        throw new FileTreeError(503, 'Project is locked by another process');
+      }
+
+      this.stats.lockWaits++;
+      await new Promise(resolve => setTimeout(resolve, delay));
+    }
+  }
+
+  /**
+   * Remove a lockfile left by a process that exited or hung; true if removed
+   */
+  async breakStaleLock(lockFile) {
+    let holder;
+    let stat;
+    try {
+      [holder, stat] = await Promise.all([fs.readFile(lockFile, 'utf-8'), fs.stat(lockFile)]);
+    } catch (error) {
+      if (error.code === 'ENOENT') return true; // Released meanwhile
+      throw error;
+    }
+
+    let stale = Date.now() - stat.mtimeMs > this.LOCK_STALE_MS;
+    const pid = Number(holder);
+    if (!stale && pid > 0 && pid !== process.pid) {
+      try {
+        process.kill(pid, 0);
+      } catch (error) {
+        stale = error.code === 'ESRCH';
+      }
+    }
+    if (!stale) return false;
+
+    await fs.unlink(lockFile).catch(() => {});
+    this.stats.staleLocks++;
+    return true;
+  }
+
+  // ---------------------------------------------------------------------------
+  // Loading
+  // ---------------------------------------------------------------------------
+
+  async stampOf(file) {
+    try {
+      const stat = await fs.stat(file);
+      return `${stat.ino}:${stat.mtimeMs}`;
+    } catch (error) {
+      if (error.code === 'ENOENT') return null;
+      throw error;
+    }
+  }
+
+  /**
+   * In-memory tree for a project, brought up to date with the disk
+   */
+  async open(projectId) {
+    const files = this.paths(projectId);
+    let state = this.projects.get(projectId);
+    const treeStamp = await this.stampOf(files.tree);
+
+    if (!state || state.treeStamp !== treeStamp || !treeStamp ||
+        !(await this.replayLog(state, files))) {
+      state = await this.load(projectId, files);
+    }
+
+    // Refresh LRU position
+    this.projects.delete(projectId);
+    this.projects.set(projectId, state);
+    this.evictProjects();
+
+    return state;
+  }
+
+  async load(projectId, files) {
+    let data;
+    try {
+      data = await fs.readFile(files.tree, 'utf-8');
+    } catch (error) {
+      if (error.code !== 'ENOENT') throw error;
+      await this.initialize(projectId, files);
+      data = await fs.readFile(files.tree, 'utf-8');
+    }
+
+    const state = {
+      tree: ProjectTree.fromSnapshot(JSON.parse(data)),
+      treeStamp: await this.stampOf(files.tree),
+      logOffset: 0,
+      opsSinceCompaction: 0
+    };
+    await this.replayLog(state, files);
+
+    this.stats.loads++;
+    return state;
+  }
+
+  /**
+   * Create a project's store from its legacy <projectId>.json (contents
+   * inline) or from the default structure
+   */
+  async initialize(projectId, files) {
+    let structure;
+    try {
+      structure = JSON.parse(await fs.readFile(files.legacy, 'utf-8'));
+      this.stats.migrations++;
+    } catch {
+      structure = getDefaultStructure();
+    }
+
+    await fs.mkdir(files.content, { recursive: true });
+
+    const strip = async (node) => {
+      if (node.type === 'file') {
+        const blob = newBlobId();
+        await fs.writeFile(path.join(files.content, blob), node.content || '', 'utf-8');
+        return { id: node.id, name: node.name, type: 'file', blob };
+      }
+      const children = [];
+      for (const child of node.children || []) {
+        children.push(await strip(child));
+      }
+      return { id: node.id, name: node.name, type: 'folder', children };
+    };
+
+    const snapshot = await strip(structure);
+    await this.writeSnapshot(files, snapshot);
+  }
+
+  /**
+   * Apply op lines appended since the last read (by any process). Returns
+   * false if the log is shorter than what was read: another process
+   * compacted and a fresh log was started, so the tree must be reloaded.
+   */
+  async replayLog(state, files, logFile = files.log) {
+    let handle;
+    try {
+      handle = await fs.open(logFile, 'r');
+    } catch (error) {
+      if (error.code === 'ENOENT') return true;
+      throw error;
+    }
+
+    try {
+      const { size } = await handle.stat();
+      if (size < state.logOffset) return false;
+      if (size === state.logOffset) return true;
+
+      const buffer = Buffer.alloc(size - state.logOffset);
+      await handle.read(buffer, 0, buffer.length, state.logOffset);
+
+      // Only consume complete lines; a partial last line is still being written
+      const end = buffer.lastIndexOf(0x0a) + 1;
+      if (end === 0) return true;
+
+      for (const line of buffer.subarray(0, end).toString('utf-8').split('\n')) {
+        if (!line) continue;
+        try {
+          state.tree.apply(JSON.parse(line));
+          state.opsSinceCompaction++;
+          this.stats.opsReplayed++;
+        } catch (error) {
+          console.error('[FileTreeStore] Skipping bad op line:', error.message);
+        }
+      }
+      state.logOffset += end;
+      return true;
+    } finally {
+      await handle.close();
+    }
+  }
+
+  /**
+   * Structure version: changes with every create/rename/delete, and is
+   * the same in every process reading the directory
+   */
+  versionOf(state) {
+    return `${state.treeStamp.replace(':', '.')}-${state.logOffset}`;
+  }
+
+  evictProjects() {
+    for (const projectId of this.projects.keys()) {
+      if (this.projects.size <= this.MAX_CACHED_PROJECTS) break;
+      if (!this.locks.has(projectId)) {
+        this.projects.delete(projectId);
+      }
+    }
+  }
+
+  // ---------------------------------------------------------------------------
+  // Persistence
+  // ---------------------------------------------------------------------------
+
+  async writeAtomic(file, data) {
+    const tmp = `${file}.${process.pid}.tmp`;
+    await fs.writeFile(tmp, data, 'utf-8');
+    await fs.rename(tmp, file);
+  }
+
+  async writeSnapshot(files, snapshot) {
+    await fs.mkdir(files.dir, { recursive: true });
+    await this.writeAtomic(files.tree, JSON.stringify(snapshot));
+  }
+
+  async appendOp(projectId, state, op) {
+    const files = this.paths(projectId);
+    await fs.appendFile(files.log, `${JSON.stringify(op)}\n`, 'utf-8');
+    this.stats.opsAppended++;
+
+    // Read it back with anything other processes appended, in log order
+    await this.replayLog(state, files);
+
+    if (state.opsSinceCompaction >= this.COMPACT_AFTER_OPS) {
+      await this.compact(projectId, state).catch(error => {
+        console.error('[FileTreeStore] Compaction error:', error);
+      });
+    }
+  }
+
+  /**
+   * Fold the op log into tree.json and drop unreferenced content blobs
+   */
+  async compact(projectId, state) {
+    const files = this.paths(projectId);
+    const sealed = `${files.log}.${process.pid}.compacting`;
+
+    // Appends from here on start a fresh log
+    try {
+      await fs.rename(files.log, sealed);
+    } catch (error) {
+      if (error.code === 'ENOENT') return; // Another process just compacted
+      throw error;
+    }
+    await this.replayLog(state, files, sealed);
+
+    await this.writeSnapshot(files, state.tree.serialize());
+    await fs.unlink(sealed);
+
+    state.treeStamp = await this.stampOf(files.tree);
+    state.logOffset = 0;
+    state.opsSinceCompaction = 0;
+    await this.replayLog(state, files);
+
+    await this.sweepBlobs(state, files);
+    this.stats.compactions++;
+  }
+
+  async sweepBlobs(state, files) {
+    const referenced = new Set();
+    state.tree.walk(state.tree.root, (node) => {
+      if (node.type === 'file') referenced.add(node.blob);
+    });
+
+    const cutoff = Date.now() - this.ORPHAN_BLOB_GRACE_MS;
+    for (const blob of await fs.readdir(files.content)) {
+      if (referenced.has(blob)) continue;
+
+      const file = path.join(files.content, blob);
+      const stat = await fs.stat(file).catch(() => null);
+      // Grace period: another process may be about to log its create
+      if (stat && stat.mtimeMs < cutoff) {
+        await fs.unlink(file).catch(() => {});
+      }
+    }
+  }
+
+  /**
+   * Content ETag from the blob's size and mtime (no read)
+   */
+  async contentTag(projectId, node) {
+    try {
+      const stat = await fs.stat(path.join(this.paths(projectId).content, node.blob));
+      return `"${stat.size.toString(36)}-${Math.floor(stat.mtimeMs).toString(36)}"`;
+    } catch (error) {
+      if (error.code === 'ENOENT') return '"0-0"';
+      throw error;
+    }
+  }
+
+  async readContent(projectId, node) {
+    try {
+      return await fs.readFile(path.join(this.paths(projectId).content, node.blob), 'utf-8');
+    } catch (error) {
+      if (error.code === 'ENOENT') return '';
+      throw error;
+    }
+  }
+
+  async writeContent(projectId, blob, content) {
+    const files = this.paths(projectId);
+    await fs.mkdir(files.content, { recursive: true });
+    await this.writeAtomic(path.join(files.content, blob), content);
+    this.stats.contentWrites++;
+  }
+
+  /**
+   * Node without contents or children, for lazy listings and pushes
+   */
+  summarize(node) {
+    if (node.type === 'file') {
+      return { id: node.id, name: node.name, type: 'file' };
+    }
+    return { id: node.id, name: node.name, type: 'folder', childCount: node.children.size };
+  }
+
+  /**
+   * Plain node as returned by the API (contents inline for files)
+   */
+  async toPlain(projectId, node, withContent = true) {
+    if (node.type === 'file') {
+      const plain = { id: node.id, name: node.name, type: 'file' };
+      if (withContent) plain.content = await this.readContent(projectId, node);
+      return plain;
+    }
+
+    const children = await Promise.all(
+      [...node.children.values()].map(child => this.toPlain(projectId, child, withContent))
+    );
+    return { id: node.id, name: node.name, type: 'folder', children };
+  }
+
+  // ---------------------------------------------------------------------------
+  // Operations
+  // ---------------------------------------------------------------------------
+
+  /**
+   * Whole tree, with file contents inline unless withContent is false
+   */
+  async getStructure(projectId, { withContent = true } = {}) {
+    const { tree } = await this.withLock(projectId, () => this.open(projectId));
+    return this.toPlain(projectId, tree.root, withContent);
+  }
+
+  async getVersion(projectId) {
+    const state = await this.withLock(projectId, () => this.open(projectId));
+    return this.versionOf(state);
+  }
+
+  /**
+   * One page of a folder's children, without contents
+   */
+  async listChildren(projectId, pathArray, { offset = 0, limit = 200 } = {}) {
+    return this.withLock(projectId, async () => {
+      const state = await this.open(projectId);
+      const node = state.tree.find(pathArray);
+
+      if (!node) throw new FileTreeError(404, 'Folder not found');
+      if (node.type !== 'folder') throw new FileTreeError(400, 'Path does not point to a folder');
+
+      const children = [];
+      let index = 0;
+      for (const child of node.children.values()) {
+        if (index++ < offset) continue;
+        if (children.length === limit) break;
+        children.push(this.summarize(child));
+      }
+
+      const next = offset + children.length;
+      return {
+        version: this.versionOf(state),
+        node: this.summarize(node),
+        children,
+        total: node.children.size,
+        nextCursor: next < node.children.size ? next : null
+      };
+    });
+  }
+
+  /**
+   * A file's content; with ifNoneMatch equal to its current ETag the
+   * content is not read and notModified is set
+   */
+  async getFile(projectId, pathArray, { ifNoneMatch = null } = {}) {
+    return this.withLock(projectId, async () => {
+      const { tree } = await this.open(projectId);
+      const node = tree.find(pathArray);
+
+      if (!node) throw new FileTreeError(404, 'File not found');
+      if (node.type !== 'file') throw new FileTreeError(400, 'Path does not point to a file');
+
+      const etag = await this.contentTag(projectId, node);
+      if (ifNoneMatch && ifNoneMatch === etag) {
+        return { id: node.id, name: node.name, etag, notModified: true };
+      }
+
+      return { id: node.id, name: node.name, etag, content: await this.readContent(projectId, node) };
+    });
+  }
+
+  async create(projectId, parentPath, { id, name, type, content = '' }) {
+    return this.withWriteLock(projectId, async () => {
+      const state = await this.open(projectId);
+      const parent = state.tree.find(parentPath);
+
+      if (!parent) throw new FileTreeError(404, 'Parent folder not found');
+      if (parent.type !== 'folder') throw new FileTreeError(400, 'Parent must be a folder');
+      if (parent.names.has(name)) {
+        throw new FileTreeError(409, `A ${type} with name "${name}" already exists`);
+      }
+
+      const spec = { id, name, type };
+      if (type === 'file') {
+        spec.blob = newBlobId();
+        // Content first, so a logged create always has its blob
+        await this.writeContent(projectId, spec.blob, content);
+      }
+
+      await this.appendOp(projectId, state, { op: 'create', parent: parent.key, node: spec });
+
+      return type === 'folder' ? { id, name, type, children: [] } : { id, name, type, content };
+    });
+  }
+
+  async rename(projectId, pathArray, newName) {
+    return this.withWriteLock(projectId, async () => {
+      const state = await this.open(projectId);
+      const node = state.tree.find(pathArray);
+
+      if (!node || !node.parent) throw new FileTreeError(404, 'File or folder not found');
+
+      const existing = node.parent.names.get(newName);
+      if (existing !== undefined && existing !== node.id) {
+        throw new FileTreeError(409, `A ${node.type} with name "${newName}" already exists`);
+      }
+
+      const oldName = node.name;
+      await this.appendOp(projectId, state, { op: 'rename', path: node.key, name: newName });
+
+      return { oldName, newName, node: await this.toPlain(projectId, node) };
+    });
+  }
+
+  async remove(projectId, pathArray) {
+    return this.withWriteLock(projectId, async () => {
+      const state = await this.open(projectId);
+      const node = state.tree.find(pathArray);
+
+      if (!node || !node.parent) throw new FileTreeError(404, 'File or folder not found');
+
+      const deleted = await this.toPlain(projectId, node);
+      const blobs = [];
+      state.tree.walk(node, (child) => {
+        if (child.type === 'file') blobs.push(child.blob);
+      });
+
+      await this.appendOp(projectId, state, { op: 'delete', path: node.key });
+
+      const { content } = this.paths(projectId);
+      await Promise.all(blobs.map(blob => fs.unlink(path.join(content, blob)).catch(() => {})));
+
+      return deleted;
+    });
+  }
+
+  async updateContent(projectId, pathArray, content) {
+    return this.withLock(projectId, async () => {
+      const { tree } = await this.open(projectId);
+      const node = tree.find(pathArray);
+
+      if (!node) throw new FileTreeError(404, 'File not found');
+      if (node.type !== 'file') throw new FileTreeError(400, 'Path does not point to a file');
+
+      await this.writeContent(projectId, node.blob, content);
+      return {
+        id: node.id,
+        name: node.name,
+        type: 'file',
+        content,
+        etag: await this.contentTag(projectId, node)
+      };
+    });
+  }
+
+  getStats() {
+    let nodes = 0;
+    for (const { tree } of this.projects.values()) {
+      nodes += tree.size;
+    }
+
+    return {
+      ...this.stats,
+      cachedProjects: this.projects.size,
+      cachedNodes: nodes,
+      lockedProjects: this.locks.size
+    };
+  }
+}
+
+export { FileTreeStore };
+
+// Singleton instance
+const fileTreeStore = new FileTreeStore();
+
+export default fileTreeStore;
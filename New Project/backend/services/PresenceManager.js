@@ -0,0 +1,183 @@
+import RoomMember from '../models/RoomMember.js';
+
+/**
+ * Presence Manager
+ * Keeps cursors and awareness in memory per room. Broadcasts are capped at
+ * one frame per key every broadcastIntervalMs with last-write-wins
+ * coalescing (only the newest state of each cursor is sent), and cursor /
+ * last-seen state reaches MongoDB in periodic bulkWrite batches instead of
+ * one write per mouse move.
+ */
+class PresenceManager {
+  constructor({
+    broadcastIntervalMs = 50, // At most ~20 frames/s per room
+    persistIntervalMs = 5000
+  } = {}) {
+    this.broadcastIntervalMs = broadcastIntervalMs;
+    this.persistIntervalMs = persistIntervalMs;
+
+    // roomKey -> { io, pending: Map(event:key -> { event, payload, senderId }), timer }
+    this.rooms = new Map();
+
+    // `${roomId}:${userId}` -> RoomMember fields to $set
+    this.dirtyMembers = new Map();
+    this.persistTimer = null;
+
+    this.stats = {
+      eventsIn: 0,
+      framesOut: 0,
+      coalesced: 0,
+      memberWrites: 0,
+      persistBatches: 0
+    };
+  }
+
+  /**
+   * Queue presence state for broadcast to a room, except the sender.
+   * A newer state for the same (event, key) replaces the pending one.
+   */
+  publish(io, roomKey, senderId, event, key, payload) {
+    let room = this.rooms.get(roomKey);
+    if (!room) {
+      room = { io, pending: new Map(), timer: null };
+      this.rooms.set(roomKey, room);
+    }
+
+    const pendingKey = `${event}:${key}`;
+    if (room.pending.has(pendingKey)) {
+      this.stats.coalesced++;
+    }
+    room.pending.set(pendingKey, { event, payload, senderId });
+    this.stats.eventsIn++;
+
+    // No timer means the room was quiet for a full interval: send on the
+    // next tick. Otherwise the running interval timer picks it up.
+    if (!room.timer) {
+      room.timer = setTimeout(() => this.flushRoom(roomKey), 0);
+    }
+  }
+
+  /**
+   * Send a room's pending state, then hold further sends for one interval;
+   * a room with nothing left to send is dropped
+   */
+  flushRoom(roomKey) {
+    const room = this.rooms.get(roomKey);
+    if (!room) return;
+
+    room.timer = null;
+
+    if (room.pending.size === 0) {
+      this.rooms.delete(roomKey);
+      return;
+    }
+
+    this.sendPending(roomKey, room);
+    room.timer = setTimeout(() => this.flushRoom(roomKey), this.broadcastIntervalMs);
+  }
+
+  sendPending(roomKey, room) {
+    for (const { event, payload, senderId } of room.pending.values()) {
+      room.io.to(roomKey).except(senderId).emit(event, payload);
+      this.stats.framesOut++;
+    }
+
+    room.pending.clear();
+  }
+
+  /**
+   * Remember a member's cursor for the next persistence batch
+   */
+  recordCursor(roomId, userId, { line, column, fileId }) {
+    this.markDirty(roomId, userId, {
+      'cursorPosition.line': line,
+      'cursorPosition.column': column,
+      'cursorPosition.fileId': fileId,
+      lastSeen: new Date()
+    });
+  }
+
+  markDirty(roomId, userId, fields) {
+    const key = `${roomId}:${userId}`;
+    this.dirtyMembers.set(key, {
+      roomId,
+      userId,
+      fields: { ...this.dirtyMembers.get(key)?.fields, ...fields }
+    });
+
+    if (!this.persistTimer) {
+      this.persistTimer = setTimeout(() => {
+        this.persistTimer = null;
+        this.persist().catch(error => {
+          console.error('Error persisting presence:', error);
+        });
+      }, this.persistIntervalMs);
+      this.persistTimer.unref();
+    }
+  }
+
+  /**
+   * Write all dirty member state in one bulkWrite
+   */
+  async persist() {
+    if (this.dirtyMembers.size === 0) return 0;
+
+    const batch = [...this.dirtyMembers.values()];
+    this.dirtyMembers.clear();
+
+    const operations = batch.map(({ roomId, userId, fields }) => ({
+      updateOne: {
+        filter: { roomId, userId },
+        update: { $set: fields }
+      }
+    }));
+
+    try {
+      await RoomMember.bulkWrite(operations, { ordered: false });
+      this.stats.memberWrites += operations.length;
+      this.stats.persistBatches++;
+      return operations.length;
+    } catch (error) {
+      // Keep entries that were not superseded for the next batch
+      for (const entry of batch) {
+        const key = `${entry.roomId}:${entry.userId}`;
+        if (!this.dirtyMembers.has(key)) {
+          this.markDirty(entry.roomId, entry.userId, entry.fields);
+        }
+      }
+      throw error;
+    }
+  }
+
+  /**
+   * Send pending frames and persist pending state (graceful shutdown)
+   */
+  async flush() {
+    for (const [roomKey, room] of this.rooms) {
+      clearTimeout(room.timer);
+      this.sendPending(roomKey, room);
+    }
+    this.rooms.clear();
+
+    clearTimeout(this.persistTimer);
+    this.persistTimer = null;
+    await this.persist();
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      pendingRooms: this.rooms.size,
+      dirtyMembers: this.dirtyMembers.size,
+      broadcastIntervalMs: this.broadcastIntervalMs,
+      persistIntervalMs: this.persistIntervalMs
+    };
+  }
+}
+
+export { PresenceManager };
+
+// Create singleton instance
+const presenceManager = new PresenceManager();
+
+export default presenceManager;
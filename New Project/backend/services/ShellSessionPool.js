@@ -0,0 +1,510 @@
+import { spawn, execFile } from 'child_process';
+import crypto from 'crypto';
+import os from 'os';
+import terminalOutput from './TerminalOutput.js';
+
+/**
+ * Shell Session Pool
+ *
+ * One long-lived shell process per terminal, so commands skip process
+ * start-up and keep shell state (cd, exports, activated venvs). Commands
+ * are written to the shell's stdin followed by a marker line that the
+ * shell prints when the command finishes:
+ *
+ *   \n__CE_<nonce>__ <exit code> <cwd>\n
+ *
+ * The marker is stripped from the output stream and completes the
+ * command with its exit code; the shell's cwd comes from the same line.
+ * Sessions that sit idle, or whose socket went away, are reaped, and each
+ * project may hold at most MAX_SESSIONS_PER_PROJECT shells. A session is
+ * bound to the project and user that started it; terminal ids come from
+ * clients, so lookups by anyone else are refused.
+ */
+
+const quotePosix = (value) => `'${String(value).replace(/'/g, `'\\''`)}'`;
+const quotePowerShell = (value) => `'${String(value).replace(/'/g, "''")}'`;
+
+/**
+ * How to start each shell and how to frame a command for it
+ */
+const SHELLS = {
+  posix: {
+    command: (name) => [name, []],
+    frame: (command, marker, cwd) => {
+      // eval keeps syntax errors inside the command; stdin is not the shell's
+      const body = cwd
+        ? `(cd ${quotePosix(cwd)} && eval ${quotePosix(command)})`
+        : `{ eval ${quotePosix(command)}\n}`;
+      return `${body} </dev/null; printf '\\n%s %s %s\\n' '${marker}' "$?" "$PWD"\n`;
+    }
+  },
+  powershell: {
+    command: () => ['powershell.exe', ['-NoLogo', '-NoProfile', '-NonInteractive', '-Command', '-']],
+    frame: (command, marker, cwd) => {
+      const run = `Invoke-Expression ${quotePowerShell(command)}`;
+      const body = cwd
+        ? `Push-Location ${quotePowerShell(cwd)}; try { ${run} } finally { Pop-Location }`
+        : run;
+      return '$global:LASTEXITCODE = 0; $__ce = 0; ' +
+        `try { ${body}; if (-not $?) { $__ce = 1 } } catch { Write-Error $_; $__ce = 1 }; ` +
+        'if ($LASTEXITCODE) { $__ce = $LASTEXITCODE }; ' +
+        `[Console]::Out.Write("\`n${marker} $__ce $($PWD.Path)\`n")\r\n`;
+    }
+  },
+  cmd: {
+    command: () => ['cmd.exe', ['/Q', '/K']],
+    frame: (command, marker, cwd) => {
+      const body = cwd ? `pushd "${cwd}" && ${command} & popd` : command;
+      return `${body}\r\necho.\r\necho ${marker} %errorlevel% %cd%\r\n`;
+    }
+  }
+};
+
+/**
+ * Shell for a requested type on this platform (same mapping as before:
+ * bash on Linux, zsh on macOS, the requested shell on Windows)
+ */
+const resolveShell = (requested) => {
+  const platform = os.platform();
+  if (platform === 'win32') {
+    if (requested === 'cmd') return { adapter: SHELLS.cmd, name: 'cmd.exe' };
+    if (requested === 'bash') return { adapter: SHELLS.posix, name: 'bash.exe' };
+    return { adapter: SHELLS.powershell, name: 'powershell.exe' };
+  }
+  return { adapter: SHELLS.posix, name: platform === 'darwin' ? 'zsh' : 'bash' };
+};
+
+/**
+ * Splits a shell's stdout into command output and marker lines
+ */
+class MarkerParser {
+  constructor(marker, onMarker) {
+    this.marker = marker;
+    this.onMarker = onMarker;
+    this.carry = '';
+  }
+
+  /**
+   * Feed decoded stdout; returns the text to show
+   */
+  push(text) {
+    let input = this.carry + text;
+    let output = '';
+    this.carry = '';
+
+    for (;;) {
+      const at = input.indexOf(this.marker);
+      if (at === -1) break;
+
+      const end = input.indexOf('\n', at);
+      if (end === -1) {
+        // Marker line not complete yet
+        this.carry = input.slice(at);
+        return output + this.stripNewline(input.slice(0, at));
+      }
+
+      output += this.stripNewline(input.slice(0, at));
+      const [code, ...cwd] = input.slice(at + this.marker.length, end).trim().split(' ');
+      this.onMarker(parseInt(code, 10), cwd.join(' ').trim());
+      input = input.slice(end + 1);
+    }
+
+    // Hold back a trailing partial marker line
+    const lineStart = input.lastIndexOf('\n');
+    const tail = input.slice(lineStart + 1);
+    if (lineStart !== -1 && this.marker.startsWith(tail)) {
+      const hold = input[lineStart - 1] === '\r' ? lineStart - 1 : lineStart;
+      this.carry = input.slice(hold);
+      return output + input.slice(0, hold);
+    }
+
+    return output + input;
+  }
+
+  /**
+   * Drop the newline the framing put before the marker
+   */
+  stripNewline(text) {
+    if (text.endsWith('\r\n')) return text.slice(0, -2);
+    if (text.endsWith('\n')) return text.slice(0, -1);
+    return text;
+  }
+}
+
+class ShellSession {
+  constructor(pool, { io, terminalId, projectId, userId = null, shell, cwd }) {
+    this.pool = pool;
+    this.io = io;
+    this.terminalId = terminalId;
+    this.projectId = projectId;
+    this.userId = userId;
+    this.requestedShell = shell;
+    this.cwd = cwd;
+    this.homeDir = cwd;
+
+    this.child = null;
+    this.current = null; // { resolve, startedAt, timer }
+    this.queue = [];
+    this.lastUsed = Date.now();
+    this.detachedAt = null;
+    this.closed = false;
+  }
+
+  get busy() {
+    return !!this.current || this.queue.length > 0;
+  }
+
+  /**
+   * Start the shell; resolves once it answered the first (empty) command
+   */
+  start() {
+    const { adapter, name } = resolveShell(this.requestedShell);
+    const [command, args] = adapter.command(name);
+    const startedAt = Date.now();
+
+    this.adapter = adapter;
+    this.marker = `__CE_${crypto.randomBytes(6).toString('hex')}__`;
+    this.parser = new MarkerParser(this.marker, (code, cwd) => this.finish(code, cwd));
+
+    this.child = spawn(command, args, {
+      cwd: this.cwd,
+      env: {
+        ...process.env,
+        FORCE_COLOR: '1',
+        TERM: 'xterm-256color',
+        COLORTERM: 'truecolor',
+        PYTHONUNBUFFERED: '1',
+        PYTHONIOENCODING: 'utf-8',
+      },
+      detached: os.platform() !== 'win32', // Own process group, killed as one
+      windowsHide: true,
+    });
+
+    terminalOutput.open(this.io, this.terminalId, this.projectId).attach(this.child, {
+      filterStdout: (text) => this.parser.push(text)
+    });
+
+    this.child.stdin.on('error', () => {}); // Shell gone; 'close' handles it
+    this.child.on('error', (error) => {
+      console.error('[ShellSession] Shell error:', error);
+      if (!this.child.pid) this.onClose(null); // Never started
+    });
+    this.child.on('close', (code) => this.onClose(code));
+
+    this.pool.stats.sessionsStarted++;
+    return this.exec('', { internal: true }).then(() => {
+      if (this.closed) throw new Error(`Shell ${name} failed to start`);
+      this.pool.recordStartup(Date.now() - startedAt);
+    });
+  }
+
+  /**
+   * Run a command; resolves with { code, cwd, durationMs } when the shell
+   * reports it finished. `cwd` runs it in another directory without
+   * moving the shell.
+   */
+  exec(command, { cwd = null, internal = false, timeoutMs = this.pool.COMMAND_TIMEOUT_MS } = {}) {
+    if (this.closed) {
+      return Promise.resolve({ code: null, cwd: this.cwd, durationMs: 0, closed: true, started: false });
+    }
+
+    return new Promise((resolve) => {
+      this.queue.push({ command, cwd, internal, timeoutMs, resolve });
+      this.lastUsed = Date.now();
+      this.next();
+    });
+  }
+
+  next() {
+    if (this.current || this.queue.length === 0 || this.closed) return;
+
+    const job = this.queue.shift();
+    this.current = {
+      ...job,
+      startedAt: Date.now(),
+      timer: setTimeout(() => this.timeout(), job.timeoutMs)
+    };
+
+    this.child.stdin.write(this.adapter.frame(job.command, this.marker, job.cwd));
+  }
+
+  finish(code, cwd) {
+    const job = this.current;
+    if (!job) return;
+
+    clearTimeout(job.timer);
+    this.current = null;
+    this.lastUsed = Date.now();
+    if (cwd) this.cwd = cwd;
+
+    // Output before the marker goes out before the caller's terminal:exit
+    terminalOutput.get(this.terminalId)?.flush();
+
+    const durationMs = Date.now() - job.startedAt;
+    if (!job.internal) this.pool.recordCommand(durationMs);
+
+    job.resolve({ code, cwd: this.cwd, durationMs });
+    this.next();
+  }
+
+  timeout() {
+    terminalOutput.get(this.terminalId)?.notice('\r\n\x1b[33m[Process killed - 2 minute timeout]\x1b[0m\r\n');
+    this.interrupt();
+  }
+
+  /**
+   * Stop the running command. On Unix the shell's children get SIGINT and
+   * the shell survives; if it does not report back in time (or on
+   * Windows) the session is killed and restarts on the next command.
+   */
+  interrupt() {
+    if (!this.current) return;
+
+    if (os.platform() === 'win32') {
+      this.kill();
+      return;
+    }
+
+    execFile('pkill', ['-INT', '-P', String(this.child.pid)], () => {});
+    const job = this.current;
+    setTimeout(() => {
+      if (this.current === job) this.kill();
+    }, this.pool.INTERRUPT_GRACE_MS).unref();
+  }
+
+  kill() {
+    if (!this.child || this.closed) return;
+
+    try {
+      if (os.platform() === 'win32') {
+        spawn('taskkill', ['/pid', this.child.pid.toString(), '/f', '/t']);
+      } else {
+        process.kill(-this.child.pid, 'SIGKILL');
+      }
+    } catch (error) {
+      console.error('[ShellSession] Kill error:', error);
+    }
+  }
+
+  onClose(code) {
+    if (this.closed) return;
+    this.closed = true;
+    this.pool.forget(this);
+
+    // The running command ends with the shell; queued ones never started
+    const { current, queue } = this;
+    this.current = null;
+    this.queue = [];
+
+    if (current) {
+      clearTimeout(current.timer);
+      current.resolve({ code: code ?? 'SIGKILL', cwd: this.cwd, durationMs: Date.now() - current.startedAt, closed: true });
+    }
+    for (const job of queue) {
+      job.resolve({ code: null, cwd: this.cwd, durationMs: 0, closed: true, started: false });
+    }
+  }
+}
+
+class ShellSessionPool {
+  constructor() {
+    this.MAX_SESSIONS_PER_PROJECT = 4;
+    this.IDLE_TIMEOUT_MS = 15 * 60 * 1000;
+    this.DETACHED_GRACE_MS = 60 * 1000; // Socket gone: wait for a reconnect
+    this.COMMAND_TIMEOUT_MS = 2 * 60 * 1000;
+    this.INTERRUPT_GRACE_MS = 2000;
+    this.REAP_INTERVAL_MS = 30 * 1000;
+    this.LATENCY_SAMPLES = 500;
+
+    this.sessions = new Map(); // terminalId -> ShellSession
+    this.starting = new Map(); // terminalId -> Promise<ShellSession>
+    this.reapTimer = null;
+
+    this.latencies = []; // Recent command round trips (ms), ring
+    this.latencyIndex = 0;
+    this.stats = {
+      sessionsStarted: 0,
+      sessionsReaped: 0,
+      commands: 0,
+      startupMsTotal: 0,
+      rejected: 0,
+      foreign: 0
+    };
+  }
+
+  /**
+   * Session for a terminal, started on first use
+   */
+  async acquire({ io, terminalId, projectId, userId = null, shell, cwd }) {
+    const existing = this.sessions.get(terminalId);
+    if (existing) this.checkOwner(existing, { projectId, userId });
+
+    if (existing && !existing.closed) {
+      existing.detachedAt = null;
+      return existing;
+    }
+    if (this.starting.has(terminalId)) {
+      return this.starting.get(terminalId);
+    }
+
+    this.makeRoom(projectId);
+
+    const session = new ShellSession(this, { io, terminalId, projectId, userId, shell, cwd });
+    this.sessions.set(terminalId, session);
+    this.startReaper();
+
+    const starting = session.start().then(() => session);
+    this.starting.set(terminalId, starting);
+    try {
+      return await starting;
+    } finally {
+      this.starting.delete(terminalId);
+    }
+  }
+
+  /**
+   * Session for a terminal; with an owner, only if it belongs to them
+   */
+  get(terminalId, owner = null) {
+    const session = this.sessions.get(terminalId) || null;
+    if (session && owner && !this.owns(session, owner)) return null;
+    return session;
+  }
+
+  owns(session, { projectId, userId = null }) {
+    return session.projectId === projectId && session.userId === userId;
+  }
+
+  checkOwner(session, owner) {
+    if (!this.owns(session, owner)) {
+      this.stats.foreign++;
+      throw new Error('Terminal belongs to another project or user');
+    }
+  }
+
+  /**
+   * Enforce the per-project limit by reaping the project's least recently
+   * used idle shell; refuse if every shell is busy
+   */
+  makeRoom(projectId) {
+    const sessions = [...this.sessions.values()].filter(session => session.projectId === projectId);
+    if (sessions.length < this.MAX_SESSIONS_PER_PROJECT) return;
+
+    const idle = sessions.filter(session => !session.busy).sort((a, b) => a.lastUsed - b.lastUsed);
+    if (idle.length === 0) {
+      this.stats.rejected++;
+      throw new Error(`Too many running terminals in this project (max ${this.MAX_SESSIONS_PER_PROJECT})`);
+    }
+
+    this.reap(idle[0]);
+  }
+
+  /**
+   * The terminal's socket went away: keep the shell for a reconnect
+   */
+  detach(terminalId) {
+    const session = this.sessions.get(terminalId);
+    if (session) session.detachedAt = Date.now();
+  }
+
+  /**
+   * A socket took the terminal back: returns its live shell, if any
+   */
+  reattach(terminalId, owner) {
+    const session = this.sessions.get(terminalId);
+    if (!session) return null;
+
+    this.checkOwner(session, owner);
+    session.detachedAt = null;
+    return session;
+  }
+
+  close(terminalId, owner = null) {
+    const session = this.get(terminalId, owner);
+    if (session) this.reap(session, false);
+  }
+
+  /**
+   * Kill every shell (server shutdown: they run in their own process groups)
+   */
+  closeAll() {
+    for (const session of [...this.sessions.values()]) {
+      this.reap(session, false);
+    }
+  }
+
+  reap(session, counted = true) {
+    this.forget(session);
+    session.kill();
+    terminalOutput.close(session.terminalId);
+    if (counted) this.stats.sessionsReaped++;
+  }
+
+  forget(session) {
+    if (this.sessions.get(session.terminalId) === session) {
+      this.sessions.delete(session.terminalId);
+    }
+    if (this.sessions.size === 0) {
+      clearInterval(this.reapTimer);
+      this.reapTimer = null;
+    }
+  }
+
+  startReaper() {
+    if (this.reapTimer) return;
+
+    this.reapTimer = setInterval(() => {
+      const now = Date.now();
+      for (const session of this.sessions.values()) {
+        const detached = session.detachedAt && now - session.detachedAt > this.DETACHED_GRACE_MS;
+        const idle = !session.busy && now - session.lastUsed > this.IDLE_TIMEOUT_MS;
+        if (detached || idle) this.reap(session);
+      }
+    }, this.REAP_INTERVAL_MS);
+    this.reapTimer.unref();
+  }
+
+  recordStartup(ms) {
+    this.stats.startupMsTotal += ms;
+  }
+
+  recordCommand(ms) {
+    this.stats.commands++;
+    this.latencies[this.latencyIndex] = ms;
+    this.latencyIndex = (this.latencyIndex + 1) % this.LATENCY_SAMPLES;
+  }
+
+  /**
+   * Command round-trip percentiles over the recent samples
+   */
+  getLatency() {
+    const samples = [...this.latencies].sort((a, b) => a - b);
+    if (samples.length === 0) return { samples: 0 };
+
+    const at = (q) => samples[Math.min(samples.length - 1, Math.floor(q * samples.length))];
+    return {
+      samples: samples.length,
+      p50Ms: at(0.5),
+      p95Ms: at(0.95),
+      maxMs: samples[samples.length - 1]
+    };
+  }
+
+  getStats() {
+    const { startupMsTotal, ...stats } = this.stats;
+    return {
+      ...stats,
+      sessions: this.sessions.size,
+      busy: [...this.sessions.values()].filter(session => session.busy).length,
+      avgStartupMs: stats.sessionsStarted ? Math.round(startupMsTotal / stats.sessionsStarted) : 0,
+      commandLatency: this.getLatency()
+    };
+  }
+}
+
+export { ShellSessionPool, ShellSession, MarkerParser };
+
+// Singleton instance
+const shellSessions = new ShellSessionPool();
+
+export default shellSessions;
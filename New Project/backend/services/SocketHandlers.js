@@ -1,10 +1,16 @@
 import { verifyToken } from '../utils/jwt.js';
 import yjsManager from '../services/YjsManager.js';
+import yjsBroadcaster from '../services/YjsBroadcaster.js';
+import presenceManager from '../services/PresenceManager.js';
+import clusterRouter from './cluster/ClusterRouter.js';
 import RoomMember from '../models/RoomMember.js';
 import Room from '../models/Room.js';
 import File from '../models/File.js';
 import Message from '../models/Message.js';
 import Activity from '../models/Activity.js';
+import fileTreeStore from './FileTreeStore.js';
+import userCache from './UserCache.js';
+import { pageSize, keysetPage } from '../utils/pagination.js';
 import * as encoding from 'lib0/encoding';
 import * as decoding from 'lib0/decoding';
 import * as syncProtocol from 'y-protocols/sync';
@@ -14,6 +20,9 @@ import setupDeltaSockets from './DeltaEngine/DeltaSocketHandlers.js';
 // Debounce helper for activity logging
 const activityDebounce = new Map();
 
+// File metadata for open Yjs rooms, cached at join-room: fileId -> { name }
+const fileMetadata = new Map();
+
 /**
  * Helper function to log activity and broadcast in real-time
  */
@@ -22,8 +31,8 @@ const logAndBroadcastActivity = async (io, activityData) => {
     const activity = await Activity.logActivity(activityData);
     
     if (activity && io && activityData.projectId) {
-      const populatedActivity = await Activity.findById(activity._id)
-        .populate('userId', 'username email avatar');
+      const populatedActivity = activity.toObject();
+      populatedActivity.userId = await userCache.get(activity.userId);
       
       io.to(`project:${activityData.projectId}`).emit('activity:new', {
         activity: populatedActivity
@@ -66,10 +75,30 @@ const logFileEdit = async (projectId, userId, username, fileId, fileName, io) =>
   activityDebounce.set(key, timeout);
 };
 
+/**
+ * Leave the socket's current Yjs file room and release the document;
+ * metadata is dropped once no socket holds the file on this node
+ */
+const leaveFileRoom = (io, socket) => {
+  const roomKey = `room:${socket.currentRoom}:file:${socket.currentFile}`;
+
+  socket.leave(roomKey);
+  yjsManager.release(socket.currentRoom, socket.currentFile, socket.id);
+
+  if (!yjsManager.isFileOpen(socket.currentFile)) {
+    fileMetadata.delete(String(socket.currentFile));
+  }
+};
+
 /**
  * Setup Socket.IO handlers for Yjs collaboration
  */
 export const setupYjsHandlers = (io) => {
+  // Edits made on the server (REST saves and reverts) reach open editors
+  yjsManager.onServerUpdate = (roomId, fileId, update) => {
+    yjsBroadcaster.queue(io, `room:${roomId}:file:${fileId}`, 'server', update);
+  };
+
   // Socket.IO middleware for authentication
   io.use(async (socket, next) => {
     try {
@@ -94,9 +123,11 @@ export const setupYjsHandlers = (io) => {
     }
   });
 
-  io.on('connection', (socket) => {
-    console.log(`✅ User connected: ${socket.username} (userId: ${socket.userId}, socketId: ${socket.id})`);
-
+  /**
+   * Install the per-socket handlers. Also used for stand-ins of sockets
+   * connected to other cluster nodes (see ClusterRouter).
+   */
+  const registerSocketHandlers = (io, socket) => {
     // Setup Delta Sync handlers
     setupDeltaSockets(io, socket);
 
@@ -140,14 +171,22 @@ export const setupYjsHandlers = (io) => {
           return callback({ success: false, message: 'File not found' });
         }
 
+        // Switching files without leave-room: release the previous document
+        if (socket.currentRoom && socket.currentFile &&
+            (socket.currentRoom !== roomId || socket.currentFile !== fileId)) {
+          leaveFileRoom(io, socket);
+        }
+
+        fileMetadata.set(String(fileId), { name: file.name });
+
         // Join Socket.IO room
         const roomKey = `room:${roomId}:file:${fileId}`;
         socket.join(roomKey);
         socket.currentRoom = roomId;
         socket.currentFile = fileId;
 
-        // Get or create Yjs document
-        const ydoc = await yjsManager.getDocument(roomId, fileId);
+        // Get or create Yjs document (held until leave-room/disconnect)
+        const ydoc = await yjsManager.acquire(roomId, fileId, socket.id);
         const awareness = yjsManager.getAwareness(roomId, fileId);
 
         // Send initial sync
@@ -223,22 +262,20 @@ export const setupYjsHandlers = (io) => {
             const updateData = decoding.readVarUint8Array(decoder);
             // Apply update to document
             syncProtocol.applyUpdate(ydoc, updateData);
-            // Broadcast to other clients
-            socket.to(roomKey).emit('yjs-sync', encoding.toUint8Array(encoder));
+            // Broadcast to other clients (coalesced per room)
+            yjsBroadcaster.queue(io, roomKey, socket.id, updateData);
             
             // Log file edit activity (debounced)
-            if (socket.currentProject) {
-              const file = await File.findById(socket.currentFile);
-              if (file) {
-                logFileEdit(
-                  socket.currentProject,
-                  socket.userId,
-                  socket.username,
-                  socket.currentFile,
-                  file.name,
-                  io
-                );
-              }
+            const metadata = fileMetadata.get(String(socket.currentFile));
+            if (socket.currentProject && metadata) {
+              logFileEdit(
+                socket.currentProject,
+                socket.userId,
+                socket.username,
+                socket.currentFile,
+                metadata.name,
+                io
+              );
             }
             break;
         }
@@ -259,8 +296,8 @@ export const setupYjsHandlers = (io) => {
 
         if (awareness) {
           awarenessProtocol.applyAwarenessUpdate(awareness, update, socket);
-          // Broadcast to others
-          socket.to(roomKey).emit('yjs-awareness', update);
+          // Broadcast to others (rate-capped, newest state per client)
+          presenceManager.publish(io, roomKey, socket.id, 'yjs-awareness', socket.id, update);
         }
       } catch (error) {
         console.error('Error handling awareness:', error);
@@ -276,19 +313,15 @@ export const setupYjsHandlers = (io) => {
 
         const roomKey = `room:${socket.currentRoom}:file:${socket.currentFile}`;
 
-        // Update in database
-        await RoomMember.findOneAndUpdate(
-          { roomId: socket.currentRoom, userId: socket.userId },
-          {
-            'cursorPosition.line': line,
-            'cursorPosition.column': column,
-            'cursorPosition.fileId': socket.currentFile,
-            lastSeen: new Date()
-          }
-        );
+        // Persisted in the next presence batch
+        presenceManager.recordCursor(socket.currentRoom, socket.userId, {
+          line,
+          column,
+          fileId: socket.currentFile
+        });
 
-        // Broadcast to others
-        socket.to(roomKey).emit('cursor-update', {
+        // Broadcast to others (rate-capped, newest position per user)
+        presenceManager.publish(io, roomKey, socket.id, 'cursor-update', socket.userId, {
           userId: socket.userId,
           username: socket.username,
           line,
@@ -318,7 +351,7 @@ export const setupYjsHandlers = (io) => {
           username: socket.username
         });
 
-        socket.leave(roomKey);
+        leaveFileRoom(io, socket);
         socket.currentRoom = null;
         socket.currentFile = null;
       }
@@ -364,6 +397,10 @@ export const setupYjsHandlers = (io) => {
         }
       }
 
+      if (socket.currentRoom && socket.currentFile) {
+        leaveFileRoom(io, socket);
+      }
+
       if (socket.currentRoom) {
         // Update member status
         await RoomMember.findOneAndUpdate(
@@ -431,7 +468,7 @@ export const setupYjsHandlers = (io) => {
     /**
      * Get message history
      */
-    socket.on('get-messages', async ({ limit = 50, before }, callback) => {
+    socket.on('get-messages', async ({ limit, before, cursor }, callback) => {
       try {
         if (!socket.currentRoom) {
           return callback({ success: false, message: 'Not in a room' });
@@ -443,25 +480,28 @@ export const setupYjsHandlers = (io) => {
           query.createdAt = { $lt: new Date(before) };
         }
 
-        const messages = await Message.find(query)
-          .populate('senderId', 'username email avatar')
-          .sort({ createdAt: -1 })
-          .limit(limit);
+        const { items: messages, nextCursor } = await keysetPage(Message, query, {
+          sortField: 'createdAt',
+          limit: pageSize(limit),
+          cursor,
+          select: 'senderId content type createdAt readBy'
+        });
+        await userCache.attach(messages, 'senderId');
 
         const formattedMessages = messages.reverse().map(msg => ({
           _id: msg._id,
           content: msg.content,
           type: msg.type,
           sender: {
-            _id: msg.senderId._id,
-            username: msg.senderId.username,
-            avatar: msg.senderId.avatar
+            _id: msg.senderId?._id || null,
+            username: msg.senderId?.username,
+            avatar: msg.senderId?.avatar
           },
           createdAt: msg.createdAt,
-          isRead: msg.readBy?.includes(socket.userId) || false
+          isRead: msg.readBy?.some(id => String(id) === String(socket.userId)) || false
         }));
 
-        callback({ success: true, messages: formattedMessages });
+        callback({ success: true, messages: formattedMessages, nextCursor });
       } catch (error) {
         console.error('Get messages error:', error);
         callback({ success: false, message: error.message });
@@ -612,7 +652,8 @@ export const setupYjsHandlers = (io) => {
      */
     socket.on('code-update', ({ projectId, fileId, code, userId }) => {
       const projectRoom = `project:${projectId}`;
-      socket.to(projectRoom).emit('code-update', {
+      // Full file content: only the newest per file needs to go out
+      presenceManager.publish(io, projectRoom, socket.id, 'code-update', fileId, {
         fileId,
         code,
         userId,
@@ -626,7 +667,7 @@ export const setupYjsHandlers = (io) => {
      */
     socket.on('cursor-update', ({ projectId, fileId, position, userId, username, color }) => {
       const projectRoom = `project:${projectId}`;
-      socket.to(projectRoom).emit('cursor-update', {
+      presenceManager.publish(io, projectRoom, socket.id, 'cursor-update', `${fileId}:${userId}`, {
         fileId,
         position,
         userId,
@@ -699,7 +740,7 @@ export const setupYjsHandlers = (io) => {
     /**
      * Get message history for a project
      */
-    socket.on('get-project-messages', async ({ projectId, limit = 50, before }, callback) => {
+    socket.on('get-project-messages', async ({ projectId, limit, before, cursor }, callback) => {
       try {
         if (!projectId) {
           return callback({ success: false, message: 'Project ID required' });
@@ -714,28 +755,17 @@ export const setupYjsHandlers = (io) => {
           query.createdAt = { $lt: new Date(before) };
         }
 
-        const messages = await Message.find(query)
-          .populate('senderId', 'username email avatar')
-          .sort({ createdAt: -1 })
-          .limit(limit);
+        const { items: messages, nextCursor } = await keysetPage(Message, query, {
+          sortField: 'createdAt',
+          limit: pageSize(limit),
+          cursor,
+          select: 'senderId content type createdAt readBy'
+        });
+        await userCache.attach(messages, 'senderId');
 
-        const formattedMessages = messages.reverse().map(msg => ({
-          _id: msg._id,
-          userId: msg.senderId._id,
-          username: msg.senderId.username,
-          message: msg.content,
-          sender: {
-            _id: msg.senderId._id,
-            username: msg.senderId.username,
-            email: msg.senderId.email,
-            avatar: msg.senderId.avatar
-          },
-          timestamp: msg.createdAt.toISOString(),
-          createdAt: msg.createdAt,
-          isRead: msg.readBy?.includes(socket.userId) || false
-        }));
+        const formattedMessages = messages.reverse().map(msg => Message.toFeedItem(msg, socket.userId));
 
-        callback({ success: true, messages: formattedMessages });
+        callback({ success: true, messages: formattedMessages, nextCursor });
       } catch (error) {
         console.error('Get project messages error:', error);
         callback({ success: false, message: error.message });
@@ -816,6 +846,8 @@ export const setupYjsHandlers = (io) => {
       const projectRoom = `project:${projectId}`;
       
       // Log activity and broadcast in real-time
+      fileMetadata.delete(String(fileId));
+
       await logAndBroadcastActivity(io, {
         projectId,
         userId: socket.userId,
@@ -837,6 +869,10 @@ export const setupYjsHandlers = (io) => {
       const projectRoom = `project:${projectId}`;
       
       // Log activity and broadcast in real-time
+      if (fileMetadata.has(String(fileId))) {
+        fileMetadata.set(String(fileId), { name: newName });
+      }
+
       await logAndBroadcastActivity(io, {
         projectId,
         userId: socket.userId,
@@ -910,15 +946,42 @@ export const setupYjsHandlers = (io) => {
       });
     });
 
+    /**
+     * File Explorer - Subscribe to tree changes
+     * The REST controller pushes changed nodes (filesystem:created, renamed,
+     * deleted, file-updated) to `filesystem:<projectId>`, each with the new
+     * structure version. The ack reports whether the caller's version is stale.
+     */
+    socket.on('filesystem:subscribe', async ({ projectId, version } = {}, callback) => {
+      try {
+        const current = await fileTreeStore.getVersion(projectId);
+        socket.join(`filesystem:${projectId}`);
+
+        if (callback) callback({ success: true, version: current, stale: version !== current });
+      } catch (error) {
+        console.error('Filesystem subscribe error:', error);
+        if (callback) callback({ success: false, message: error.message });
+      }
+    });
+
+    socket.on('filesystem:unsubscribe', ({ projectId } = {}) => {
+      socket.leave(`filesystem:${projectId}`);
+    });
+
     /**
      * File Explorer - Structure sync request
+     * The server holds the tree: answer with its version so the client
+     * revalidates what it has loaded instead of pulling the whole tree
      */
-    socket.on('filesystem:request-sync', ({ projectId }) => {
-      const projectRoom = `project:${projectId}`;
-      // Request the most recent structure from any online client
-      socket.to(projectRoom).emit('filesystem:sync-requested', {
-        requestingUser: socket.userId
-      });
+    socket.on('filesystem:request-sync', async ({ projectId }) => {
+      try {
+        socket.emit('filesystem:sync', {
+          projectId,
+          version: await fileTreeStore.getVersion(projectId)
+        });
+      } catch (error) {
+        console.error('Filesystem sync error:', error);
+      }
     });
 
     /**
@@ -979,7 +1042,18 @@ export const setupYjsHandlers = (io) => {
         username: username || socket.username
       });
     });
+  };
+
+  io.on('connection', (socket) => {
+    console.log(`✅ User connected: ${socket.username} (userId: ${socket.userId}, socketId: ${socket.id})`);
+
+    // File-scoped events owned by another cluster node are forwarded there
+    clusterRouter.attach(socket);
+
+    registerSocketHandlers(io, socket);
   });
+
+  return registerSocketHandlers;
 };
 
 /**
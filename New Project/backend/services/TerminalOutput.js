@@ -0,0 +1,315 @@
+import { StringDecoder } from 'string_decoder';
+
+/**
+ * Terminal Output
+ * Per-terminal output pipeline between a child process and the project room:
+ * - stdout/stderr are decoded with streaming UTF-8 decoders, so multi-byte
+ *   characters split across chunks arrive intact
+ * - output is coalesced into terminal:output frames: 16ms after a quiet
+ *   period (keeps echo snappy), 50ms while output keeps streaming
+ * - the last SCROLLBACK_CHARS of output are kept for replay to late joiners
+ * - when the slowest local client's socket buffer passes HIGH_WATER
+ *   packets, the child's stdout/stderr are paused until it drains
+ */
+
+/**
+ * Bounded scrollback: a queue of frames trimmed from the head
+ */
+class Scrollback {
+  constructor(maxChars) {
+    this.maxChars = maxChars;
+    this.frames = [];
+    this.head = 0;
+    this.chars = 0;
+  }
+
+  push(text) {
+    if (text.length > this.maxChars) {
+      text = text.slice(-this.maxChars);
+    }
+
+    this.frames.push(text);
+    this.chars += text.length;
+
+    while (this.chars > this.maxChars) {
+      this.chars -= this.frames[this.head].length;
+      this.frames[this.head++] = undefined;
+    }
+
+    // Reclaim the dropped head once it dominates the array
+    if (this.head > 1024 && this.head * 2 > this.frames.length) {
+      this.frames = this.frames.slice(this.head);
+      this.head = 0;
+    }
+  }
+
+  toString() {
+    return this.frames.slice(this.head).join('');
+  }
+}
+
+class TerminalStream {
+  constructor(hub, io, terminalId, projectId) {
+    this.hub = hub;
+    this.io = io;
+    this.terminalId = terminalId;
+    this.room = `project:${projectId}`;
+
+    this.pending = [];
+    this.pendingChars = 0;
+    this.frameTimer = null;
+    this.lastFlushAt = 0;
+    this.scrollback = new Scrollback(hub.SCROLLBACK_CHARS);
+
+    this.child = null;
+    this.paused = false;
+    this.pausedAt = 0;
+    this.resumeTimer = null;
+
+    this.stats = { bytesIn: 0, framesOut: 0, charsOut: 0, pauses: 0 };
+  }
+
+  /**
+   * Pipe a child's stdout/stderr into this terminal
+   * `filterStdout(text)` / `decorateStderr(text)` may rewrite decoded text
+   * (e.g. strip framing, wrap in color codes) and return what to show
+   */
+  attach(child, { filterStdout = null, decorateStderr = null } = {}) {
+    this.resume();
+    this.child = child;
+
+    for (const [stream, rewrite] of [[child.stdout, filterStdout], [child.stderr, decorateStderr]]) {
+      if (!stream) continue;
+
+      const decoder = new StringDecoder('utf8');
+      const emit = (text) => {
+        const output = text && rewrite ? rewrite(text) : text;
+        if (output) this.write(output);
+      };
+
+      stream.on('data', (chunk) => {
+        this.stats.bytesIn += chunk.length;
+        this.hub.totals.bytesIn += chunk.length;
+        emit(decoder.write(chunk));
+      });
+      stream.on('end', () => emit(decoder.end()));
+    }
+
+    // Registered before the caller's handlers: output is out before terminal:exit
+    child.once('close', () => {
+      if (this.child === child) {
+        this.resume();
+        this.child = null;
+      }
+      this.flush();
+    });
+
+    return this;
+  }
+
+  write(text) {
+    this.pending.push(text);
+    this.pendingChars += text.length;
+
+    if (this.pendingChars >= this.hub.MAX_FRAME_CHARS) {
+      this.flush();
+    } else if (!this.frameTimer) {
+      const streaming = Date.now() - this.lastFlushAt < this.hub.MAX_FRAME_MS;
+      this.frameTimer = setTimeout(
+        () => this.flush(),
+        streaming ? this.hub.MAX_FRAME_MS : this.hub.MIN_FRAME_MS
+      );
+    }
+  }
+
+  /**
+   * Status line from the server: sent right away, in order with output
+   */
+  notice(text) {
+    this.write(text);
+    this.flush();
+  }
+
+  flush() {
+    clearTimeout(this.frameTimer);
+    this.frameTimer = null;
+    if (this.pending.length === 0) return;
+
+    const output = this.pending.length === 1 ? this.pending[0] : this.pending.join('');
+    this.pending = [];
+    this.pendingChars = 0;
+    this.lastFlushAt = Date.now();
+
+    this.scrollback.push(output);
+    this.io.to(this.room).emit('terminal:output', { terminalId: this.terminalId, output });
+
+    this.stats.framesOut++;
+    this.stats.charsOut += output.length;
+    this.hub.totals.framesOut++;
+    this.hub.totals.charsOut += output.length;
+
+    if (!this.paused && this.child && this.hub.roomLag(this.io, this.room) > this.hub.HIGH_WATER) {
+      this.pause();
+    }
+  }
+
+  pause() {
+    this.child.stdout?.pause();
+    this.child.stderr?.pause();
+    this.paused = true;
+    this.pausedAt = Date.now();
+    this.stats.pauses++;
+    this.hub.totals.pauses++;
+
+    this.resumeTimer = setInterval(() => {
+      const drained = this.hub.roomLag(this.io, this.room) <= this.hub.LOW_WATER;
+      // Never let one stuck client stall the terminal for everyone
+      const stalled = Date.now() - this.pausedAt > this.hub.MAX_STALL_MS;
+      if (drained || stalled) this.resume();
+    }, this.hub.MAX_FRAME_MS);
+  }
+
+  resume() {
+    clearInterval(this.resumeTimer);
+    this.resumeTimer = null;
+    if (!this.paused) return;
+
+    this.paused = false;
+    this.child?.stdout?.resume();
+    this.child?.stderr?.resume();
+  }
+
+  /**
+   * Send the scrollback to one socket
+   */
+  replay(socket) {
+    this.flush();
+    const output = this.scrollback.toString();
+    if (output) {
+      socket.emit('terminal:output', { terminalId: this.terminalId, output, replay: true });
+    }
+  }
+
+  close() {
+    this.flush();
+    this.resume();
+    this.child = null;
+  }
+}
+
+class TerminalOutput {
+  constructor() {
+    this.MIN_FRAME_MS = 16;
+    this.MAX_FRAME_MS = 50;
+    this.MAX_FRAME_CHARS = 64 * 1024;
+    this.SCROLLBACK_CHARS = 256 * 1024;
+    this.HIGH_WATER = 64; // Queued packets on the slowest local socket
+    this.LOW_WATER = 8;
+    this.MAX_STALL_MS = 5000;
+
+    this.streams = new Map(); // terminalId -> TerminalStream
+
+    this.totals = { bytesIn: 0, framesOut: 0, charsOut: 0, pauses: 0 };
+    this.rates = { bytesInPerSecond: 0, framesPerSecond: 0 };
+    this.rateSample = { ...this.totals, at: Date.now() };
+    this.rateTimer = null;
+  }
+
+  /**
+   * Output stream of a terminal, created on first use
+   */
+  open(io, terminalId, projectId) {
+    let stream = this.streams.get(terminalId);
+    if (!stream) {
+      stream = new TerminalStream(this, io, terminalId, projectId);
+      this.streams.set(terminalId, stream);
+      this.startRates();
+    }
+    return stream;
+  }
+
+  get(terminalId) {
+    return this.streams.get(terminalId) || null;
+  }
+
+  /**
+   * Replay a terminal's scrollback to a (re)joining socket
+   */
+  replay(socket, terminalId) {
+    const stream = this.streams.get(terminalId);
+    if (stream) stream.replay(socket);
+    return !!stream;
+  }
+
+  close(terminalId) {
+    const stream = this.streams.get(terminalId);
+    if (!stream) return;
+
+    stream.close();
+    this.streams.delete(terminalId);
+    if (this.streams.size === 0) this.stopRates();
+  }
+
+  /**
+   * Most packets queued on any local socket in the room (engine.io
+   * write buffer); remote sockets are handled by their own node
+   */
+  roomLag(io, room) {
+    const ids = io.sockets.adapter.rooms.get(room);
+    if (!ids) return 0;
+
+    let lag = 0;
+    for (const id of ids) {
+      const queued = io.sockets.sockets.get(id)?.conn?.writeBuffer?.length || 0;
+      if (queued > lag) lag = queued;
+    }
+    return lag;
+  }
+
+  startRates() {
+    if (this.rateTimer) return;
+
+    this.rateSample = { ...this.totals, at: Date.now() };
+    this.rateTimer = setInterval(() => {
+      const now = Date.now();
+      const seconds = (now - this.rateSample.at) / 1000;
+
+      this.rates = {
+        bytesInPerSecond: Math.round((this.totals.bytesIn - this.rateSample.bytesIn) / seconds),
+        framesPerSecond: Math.round((this.totals.framesOut - this.rateSample.framesOut) / seconds)
+      };
+      this.rateSample = { ...this.totals, at: now };
+    }, 1000);
+    this.rateTimer.unref();
+  }
+
+  stopRates() {
+    clearInterval(this.rateTimer);
+    this.rateTimer = null;
+    this.rates = { bytesInPerSecond: 0, framesPerSecond: 0 };
+  }
+
+  getStats() {
+    let paused = 0;
+    let scrollbackChars = 0;
+    for (const stream of this.streams.values()) {
+      if (stream.paused) paused++;
+      scrollbackChars += stream.scrollback.chars;
+    }
+
+    return {
+      ...this.totals,
+      ...this.rates,
+      terminals: this.streams.size,
+      paused,
+      scrollbackChars
+    };
+  }
+}
+
+export { TerminalOutput, TerminalStream, Scrollback };
+
+// Singleton instance
+const terminalOutput = new TerminalOutput();
+
+export default terminalOutput;
@@ -3,14 +3,50 @@
  * Real-time terminal communication via Socket.io
  */
 
-import { spawn } from 'child_process';
 import path from 'path';
 import fs from 'fs';
-import os from 'os';
+import terminalOutput from './TerminalOutput.js';
+import shellSessions from './ShellSessionPool.js';
 
 // Store active terminal sessions per socket
 const terminalSessions = new Map();
-const processMap = new Map();
+
+/**
+ * Send a status line through the terminal's output stream, so it stays
+ * in order with buffered process output
+ */
+const notify = (io, terminalId, projectId, output) => {
+  terminalOutput.open(io, terminalId, projectId).notice(output);
+};
+
+/**
+ * Run a command in the terminal's shell session (started on first use).
+ * A command still running in that shell is interrupted first.
+ */
+const runInShell = async (io, terminalId, session, command, options = {}) => {
+  const shell = await shellSessions.acquire({
+    io,
+    terminalId,
+    projectId: session.projectId,
+    userId: session.userId,
+    shell: session.shell,
+    cwd: session.projectDir,
+  });
+
+  if (shell.busy) {
+    notify(io, terminalId, session.projectId, '\x1b[33m[Stopping previous process...]\x1b[0m\r\n');
+    shell.interrupt();
+  }
+
+  const result = await shell.exec(command, options);
+  if (result.started === false) {
+    // The shell had to be killed before reaching this command: start over
+    return runInShell(io, terminalId, session, command, options);
+  }
+
+  session.cwd = result.cwd;
+  return result;
+};
 
 /**
  * Setup Terminal Socket Handlers
@@ -34,12 +70,23 @@ export const setupTerminalSockets = (io) => {
           fs.mkdirSync(projectDir, { recursive: true });
         }
 
+        // Terminal ids come from the client: never take over someone else's
+        const existing = terminalSessions.get(terminalId);
+        if (existing && existing.userId !== socket.userId) {
+          throw new Error('Terminal belongs to another user');
+        }
+
+        // Reconnecting to a shell that is still alive keeps its state
+        const shellSession = shellSessions.reattach(terminalId, { projectId, userId: socket.userId });
+
         // Store session
         terminalSessions.set(terminalId, {
           socketId: socket.id,
+          userId: socket.userId,
           projectId,
           shell,
-          cwd: projectDir,
+          projectDir,
+          cwd: shellSession?.cwd || projectDir,
           createdAt: Date.now(),
         });
 
@@ -49,8 +96,11 @@ export const setupTerminalSockets = (io) => {
         // Emit success
         socket.emit('terminal:created', {
           terminalId,
-          cwd: projectDir,
+          cwd: shellSession?.cwd || projectDir,
         });
+
+        // Re-created after a reconnect: replay the scrollback
+        terminalOutput.replay(socket, terminalId);
       } catch (error) {
         console.error('[Terminal] Error creating terminal:', error);
         socket.emit('terminal:error', {
@@ -68,7 +118,7 @@ export const setupTerminalSockets = (io) => {
         console.log(`[Terminal] Executing command in ${terminalId}: ${command}`);
 
         const session = terminalSessions.get(terminalId);
-        if (!session) {
+        if (!session || session.userId !== socket.userId) {
           socket.emit('terminal:error', {
             terminalId,
             error: 'Terminal session not found',
@@ -76,116 +126,14 @@ export const setupTerminalSockets = (io) => {
           return;
         }
 
-        // Kill any existing process
-        if (processMap.has(terminalId)) {
-          const oldProcess = processMap.get(terminalId);
-          try {
-            if (os.platform() === 'win32') {
-              spawn('taskkill', ['/pid', oldProcess.pid.toString(), '/f', '/t']);
-            } else {
-              process.kill(-oldProcess.pid);
-            }
-          } catch (error) {
-            console.error('[Terminal] Error killing old process:', error);
-          }
-          processMap.delete(terminalId);
-        }
-
-        // Determine shell and args
-        let shell, args;
-        if (os.platform() === 'win32') {
-          if (session.shell === 'cmd') {
-            shell = 'cmd.exe';
-            args = ['/c', command];
-          } else if (session.shell === 'bash') {
-            shell = 'bash.exe';
-            args = ['-c', command];
-          } else {
-            shell = 'powershell.exe';
-            args = ['-NoProfile', '-Command', command];
-          }
-        } else if (os.platform() === 'darwin') {
-          shell = 'zsh';
-          args = ['-c', command];
-        } else {
-          shell = 'bash';
-          args = ['-c', command];
-        }
-
-        // Spawn process
-        const childProcess = spawn(shell, args, {
-          cwd: session.cwd,
-          env: {
-            ...process.env,
-            FORCE_COLOR: '1',
-            TERM: 'xterm-256color',
-            COLORTERM: 'truecolor',
-          },
-          detached: os.platform() !== 'win32', // For Unix systems
-          windowsHide: true,
-        });
-
-        // Store process
-        processMap.set(terminalId, childProcess);
-
-        // Handle stdout
-        childProcess.stdout.on('data', (data) => {
-          const output = data.toString();
-          io.to(`project:${projectId}`).emit('terminal:output', {
-            terminalId,
-            output,
-          });
-        });
-
-        // Handle stderr
-        childProcess.stderr.on('data', (data) => {
-          const output = data.toString();
-          io.to(`project:${projectId}`).emit('terminal:output', {
-            terminalId,
-            output,
-          });
-        });
+        const { code, cwd } = await runInShell(io, terminalId, session, command);
 
-        // Handle exit
-        childProcess.on('close', (code) => {
-          console.log(`[Terminal] Process exited with code: ${code}`);
-          processMap.delete(terminalId);
-          io.to(`project:${projectId}`).emit('terminal:exit', {
-            terminalId,
-            code,
-          });
-        });
-
-        // Handle error
-        childProcess.on('error', (error) => {
-          console.error('[Terminal] Process error:', error);
-          processMap.delete(terminalId);
-          io.to(`project:${projectId}`).emit('terminal:error', {
-            terminalId,
-            error: error.message,
-          });
+        console.log(`[Terminal] Command exited with code: ${code}`);
+        io.to(`project:${projectId}`).emit('terminal:exit', {
+          terminalId,
+          code,
+          cwd,
         });
-
-        // Set timeout (2 minutes)
-        setTimeout(() => {
-          if (processMap.has(terminalId)) {
-            const proc = processMap.get(terminalId);
-            try {
-              if (os.platform() === 'win32') {
-                spawn('taskkill', ['/pid', proc.pid.toString(), '/f', '/t']);
-              } else {
-                process.kill(-proc.pid);
-              }
-            } catch (error) {
-              console.error('[Terminal] Error killing timeout process:', error);
-            }
-            processMap.delete(terminalId);
-            io.to(`project:${projectId}`).emit('terminal:output', {
-              terminalId,
-              output: '\r\n\x1b[33m[Process killed - 2 minute timeout]\x1b[0m\r\n',
-            });
-          }
-        }, 120000);
       } catch (error) {
         console.error('[Terminal] Error executing command:', error);
         socket.emit('terminal:error', {
@@ -226,8 +174,10 @@ export const setupTerminalSockets = (io) => {
 
           session = {
             socketId: socket.id,
+            userId: socket.userId,
             projectId,
             shell: 'powershell',
+            projectDir,
             cwd: projectDir,
             createdAt: Date.now(),
           };
@@ -261,10 +211,7 @@ export const setupTerminalSockets = (io) => {
             // Use the alternative file
             fileDoc = alternativeFile;
           } else {
-            io.to(`project:${projectId}`).emit('terminal:output', {
-              terminalId,
-              output: `\r\n\x1b[31m━━━━━ Error ━━━━━\x1b[0m\r\n\x1b[31mFile not found in project: ${filePath || fileName}\x1b[0m\r\n\x1b[90mPlease make sure the file is saved before running.\x1b[0m\r\n`,
-            });
+            notify(io, terminalId, projectId, `\r\n\x1b[31m━━━━━ Error ━━━━━\x1b[0m\r\n\x1b[31mFile not found in project: ${filePath || fileName}\x1b[0m\r\n\x1b[90mPlease make sure the file is saved before running.\x1b[0m\r\n`);
             return;
           }
         }
@@ -275,7 +222,7 @@ export const setupTerminalSockets = (io) => {
         }
 
         // Create file on filesystem temporarily
-        const fileFullPath = path.join(session.cwd, filePath || fileName);
+        const fileFullPath = path.join(session.projectDir, filePath || fileName);
         const fileDir = path.dirname(fileFullPath);
         
         // Create directory if it doesn't exist
@@ -288,147 +235,20 @@ export const setupTerminalSockets = (io) => {
         console.log(`[Terminal] File written to: ${fileFullPath}`);
 
         // Emit output header
-        io.to(`project:${projectId}`).emit('terminal:output', {
-          terminalId,
-          output: `\r\n\x1b[36m━━━━━ Running: ${fileName} ━━━━━\x1b[0m\r\n\x1b[90m$ ${command}\x1b[0m\r\n`,
-        });
+        notify(io, terminalId, projectId, `\r\n\x1b[36m━━━━━ Running: ${fileName} ━━━━━\x1b[0m\r\n\x1b[90m$ ${command}\x1b[0m\r\n`);
 
-        // Kill any existing process for this terminal
-        if (processMap.has(terminalId)) {
-          console.log(`[Terminal] Killing existing process for terminal: ${terminalId}`);
-          io.to(`project:${projectId}`).emit('terminal:output', {
-            terminalId,
-            output: '\x1b[33m[Stopping previous process...]\x1b[0m\r\n',
-          });
-          
-          const oldProcess = processMap.get(terminalId);
-          try {
-            if (os.platform() === 'win32') {
-              spawn('taskkill', ['/pid', oldProcess.pid.toString(), '/f', '/t']);
-            } else {
-              process.kill(-oldProcess.pid);
-            }
-          } catch (error) {
-            console.error('[Terminal] Error killing old process:', error);
-          }
-          processMap.delete(terminalId);
-        }
-
-        // Determine shell and args
-        let shell, args;
-        if (os.platform() === 'win32') {
-          shell = 'powershell.exe';
-          args = ['-NoProfile', '-Command', command];
-        } else if (os.platform() === 'darwin') {
-          shell = 'zsh';
-          args = ['-c', command];
-        } else {
-          shell = 'bash';
-          args = ['-c', command];
-        }
-
-        console.log(`[Terminal] Executing with shell: ${shell}, args:`, args);
-        console.log(`[Terminal] Working directory: ${session.cwd}`);
-
-        // Spawn process
-        const childProcess = spawn(shell, args, {
-          cwd: session.cwd,
-          env: {
-            ...process.env,
-            FORCE_COLOR: '1',
-            TERM: 'xterm-256color',
-            COLORTERM: 'truecolor',
-            PYTHONUNBUFFERED: '1', // Important for Python output
-            PYTHONIOENCODING: 'utf-8', // Ensure proper encoding
-          },
-          detached: os.platform() !== 'win32',
-          windowsHide: true,
-          shell: true, // Use shell to resolve commands
-        });
-
-        // Store process
-        processMap.set(terminalId, childProcess);
-
-        // Handle stdout
-        childProcess.stdout.on('data', (data) => {
-          const output = data.toString();
-          console.log(`[Terminal] Output from ${fileName}:`, output);
-          io.to(`project:${projectId}`).emit('terminal:output', {
-            terminalId,
-            output,
-          });
-        });
-
-        // Handle stderr
-        childProcess.stderr.on('data', (data) => {
-          const output = data.toString();
-          console.log(`[Terminal] Error output from ${fileName}:`, output);
-          io.to(`project:${projectId}`).emit('terminal:output', {
-            terminalId,
-            output,
-          });
+        // Runs from the project root without moving the shell's own cwd
+        const { code, cwd } = await runInShell(io, terminalId, session, command, {
+          cwd: session.projectDir,
         });
 
-        // Handle exit
-        childProcess.on('close', (code) => {
-          console.log(`[Terminal] ${fileName} exited with code: ${code}`);
-          processMap.delete(terminalId);
-          io.to(`project:${projectId}`).emit('terminal:output', {
-            terminalId,
-            output: `\r\n\x1b[${code === 0 ? '32' : '31'}m━━━━━ Process exited with code ${code} ━━━━━\x1b[0m\r\n`,
-          });
-          io.to(`project:${projectId}`).emit('terminal:exit', {
-            terminalId,
-            code,
-          });
-          
-          // Optional: Clean up temporary file after execution
-          // Commented out to keep files for debugging/future runs
-          // try {
-          //   if (fs.existsSync(fileFullPath)) {
-          //     fs.unlinkSync(fileFullPath);
-          //     console.log(`[Terminal] Cleaned up temporary file: ${fileFullPath}`);
-          //   }
-          // } catch (cleanupError) {
-          //   console.error(`[Terminal] Error cleaning up file:`, cleanupError);
-          // }
-        });
-
-        // Handle error
-        childProcess.on('error', (error) => {
-          console.error('[Terminal] Process error:', error);
-          processMap.delete(terminalId);
-          io.to(`project:${projectId}`).emit('terminal:output', {
-            terminalId,
-            output: `\r\n\x1b[31mError: ${error.message}\x1b[0m\r\n`,
-          });
-          io.to(`project:${projectId}`).emit('terminal:error', {
-            terminalId,
-            error: error.message,
-          });
+        console.log(`[Terminal] ${fileName} exited with code: ${code}`);
+        notify(io, terminalId, projectId, `\r\n\x1b[${code === 0 ? '32' : '31'}m━━━━━ Process exited with code ${code} ━━━━━\x1b[0m\r\n`);
+        io.to(`project:${projectId}`).emit('terminal:exit', {
+          terminalId,
+          code,
+          cwd,
         });
-
-        // Set timeout (2 minutes)
-        setTimeout(() => {
-          if (processMap.has(terminalId)) {
-            const proc = processMap.get(terminalId);
-            try {
-              if (os.platform() === 'win32') {
-                spawn('taskkill', ['/pid', proc.pid.toString(), '/f', '/t']);
-              } else {
-                process.kill(-proc.pid);
-              }
-            } catch (error) {
-              console.error('[Terminal] Error killing timeout process:', error);
-            }
-            processMap.delete(terminalId);
-            io.to(`project:${projectId}`).emit('terminal:output', {
-              terminalId,
-              output: '\r\n\x1b[33m[Process killed - 2 minute timeout]\x1b[0m\r\n',
-            });
-          }
-        }, 120000);
-
       } catch (error) {
         console.error('[Terminal] Error running file:', error);
         socket.emit('terminal:error', {
@@ -438,42 +258,22 @@ export const setupTerminalSockets = (io) => {
     });
 
     /**
-     * Kill Process
+     * Kill Process - interrupts the running command, the shell stays
      */
     socket.on('terminal:kill', async ({ terminalId, projectId }) => {
       try {
         console.log(`[Terminal] Killing process: ${terminalId}`);
 
-        if (!processMap.has(terminalId)) {
+        const shell = shellSessions.get(terminalId, { projectId, userId: socket.userId });
+        if (!shell?.busy) {
           console.log(`[Terminal] No running process found for: ${terminalId}`);
           // Don't emit error - process might have already finished
-          io.to(`project:${projectId}`).emit('terminal:output', {
-            terminalId,
-            output: '\r\n\x1b[90m[No running process to kill]\x1b[0m\r\n',
-          });
+          notify(io, terminalId, projectId, '\r\n\x1b[90m[No running process to kill]\x1b[0m\r\n');
           return;
         }
 
-        const childProcess = processMap.get(terminalId);
-        
-        try {
-          if (os.platform() === 'win32') {
-            // Windows: Use taskkill to kill process tree
-            spawn('taskkill', ['/pid', childProcess.pid.toString(), '/f', '/t']);
-          } else {
-            // Unix: Kill process group
-            process.kill(-childProcess.pid);
-          }
-        } catch (error) {
-          console.error('[Terminal] Error killing process:', error);
-        }
-
-        processMap.delete(terminalId);
-
-        io.to(`project:${projectId}`).emit('terminal:exit', {
-          terminalId,
-          code: 'SIGKILL',
-        });
+        // terminal:exit follows when the command reports back
+        shell.interrupt();
       } catch (error) {
         console.error('[Terminal] Error killing process:', error);
         socket.emit('terminal:error', {
@@ -490,28 +290,39 @@ export const setupTerminalSockets = (io) => {
       try {
         console.log(`[Terminal] Closing terminal: ${terminalId}`);
 
-        // Kill any running process
-        if (processMap.has(terminalId)) {
-          const childProcess = processMap.get(terminalId);
-          try {
-            if (os.platform() === 'win32') {
-              spawn('taskkill', ['/pid', childProcess.pid.toString(), '/f', '/t']);
-            } else {
-              process.kill(-childProcess.pid);
-            }
-          } catch (error) {
-            console.error('[Terminal] Error killing process:', error);
-          }
-          processMap.delete(terminalId);
-        }
+        const session = terminalSessions.get(terminalId);
+        if (session && session.userId !== socket.userId) return;
+
+        // Stop the shell and anything running in it
+        shellSessions.close(terminalId, { projectId, userId: socket.userId });
 
         // Remove session
         terminalSessions.delete(terminalId);
+        terminalOutput.close(terminalId);
       } catch (error) {
         console.error('[Terminal] Error closing terminal:', error);
       }
     });
 
+    /**
+     * Replay Scrollback - recent output of the caller's own terminal
+     */
+    socket.on('terminal:replay', ({ terminalId, projectId }) => {
+      // Terminal ids come from the client: only the terminal's own user
+      // may read its output
+      const session = terminalSessions.get(terminalId);
+      const owned = session
+        ? session.userId === socket.userId && session.projectId === projectId
+        : !!shellSessions.get(terminalId, { projectId, userId: socket.userId });
+
+      if (!owned || !terminalOutput.replay(socket, terminalId)) {
+        socket.emit('terminal:error', {
+          terminalId,
+          error: 'Terminal session not found',
+        });
+      }
+    });
+
     /**
      * Handle disconnect
      */
@@ -526,22 +337,14 @@ export const setupTerminalSockets = (io) => {
         }
       }
 
-      // Kill processes and remove sessions
+      // Shells outlive the socket for a while, so a reconnect can resume them
       terminalsToClean.forEach((terminalId) => {
-        if (processMap.has(terminalId)) {
-          const childProcess = processMap.get(terminalId);
-          try {
-            if (os.platform() === 'win32') {
-              spawn('taskkill', ['/pid', childProcess.pid.toString(), '/f', '/t']);
-            } else {
-              process.kill(-childProcess.pid);
-            }
-          } catch (error) {
-            console.error('[Terminal] Error killing process on disconnect:', error);
-          }
-          processMap.delete(terminalId);
-        }
         terminalSessions.delete(terminalId);
+        if (shellSessions.get(terminalId)) {
+          shellSessions.detach(terminalId);
+        } else {
+          terminalOutput.close(terminalId);
+        }
       });
     });
   });
@@ -0,0 +1,125 @@
+import User from '../models/User.js';
+
+/**
+ * User Cache
+ * Small shared LRU of public user profiles ({ _id, username, email, avatar })
+ * used in place of populate() on feeds: one batched $in query per page
+ * for the users not seen recently, instead of a join per request.
+ * Entries expire after TTL_MS so profile edits on other nodes show up.
+ */
+class UserCache {
+  constructor() {
+    this.MAX_ENTRIES = 5000;
+    this.TTL_MS = 60 * 1000;
+    this.FIELDS = 'username email avatar';
+
+    this.entries = new Map(); // userId -> { profile, expiresAt }; insertion order is LRU order
+    this.loading = new Map(); // userId -> Promise, shared by concurrent lookups
+
+    this.stats = { hits: 0, misses: 0, queries: 0, evictions: 0 };
+  }
+
+  /**
+   * Profiles for a list of ids: Map of id string -> profile (missing users
+   * are absent)
+   */
+  async getMany(ids) {
+    const now = Date.now();
+    const profiles = new Map();
+    const missing = [];
+    const pending = []; // [id, Promise<profile>]
+
+    for (const id of new Set(ids.filter(Boolean).map(String))) {
+      const entry = this.entries.get(id);
+      if (entry && entry.expiresAt > now) {
+        // Refresh LRU position
+        this.entries.delete(id);
+        this.entries.set(id, entry);
+        this.stats.hits++;
+        if (entry.profile) profiles.set(id, entry.profile);
+      } else if (this.loading.has(id)) {
+        pending.push([id, this.loading.get(id)]);
+      } else {
+        missing.push(id);
+      }
+    }
+
+    if (missing.length > 0) {
+      this.stats.misses += missing.length;
+      this.stats.queries++;
+      const byId = User.find({ _id: { $in: missing } }).select(this.FIELDS).lean().exec()
+        .then(users => new Map(users.map(user => [String(user._id), user])));
+
+      for (const id of missing) {
+        const loading = byId.then(users => users.get(id) || null);
+        this.loading.set(id, loading);
+        pending.push([id, loading]);
+      }
+    }
+
+    let loaded;
+    try {
+      loaded = await Promise.all(pending.map(([, loading]) => loading));
+    } finally {
+      for (const [id, loading] of pending) {
+        if (this.loading.get(id) === loading) this.loading.delete(id);
+      }
+    }
+
+    pending.forEach(([id], i) => {
+      this.set(id, loaded[i]);
+      if (loaded[i]) profiles.set(id, loaded[i]);
+    });
+
+    return profiles;
+  }
+
+  async get(id) {
+    return (await this.getMany([id])).get(String(id)) || null;
+  }
+
+  /**
+   * populate() replacement for lean documents: swaps `doc[field]` ids for
+   * profiles (null for deleted users)
+   */
+  async attach(docs, field) {
+    const profiles = await this.getMany(docs.map(doc => doc[field]));
+    for (const doc of docs) {
+      if (doc[field]) doc[field] = profiles.get(String(doc[field])) || null;
+    }
+    return docs;
+  }
+
+  set(id, profile) {
+    this.entries.delete(id);
+    this.entries.set(id, { profile, expiresAt: Date.now() + this.TTL_MS });
+
+    while (this.entries.size > this.MAX_ENTRIES) {
+      this.entries.delete(this.entries.keys().next().value);
+      this.stats.evictions++;
+    }
+  }
+
+  /**
+   * Drop a user after a profile change
+   */
+  invalidate(id) {
+    this.entries.delete(String(id));
+  }
+
+  getStats() {
+    const lookups = this.stats.hits + this.stats.misses;
+    return {
+      ...this.stats,
+      entries: this.entries.size,
+      hitRate: lookups ? Math.round((this.stats.hits / lookups) * 100) / 100 : 0
+    };
+  }
+}
+
+export { UserCache };
+
+// Singleton instance
+const userCache = new UserCache();
+
+export default userCache;
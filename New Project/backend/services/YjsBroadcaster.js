@@ -0,0 +1,115 @@
+import * as Y from 'yjs';
+import * as encoding from 'lib0/encoding';
+import * as syncProtocol from 'y-protocols/sync';
+
+/**
+ * Yjs Broadcaster
+ * Coalesces outbound Yjs updates per room: updates applied within a short
+ * window are merged with Y.mergeUpdates and sent as one yjs-sync frame.
+ * A frame with a single sender skips that sender; a frame mixing senders
+ * goes to the whole room (re-applying your own update is a no-op in Yjs).
+ */
+class YjsBroadcaster {
+  constructor({
+    windowMs = 25,
+    maxBatchBytes = 256 * 1024 // Flush early on large pastes
+  } = {}) {
+    this.windowMs = windowMs;
+    this.maxBatchBytes = maxBatchBytes;
+
+    // roomKey -> { io, updates, bytes, senders, timer }
+    this.batches = new Map();
+
+    this.stats = {
+      framesIn: 0,
+      framesOut: 0,
+      deliveries: 0, // Frames out x local recipients
+      bytesIn: 0,
+      bytesOut: 0,
+      largestBatch: 0
+    };
+  }
+
+  /**
+   * Queue an update applied by `senderId` for broadcast to the room
+   */
+  queue(io, roomKey, senderId, update) {
+    let batch = this.batches.get(roomKey);
+
+    if (!batch) {
+      batch = { io, updates: [], bytes: 0, senders: new Set(), timer: null };
+      batch.timer = setTimeout(() => this.flush(roomKey), this.windowMs);
+      this.batches.set(roomKey, batch);
+    }
+
+    batch.updates.push(update);
+    batch.bytes += update.length;
+    batch.senders.add(senderId);
+
+    this.stats.framesIn++;
+    this.stats.bytesIn += update.length;
+
+    if (batch.bytes >= this.maxBatchBytes) {
+      this.flush(roomKey);
+    }
+  }
+
+  /**
+   * Send a room's pending updates as one frame
+   */
+  flush(roomKey) {
+    const batch = this.batches.get(roomKey);
+    if (!batch) return;
+
+    this.batches.delete(roomKey);
+    clearTimeout(batch.timer);
+
+    try {
+      const update = batch.updates.length === 1
+        ? batch.updates[0]
+        : Y.mergeUpdates(batch.updates);
+
+      const encoder = encoding.createEncoder();
+      syncProtocol.writeUpdate(encoder, update);
+      const frame = encoding.toUint8Array(encoder);
+
+      let target = batch.io.to(roomKey);
+      let recipients = batch.io.sockets.adapter.rooms.get(roomKey)?.size || 0;
+      if (batch.senders.size === 1) {
+        const [sender] = batch.senders;
+        target = target.except(sender);
+        recipients = Math.max(0, recipients - 1);
+      }
+      target.emit('yjs-sync', frame);
+
+      this.stats.framesOut++;
+      this.stats.deliveries += recipients;
+      this.stats.bytesOut += frame.length;
+      this.stats.largestBatch = Math.max(this.stats.largestBatch, batch.updates.length);
+    } catch (error) {
+      console.error('Error broadcasting Yjs updates:', error);
+    }
+  }
+
+  flushAll() {
+    for (const roomKey of [...this.batches.keys()]) {
+      this.flush(roomKey);
+    }
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      pendingRooms: this.batches.size,
+      windowMs: this.windowMs,
+      coalescingRatio: this.stats.framesOut > 0 ? this.stats.framesIn / this.stats.framesOut : 0
+    };
+  }
+}
+
+export { YjsBroadcaster };
+
+// Create singleton instance
+const yjsBroadcaster = new YjsBroadcaster();
+
+export default yjsBroadcaster;
@@ -5,11 +5,18 @@ import * as syncProtocol from 'y-protocols/sync';
 import * as awarenessProtocol from 'y-protocols/awareness';
 import FileVersion from '../models/FileVersion.js';
 import File from '../models/File.js';
-import crypto from 'crypto';
+import YjsUpdate from '../models/YjsUpdate.js';
+import ChunkedChecksum from './DeltaEngine/utils/chunkedChecksum.js';
+import blobStore from './BlobStore.js';
+import { toBytes } from './DeltaEngine/utils/codecs.js';
+import { calculateHash } from '../utils/diffUtil.js';
 
 /**
  * Yjs Document Manager
- * Manages collaborative editing with Yjs documents
+ * Manages collaborative editing with Yjs documents. Documents are
+ * reference counted per socket (acquire/release); once a document has no
+ * sockets left it is flushed and evicted after an idle grace period, and
+ * a global memory budget evicts the least recently active documents first.
  */
 class YjsDocumentManager {
   constructor() {
@@ -21,6 +28,35 @@ class YjsDocumentManager {
     
     // Debounce timers for saving
     this.saveTimers = new Map();
+
+    // Incremental content checksums per document
+    this.checksums = new Map();
+
+    // Lifecycle per document: { roomId, fileId, sockets, lastActive, bytes, pendingUpdates, ... }
+    this.entries = new Map();
+
+    // In-flight loads, so concurrent joins share one Y.Doc
+    this.loading = new Map();
+
+    // Update log rows appended since the last compaction, per fileId
+    this.logTails = new Map();
+    this.compacting = new Set();
+
+    // (roomId, fileId, update) => void: sends server-made edits to clients
+    this.onServerUpdate = null;
+
+    this.SAVE_DEBOUNCE_MS = 5000;
+    this.IDLE_EVICTION_MS = 60 * 1000; // Grace period after the last socket leaves
+    this.MEMORY_BUDGET_BYTES = 256 * 1024 * 1024; // Estimated Yjs state across all docs
+    this.COMPACT_AFTER_UPDATES = 50; // Log rows before merging into a snapshot
+
+    this.stats = {
+      loads: 0,
+      idleEvictions: 0,
+      budgetEvictions: 0,
+      appendedUpdates: 0,
+      compactions: 0
+    };
   }
 
   /**
@@ -30,18 +66,56 @@ class YjsDocumentManager {
     const key = `${roomId}:${fileId}`;
     
     if (this.docs.has(key)) {
+      this.touch(key);
       return this.docs.get(key);
     }
 
+    if (!this.loading.has(key)) {
+      const load = this.createDocument(roomId, fileId)
+        .finally(() => this.loading.delete(key));
+      this.loading.set(key, load);
+    }
+
+    return this.loading.get(key);
+  }
+
+  /**
+   * Load a document into memory and start tracking it
+   */
+  async createDocument(roomId, fileId) {
+    const key = `${roomId}:${fileId}`;
+
     // Create new Yjs document
     const ydoc = new Y.Doc();
     
     // Load existing content from database
     await this.loadDocumentFromDB(ydoc, fileId);
+    this.stats.loads++;
+
+    // Track text edits so saves only rehash the chunks that changed
+    const ytext = ydoc.getText('monaco');
+    const checksum = {
+      tree: new ChunkedChecksum(ytext.toString()),
+      pending: null, // Coalesced edit range since the last save
+      savedRoot: null
+    };
+    checksum.savedRoot = checksum.tree.digest();
+    this.checksums.set(key, checksum);
+
+    ytext.observe((event) => {
+      this.trackTextChange(checksum, event.delta);
+    });
     
+    const entry = this.getEntry(roomId, fileId);
+    entry.bytes = Y.encodeStateAsUpdate(ydoc).length;
+    entry.lastActive = Date.now();
+
     // Listen for updates to persist
     ydoc.on('update', (update) => {
-      this.scheduleDocumentSave(roomId, fileId, ydoc, update);
+      entry.bytes += update.length;
+      entry.lastActive = Date.now();
+      entry.pendingUpdates.push(update);
+      this.scheduleDocumentSave(roomId, fileId, ydoc);
     });
 
     this.docs.set(key, ydoc);
@@ -50,9 +124,202 @@ class YjsDocumentManager {
     const awareness = new awarenessProtocol.Awareness(ydoc);
     this.awareness.set(key, awareness);
 
+    // Nobody may acquire it (e.g. a sync from a socket that was evicted
+    // while idle); make sure it still goes away
+    if (entry.sockets.size === 0) {
+      this.scheduleEviction(key);
+    }
+
+    this.enforceMemoryBudget();
+
     return ydoc;
   }
 
+  getEntry(roomId, fileId) {
+    const key = `${roomId}:${fileId}`;
+
+    if (!this.entries.has(key)) {
+      this.entries.set(key, {
+        roomId,
+        fileId,
+        sockets: new Set(),
+        lastActive: Date.now(),
+        bytes: 0,
+        evictionTimer: null,
+        evicting: false,
+        pendingUpdates: [] // Edits not yet in the update log
+      });
+    }
+
+    return this.entries.get(key);
+  }
+
+  touch(key) {
+    const entry = this.entries.get(key);
+    if (entry) {
+      entry.lastActive = Date.now();
+    }
+  }
+
+  /**
+   * Take a reference to a document for a socket (join-room)
+   */
+  async acquire(roomId, fileId, socketId) {
+    const entry = this.getEntry(roomId, fileId);
+    entry.sockets.add(socketId);
+    entry.lastActive = Date.now();
+
+    if (entry.evictionTimer) {
+      clearTimeout(entry.evictionTimer);
+      entry.evictionTimer = null;
+    }
+
+    return this.getDocument(roomId, fileId);
+  }
+
+  /**
+   * Drop a socket's reference (leave-room, disconnect, switching files);
+   * the last one out starts the idle grace period
+   */
+  release(roomId, fileId, socketId) {
+    const key = `${roomId}:${fileId}`;
+    const entry = this.entries.get(key);
+    if (!entry || !entry.sockets.delete(socketId)) return;
+
+    entry.lastActive = Date.now();
+
+    if (entry.sockets.size === 0) {
+      this.scheduleEviction(key);
+    }
+  }
+
+  /**
+   * Whether any socket holds a document for this file (in any room)
+   */
+  isFileOpen(fileId) {
+    for (const entry of this.entries.values()) {
+      if (String(entry.fileId) === String(fileId) && entry.sockets.size > 0) {
+        return true;
+      }
+    }
+    return false;
+  }
+
+  scheduleEviction(key) {
+    const entry = this.entries.get(key);
+    if (!entry || entry.evictionTimer) return;
+
+    entry.evictionTimer = setTimeout(() => {
+      entry.evictionTimer = null;
+      this.evictDocument(key, 'idle');
+    }, this.IDLE_EVICTION_MS);
+    entry.evictionTimer.unref();
+  }
+
+  /**
+   * Persist pending edits, then drop the document from memory.
+   * Aborted if the document was joined again while flushing.
+   */
+  async evictDocument(key, reason) {
+    const entry = this.entries.get(key);
+    if (!entry || entry.evicting) return false;
+
+    if (reason === 'idle' && entry.sockets.size > 0) return false;
+
+    entry.evicting = true;
+    try {
+      await this.flushDocument(key);
+    } finally {
+      entry.evicting = false;
+    }
+
+    if (reason === 'idle' && entry.sockets.size > 0) return false;
+    if (this.saveTimers.has(key)) return false; // Edited while flushing
+
+    this.closeDocument(entry.roomId, entry.fileId);
+
+    if (reason === 'idle') {
+      this.stats.idleEvictions++;
+    } else {
+      this.stats.budgetEvictions++;
+    }
+
+    return true;
+  }
+
+  /**
+   * Run a pending debounced save now
+   */
+  async flushDocument(key) {
+    const entry = this.entries.get(key);
+    const ydoc = this.docs.get(key);
+    if (!entry || !ydoc || !this.saveTimers.has(key)) return;
+
+    clearTimeout(this.saveTimers.get(key));
+    this.saveTimers.delete(key);
+
+    await this.saveDocumentToDB(entry.roomId, entry.fileId, ydoc);
+  }
+
+  /**
+   * Flush every document with pending edits (graceful shutdown)
+   */
+  async flushAll() {
+    await Promise.all([...this.saveTimers.keys()].map(key => this.flushDocument(key)));
+  }
+
+  /**
+   * Evict least recently active documents while over the memory budget:
+   * documents nobody holds first, then held ones idle past the grace period
+   * (their clients resync from the flushed state on the next message)
+   */
+  enforceMemoryBudget() {
+    let resident = this.getResidentBytes();
+    if (resident <= this.MEMORY_BUDGET_BYTES) return;
+
+    const idleSince = Date.now() - this.IDLE_EVICTION_MS;
+    const candidates = [...this.entries.entries()]
+      .filter(([key, entry]) => this.docs.has(key) && !entry.evicting &&
+        (entry.sockets.size === 0 || entry.lastActive < idleSince))
+      .sort((a, b) => (a[1].sockets.size - b[1].sockets.size) || (a[1].lastActive - b[1].lastActive));
+
+    for (const [key, entry] of candidates) {
+      if (resident <= this.MEMORY_BUDGET_BYTES) break;
+
+      resident -= entry.bytes;
+      this.evictDocument(key, 'budget').catch(error => {
+        console.error('Error evicting document:', error);
+      });
+    }
+  }
+
+  getResidentBytes() {
+    let total = 0;
+    for (const [key, entry] of this.entries) {
+      if (this.docs.has(key)) total += entry.bytes;
+    }
+    return total;
+  }
+
+  /**
+   * Gauge of resident documents and estimated memory
+   */
+  getStats() {
+    let referenced = 0;
+    for (const [key, entry] of this.entries) {
+      if (this.docs.has(key) && entry.sockets.size > 0) referenced++;
+    }
+
+    return {
+      ...this.stats,
+      residentDocs: this.docs.size,
+      referencedDocs: referenced,
+      residentBytes: this.getResidentBytes(),
+      memoryBudgetBytes: this.MEMORY_BUDGET_BYTES,
+      pendingSaves: this.saveTimers.size
+    };
+  }
+
   /**
    * Get awareness instance for a document
    */
@@ -62,41 +329,253 @@ class YjsDocumentManager {
   }
 
   /**
-   * Load document content from MongoDB
+   * Load document state from MongoDB: the merge of the file's update log
+   * (compacted snapshot + tail updates). Files without a log are seeded
+   * from their last Yjs FileVersion or their content; later REST writes
+   * to the content are appended by applyExternalContent.
    */
   async loadDocumentFromDB(ydoc, fileId) {
     try {
-      // Get file from database
-      const file = await File.findById(fileId);
-      
-      if (!file) {
-        console.log(`File ${fileId} not found, initializing empty document`);
-        return;
+      let rows = await YjsUpdate.find({ fileId })
+        .select('kind data')
+        .lean();
+
+      if (rows.length === 0) {
+        if (!await this.seedDocumentLog(fileId)) return;
+
+        rows = await YjsUpdate.find({ fileId })
+          .select('kind data')
+          .lean();
       }
 
-      // Get latest version with Yjs update
-      const latestVersion = await FileVersion.findOne({ fileId })
-        .sort({ versionNumber: -1 })
-        .limit(1);
+      Y.applyUpdate(ydoc, Y.mergeUpdates(rows.map(row => toBytes(row.data))));
+
+      const tail = rows.filter(row => row.kind === 'update').length;
+      this.logTails.set(String(fileId), tail);
 
+      if (tail >= this.COMPACT_AFTER_UPDATES) {
+        this.compactInBackground(fileId);
+      }
+    } catch (error) {
+      console.error('Error loading document from DB:', error);
+    }
+  }
+
+  /**
+   * Write the first snapshot of a file's update log. Only one process
+   * (or room) may seed a file; the others load the winner's snapshot so
+   * every document shares the same initial Yjs items. Returns false if
+   * the file does not exist.
+   */
+  async seedDocumentLog(fileId) {
+    const file = await File.findById(fileId);
+
+    if (!file) {
+      console.log(`File ${fileId} not found, initializing empty document`);
+      return false;
+    }
+
+    const seedDoc = new Y.Doc();
+
+    // Existing files: continue from the last full-state version
+    const latestVersion = await FileVersion.findOne({ fileId })
+      .sort({ versionNumber: -1 })
+      .select('diff');
+
+    try {
       if (latestVersion && latestVersion.diff) {
-        // If we have a Yjs update stored, apply it
-        try {
-          const updateBuffer = Buffer.from(latestVersion.diff, 'base64');
-          Y.applyUpdate(ydoc, updateBuffer);
-          console.log(`✅ Loaded Yjs state for file ${fileId}`);
-        } catch (error) {
-          console.error('Error applying Yjs update:', error);
-          // Fallback to content
-          this.initializeFromContent(ydoc, file.content);
-        }
+        Y.applyUpdate(seedDoc, Buffer.from(latestVersion.diff, 'base64'));
       } else {
-        // Initialize from file content
-        this.initializeFromContent(ydoc, file.content);
+        this.initializeFromContent(seedDoc, file.content);
       }
     } catch (error) {
-      console.error('Error loading document from DB:', error);
+      console.error('Error applying Yjs update:', error);
+      // Fallback to content
+      seedDoc.destroy();
+      return this.seedFromContent(fileId, file.content);
     }
+
+    const data = Y.encodeStateAsUpdate(seedDoc);
+    seedDoc.destroy();
+
+    return this.insertSeed(fileId, data);
+  }
+
+  async seedFromContent(fileId, content) {
+    const seedDoc = new Y.Doc();
+    this.initializeFromContent(seedDoc, content);
+    const data = Y.encodeStateAsUpdate(seedDoc);
+    seedDoc.destroy();
+
+    return this.insertSeed(fileId, data);
+  }
+
+  async insertSeed(fileId, data) {
+    try {
+      await YjsUpdate.create({
+        fileId,
+        kind: 'snapshot',
+        data: Buffer.from(data),
+        size: data.length,
+        seed: true
+      });
+    } catch (error) {
+      // Seeded concurrently: the caller loads that one
+      if (error.code !== 11000) throw error;
+    }
+
+    return true;
+  }
+
+  /**
+   * Bring a file's collaborative state to content written outside Yjs
+   * (REST snapshot saves and reverts). Resident documents take the edit
+   * and log it on their next save; otherwise it is appended to the update
+   * log, so the next load and the next save both keep the new content.
+   */
+  async applyExternalContent(fileId, content) {
+    try {
+      const keys = [...this.docs.keys()]
+        .filter(key => String(this.entries.get(key)?.fileId) === String(fileId));
+
+      if (keys.length > 0) {
+        // Edit one document and replay the same update into the others, so
+        // every room holds the same items
+        const [first, ...others] = keys;
+        const ydoc = this.docs.get(first);
+        const stateVector = Y.encodeStateVector(ydoc);
+        if (!this.replaceText(ydoc.getText('monaco'), content)) return;
+
+        const update = Y.encodeStateAsUpdate(ydoc, stateVector);
+        for (const key of others) {
+          Y.applyUpdate(this.docs.get(key), update);
+        }
+
+        for (const key of keys) {
+          const { roomId } = this.entries.get(key);
+          if (this.onServerUpdate) this.onServerUpdate(roomId, fileId, update);
+        }
+        return;
+      }
+
+      // No log yet: the first load seeds it from File.content
+      const rows = await YjsUpdate.find({ fileId })
+        .select('data')
+        .lean();
+      if (rows.length === 0) return;
+
+      const scratch = new Y.Doc();
+      Y.applyUpdate(scratch, Y.mergeUpdates(rows.map(row => toBytes(row.data))));
+      const stateVector = Y.encodeStateVector(scratch);
+      const changed = this.replaceText(scratch.getText('monaco'), content);
+      const data = Y.encodeStateAsUpdate(scratch, stateVector);
+      scratch.destroy();
+      if (!changed) return;
+
+      await YjsUpdate.create({
+        fileId,
+        kind: 'update',
+        data: Buffer.from(data),
+        size: data.length
+      });
+      this.stats.appendedUpdates++;
+
+      const tail = (this.logTails.get(String(fileId)) || 0) + 1;
+      this.logTails.set(String(fileId), tail);
+
+      if (tail >= this.COMPACT_AFTER_UPDATES) {
+        this.compactInBackground(fileId);
+      }
+    } catch (error) {
+      console.error('Error applying external content:', error);
+    }
+  }
+
+  /**
+   * Replace a Y.Text's content with one edit over the changed middle;
+   * false if it already matches
+   */
+  replaceText(ytext, content) {
+    const current = ytext.toString();
+    content = content || '';
+    if (current === content) return false;
+
+    let start = 0;
+    const max = Math.min(current.length, content.length);
+    while (start < max && current[start] === content[start]) start++;
+
+    let end = 0;
+    while (end < max - start &&
+        current[current.length - 1 - end] === content[content.length - 1 - end]) end++;
+
+    ytext.doc.transact(() => {
+      ytext.delete(start, current.length - end - start);
+      ytext.insert(start, content.slice(start, content.length - end));
+    });
+    return true;
+  }
+
+  /**
+   * Fold a Yjs text delta into the pending edit range
+   * (from, oldTo) are offsets in the last-saved text, newTo in the current text
+   */
+  trackTextChange(checksum, delta) {
+    let oldPos = 0;
+    let newPos = 0;
+    let from = null;
+    let oldTo = 0;
+    let newTo = 0;
+
+    for (const op of delta) {
+      if (op.retain !== undefined) {
+        oldPos += op.retain;
+        newPos += op.retain;
+      } else if (op.insert !== undefined) {
+        if (from === null) from = newPos;
+        newPos += typeof op.insert === 'string' ? op.insert.length : 1;
+        oldTo = oldPos;
+        newTo = newPos;
+      } else if (op.delete !== undefined) {
+        if (from === null) from = oldPos;
+        oldPos += op.delete;
+        oldTo = oldPos;
+        newTo = newPos;
+      }
+    }
+
+    if (from === null) return;
+
+    const pending = checksum.pending;
+    if (!pending) {
+      checksum.pending = { from, oldTo, newTo };
+      return;
+    }
+
+    // Merge with the earlier range (which is in current-text coordinates)
+    const shift = (newTo - from) - (oldTo - from);
+    checksum.pending = {
+      from: Math.min(pending.from, from),
+      oldTo: pending.oldTo + Math.max(0, oldTo - pending.newTo),
+      newTo: Math.max(pending.newTo, oldTo) + shift
+    };
+  }
+
+  /**
+   * Bring a document's checksum up to date and return the root
+   */
+  getContentChecksum(key, content) {
+    const checksum = this.checksums.get(key);
+    if (!checksum) {
+      return new ChunkedChecksum(content).digest();
+    }
+
+    if (checksum.pending) {
+      const { from, oldTo, newTo } = checksum.pending;
+      checksum.tree.update(content, from, oldTo, newTo - from);
+      checksum.pending = null;
+    }
+
+    return checksum.tree.digest();
   }
 
   /**
@@ -110,7 +589,7 @@ class YjsDocumentManager {
   /**
    * Schedule document save with debouncing (5 seconds)
    */
-  scheduleDocumentSave(roomId, fileId, ydoc, update) {
+  scheduleDocumentSave(roomId, fileId, ydoc) {
     const key = `${roomId}:${fileId}`;
     
     // Clear existing timer
@@ -120,55 +599,157 @@ class YjsDocumentManager {
 
     // Set new timer
     const timer = setTimeout(() => {
-      this.saveDocumentToDB(roomId, fileId, ydoc, update);
-    }, 5000); // 5 second debounce
+      this.saveTimers.delete(key);
+      this.saveDocumentToDB(roomId, fileId, ydoc);
+    }, this.SAVE_DEBOUNCE_MS);
 
     this.saveTimers.set(key, timer);
   }
 
   /**
-   * Save document to MongoDB
+   * Save document to MongoDB: append the edits since the last save to the
+   * update log, and refresh the file's plain content if the text changed
    */
-  async saveDocumentToDB(roomId, fileId, ydoc, update) {
+  async saveDocumentToDB(roomId, fileId, ydoc) {
+    const key = `${roomId}:${fileId}`;
+    const entry = this.entries.get(key);
+    const updates = entry ? entry.pendingUpdates.splice(0) : [];
+
     try {
+      if (updates.length > 0) {
+        const data = Y.mergeUpdates(updates);
+
+        await YjsUpdate.create({
+          fileId,
+          kind: 'update',
+          data: Buffer.from(data),
+          size: data.length
+        });
+        this.stats.appendedUpdates++;
+
+        const tail = (this.logTails.get(String(fileId)) || 0) + 1;
+        this.logTails.set(String(fileId), tail);
+
+        if (tail >= this.COMPACT_AFTER_UPDATES) {
+          this.compactInBackground(fileId);
+        }
+      }
+
       // Get current content
       const ytext = ydoc.getText('monaco');
       const content = ytext.toString();
+      const contentHash = this.getContentChecksum(key, content);
+
+      // Text unchanged since the last save (e.g. edits that cancelled out)
+      const checksum = this.checksums.get(key);
+      if (checksum && checksum.savedRoot === contentHash) {
+        return;
+      }
 
       // Update file content
-      const file = await File.findById(fileId);
-      if (!file) {
+      const result = await File.updateOne(
+        { _id: fileId },
+        {
+          $set: {
+            content,
+            size: Buffer.byteLength(content, 'utf8'),
+            'metadata.lineCount': content.split('\n').length
+          }
+        }
+      );
+
+      if (result.matchedCount === 0) {
         console.error(`File ${fileId} not found for saving`);
         return;
       }
 
-      file.content = content;
-      file.size = Buffer.byteLength(content, 'utf8');
-      file.metadata.lineCount = content.split('\n').length;
-      await file.save();
-
-      // Save Yjs state vector as a version
-      const stateVector = Y.encodeStateAsUpdate(ydoc);
-      const stateBase64 = Buffer.from(stateVector).toString('base64');
-      const contentHash = crypto.createHash('sha256').update(content).digest('hex');
-
-      // Get version number
-      const lastVersion = await FileVersion.findOne({ fileId })
-        .sort({ versionNumber: -1 })
-        .limit(1);
-      
-      const versionNumber = lastVersion ? lastVersion.versionNumber + 1 : 1;
-
-      // Create new version
-      const version = new FileVersion({
+      if (checksum) {
+        checksum.savedRoot = contentHash;
+      }
+    } catch (error) {
+      // Keep the edits for the next save
+      if (entry && updates.length > 0) {
+        entry.pendingUpdates.unshift(...updates);
+      }
+      console.error('Error saving document to DB:', error);
+    }
+  }
+
+  compactInBackground(fileId) {
+    this.compactDocument(fileId).catch(error => {
+      console.error('Error compacting document:', error);
+    });
+  }
+
+  /**
+   * Merge a file's update log into one snapshot. The merged state is
+   * loaded into a scratch doc so deleted content is garbage collected,
+   * and a FileVersion is recorded for the version history.
+   */
+  async compactDocument(fileId) {
+    const id = String(fileId);
+    if (this.compacting.has(id)) return null;
+    this.compacting.add(id);
+
+    try {
+      const rows = await YjsUpdate.find({ fileId })
+        .select('_id data')
+        .lean();
+
+      if (rows.length < 2) return null;
+
+      const scratch = new Y.Doc();
+      Y.applyUpdate(scratch, Y.mergeUpdates(rows.map(row => toBytes(row.data))));
+      const data = Y.encodeStateAsUpdate(scratch);
+      const content = scratch.getText('monaco').toString();
+      scratch.destroy();
+
+      // Write the snapshot before deleting what it replaces
+      await YjsUpdate.create({
+        fileId,
+        kind: 'snapshot',
+        data: Buffer.from(data),
+        size: data.length,
+        mergedCount: rows.length
+      });
+      await YjsUpdate.deleteMany({ _id: { $in: rows.map(row => row._id) } });
+
+      this.logTails.set(id, 0);
+      this.stats.compactions++;
+
+      await this.recordVersion(fileId, content);
+
+      return { merged: rows.length, size: data.length };
+    } finally {
+      this.compacting.delete(id);
+    }
+  }
+
+  /**
+   * Add an auto-save FileVersion (once per compaction, not per save)
+   */
+  async recordVersion(fileId, content) {
+    const file = await File.findById(fileId).select('createdBy lastModifiedBy');
+    if (!file) return;
+
+    const lastVersion = await FileVersion.findOne({ fileId })
+      .sort({ versionNumber: -1 })
+      .select('versionNumber');
+
+    const versionNumber = lastVersion ? lastVersion.versionNumber + 1 : 1;
+    const size = Buffer.byteLength(content, 'utf8');
+
+    const contentBlob = await blobStore.put(content);
+
+    try {
+      await FileVersion.create({
         fileId,
         versionNumber,
-        content,
-        contentHash,
-        diff: stateBase64, // Store Yjs state as diff
+        contentBlob,
+        contentHash: calculateHash(content),
         createdBy: file.lastModifiedBy || file.createdBy,
         message: 'Auto-saved collaborative changes',
-        size: file.size,
+        size,
         isAutoSave: true,
         metadata: {
           linesAdded: 0,
@@ -177,13 +758,12 @@ class YjsDocumentManager {
           charactersRemoved: 0
         }
       });
-
-      await version.save();
-      
-      console.log(`✅ Saved version ${versionNumber} for file ${fileId}`);
     } catch (error) {
-      console.error('Error saving document to DB:', error);
+      await blobStore.release(contentBlob);
+      throw error;
     }
+
+    console.log(`✅ Saved version ${versionNumber} for file ${fileId}`);
   }
 
   /**
@@ -198,6 +778,23 @@ class YjsDocumentManager {
       this.saveTimers.delete(key);
     }
 
+    this.checksums.delete(key);
+
+    // Keep the entry while sockets still hold the document (budget
+    // eviction); it is reloaded on their next message
+    const entry = this.entries.get(key);
+    if (entry) {
+      if (entry.evictionTimer) {
+        clearTimeout(entry.evictionTimer);
+        entry.evictionTimer = null;
+      }
+      entry.bytes = 0;
+      entry.pendingUpdates = [];
+      if (entry.sockets.size === 0) {
+        this.entries.delete(key);
+      }
+    }
+
     // Destroy document
     if (this.docs.has(key)) {
       const doc = this.docs.get(key);
@@ -0,0 +1,56 @@
+import { ClusterAdapterWithHeartbeat } from 'socket.io-adapter';
+
+/**
+ * Socket.IO adapter over a pub/sub broker (see brokers.js)
+ * Built on socket.io-adapter's ClusterAdapter, so broadcasts, rooms,
+ * socketsJoin/Leave, fetchSockets and serverSideEmit work across nodes.
+ * Each namespace publishes on `socket.io#<nsp>`; responses to cluster
+ * requests go to the requesting node's own channel.
+ */
+class BrokerAdapter extends ClusterAdapterWithHeartbeat {
+  constructor(nsp, broker, opts = {}) {
+    super(nsp, opts);
+    this.broker = broker;
+
+    const channel = `socket.io#${nsp.name}`;
+    this.channel = channel;
+
+    this.unsubscribers = [
+      broker.subscribe(channel, (message) => {
+        if (message.uid === this.uid || message.nsp !== nsp.name) return;
+        this.onMessage(message);
+      }),
+      broker.subscribe(`${channel}#${this.uid}`, (response) => {
+        this.onResponse(response);
+      })
+    ];
+
+    this.init();
+  }
+
+  doPublish(message) {
+    this.broker.publish(this.channel, message);
+    return Promise.resolve(''); // No connection state recovery offsets
+  }
+
+  doPublishResponse(requesterUid, response) {
+    this.broker.publish(`${this.channel}#${requesterUid}`, response);
+    return Promise.resolve();
+  }
+
+  close() {
+    this.unsubscribers.forEach(unsubscribe => unsubscribe());
+    return super.close();
+  }
+}
+
+/**
+ * Adapter constructor for `new Server(httpServer, { adapter })`
+ */
+export function createBrokerAdapter(broker, opts = {}) {
+  return function (nsp) {
+    return new BrokerAdapter(nsp, broker, opts);
+  };
+}
+
+export default BrokerAdapter;
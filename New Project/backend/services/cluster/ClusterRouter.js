@@ -0,0 +1,381 @@
+import { EventEmitter } from 'events';
+
+/**
+ * Cluster Router
+ *
+ * Every collaborative file (its Y.Doc, delta buffer and snapshot timers)
+ * is owned by exactly one node, chosen by rendezvous hashing of the file
+ * id over the node list, so all nodes agree on the owner without talking
+ * to each other. Sockets connect to any node; their file-scoped events are
+ * forwarded over the broker to the owner, which runs the regular socket
+ * handlers against a RemoteSocket stand-in. Emits from the owner reach the
+ * real socket through the Socket.IO broker adapter.
+ *
+ * With a single node everything is local and nothing is forwarded.
+ */
+
+// Socket events scoped to the file a socket joined with join-room
+const ROOM_EVENTS = new Set([
+  'join-room',
+  'leave-room',
+  'yjs-sync',
+  'yjs-awareness',
+  'cursor-update',
+  'send-message',
+  'get-messages',
+  'typing',
+  'mark-read'
+]);
+
+// 32-bit FNV-1a
+function hash(value) {
+  let h = 0x811c9dc5;
+  for (let i = 0; i < value.length; i++) {
+    h ^= value.charCodeAt(i);
+    h = Math.imul(h, 0x01000193);
+  }
+  return h >>> 0;
+}
+
+/**
+ * Stand-in for a socket connected to another node. Handlers register
+ * with on() as usual; emit/to/join/leave go through io (and the adapter).
+ */
+class RemoteSocket extends EventEmitter {
+  constructor(io, id) {
+    super();
+    this.setMaxListeners(0);
+    this.io = io;
+    this.id = id;
+    this.remote = true;
+    this.lastSeen = Date.now();
+  }
+
+  emit(event, ...args) {
+    this.io.to(this.id).emit(event, ...args);
+    return true;
+  }
+
+  to(room) {
+    return this.io.to(room).except(this.id);
+  }
+
+  join(room) {
+    this.io.in(this.id).socketsJoin(room);
+  }
+
+  leave(room) {
+    this.io.in(this.id).socketsLeave(room);
+  }
+
+  /**
+   * Run this socket's handlers for an event; resolves with the arguments
+   * passed to the ack callback, or [] if no handler acknowledged
+   */
+  dispatch(event, args, hasAck) {
+    return new Promise((resolve, reject) => {
+      const ack = hasAck ? (...response) => resolve(response) : undefined;
+      const listeners = this.listeners(event);
+
+      Promise.all(listeners.map(listener => listener(...args, ack)))
+        .then(() => resolve([]))
+        .catch(reject);
+    });
+  }
+}
+
+class ClusterRouter {
+  constructor() {
+    this.nodeId = 'local';
+    this.nodes = ['local'];
+    this.broker = null;
+    this.io = null;
+    this.registerHandlers = null;
+
+    this.REQUEST_TIMEOUT_MS = 10000;
+    this.PROXY_SWEEP_MS = 60 * 1000;
+
+    this.pending = new Map(); // requestId -> { resolve, reject, timer }
+    this.proxies = new Map(); // socketId -> RemoteSocket (sockets on other nodes)
+    this.nextRequestId = 1;
+    this.unsubscribers = [];
+    this.sweepTimer = null;
+
+    this.stats = {
+      localEvents: 0,
+      forwardedEvents: 0,
+      servedEvents: 0,
+      failedForwards: 0
+    };
+  }
+
+  /**
+   * Join the cluster. `registerHandlers(io, socket)` installs the regular
+   * socket handlers and is also used for RemoteSocket stand-ins.
+   */
+  configure({ nodeId, nodes, broker, io, registerHandlers }) {
+    this.nodeId = nodeId;
+    this.nodes = [...nodes].sort();
+    this.broker = broker;
+    this.io = io;
+    this.registerHandlers = registerHandlers;
+
+    if (!this.isClustered()) return;
+
+    this.unsubscribers.push(
+      broker.subscribe(`cluster:events:${nodeId}`, (request) => this.serve(request)),
+      broker.subscribe(`cluster:replies:${nodeId}`, (reply) => this.settle(reply))
+    );
+
+    this.sweepTimer = setInterval(() => {
+      this.sweepProxies().catch(error => {
+        console.error('[ClusterRouter] Sweep error:', error);
+      });
+    }, this.PROXY_SWEEP_MS);
+    this.sweepTimer.unref();
+  }
+
+  isClustered() {
+    return !!this.broker && this.nodes.length > 1;
+  }
+
+  /**
+   * Owning node of a file (rendezvous / highest random weight hashing)
+   */
+  ownerOf(key) {
+    let owner = this.nodes[0];
+    let best = -1;
+
+    for (const node of this.nodes) {
+      const weight = hash(`${node}\0${key}`);
+      if (weight > best) {
+        best = weight;
+        owner = node;
+      }
+    }
+
+    return owner;
+  }
+
+  isLocal(key) {
+    return this.ownerOf(String(key)) === this.nodeId;
+  }
+
+  /**
+   * File a socket event is about, or null for events handled where the
+   * socket is connected
+   */
+  routeKey(socket, event, args) {
+    if (event === 'join-room') {
+      return args[0]?.fileId ?? null;
+    }
+    if (ROOM_EVENTS.has(event)) {
+      return socket.clusterFile ?? null;
+    }
+    if (event.startsWith('delta:')) {
+      return args[0]?.fileId ?? null;
+    }
+    return null;
+  }
+
+  /**
+   * Socket middleware: forward file-scoped events owned by other nodes
+   */
+  attach(socket) {
+    if (!this.isClustered()) return;
+
+    socket.clusterOwners = new Set(); // Remote nodes holding a stand-in
+
+    socket.use((packet, next) => {
+      const [event, ...args] = packet;
+      const key = this.routeKey(socket, event, args);
+
+      if (event === 'join-room' && key) {
+        this.switchFile(socket, String(key));
+      }
+
+      if (!key || this.isLocal(key)) {
+        this.stats.localEvents++;
+        return next();
+      }
+
+      const ack = typeof args[args.length - 1] === 'function' ? args.pop() : null;
+      this.forward(socket, this.ownerOf(String(key)), event, args, !!ack)
+        .then(response => { if (ack) ack(...response); })
+        .catch(error => {
+          this.stats.failedForwards++;
+          console.error('[ClusterRouter] Forward error:', error);
+          if (ack) ack({ success: false, message: error.message });
+        });
+    });
+
+    socket.on('disconnect', () => {
+      for (const owner of socket.clusterOwners) {
+        this.forward(socket, owner, 'disconnect', [], false).catch(error => {
+          console.error('[ClusterRouter] Forward disconnect error:', error);
+        });
+      }
+    });
+  }
+
+  /**
+   * A socket joining another file leaves the previous one on its owner
+   */
+  switchFile(socket, fileId) {
+    const previous = socket.clusterFile;
+    socket.clusterFile = fileId;
+
+    if (!previous || previous === fileId) return;
+
+    // Same owner: its join-room handler releases the previous file
+    const previousOwner = this.ownerOf(previous);
+    if (previousOwner === this.ownerOf(fileId)) return;
+
+    if (previousOwner === this.nodeId) {
+      for (const listener of socket.listeners('leave-room')) {
+        Promise.resolve(listener()).catch(error => {
+          console.error('[ClusterRouter] Local leave error:', error);
+        });
+      }
+    } else {
+      this.forward(socket, previousOwner, 'leave-room', [], false).catch(error => {
+        console.error('[ClusterRouter] Forward leave error:', error);
+      });
+    }
+  }
+
+  forward(socket, owner, event, args, hasAck) {
+    this.stats.forwardedEvents++;
+    socket.clusterOwners.add(owner);
+
+    return new Promise((resolve, reject) => {
+      const requestId = `${this.nodeId}:${this.nextRequestId++}`;
+      const timer = setTimeout(() => {
+        this.pending.delete(requestId);
+        reject(new Error(`Node ${owner} did not answer ${event}`));
+      }, this.REQUEST_TIMEOUT_MS);
+
+      this.pending.set(requestId, { resolve, reject, timer });
+
+      this.broker.publish(`cluster:events:${owner}`, {
+        requestId,
+        from: this.nodeId,
+        socketId: socket.id,
+        // Connection state the handlers read; project presence stays
+        // with the node the socket is connected to
+        context: {
+          userId: socket.userId,
+          userEmail: socket.userEmail,
+          username: socket.username,
+          currentProject: event === 'disconnect' ? null : socket.currentProject
+        },
+        event,
+        args,
+        hasAck
+      });
+    });
+  }
+
+  /**
+   * Owner side: run a forwarded event on the socket's stand-in
+   */
+  async serve({ requestId, from, socketId, context, event, args, hasAck }) {
+    this.stats.servedEvents++;
+
+    let proxy = this.proxies.get(socketId);
+    if (!proxy) {
+      if (event === 'disconnect') {
+        this.reply(from, requestId, []);
+        return;
+      }
+
+      proxy = new RemoteSocket(this.io, socketId);
+      this.registerHandlers(this.io, proxy);
+      this.proxies.set(socketId, proxy);
+    }
+
+    Object.assign(proxy, context);
+    proxy.lastSeen = Date.now();
+
+    try {
+      const response = await proxy.dispatch(event, args, hasAck);
+      this.reply(from, requestId, response);
+    } catch (error) {
+      this.reply(from, requestId, null, error.message);
+    } finally {
+      if (event === 'disconnect') {
+        this.proxies.delete(socketId);
+      }
+    }
+  }
+
+  reply(node, requestId, response, error = null) {
+    this.broker.publish(`cluster:replies:${node}`, { requestId, response, error });
+  }
+
+  settle({ requestId, response, error }) {
+    const request = this.pending.get(requestId);
+    if (!request) return;
+
+    this.pending.delete(requestId);
+    clearTimeout(request.timer);
+
+    if (error) {
+      request.reject(new Error(error));
+    } else {
+      request.resolve(response || []);
+    }
+  }
+
+  /**
+   * Drop stand-ins whose socket is gone (e.g. its node crashed before
+   * forwarding the disconnect)
+   */
+  async sweepProxies() {
+    const idleSince = Date.now() - this.PROXY_SWEEP_MS;
+
+    for (const [socketId, proxy] of this.proxies) {
+      if (proxy.lastSeen > idleSince) continue;
+
+      const sockets = await this.io.in(socketId).fetchSockets();
+      if (sockets.length === 0 && this.proxies.get(socketId) === proxy) {
+        this.proxies.delete(socketId);
+        await proxy.dispatch('disconnect', [], false).catch(error => {
+          console.error('[ClusterRouter] Proxy cleanup error:', error);
+        });
+      } else {
+        proxy.lastSeen = Date.now();
+      }
+    }
+  }
+
+  close() {
+    this.unsubscribers.forEach(unsubscribe => unsubscribe());
+    this.unsubscribers = [];
+    clearInterval(this.sweepTimer);
+
+    for (const { reject, timer } of this.pending.values()) {
+      clearTimeout(timer);
+      reject(new Error('ClusterRouter closed'));
+    }
+    this.pending.clear();
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      nodeId: this.nodeId,
+      nodes: this.nodes,
+      clustered: this.isClustered(),
+      remoteSockets: this.proxies.size,
+      pendingForwards: this.pending.size
+    };
+  }
+}
+
+export { ClusterRouter, RemoteSocket };
+
+// Singleton instance
+const clusterRouter = new ClusterRouter();
+
+export default clusterRouter;
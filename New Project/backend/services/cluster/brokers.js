@@ -0,0 +1,89 @@
+import { EventEmitter } from 'events';
+
+/**
+ * Pub/sub brokers for cross-node messaging
+ *
+ * A broker delivers every message published on a channel to all
+ * subscribers of that channel on every node, including the publisher's
+ * own node. Messages may carry Buffers/Uint8Arrays.
+ *
+ *   publish(channel, message)
+ *   subscribe(channel, handler) -> unsubscribe()
+ *   close()
+ */
+
+/**
+ * In-process broker: several "nodes" in one process share an instance.
+ * Used for single-process setups and tests.
+ */
+export class LocalBroker {
+  constructor() {
+    this.emitter = new EventEmitter();
+    this.emitter.setMaxListeners(0);
+  }
+
+  publish(channel, message) {
+    // Async like a real broker, so publishers never re-enter their handlers
+    setImmediate(() => this.emitter.emit(channel, message));
+  }
+
+  subscribe(channel, handler) {
+    this.emitter.on(channel, handler);
+    return () => this.emitter.off(channel, handler);
+  }
+
+  close() {
+    this.emitter.removeAllListeners();
+  }
+}
+
+const IPC_TYPE = 'cluster:broker';
+
+/**
+ * node:cluster worker broker: messages go to the primary over IPC and are
+ * relayed to every worker (see relayClusterBroker). The primary must use
+ * the 'advanced' serialization so binary payloads survive the hop.
+ */
+export class ClusterIpcBroker {
+  constructor(proc = process) {
+    this.proc = proc;
+    this.emitter = new EventEmitter();
+    this.emitter.setMaxListeners(0);
+
+    this.onMessage = (packet) => {
+      if (packet && packet.type === IPC_TYPE) {
+        this.emitter.emit(packet.channel, packet.message);
+      }
+    };
+    this.proc.on('message', this.onMessage);
+  }
+
+  publish(channel, message) {
+    this.proc.send({ type: IPC_TYPE, channel, message });
+  }
+
+  subscribe(channel, handler) {
+    this.emitter.on(channel, handler);
+    return () => this.emitter.off(channel, handler);
+  }
+
+  close() {
+    this.proc.off('message', this.onMessage);
+    this.emitter.removeAllListeners();
+  }
+}
+
+/**
+ * Primary side of ClusterIpcBroker: fan worker messages out to all workers
+ */
+export function relayClusterBroker(cluster) {
+  cluster.on('message', (source, packet) => {
+    if (!packet || packet.type !== IPC_TYPE) return;
+
+    for (const worker of Object.values(cluster.workers)) {
+      if (worker && worker.isConnected()) {
+        worker.send(packet);
+      }
+    }
+  });
+}
@@ -0,0 +1,118 @@
+/**
+ * Microbenchmark: whole-file SHA-256 vs incremental chunked checksum
+ * Simulates single-keystroke edits at 1 KB, 100 KB and 5 MB file sizes
+ *
+ * Run: node test/checksum-benchmark.js
+ */
+
+import crypto from 'crypto';
+import ChunkedChecksum from '../services/DeltaEngine/utils/chunkedChecksum.js';
+import { applyOps } from '../services/DeltaEngine/utils/editOps.js';
+
+const SIZES = [
+  ['1 KB', 1024],
+  ['100 KB', 100 * 1024],
+  ['5 MB', 5 * 1024 * 1024]
+];
+
+const EDITS = 200;
+
+// Same as utils/checksum.js createChecksum (imported directly to keep deps out)
+function createChecksum(content) {
+  return crypto.createHash('sha256').update(content, 'utf8').digest('hex');
+}
+
+// Source-like text: lines of varying length
+function generateContent(size) {
+  const lines = [
+    'function handler(req, res) {',
+    '  const { id } = req.params;',
+    '  if (!id) return res.status(400).json({ success: false });',
+    '  // TODO: validate input',
+    '}',
+    '',
+    'export default handler;'
+  ];
+
+  let content = '';
+  let i = 0;
+  while (content.length < size) {
+    content += lines[i % lines.length] + ` // ${i}\n`;
+    i++;
+  }
+
+  return content.slice(0, size);
+}
+
+// Random single-character insertions, like typing
+function generateEdits(length, count) {
+  const edits = [];
+  for (let i = 0; i < count; i++) {
+    const from = Math.floor(Math.random() * length);
+    edits.push([{ from, to: from, insert: 'x' }]);
+    length++;
+  }
+  return edits;
+}
+
+function time(fn) {
+  const start = process.hrtime.bigint();
+  fn();
+  return Number(process.hrtime.bigint() - start) / 1e6;
+}
+
+console.log(`Checksum benchmark (${EDITS} single-character edits per size)\n`);
+console.log('size     | full SHA-256 / edit | chunked / edit | speedup | initial build');
+console.log('---------|---------------------|----------------|---------|--------------');
+
+for (const [label, size] of SIZES) {
+  const base = generateContent(size);
+  const edits = generateEdits(base.length, EDITS);
+
+  // Current approach: hash the whole document after every edit
+  let content = base;
+  const fullMs = time(() => {
+    for (const ops of edits) {
+      content = applyOps(content, ops);
+      createChecksum(content);
+    }
+  });
+
+  // Incremental: rehash only the touched chunks
+  content = base;
+  let tree;
+  const buildMs = time(() => {
+    tree = new ChunkedChecksum(base);
+    tree.digest();
+  });
+
+  const applyMs = time(() => {
+    for (const ops of edits) {
+      content = applyOps(content, ops);
+    }
+  });
+
+  content = base;
+  const chunkedMs = time(() => {
+    for (const ops of edits) {
+      content = applyOps(content, ops);
+      tree.applyOps(content, ops).digest();
+    }
+  }) - applyMs;
+
+  const fullTotalMs = fullMs - applyMs;
+
+  // Sanity check: incremental root equals a fresh build
+  const fresh = new ChunkedChecksum(content).digest();
+  if (fresh !== tree.digest()) {
+    throw new Error(`Incremental checksum diverged at ${label}`);
+  }
+
+  const perFull = fullTotalMs / EDITS;
+  const perChunked = chunkedMs / EDITS;
+
+  console.log(
+    `${label.padEnd(8)} | ${perFull.toFixed(4).padStart(16)} ms | ${perChunked.toFixed(4).padStart(11)} ms | ` +
+    `${(perFull / perChunked).toFixed(1).padStart(6)}x | ${buildMs.toFixed(2)} ms (${tree.chunkCount} chunks)`
+  );
+}
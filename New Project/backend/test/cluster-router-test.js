@@ -0,0 +1,166 @@
+/**
+ * Test: file ownership and event forwarding between cluster nodes
+ * Three ClusterRouters share a LocalBroker (the in-process loopback
+ * broker). A socket connected to one node joins files owned by each node;
+ * its events must run exactly once, on the owner, with acks returned to
+ * the socket, and its disconnect must reach every owner it used.
+ *
+ * Run: node test/cluster-router-test.js
+ */
+
+import assert from 'assert';
+import { EventEmitter } from 'events';
+import { ClusterRouter } from '../services/cluster/ClusterRouter.js';
+import { LocalBroker } from '../services/cluster/brokers.js';
+
+const NODES = ['node-0', 'node-1', 'node-2'];
+const broker = new LocalBroker();
+const handled = []; // [nodeId, event, socketId, fileId]
+const emitted = []; // [target, event, payload]
+
+// Minimal io: records emits, no real transport
+function createIo() {
+  const target = (room) => ({
+    emit: (event, payload) => emitted.push([room, event, payload]),
+    except: () => target(room)
+  });
+
+  return {
+    to: target,
+    in: () => ({ socketsJoin() {}, socketsLeave() {}, fetchSockets: async () => [] })
+  };
+}
+
+// Stand-in for the real handlers: remember the file, ack with the node id
+function handlersFor(nodeId) {
+  return (io, socket) => {
+    socket.on('join-room', async ({ fileId }, callback) => {
+      socket.currentFile = fileId;
+      handled.push([nodeId, 'join-room', socket.id, fileId]);
+      callback({ success: true, node: nodeId });
+    });
+
+    socket.on('yjs-sync', async (update) => {
+      handled.push([nodeId, 'yjs-sync', socket.id, socket.currentFile]);
+      socket.to(`room:${socket.currentFile}`).emit('yjs-sync', update);
+    });
+
+    socket.on('delta:update', async ({ fileId }, callback) => {
+      handled.push([nodeId, 'delta:update', socket.id, fileId]);
+      if (callback) callback({ success: true, node: nodeId });
+    });
+
+    socket.on('disconnect', () => {
+      handled.push([nodeId, 'disconnect', socket.id, socket.currentFile]);
+    });
+  };
+}
+
+const routers = NODES.map(nodeId => {
+  const router = new ClusterRouter();
+  const io = createIo();
+  router.configure({ nodeId, nodes: NODES, broker, io, registerHandlers: handlersFor(nodeId) });
+  return router;
+});
+
+// Socket connected to node-0, with Socket.IO's middleware semantics
+class FakeSocket extends EventEmitter {
+  constructor(id) {
+    super();
+    this.id = id;
+    this.userId = 'user-1';
+    this.username = 'alice';
+    this.middlewares = [];
+  }
+
+  to(room) {
+    return createIo().to(room);
+  }
+
+  use(fn) {
+    this.middlewares.push(fn);
+  }
+
+  // Client -> server event
+  receive(event, ...args) {
+    const packet = [event, ...args];
+    const run = (i) => {
+      if (i === this.middlewares.length) {
+        this.listeners(event).forEach(listener => listener(...packet.slice(1)));
+        return;
+      }
+      this.middlewares[i](packet, () => run(i + 1));
+    };
+    run(0);
+  }
+}
+
+const wait = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+const ack = () => {
+  let resolve;
+  const promise = new Promise(r => { resolve = r; });
+  return { promise, callback: (response) => resolve(response) };
+};
+
+// 1. Ownership: deterministic, agreed by every node, spread across nodes
+const files = Array.from({ length: 3000 }, (_, i) => `file-${i}`);
+const counts = Object.fromEntries(NODES.map(node => [node, 0]));
+for (const fileId of files) {
+  const owner = routers[0].ownerOf(fileId);
+  assert.ok(routers.every(router => router.ownerOf(fileId) === owner), 'nodes disagree on owner');
+  counts[owner]++;
+}
+console.log('Ownership spread over 3000 files:', counts);
+for (const node of NODES) {
+  assert.ok(counts[node] > 800, `node ${node} owns too few files`);
+}
+
+// 2. Forwarding: join a file owned by each node from a socket on node-0
+const entry = routers[0];
+const socket = new FakeSocket('socket-1');
+entry.attach(socket);
+handlersFor('node-0')(null, socket);
+
+const fileOwnedBy = (node) => files.find(fileId => entry.ownerOf(fileId) === node);
+
+for (const node of NODES) {
+  const fileId = fileOwnedBy(node);
+  handled.length = 0;
+
+  const joined = ack();
+  socket.receive('join-room', { roomId: 'room-1', fileId }, joined.callback);
+  const response = await joined.promise;
+  assert.deepStrictEqual(response, { success: true, node }, 'join acked by the owner');
+
+  socket.receive('yjs-sync', new Uint8Array([0, 2, 1, 7]));
+  const updated = ack();
+  socket.receive('delta:update', { fileId, ops: [] }, updated.callback);
+  assert.strictEqual((await updated.promise).node, node);
+  await wait(10);
+
+  const events = handled.filter(([, event]) => event !== 'disconnect');
+  assert.deepStrictEqual(
+    events.map(([handler, event, , file]) => [handler, event, file]),
+    [[node, 'join-room', fileId], [node, 'yjs-sync', fileId], [node, 'delta:update', fileId]],
+    `events for a file owned by ${node} run once, on ${node}`
+  );
+
+  const relayed = emitted.pop();
+  assert.deepStrictEqual(relayed.slice(0, 2), [`room:${fileId}`, 'yjs-sync']);
+  assert.ok(relayed[2] instanceof Uint8Array, 'binary payloads survive forwarding');
+}
+
+// 3. Disconnect reaches the remote owners that hold a stand-in
+handled.length = 0;
+socket.emit('disconnect'); // Reserved event: bypasses middleware
+await wait(10);
+
+const disconnected = handled.filter(([, event]) => event === 'disconnect').map(([node]) => node).sort();
+assert.ok(disconnected.includes('node-1') && disconnected.includes('node-2'), 'remote owners saw disconnect');
+assert.strictEqual(routers[1].proxies.size + routers[2].proxies.size, 0, 'stand-ins removed');
+
+console.log('Entry node stats:', entry.getStats());
+console.log('✅ Cluster routing test passed');
+
+routers.forEach(router => router.close());
+broker.close();
@@ -0,0 +1,129 @@
+/**
+ * Benchmark: delta codecs on a patch corpus built from this repo's sources
+ * Simulates edit sessions on backend source files, diffs consecutive
+ * versions, then reports stored size and encode/decode speed per codec.
+ * The dictionary codec is trained on half the files and measured on the
+ * other half. Native codecs encode asynchronously on the libuv threadpool,
+ * so their encode speed here includes one threadpool hop per patch.
+ *
+ * Run: node test/codec-benchmark.js
+ */
+
+import fs from 'fs';
+import path from 'path';
+import zlib from 'zlib';
+import { fileURLToPath } from 'url';
+import { performance } from 'perf_hooks';
+import { computeDiff } from '../services/DeltaEngine/utils/diffUtils.js';
+import { CODECS, encodeDelta, decodeStoredDelta, trainDictionary } from '../services/DeltaEngine/utils/codecs.js';
+
+const ROOT = path.join(path.dirname(fileURLToPath(import.meta.url)), '..');
+const SOURCE_DIRS = ['services', 'controllers', 'routes', 'models', 'utils', 'middleware'];
+const VERSIONS_PER_FILE = 12;
+
+function listSources(dir) {
+  const full = path.join(ROOT, dir);
+  if (!fs.existsSync(full)) return [];
+
+  return fs.readdirSync(full, { withFileTypes: true }).flatMap(entry => {
+    const rel = path.join(dir, entry.name);
+    if (entry.isDirectory()) return listSources(rel);
+    return entry.name.endsWith('.js') ? [path.join(ROOT, rel)] : [];
+  });
+}
+
+// Typical editor session: tweak lines, paste a nearby block, delete a few lines
+function editSession(content) {
+  const lines = content.split('\n');
+  const pick = () => Math.floor(Math.random() * lines.length);
+
+  for (let i = 0; i < 3; i++) {
+    const at = pick();
+    lines[at] = lines[at].replace(/\w+/, word => `${word}Updated`);
+  }
+
+  const from = pick();
+  lines.splice(pick(), 0, ...lines.slice(from, from + 1 + Math.floor(Math.random() * 12)));
+  lines.splice(pick(), Math.floor(Math.random() * 4));
+
+  return lines.join('\n');
+}
+
+function buildCorpus(files) {
+  const patches = [];
+
+  for (const file of files) {
+    let content = fs.readFileSync(file, 'utf8');
+    for (let v = 0; v < VERSIONS_PER_FILE; v++) {
+      const next = editSession(content);
+      patches.push(computeDiff(content, next).patch);
+      content = next;
+    }
+  }
+
+  return patches;
+}
+
+async function measure(name, patches, encode, decode) {
+  const raw = patches.reduce((total, p) => total + Buffer.byteLength(p, 'utf8'), 0);
+
+  let start = performance.now();
+  const encoded = [];
+  for (const patch of patches) {
+    encoded.push(await encode(patch));
+  }
+  const encodeMs = performance.now() - start;
+
+  start = performance.now();
+  for (let i = 0; i < encoded.length; i++) {
+    if (decode(encoded[i]) !== patches[i]) {
+      throw new Error(`${name}: round-trip mismatch`);
+    }
+  }
+  const decodeMs = performance.now() - start;
+
+  const stored = encoded.reduce((total, e) => total + e.size, 0);
+  const mb = raw / (1024 * 1024);
+
+  console.log(
+    `${name.padEnd(18)} | ${(stored / 1024).toFixed(0).padStart(8)} KB | ${(stored / raw).toFixed(3).padStart(6)} | ` +
+    `${(mb / (encodeMs / 1000)).toFixed(1).padStart(8)} MB/s | ${(mb / (decodeMs / 1000)).toFixed(1).padStart(8)} MB/s`
+  );
+}
+
+const files = SOURCE_DIRS.flatMap(listSources);
+const half = Math.ceil(files.length / 2);
+const training = buildCorpus(files.slice(0, half));
+const patches = buildCorpus(files.slice(half));
+const rawKb = patches.reduce((total, p) => total + Buffer.byteLength(p, 'utf8'), 0) / 1024;
+
+console.log(`Codec benchmark: ${patches.length} patches (${rawKb.toFixed(0)} KB) from ${files.length - half} files\n`);
+console.log('codec              |  stored     | ratio  |  encode       |  decode');
+console.log('-------------------|-------------|--------|---------------|--------------');
+
+// Legacy format: gzip level 6, base64 in a String field
+await measure('gzip+base64 (old)', patches,
+  async (patch) => {
+    const data = zlib.gzipSync(Buffer.from(patch, 'utf8'), { level: 6 }).toString('base64');
+    return { delta: data, size: Buffer.byteLength(data) };
+  },
+  (e) => decodeStoredDelta({ delta: e.delta, compressed: true }));
+
+for (const codec of Object.keys(CODECS).filter(name => name !== 'deflate-dict')) {
+  await measure(codec, patches,
+    async (patch) => {
+      const result = await encodeDelta(patch, codec);
+      return { ...result, size: result.compressedSize };
+    },
+    (e) => decodeStoredDelta({ deltaData: e.data, codec }));
+}
+
+const dictionary = trainDictionary(training);
+const dictionaries = { bench: dictionary };
+
+await measure(`deflate-dict ${(dictionary.length / 1024).toFixed(0)}KB`, patches,
+  async (patch) => {
+    const result = await encodeDelta(patch, 'deflate-dict', dictionary);
+    return { ...result, size: result.compressedSize };
+  },
+  (e) => decodeStoredDelta({ deltaData: e.data, codec: 'deflate-dict', dictionaryId: 'bench' }, dictionaries));
@@ -0,0 +1,113 @@
+/**
+ * Test: DeltaScheduler on the shared timer wheel
+ * Drives thousands of files through edit bursts with shortened thresholds
+ * and checks that idle deadlines are moved rather than recreated, that
+ * bursts coalesce into one snapshot per file, that a single interval
+ * serves every deadline, that snapshots of one file run one at a time,
+ * and that unregistering cancels everything.
+ *
+ * Run: node test/delta-scheduler-test.js
+ */
+
+import assert from 'assert';
+import DeltaScheduler from '../services/DeltaEngine/DeltaScheduler.js';
+import DocumentBuffers from '../services/DeltaEngine/DocumentBuffers.js';
+
+const FILES = 5000;
+const EDITS_PER_FILE = 20;
+
+const created = [];
+const deltaManager = {
+  async createSnapshot(snapshot) {
+    created.push(snapshot);
+  }
+};
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Count intervals created while the scheduler runs
+const timers = { intervals: 0 };
+const realSetInterval = globalThis.setInterval;
+globalThis.setInterval = (...args) => { timers.intervals++; return realSetInterval(...args); };
+
+// The scheduler logs every file event
+const log = console.log;
+console.log = () => {};
+
+const buffers = new DocumentBuffers({ maxDocuments: FILES });
+const scheduler = new DeltaScheduler(deltaManager, buffers);
+scheduler.updateConfig({ idleThreshold: 300, batchDelay: 50, timeInterval: 60000, editCountThreshold: 1000 });
+
+for (let i = 0; i < FILES; i++) {
+  buffers.ensure(`file-${i}`, 'start');
+  scheduler.registerFile(`file-${i}`, 'project-1', 'user-1');
+}
+
+// 1. Edit bursts: every edit moves the file's idle deadline
+const startedAt = Date.now();
+for (let round = 0; round < EDITS_PER_FILE; round++) {
+  for (let i = 0; i < FILES; i++) {
+    buffers.sync(`file-${i}`, `edit ${round}`);
+    scheduler.onEdit({ fileId: `file-${i}`, projectId: 'project-1', userId: 'user-1' });
+  }
+}
+const scheduleMs = Date.now() - startedAt;
+
+let stats = scheduler.getStats();
+assert.strictEqual(stats.wheel.pending, FILES * 2, 'one idle + one interval deadline per file');
+assert.strictEqual(stats.wheel.rescheduled, FILES * (EDITS_PER_FILE - 1), 'idle deadlines moved in place');
+assert.strictEqual(timers.intervals, 1, 'a single interval drives every deadline');
+
+// 2. Idle deadlines fire once, then the batch creates one snapshot per file
+await sleep(600);
+stats = scheduler.getStats();
+assert.strictEqual(created.length, FILES);
+assert.ok(created.every(snapshot => snapshot.trigger === 'idle' && snapshot.newContent === `edit ${EDITS_PER_FILE - 1}`));
+assert.strictEqual(stats.fired, FILES);
+
+// 3. Rapid triggers on one file coalesce into one snapshot
+created.length = 0;
+buffers.sync('file-0', 'saved');
+scheduler.onSave({ fileId: 'file-0', projectId: 'project-1', userId: 'user-1' });
+scheduler.onFocusLoss({ fileId: 'file-0', projectId: 'project-1', userId: 'user-1' });
+scheduler.onManualSave({ fileId: 'file-0', projectId: 'project-1', userId: 'user-1', message: 'Checkpoint' });
+await sleep(150);
+assert.strictEqual(created.length, 1);
+assert.strictEqual(created[0].trigger, 'manual');
+assert.strictEqual(created[0].message, 'Checkpoint');
+assert.ok(scheduler.getStats().coalesced >= 2);
+
+// 4. Snapshots of one file run one at a time, each on the previous one's content
+created.length = 0;
+let running = 0;
+deltaManager.createSnapshot = async (snapshot) => {
+  assert.strictEqual(++running, 1, 'no overlapping snapshots of a file');
+  await sleep(20);
+  created.push(snapshot);
+  running--;
+};
+buffers.sync('file-1', 'flushed');
+const flushed = scheduler.flushSnapshot('file-1', { projectId: 'project-1', userId: 'user-1', trigger: 'idle' });
+const saved = scheduler.runExclusive('file-1', async () => {
+  await deltaManager.createSnapshot({ fileId: 'file-1', newContent: 'saved', oldContent: buffers.get('file-1').snapshotContent });
+  buffers.sync('file-1', 'saved');
+  buffers.markSnapshot('file-1', 'saved');
+});
+await Promise.all([flushed, saved]);
+assert.deepStrictEqual(created.map(snapshot => snapshot.oldContent), [`edit ${EDITS_PER_FILE - 1}`, 'flushed']);
+assert.strictEqual(scheduler.snapshotChains.size, 0, 'settled chains are dropped');
+
+// 5. Unregistering cancels pending deadlines; the wheel goes quiet
+for (let i = 0; i < FILES; i++) {
+  scheduler.unregisterFile(`file-${i}`);
+}
+stats = scheduler.getStats();
+assert.strictEqual(stats.wheel.pending, 0);
+assert.strictEqual(stats.wheel.running, false, 'no interval left when nothing is scheduled');
+
+globalThis.setInterval = realSetInterval;
+console.log = log;
+
+console.log(`${FILES * EDITS_PER_FILE} edits scheduled in ${scheduleMs}ms`);
+console.log('Stats:', stats);
+console.log('✅ Delta scheduler test passed');
@@ -0,0 +1,102 @@
+/**
+ * Benchmark: event loop delay with delta work inline vs on DeltaWorkerPool
+ * Runs large diffs, delta encoding and patch replays while a 5ms heartbeat stands in
+ * for socket traffic, and reports how late the heartbeat fires
+ *
+ * Run: node test/delta-worker-benchmark.js
+ */
+
+import { performance } from 'perf_hooks';
+import { DeltaWorkerPool } from '../services/DeltaEngine/DeltaWorkerPool.js';
+import DeltaCompressor from '../services/DeltaEngine/DeltaCompressor.js';
+
+const LINES = 40000; // ~1.6 MB file
+const EDITS = 400;
+const ROUNDS = 4;
+const HEARTBEAT_MS = 5;
+
+function generateContent(lines) {
+  const out = [];
+  for (let i = 0; i < lines; i++) {
+    out.push(`  const value${i} = compute(${i % 97}, "${(i * 7919) % 1000}");`);
+  }
+  return out.join('\n') + '\n';
+}
+
+function editContent(content, edits) {
+  const lines = content.split('\n');
+  for (let i = 0; i < edits; i++) {
+    const at = Math.floor(Math.random() * lines.length);
+    if (i % 3 === 0) lines.splice(at, 0, `// inserted ${i}`);
+    else if (i % 3 === 1) lines.splice(at, 1);
+    else lines[at] += ' // changed';
+  }
+  return lines.join('\n');
+}
+
+async function workload(pool, versions) {
+  const deltas = [];
+
+  for (let i = 1; i < versions.length; i++) {
+    const diff = await pool.diff(versions[i - 1], versions[i]);
+    const encoded = await DeltaCompressor.encode(diff.patch, 'brotli');
+    deltas.push({ deltaData: encoded.data, codec: encoded.codec });
+  }
+
+  const replayed = await pool.replay(versions[0], deltas);
+  if (replayed !== versions[versions.length - 1]) {
+    throw new Error('Replay mismatch');
+  }
+}
+
+async function measure(label, pool, versions) {
+  // Heartbeat lateness = how long a socket message would wait for the loop
+  const lateness = [];
+  let last = performance.now();
+  const heartbeat = setInterval(() => {
+    const now = performance.now();
+    lateness.push(Math.max(0, now - last - HEARTBEAT_MS));
+    last = now;
+  }, HEARTBEAT_MS);
+
+  const start = performance.now();
+  await workload(pool, versions);
+  const elapsed = performance.now() - start;
+
+  // Let a heartbeat blocked by the last synchronous step report in
+  await new Promise(resolve => setTimeout(resolve, HEARTBEAT_MS * 2));
+  clearInterval(heartbeat);
+
+  lateness.sort((a, b) => a - b);
+  const pick = q => (lateness[Math.min(lateness.length - 1, Math.floor(q * lateness.length))] || 0).toFixed(1);
+
+  console.log(
+    `${label.padEnd(8)} | ${elapsed.toFixed(0).padStart(7)} ms | ` +
+    `p50 ${pick(0.5).padStart(6)} ms | p99 ${pick(0.99).padStart(6)} ms | ` +
+    `max ${pick(1).padStart(6)} ms`
+  );
+}
+
+const versions = [generateContent(LINES)];
+for (let i = 0; i < ROUNDS; i++) {
+  versions.push(editContent(versions[versions.length - 1], EDITS));
+}
+
+console.log(`Delta worker benchmark (${LINES} lines, ${ROUNDS} versions x ${EDITS} edits)\n`);
+console.log('mode     |    wall    | heartbeat lateness');
+console.log('---------|------------|-----------------------------------------');
+
+const inline = new DeltaWorkerPool({ inlineThreshold: Infinity });
+const pooled = new DeltaWorkerPool();
+
+await measure('inline', inline, versions);
+await measure('pool', pooled, versions); // includes worker startup
+await measure('pool', pooled, versions);
+
+console.log('\nPool stats:', JSON.stringify({
+  ...pooled.getStats(),
+  eventLoopDelay: undefined
+}));
+
+await inline.close();
+await pooled.close();
@@ -0,0 +1,155 @@
+/**
+ * Benchmark: FileVersion diffs, index-based vs the shared Myers engine
+ * Simulates edit sessions on this repo's sources (line tweaks, pasted
+ * blocks, deletions, an insert at the top) and reports stored diff size,
+ * changed-line counts and diff time for the previous index-by-index diff
+ * and for utils/diffUtil. Also checks every diff applies back through
+ * applyPatch, and that a worst case (unrelated documents) stays within
+ * the time budget.
+ *
+ * Run: node test/diff-benchmark.js
+ */
+
+import fs from 'fs';
+import path from 'path';
+import assert from 'assert';
+import { fileURLToPath } from 'url';
+import { performance } from 'perf_hooks';
+import { diffVersions, generateDiff, applyPatch } from '../utils/diffUtil.js';
+
+const ROOT = path.join(path.dirname(fileURLToPath(import.meta.url)), '..');
+const SOURCE_DIRS = ['services', 'controllers', 'routes', 'models', 'utils'];
+const VERSIONS_PER_FILE = 8;
+
+function listSources(dir) {
+  const full = path.join(ROOT, dir);
+  if (!fs.existsSync(full)) return [];
+
+  return fs.readdirSync(full, { withFileTypes: true }).flatMap(entry => {
+    const rel = path.join(dir, entry.name);
+    if (entry.isDirectory()) return listSources(rel);
+    return entry.name.endsWith('.js') ? [path.join(ROOT, rel)] : [];
+  });
+}
+
+// Typical save: tweak lines, paste a nearby block, delete a few lines,
+// and every other version add an import at the top
+function editSession(content, version) {
+  const lines = content.split('\n');
+  const pick = () => Math.floor(Math.random() * lines.length);
+
+  for (let i = 0; i < 3; i++) {
+    const at = pick();
+    lines[at] = lines[at].replace(/\w+/, word => `${word}Updated`);
+  }
+
+  const from = pick();
+  lines.splice(pick(), 0, ...lines.slice(from, from + 1 + Math.floor(Math.random() * 12)));
+  lines.splice(pick(), Math.floor(Math.random() * 4));
+
+  if (version % 2 === 0) {
+    lines.unshift(`import helper${version} from './helper${version}.js';`);
+  }
+
+  return lines.join('\n');
+}
+
+/**
+ * The previous diffUtil: compares line i with line i
+ */
+function indexBasedDiff(oldContent, newContent, oldLabel, newLabel) {
+  const oldLines = oldContent ? oldContent.split('\n') : [];
+  const newLines = newContent ? newContent.split('\n') : [];
+
+  let diffString = `--- ${oldLabel}\n+++ ${newLabel}\n`;
+  const hunkLines = [];
+  let changed = 0;
+
+  for (let i = 0; i < Math.max(oldLines.length, newLines.length); i++) {
+    const oldLine = oldLines[i];
+    const newLine = newLines[i];
+
+    if (oldLine === newLine) {
+      hunkLines.push(` ${oldLine || ''}`);
+    } else {
+      changed++;
+      if (oldLine !== undefined) hunkLines.push(`-${oldLine}`);
+      if (newLine !== undefined) hunkLines.push(`+${newLine}`);
+    }
+  }
+
+  if (hunkLines.length > 0) {
+    diffString += `@@ -1,${oldLines.length} +1,${newLines.length} @@\n`;
+    diffString += hunkLines.join('\n');
+  }
+
+  return { diff: diffString, changed };
+}
+
+function buildCorpus(files) {
+  const pairs = [];
+
+  for (const file of files) {
+    let content = fs.readFileSync(file, 'utf8');
+    for (let v = 0; v < VERSIONS_PER_FILE; v++) {
+      const next = editSession(content, v);
+      pairs.push([content, next]);
+      content = next;
+    }
+  }
+
+  return pairs;
+}
+
+function measure(name, pairs, diff) {
+  let bytes = 0;
+  let changedLines = 0;
+  const start = performance.now();
+
+  for (const [oldContent, newContent] of pairs) {
+    const result = diff(oldContent, newContent);
+    bytes += Buffer.byteLength(result.diff, 'utf8');
+    changedLines += result.changed;
+  }
+
+  const ms = performance.now() - start;
+  return {
+    name,
+    diffs: pairs.length,
+    totalKB: Math.round(bytes / 1024),
+    avgBytes: Math.round(bytes / pairs.length),
+    avgChangedLines: Math.round(changedLines / pairs.length),
+    totalMs: Math.round(ms),
+    avgMs: Number((ms / pairs.length).toFixed(3))
+  };
+}
+
+const files = SOURCE_DIRS.flatMap(listSources);
+const pairs = buildCorpus(files);
+console.log(`Corpus: ${files.length} files x ${VERSIONS_PER_FILE} versions = ${pairs.length} diffs`);
+
+// Correctness: every minimal diff applies back to the new version
+for (const [oldContent, newContent] of pairs) {
+  assert.strictEqual(applyPatch(oldContent, generateDiff(oldContent, newContent)), newContent);
+}
+
+const results = [
+  measure('index-based (previous)', pairs, (a, b) => indexBasedDiff(a, b, 'v1', 'v2')),
+  measure('myers (diffUtil)', pairs, (a, b) => {
+    const { diff, stats } = diffVersions(a, b, 'v1', 'v2');
+    return { diff, changed: stats.totalChanges };
+  })
+];
+console.table(results);
+
+// Worst case: unrelated 20k-line documents fall back to one block within budget
+const unrelated = (seed) => Array.from({ length: 20000 }, (_, i) => `line ${(i * seed) % 7919} ${seed}`).join('\n');
+const start = performance.now();
+const worst = diffVersions(unrelated(31), unrelated(37), 'v1', 'v2');
+const worstMs = Math.round(performance.now() - start);
+console.log(`Unrelated 20k-line documents: ${worstMs}ms, coarse=${worst.coarse}, ${Math.round(worst.diff.length / 1024)}KB`);
+
+const [previous, myers] = results;
+assert.ok(myers.totalKB < previous.totalKB, 'minimal diffs are smaller');
+console.log(`Diff size: ${(previous.totalKB / Math.max(myers.totalKB, 1)).toFixed(1)}x smaller`);
+console.log('✅ Diff benchmark passed');
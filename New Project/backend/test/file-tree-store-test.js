@@ -0,0 +1,138 @@
+/**
+ * Test: FileTreeStore persistence and concurrency
+ * Runs against a temporary directory: migrates a legacy <projectId>.json,
+ * applies concurrent mutations, compacts, and checks that a second store
+ * instance (another process in cluster mode) sees every change and is
+ * serialized with the first by the project lockfile. Also covers
+ * paginated listings, structure versions and content ETags.
+ *
+ * Run: node test/file-tree-store-test.js
+ */
+
+import assert from 'assert';
+import fs from 'fs/promises';
+import os from 'os';
+import path from 'path';
+import { FileTreeStore } from '../services/FileTreeStore.js';
+
+const rootDir = await fs.mkdtemp(path.join(os.tmpdir(), 'file-tree-'));
+const projectId = 'project-1';
+
+await fs.writeFile(path.join(rootDir, `${projectId}.json`), JSON.stringify({
+  id: 'root',
+  name: 'root',
+  type: 'folder',
+  children: [
+    { id: 'src', name: 'src', type: 'folder', children: [
+      { id: 'index.js', name: 'index.js', type: 'file', content: 'console.log(1);' }
+    ] },
+    { id: 'readme.md', name: 'README.md', type: 'file', content: '# Hi' }
+  ]
+}));
+
+const store = new FileTreeStore({ rootDir });
+store.COMPACT_AFTER_OPS = 50;
+
+try {
+  // 1. Legacy structure is migrated with contents out of line
+  const migrated = await store.getStructure(projectId);
+  assert.strictEqual(migrated.children[0].children[0].content, 'console.log(1);');
+  const snapshot = await fs.readFile(path.join(rootDir, projectId, 'tree.json'), 'utf-8');
+  assert.ok(!snapshot.includes('console.log'), 'tree.json holds no contents');
+  assert.strictEqual(store.stats.migrations, 1);
+
+  // 2. Concurrent creates in one folder: serialized, duplicates rejected
+  const creates = await Promise.allSettled(
+    Array.from({ length: 120 }, (_, i) => store.create(projectId, ['root', 'src'], {
+      id: `file-${i}`,
+      name: `file-${i % 100}.js`, // 20 duplicate names
+      type: 'file',
+      content: `// ${i}`
+    }))
+  );
+  const rejected = creates.filter(result => result.status === 'rejected');
+  assert.strictEqual(rejected.length, 20);
+  assert.ok(rejected.every(result => result.reason.status === 409));
+
+  // 3. Rename, content update, delete
+  await store.rename(projectId, ['src', 'file-1'], 'renamed.js');
+  await store.updateContent(projectId, ['src', 'file-2'], 'updated');
+  await store.create(projectId, [], { id: 'lib', name: 'lib', type: 'folder' });
+  await store.create(projectId, ['lib'], { id: 'util.js', name: 'util.js', type: 'file', content: 'x' });
+  const deleted = await store.remove(projectId, ['lib']);
+  assert.strictEqual(deleted.children[0].content, 'x');
+
+  await assert.rejects(store.getFile(projectId, ['lib', 'util.js']), { status: 404 });
+  await assert.rejects(store.rename(projectId, ['src', 'file-3'], 'renamed.js'), { status: 409 });
+  await assert.rejects(store.getStructure('../etc'), { status: 400 });
+
+  assert.ok(store.stats.compactions >= 1, 'op log was compacted');
+  assert.strictEqual(store.stats.contentWrites, 100 + 1 + 1, 'one blob write per file change');
+
+  // 4. A second instance reads the same state, then sees further appends
+  const other = new FileTreeStore({ rootDir });
+  const expected = await store.getStructure(projectId);
+  assert.deepStrictEqual(await other.getStructure(projectId), expected);
+
+  await store.create(projectId, ['src'], { id: 'late.js', name: 'late.js', type: 'file', content: 'late' });
+  assert.strictEqual((await other.getFile(projectId, ['src', 'late.js'])).content, 'late');
+
+  const src = (await other.getStructure(projectId)).children.find(child => child.id === 'src');
+  assert.strictEqual(src.children.length, 1 + 100 + 1);
+  assert.ok(src.children.some(child => child.name === 'renamed.js'));
+  assert.strictEqual(src.children.find(child => child.id === 'file-2').content, 'updated');
+
+  // 5. Lazy listing: pages of children, versions shared across instances
+  const version = await store.getVersion(projectId);
+  assert.strictEqual(await other.getVersion(projectId), version);
+
+  const listed = [];
+  let cursor = 0;
+  while (cursor !== null) {
+    const page = await other.listChildren(projectId, ['root', 'src'], { offset: cursor, limit: 40 });
+    assert.strictEqual(page.version, version);
+    listed.push(...page.children);
+    cursor = page.nextCursor;
+  }
+  assert.strictEqual(listed.length, 102);
+  assert.ok(listed.every(child => !('content' in child)), 'listings carry no contents');
+
+  // 6. Content ETags: unchanged content is not read again
+  const file = await store.getFile(projectId, ['src', 'late.js']);
+  const revalidated = await store.getFile(projectId, ['src', 'late.js'], { ifNoneMatch: file.etag });
+  assert.ok(revalidated.notModified && !('content' in revalidated));
+
+  await new Promise(resolve => setTimeout(resolve, 5));
+  const updated = await store.updateContent(projectId, ['src', 'late.js'], 'later');
+  assert.notStrictEqual(updated.etag, file.etag);
+  assert.strictEqual((await other.getFile(projectId, ['src', 'late.js'], { ifNoneMatch: file.etag })).content, 'later');
+  assert.strictEqual(await store.getVersion(projectId), version, 'content edits keep the structure version');
+
+  // 7. Creates racing across instances: the lockfile serializes check + append
+  const raced = await Promise.allSettled(
+    Array.from({ length: 40 }, (_, i) => (i % 2 ? other : store).create(projectId, ['src'], {
+      id: `race-${i}`,
+      name: `race-${i % 20}.js`, // each name requested once per instance
+      type: 'file'
+    }))
+  );
+  assert.strictEqual(raced.filter(result => result.status === 'rejected').length, 20);
+  const racedSrc = (await store.getStructure(projectId, { withContent: false })).children.find(child => child.id === 'src');
+  assert.strictEqual(racedSrc.children.filter(child => child.name.startsWith('race-')).length, 20);
+  assert.deepStrictEqual(await other.getStructure(projectId), await store.getStructure(projectId));
+  await assert.rejects(fs.access(path.join(rootDir, projectId, 'lock')), { code: 'ENOENT' });
+
+  // 8. A log shorter than what was read was replaced: reload, don't skip it
+  const logFile = path.join(rootDir, projectId, 'ops.log');
+  await other.getStructure(projectId);
+  await fs.writeFile(`${logFile}.new`, `${JSON.stringify({ op: 'create', parent: '', node: { id: 'fresh', name: 'fresh', type: 'folder' } })}\n`);
+  await fs.rename(`${logFile}.new`, logFile);
+  const reloaded = await other.getStructure(projectId, { withContent: false });
+  assert.ok(reloaded.children.some(child => child.id === 'fresh'));
+
+  const blobs = await fs.readdir(path.join(rootDir, projectId, 'content'));
+  console.log('Stats:', store.getStats(), `blobs on disk: ${blobs.length}`);
+  console.log('✅ File tree store test passed');
+} finally {
+  await fs.rm(rootDir, { recursive: true, force: true });
+}
@@ -0,0 +1,117 @@
+/**
+ * Test + benchmark: persistent shell sessions
+ * Runs commands through a real ShellSessionPool (bash) and checks the
+ * framing: exit codes, cwd and exported variables survive between
+ * commands, output never contains the marker, an interrupt stops a
+ * running command but keeps the shell, a terminal id is refused to other
+ * projects and users. Then compares command round trip
+ * against the previous spawn-per-command approach.
+ *
+ * Run: node test/shell-session-benchmark.js
+ */
+
+import assert from 'assert';
+import { spawn } from 'child_process';
+import os from 'os';
+import { ShellSessionPool, MarkerParser } from '../services/ShellSessionPool.js';
+import terminalOutput from '../services/TerminalOutput.js';
+
+const ROUNDS = 200;
+
+let received = '';
+const io = {
+  to: () => ({ emit: (event, payload) => { received += payload.output; } }),
+  sockets: { adapter: { rooms: new Map() }, sockets: new Map() }
+};
+
+const percentile = (samples, q) => {
+  const sorted = [...samples].sort((a, b) => a - b);
+  return sorted[Math.min(sorted.length - 1, Math.floor(q * sorted.length))];
+};
+
+// 1. Parser: markers split across chunks are stripped
+const markers = [];
+const parser = new MarkerParser('__CE_x__', (code, cwd) => markers.push({ code, cwd }));
+const shown = ['out\n', '\n__CE', '_x__ 3 /tmp/a b', '\nmore'].map(chunk => parser.push(chunk)).join('');
+assert.strictEqual(shown, 'out\nmore');
+assert.deepStrictEqual(markers, [{ code: 3, cwd: '/tmp/a b' }]);
+
+const pool = new ShellSessionPool();
+const cwd = os.tmpdir();
+const shell = await pool.acquire({ io, terminalId: 't1', projectId: 'p1', shell: 'bash', cwd });
+
+try {
+  // 2. Exit codes and output
+  received = '';
+  assert.strictEqual((await shell.exec('echo hello')).code, 0);
+  assert.strictEqual((await shell.exec('exit_code() { return 7; }; exit_code')).code, 7);
+  assert.strictEqual((await shell.exec('no-such-command-here 2>/dev/null')).code, 127);
+  assert.strictEqual((await shell.exec("echo 'it''s' \"quoted\"")).code, 0);
+  terminalOutput.get('t1').flush();
+  assert.ok(received.includes('hello\n') && received.includes('its quoted\n'));
+  assert.ok(!received.includes('__CE_'), 'marker never reaches the terminal');
+
+  // 3. Shell state persists between commands
+  await shell.exec('cd / && export CE_TEST=persisted');
+  received = '';
+  const state = await shell.exec('echo "$CE_TEST"');
+  terminalOutput.get('t1').flush();
+  assert.strictEqual(state.cwd, '/');
+  assert.strictEqual(received, 'persisted\n');
+
+  // 4. A one-off cwd does not move the shell
+  const scoped = await shell.exec('pwd', { cwd });
+  assert.strictEqual(scoped.cwd, '/');
+
+  // 5. Interrupt stops the command, the shell survives
+  const running = shell.exec('sleep 30');
+  await new Promise(resolve => setTimeout(resolve, 200));
+  shell.interrupt();
+  const interrupted = await running;
+  assert.notStrictEqual(interrupted.code, 0);
+  assert.ok(interrupted.durationMs < 5000);
+  assert.strictEqual(pool.get('t1'), shell, 'same shell after interrupt');
+  assert.strictEqual((await shell.exec('echo "$CE_TEST"')).code, 0);
+
+  // 6. Sessions are bound to their project and user
+  await assert.rejects(pool.acquire({ io, terminalId: 't1', projectId: 'p2', shell: 'bash', cwd }), /another project/);
+  assert.throws(() => pool.reattach('t1', { projectId: 'p1', userId: 'intruder' }), /another project/);
+  assert.strictEqual(pool.get('t1', { projectId: 'p2' }), null);
+  assert.strictEqual(pool.reattach('t1', { projectId: 'p1' }), shell);
+  assert.strictEqual(pool.getStats().foreign, 2);
+
+  // 7. Per-project limit reaps the least recently used idle shell
+  pool.MAX_SESSIONS_PER_PROJECT = 2;
+  await pool.acquire({ io, terminalId: 't2', projectId: 'p1', shell: 'bash', cwd });
+  await pool.acquire({ io, terminalId: 't3', projectId: 'p1', shell: 'bash', cwd });
+  assert.strictEqual(pool.get('t1'), null, 'oldest idle shell reaped');
+  assert.strictEqual(pool.getStats().sessionsReaped, 1);
+
+  // 8. Round trip: spawn per command (before) vs persistent shell (after)
+  const spawned = [];
+  for (let i = 0; i < ROUNDS; i++) {
+    const startedAt = Date.now();
+    await new Promise((resolve) => {
+      const child = spawn('bash', ['-c', 'true'], { cwd, detached: true });
+      child.stdout.resume();
+      child.stderr.resume();
+      child.on('close', resolve);
+    });
+    spawned.push(Date.now() - startedAt);
+  }
+
+  const session = pool.get('t2');
+  const persistent = [];
+  for (let i = 0; i < ROUNDS; i++) {
+    persistent.push((await session.exec('true')).durationMs);
+  }
+
+  console.log(`spawn per command: p50 ${percentile(spawned, 0.5)}ms, p95 ${percentile(spawned, 0.95)}ms`);
+  console.log(`persistent shell:  p50 ${percentile(persistent, 0.5)}ms, p95 ${percentile(persistent, 0.95)}ms`);
+  assert.ok(percentile(persistent, 0.5) <= percentile(spawned, 0.5), 'persistent shell is not slower');
+
+  console.log('Stats:', pool.getStats());
+  console.log('✅ Shell session test passed');
+} finally {
+  pool.closeAll();
+}
@@ -0,0 +1,93 @@
+/**
+ * Test: terminal output pipeline
+ * Spawns a real child that splits multi-byte characters across writes and
+ * then floods stdout, and checks that the room receives intact text in
+ * far fewer frames than chunks, that scrollback stays bounded and replays,
+ * and that a lagging client pauses the child until it drains.
+ *
+ * Run: node test/terminal-output-test.js
+ */
+
+import assert from 'assert';
+import { spawn } from 'child_process';
+import { TerminalOutput } from '../services/TerminalOutput.js';
+
+const frames = [];
+const client = { id: 'socket-1', conn: { writeBuffer: [] } };
+
+// Minimal io: one local socket in the project room
+const io = {
+  to: () => ({ emit: (event, payload) => frames.push(payload) }),
+  sockets: {
+    adapter: { rooms: new Map([['project:p1', new Set([client.id])]]) },
+    sockets: new Map([[client.id, client]])
+  }
+};
+
+const CHILD = `
+const euro = Buffer.from('€');
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+(async () => {
+  // A 3-byte character split across two writes
+  process.stdout.write(euro.subarray(0, 2));
+  await sleep(30);
+  process.stdout.write(euro.subarray(2));
+  process.stdout.write('\\n');
+  for (let i = 0; i < 5000; i++) {
+    process.stdout.write('line ' + i + ' ✓\\n');
+    if (i % 500 === 0) await sleep(5);
+  }
+})();
+`;
+
+const run = (hub, terminalId) => new Promise((resolve) => {
+  const child = spawn(process.execPath, ['-e', CHILD]);
+  let chunks = 0;
+  child.stdout.on('data', () => chunks++);
+
+  hub.open(io, terminalId, 'p1').attach(child);
+  child.on('close', () => resolve(chunks));
+});
+
+const expected = '€\n' + Array.from({ length: 5000 }, (_, i) => `line ${i} ✓\n`).join('');
+
+// 1. Batching and UTF-8 decoding
+const hub = new TerminalOutput();
+hub.SCROLLBACK_CHARS = 10 * 1024;
+
+const chunks = await run(hub, 't1');
+const received = frames.map(frame => frame.output).join('');
+
+assert.strictEqual(received, expected, 'output decoded intact and in order');
+assert.ok(!received.includes('�'), 'no replacement characters');
+console.log(`Chunks from child: ${chunks}, frames to room: ${frames.length}`);
+assert.ok(frames.length < chunks, 'chunks coalesced into fewer frames');
+
+// 2. Scrollback is bounded and replays the tail
+const stream = hub.get('t1');
+assert.ok(stream.scrollback.chars <= hub.SCROLLBACK_CHARS);
+
+const replayed = [];
+hub.replay({ emit: (event, payload) => replayed.push(payload) }, 't1');
+assert.strictEqual(replayed.length, 1);
+assert.ok(replayed[0].replay);
+assert.ok(expected.endsWith(replayed[0].output), 'replay is the most recent output');
+
+// 3. Backpressure: a lagging client pauses the child until it drains
+frames.length = 0;
+client.conn.writeBuffer = new Array(hub.HIGH_WATER + 1);
+const drain = setTimeout(() => { client.conn.writeBuffer = []; }, 300);
+
+const started = Date.now();
+await run(hub, 't2');
+clearTimeout(drain);
+
+const stats = hub.getStats();
+assert.ok(stats.pauses >= 1, 'child was paused');
+assert.ok(Date.now() - started >= 300, 'output waited for the client to drain');
+assert.strictEqual(frames.map(frame => frame.output).join(''), expected, 'nothing lost while paused');
+
+console.log('Stats:', stats);
+hub.close('t1');
+hub.close('t2');
+console.log('✅ Terminal output test passed');
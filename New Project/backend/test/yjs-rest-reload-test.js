@@ -0,0 +1,93 @@
+/**
+ * Test: REST writes survive the collaborative update log
+ * Against a running server: opens a file's Yjs document, saves a snapshot
+ * and reverts it through the REST API, and after each write checks that
+ * a freshly synced document holds the written content (the log, not
+ * File.content, is what collaborative sessions load).
+ *
+ * Run: CODE_SYNC_JWT=<token> ROOM_ID=<room> FILE_ID=<file> node test/yjs-rest-reload-test.js
+ */
+
+import assert from 'assert';
+import { io } from 'socket.io-client';
+import * as Y from 'yjs';
+import * as encoding from 'lib0/encoding';
+import * as decoding from 'lib0/decoding';
+import * as syncProtocol from 'y-protocols/sync';
+
+const BASE_URL = process.env.CODE_SYNC_URL || 'http://localhost:5000';
+const TOKEN = process.env.CODE_SYNC_JWT;
+const ROOM_ID = process.env.ROOM_ID;
+const FILE_ID = process.env.FILE_ID;
+
+/**
+ * Join the file's room and sync a fresh document; resolves its text
+ */
+function readDocument() {
+  return new Promise((resolve, reject) => {
+    const ydoc = new Y.Doc();
+    const socket = io(BASE_URL, { auth: { token: TOKEN }, transports: ['websocket'] });
+    const timer = setTimeout(() => finish(new Error('Sync timed out')), 10000);
+
+    const finish = (error) => {
+      clearTimeout(timer);
+      socket.disconnect();
+      if (error) reject(error);
+      else resolve(ydoc.getText('monaco').toString());
+      ydoc.destroy();
+    };
+
+    socket.on('yjs-sync', (message) => {
+      const decoder = decoding.createDecoder(new Uint8Array(message));
+      const messageType = decoding.readVarUint(decoder);
+      if (messageType === syncProtocol.messageYjsSyncStep2) {
+        Y.applyUpdate(ydoc, decoding.readVarUint8Array(decoder));
+        finish();
+      }
+    });
+
+    socket.on('connect', () => {
+      socket.emit('join-room', { roomId: ROOM_ID, fileId: FILE_ID }, (response) => {
+        if (!response.success) return finish(new Error(response.message));
+
+        // Ask for everything the server has
+        const encoder = encoding.createEncoder();
+        syncProtocol.writeSyncStep1(encoder, ydoc);
+        socket.emit('yjs-sync', encoding.toUint8Array(encoder));
+      });
+    });
+    socket.on('connect_error', finish);
+  });
+}
+
+async function rest(method, path, body) {
+  const response = await fetch(`${BASE_URL}${path}`, {
+    method,
+    headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${TOKEN}` },
+    body: body ? JSON.stringify(body) : undefined
+  });
+  const data = await response.json();
+  assert.ok(response.ok, `${method} ${path} failed: ${data.message}`);
+  return data.data;
+}
+
+assert.ok(TOKEN && ROOM_ID && FILE_ID, 'set CODE_SYNC_JWT, ROOM_ID and FILE_ID');
+
+// 1. Opening the document starts its update log
+const original = await readDocument();
+
+// 2. REST snapshot saves are what the next session loads
+const first = `${original}\n// first REST save ${Date.now()}\n`;
+const { version } = await rest('POST', `/files/${FILE_ID}/save-snapshot`, { content: first, message: 'REST save 1' });
+assert.strictEqual(await readDocument(), first);
+
+const second = `${first}// second REST save\n`;
+await rest('POST', `/files/${FILE_ID}/save-snapshot`, { content: second, message: 'REST save 2' });
+assert.strictEqual(await readDocument(), second);
+
+// 3. So is a revert
+await rest('POST', `/files/${FILE_ID}/revert/${version.versionNumber}`, { createSnapshot: false });
+assert.strictEqual(await readDocument(), first);
+
+console.log('✅ Yjs REST reload test passed');
+process.exit(0);
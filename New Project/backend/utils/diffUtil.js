@@ -1,12 +1,25 @@
 import crypto from 'crypto';
+import { diffLineRanges, formatUnifiedPatch, diffStats } from '../services/DeltaEngine/utils/diffEngine.js';
 
 /**
  * Diff Utility for comparing file versions
- * Uses line-based diff algorithm similar to difflib
+ * Minimal line diffs from the DeltaEngine's Myers engine (utils/diffEngine.js),
+ * so an inserted line is one addition rather than a change to every line
+ * after it
  */
 
+// Budget for diffs on the request path: past it, the edited region
+// (after trimming the common prefix/suffix) is reported as one block
+const DIFF_OPTIONS = {
+  context: 3,
+  maxCost: 2000000,
+  timeBudgetMs: 50
+};
+
 /**
  * Calculate hash of content
+ * Full SHA-256, the stored FileVersion.contentHash format; the chunked
+ * checksums (DeltaEngine/utils/chunkedChecksum.js) stay in memory
  */
 export const calculateHash = (content) => {
   return crypto.createHash('sha256').update(content).digest('hex');
@@ -21,11 +34,36 @@ const getLines = (content) => {
 };
 
 /**
- * Generate unified diff between two texts
+ * Text diffed in place of content: with a line break appended, the
+ * engine's lines are exactly content.split('\n'), so a missing final
+ * newline is an ordinary line change
  */
-export const generateDiff = (oldContent, newContent) => {
-  const oldLines = getLines(oldContent);
-  const newLines = getLines(newContent);
+const terminate = (content) => (content || '') + '\n';
+
+/**
+ * Text of line `index` of a terminated text, without its line break
+ */
+const lineAt = (text, starts, index) => {
+  const end = index + 1 < starts.length ? starts[index + 1] : text.length;
+  return text.slice(starts[index], end - 1);
+};
+
+/**
+ * Changed line ranges between two texts (see diffEngine.diffLineRanges)
+ */
+const diffLines = (oldContent, newContent) => {
+  return diffLineRanges(terminate(oldContent), terminate(newContent), DIFF_OPTIONS);
+};
+
+/**
+ * Generate line diff between two texts
+ * Within each changed block, old and new lines are paired up as changes;
+ * the rest are deletions (old line numbers) or additions (new line numbers)
+ */
+export const generateDiff = (oldContent, newContent, ranges = diffLines(oldContent, newContent)) => {
+  const oldText = terminate(oldContent);
+  const newText = terminate(newContent);
+  const { changes, oldStarts, newStarts } = ranges;
 
   const diff = {
     additions: [],
@@ -33,31 +71,26 @@ export const generateDiff = (oldContent, newContent) => {
     changes: []
   };
 
-  // Simple line-by-line comparison
-  const maxLength = Math.max(oldLines.length, newLines.length);
-  
-  for (let i = 0; i < maxLength; i++) {
-    const oldLine = oldLines[i];
-    const newLine = newLines[i];
+  for (const [oldStart, oldEnd, newStart, newEnd] of changes) {
+    const paired = Math.min(oldEnd - oldStart, newEnd - newStart);
 
-    if (oldLine === undefined && newLine !== undefined) {
-      // Line added
-      diff.additions.push({
-        lineNumber: i + 1,
-        content: newLine
+    for (let i = 0; i < paired; i++) {
+      diff.changes.push({
+        lineNumber: newStart + i + 1,
+        oldContent: lineAt(oldText, oldStarts, oldStart + i),
+        newContent: lineAt(newText, newStarts, newStart + i)
       });
-    } else if (oldLine !== undefined && newLine === undefined) {
-      // Line deleted
+    }
+    for (let i = oldStart + paired; i < oldEnd; i++) {
       diff.deletions.push({
         lineNumber: i + 1,
-        content: oldLine
+        content: lineAt(oldText, oldStarts, i)
       });
-    } else if (oldLine !== newLine) {
-      // Line changed
-      diff.changes.push({
+    }
+    for (let i = newStart + paired; i < newEnd; i++) {
+      diff.additions.push({
         lineNumber: i + 1,
-        oldContent: oldLine,
-        newContent: newLine
+        content: lineAt(newText, newStarts, i)
       });
     }
   }
@@ -68,61 +101,48 @@ export const generateDiff = (oldContent, newContent) => {
 /**
  * Generate unified diff string (similar to git diff)
  */
-export const generateUnifiedDiff = (oldContent, newContent, oldLabel = 'old', newLabel = 'new') => {
-  const oldLines = getLines(oldContent);
-  const newLines = getLines(newContent);
-
-  let diffString = `--- ${oldLabel}\n+++ ${newLabel}\n`;
-  const maxLength = Math.max(oldLines.length, newLines.length);
-
-  let hunkStart = 0;
-  let hunkLines = [];
-
-  for (let i = 0; i < maxLength; i++) {
-    const oldLine = oldLines[i];
-    const newLine = newLines[i];
-
-    if (oldLine === newLine) {
-      hunkLines.push(` ${oldLine || ''}`);
-    } else {
-      if (oldLine !== undefined) {
-        hunkLines.push(`-${oldLine}`);
-      }
-      if (newLine !== undefined) {
-        hunkLines.push(`+${newLine}`);
-      }
-    }
-  }
-
-  if (hunkLines.length > 0) {
-    diffString += `@@ -1,${oldLines.length} +1,${newLines.length} @@\n`;
-    diffString += hunkLines.join('\n');
-  }
-
-  return diffString;
+export const generateUnifiedDiff = (oldContent, newContent, oldLabel = 'old', newLabel = 'new', ranges = diffLines(oldContent, newContent)) => {
+  return formatUnifiedPatch(terminate(oldContent), terminate(newContent), ranges, {
+    ...DIFF_OPTIONS,
+    index: false,
+    oldFileName: oldLabel,
+    newFileName: newLabel
+  });
 };
 
 /**
  * Calculate diff statistics
  */
-export const getDiffStats = (oldContent, newContent) => {
-  const oldLines = getLines(oldContent);
-  const newLines = getLines(newContent);
-
-  const diff = generateDiff(oldContent, newContent);
+export const getDiffStats = (oldContent, newContent, ranges = diffLines(oldContent, newContent)) => {
+  const diff = generateDiff(oldContent, newContent, ranges);
+  const chars = diffStats(terminate(oldContent), terminate(newContent), ranges);
 
   return {
     linesAdded: diff.additions.length,
     linesRemoved: diff.deletions.length,
     linesChanged: diff.changes.length,
-    oldLineCount: oldLines.length,
-    newLineCount: newLines.length,
-    charactersAdded: Math.max(0, newContent.length - oldContent.length),
-    charactersRemoved: Math.max(0, oldContent.length - newContent.length),
+    oldLineCount: getLines(oldContent).length,
+    newLineCount: getLines(newContent).length,
+    charactersAdded: chars.charsAdded,
+    charactersRemoved: chars.charsRemoved,
     totalChanges: diff.additions.length + diff.deletions.length + diff.changes.length
   };
 };
 
+/**
+ * Unified diff and statistics from a single diff pass; `coarse` is true
+ * when the budget ran out and the edit is reported as one block
+ */
+export const diffVersions = (oldContent, newContent, oldLabel = 'old', newLabel = 'new') => {
+  const ranges = diffLines(oldContent, newContent);
+
+  return {
+    diff: generateUnifiedDiff(oldContent, newContent, oldLabel, newLabel, ranges),
+    stats: getDiffStats(oldContent, newContent, ranges),
+    coarse: ranges.coarse
+  };
+};
+
 /**
  * Apply patch to content (simple implementation)
  */
@@ -174,6 +194,7 @@ export default {
   generateDiff,
   generateUnifiedDiff,
   getDiffStats,
+  diffVersions,
   applyPatch,
   generateVersionSummary
 };
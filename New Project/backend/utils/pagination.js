@@ -0,0 +1,88 @@
+/**
+ * Keyset (cursor) pagination helpers
+ *
+ * Pages are read with a range on (sortField, _id) instead of skip, so the
+ * database seeks straight to the page through the index and page 500
+ * costs the same as page 1. The cursor is an opaque token holding the
+ * last row's sort value and _id.
+ */
+
+export const MAX_PAGE_SIZE = 200;
+export const COUNT_LIMIT = 10000; // Totals above this are reported as "at least"
+
+/**
+ * Clamp a requested page size
+ */
+export const pageSize = (limit, fallback = 50) => {
+  const size = parseInt(limit, 10);
+  if (!Number.isFinite(size) || size < 1) return fallback;
+  return Math.min(size, MAX_PAGE_SIZE);
+};
+
+export const encodeCursor = (doc, sortField) => {
+  const value = doc[sortField] instanceof Date ? doc[sortField].toISOString() : doc[sortField];
+  return Buffer.from(JSON.stringify([value, String(doc._id)])).toString('base64url');
+};
+
+/**
+ * Decode a cursor; throws a 400-tagged error for malformed tokens
+ */
+export const decodeCursor = (cursor) => {
+  try {
+    const [value, id] = JSON.parse(Buffer.from(String(cursor), 'base64url').toString('utf8'));
+    if (value === undefined || typeof id !== 'string' || !/^[a-f\d]{24}$/i.test(id)) {
+      throw new Error('bad cursor');
+    }
+    return { value, id };
+  } catch (error) {
+    const invalid = new Error('Invalid cursor');
+    invalid.status = 400;
+    throw invalid;
+  }
+};
+
+/**
+ * Filter for the rows after a cursor, newest first. Values are cast by
+ * the model's schema (dates arrive as ISO strings).
+ */
+export const afterCursor = (sortField, cursor) => {
+  const { value, id } = decodeCursor(cursor);
+  return {
+    $or: [
+      { [sortField]: { $lt: value } },
+      { [sortField]: value, _id: { $lt: id } }
+    ]
+  };
+};
+
+/**
+ * One page of `Model` matching `filter`, newest first on (sortField, _id)
+ * Returns { items, nextCursor } with lean, projected documents.
+ */
+export const keysetPage = async (Model, filter, { sortField, limit, cursor = null, select = null }) => {
+  const query = cursor ? { $and: [filter, afterCursor(sortField, cursor)] } : filter;
+
+  // One extra row tells whether another page exists
+  let find = Model.find(query)
+    .sort({ [sortField]: -1, _id: -1 })
+    .limit(limit + 1)
+    .lean();
+  if (select) find = find.select(select);
+
+  const items = await find;
+  const hasMore = items.length > limit;
+  if (hasMore) items.length = limit;
+
+  return {
+    items,
+    nextCursor: hasMore ? encodeCursor(items[items.length - 1], sortField) : null
+  };
+};
+
+/**
+ * Bounded count: walks at most COUNT_LIMIT index entries
+ */
+export const countUpTo = async (Model, filter) => {
+  const total = await Model.countDocuments(filter, { limit: COUNT_LIMIT });
+  return { total, totalIsLowerBound: total >= COUNT_LIMIT };
+};
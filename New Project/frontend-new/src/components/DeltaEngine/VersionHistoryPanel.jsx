@@ -27,6 +27,7 @@ export default function VersionHistoryPanel({
   isOpen 
 }) {
   const [snapshots, setSnapshots] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [selectedSnapshot, setSelectedSnapshot] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
   const [showDiff, setShowDiff] = useState(false);
@@ -43,8 +44,9 @@ export default function VersionHistoryPanel({
   const loadHistory = async () => {
     try {
       setIsLoading(true);
-      const history = await getVersionHistory(50, 0);
-      setSnapshots(history);
+      const history = await getVersionHistory(50);
+      setSnapshots(history.snapshots);
+      setNextCursor(history.nextCursor);
     } catch (error) {
       console.error('Failed to load version history:', error);
     } finally {
@@ -52,6 +54,21 @@ export default function VersionHistoryPanel({
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+
+    try {
+      setIsLoading(true);
+      const history = await getVersionHistory(50, nextCursor);
+      setSnapshots(prev => [...prev, ...history.snapshots]);
+      setNextCursor(history.nextCursor);
+    } catch (error) {
+      console.error('Failed to load more versions:', error);
+    } finally {
+      setIsLoading(false);
+    }
+  };
+
   const handleRollback = async (snapshotId) => {
     try {
       setIsLoading(true);
@@ -230,6 +247,16 @@ export default function VersionHistoryPanel({
                     </AnimatePresence>
                   </motion.div>
                 ))}
+
+                {nextCursor && (
+                  <button
+                    onClick={loadMore}
+                    disabled={isLoading}
+                    className="w-full px-3 py-2 text-sm text-gray-300 hover:text-white hover:bg-gray-800/60 disabled:text-gray-600 rounded-lg transition-colors"
+                  >
+                    {isLoading ? 'Loading...' : 'Load older versions'}
+                  </button>
+                )}
               </div>
             )}
           </div>
@@ -237,7 +264,7 @@ export default function VersionHistoryPanel({
           {/* Footer */}
           <div className="p-4 border-t border-gray-700 bg-gray-800/30">
             <div className="text-xs text-gray-400 text-center">
-              {snapshots.length} version{snapshots.length !== 1 ? 's' : ''} available
+              {snapshots.length}{nextCursor ? '+' : ''} version{snapshots.length !== 1 ? 's' : ''} available
             </div>
           </div>
         </motion.div>
@@ -48,7 +48,8 @@ const FileExplorer = ({ projectId, socket, onFileSelect, className = '' }) => {
     startRenaming,
     cancelRenaming,
     showContextMenu,
-    hideContextMenu
+    hideContextMenu,
+    loadFileContent
   } = useFileExplorer(projectId, socket);
 
   const [newNodeDialog, setNewNodeDialog] = useState(null);
@@ -109,7 +110,7 @@ const FileExplorer = ({ projectId, socket, onFileSelect, className = '' }) => {
       // Expand parent folder
       if (newNodeDialog?.parentPath?.length > 0) {
         const parentId = newNodeDialog.parentPath[newNodeDialog.parentPath.length - 1];
-        expandFolder(parentId);
+        expandFolder(parentId, newNodeDialog.parentPath);
       }
 
       setNewNodeDialog(null);
@@ -259,14 +260,25 @@ const FileExplorer = ({ projectId, socket, onFileSelect, className = '' }) => {
    */
   const handleNodeClick = (node, path) => {
     if (node.type === 'folder') {
-      toggleFolder(node.id);
+      toggleFolder(node.id, path);
     } else {
       selectNode(node, path);
-      
-      // Call onFileSelect callback if provided
-      if (onFileSelect) {
-        onFileSelect(node, path);
-      }
+      openFile(node, path);
+    }
+  };
+
+  /**
+   * Pass a file to onFileSelect with its content (fetched on open)
+   */
+  const openFile = async (node, path) => {
+    if (!onFileSelect) return;
+
+    try {
+      const content = await loadFileContent(path);
+      onFileSelect({ ...node, content }, path);
+    } catch (err) {
+      console.error('Open file error:', err);
+      toast.error(`Failed to open ${node.name}`);
     }
   };
 
@@ -275,7 +287,7 @@ const FileExplorer = ({ projectId, socket, onFileSelect, className = '' }) => {
    */
   const handleFileDoubleClick = (node, path) => {
     if (node.type === 'file' && onFileSelect) {
-      onFileSelect(node, path);
+      openFile(node, path);
       toast.success(`Opening ${node.name}...`);
     }
   };
@@ -307,7 +319,7 @@ const FileExplorer = ({ projectId, socket, onFileSelect, className = '' }) => {
           {isFolder && (
             <span className="expand-icon" onClick={(e) => {
               e.stopPropagation();
-              toggleFolder(node.id);
+              toggleFolder(node.id, currentPath);
             }}>
               {isExpanded ? (
                 <FaChevronDown size={12} />
@@ -89,13 +89,13 @@ export default function ProjectTimeline({ projectId, socket }) {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [filter, setFilter] = useState('all');
-  const [page, setPage] = useState(1);
-  const [hasMore, setHasMore] = useState(true);
+  const [cursor, setCursor] = useState(null); // null = first page
+  const [nextCursor, setNextCursor] = useState(null);
 
   // Fetch initial activities
   useEffect(() => {
     fetchActivities();
-  }, [projectId, filter, page]);
+  }, [projectId, filter, cursor]);
 
   // Listen for real-time activity updates
   useEffect(() => {
@@ -127,10 +127,10 @@ export default function ProjectTimeline({ projectId, socket }) {
   const fetchActivities = async () => {
     try {
       setLoading(true);
-      const params = new URLSearchParams({
-        page: page.toString(),
-        limit: '50'
-      });
+      const params = new URLSearchParams({ limit: '50' });
+      if (cursor) {
+        params.append('cursor', cursor);
+      }
       
       if (filter !== 'all') {
         params.append('type', filter);
@@ -140,8 +140,8 @@ export default function ProjectTimeline({ projectId, socket }) {
       
       if (response.data.success) {
         const newActivities = response.data.data.activities;
-        setActivities(prev => page === 1 ? newActivities : [...prev, ...newActivities]);
-        setHasMore(response.data.data.pagination.page < response.data.data.pagination.pages);
+        setActivities(prev => cursor ? [...prev, ...newActivities] : newActivities);
+        setNextCursor(response.data.data.pagination.nextCursor);
       }
     } catch (err) {
       console.error('Error fetching activities:', err);
@@ -152,8 +152,8 @@ export default function ProjectTimeline({ projectId, socket }) {
   };
 
   const loadMore = () => {
-    if (hasMore && !loading) {
-      setPage(prev => prev + 1);
+    if (nextCursor && !loading) {
+      setCursor(nextCursor);
     }
   };
 
@@ -188,7 +188,7 @@ export default function ProjectTimeline({ projectId, socket }) {
             value={filter}
             onChange={(e) => {
               setFilter(e.target.value);
-              setPage(1);
+              setCursor(null);
               setActivities([]);
             }}
             className="px-3 py-1.5 border border-gray-300 rounded-lg text-sm focus:outline-none focus:ring-2 focus:ring-blue-500"
@@ -282,7 +282,7 @@ export default function ProjectTimeline({ projectId, socket }) {
             ))}
 
             {/* Load More */}
-            {hasMore && (
+            {nextCursor && (
               <div className="text-center pt-4">
                 <button
                   onClick={loadMore}
@@ -2,6 +2,7 @@ import { useEffect, useCallback, useRef, useState } from 'react';
 import { io } from 'socket.io-client';
 import useDeltaStore from '../stores/useDeltaStore';
 import axios from 'axios';
+import { computeEditOps, applyOps } from '../utils/editOps';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000';
 
@@ -31,6 +32,9 @@ export function useDeltaSync(projectId, fileId, initialContent = '') {
   const currentContentRef = useRef(initialContent);
   const oldContentRef = useRef(initialContent);
   const cursorPositionRef = useRef(null);
+  // Content and checksum of the server-side buffer that edit ops apply to
+  const serverContentRef = useRef(initialContent);
+  const serverChecksumRef = useRef(null);
   const initializationAttemptedRef = useRef(false);
 
   // Update content ref when initialContent changes
@@ -113,6 +117,8 @@ export function useDeltaSync(projectId, fileId, initialContent = '') {
           addSnapshot(fileId, response.snapshot);
           setCurrentVersion(fileId, response.snapshot.versionNumber);
           setLastChecksum(response.snapshot.checksum);
+          serverContentRef.current = currentContentRef.current;
+          serverChecksumRef.current = response.checksum;
           setSyncStatus(fileId, { synced: true, initialized: true });
           setIsInitialized(true);
         } else {
@@ -127,14 +133,39 @@ export function useDeltaSync(projectId, fileId, initialContent = '') {
   }, [projectId, fileId, isInitialized, addSnapshot, setCurrentVersion, setSyncStatus]);
 
   /**
-   * Send delta update to server
+   * Send full content to the server buffer (after a checksum mismatch)
+   */
+  const sendFullContent = useCallback((content) => {
+    const socket = socketRef.current;
+    if (!socket) return;
+
+    socket.emit('delta:update', {
+      projectId,
+      fileId,
+      newContent: content,
+      cursorPosition: cursorPositionRef.current
+    }, (response) => {
+      setIsSyncing(false);
+
+      if (response?.success) {
+        serverContentRef.current = content;
+        serverChecksumRef.current = response.checksum;
+        setSyncStatus(fileId, { synced: true, lastSync: Date.now() });
+      } else {
+        console.error('[useDeltaSync] Resync failed:', response?.message);
+        setSyncStatus(fileId, { synced: false, error: response?.message });
+      }
+    });
+  }, [projectId, fileId, setSyncStatus]);
+
+  /**
+   * Send delta update to server as edit ops against the server buffer
    */
   const sendDelta = useCallback((newContent, cursorPosition = null) => {
     const socket = socketRef.current;
     if (!socket || !isInitialized) return;
 
     // Update refs
-    const oldContent = currentContentRef.current;
     currentContentRef.current = newContent;
     if (cursorPosition) {
       cursorPositionRef.current = cursorPosition;
@@ -147,28 +178,35 @@ export function useDeltaSync(projectId, fileId, initialContent = '') {
 
     // Batch rapid updates (debounce)
     updateTimerRef.current = setTimeout(() => {
+      const content = currentContentRef.current;
+      const ops = computeEditOps(serverContentRef.current, content);
+      if (ops.length === 0) return;
+
       setIsSyncing(true);
 
       socket.emit('delta:update', {
         projectId,
         fileId,
-        newContent,
-        oldContent,
-        cursorPosition: cursorPositionRef.current,
-        checksum: null // Will be computed on server
+        baseChecksum: serverChecksumRef.current,
+        ops,
+        cursorPosition: cursorPositionRef.current
       }, (response) => {
-        setIsSyncing(false);
-        
         if (response?.success) {
+          setIsSyncing(false);
+          serverContentRef.current = content;
+          serverChecksumRef.current = response.checksum;
           setSyncStatus(fileId, { synced: true, lastSync: Date.now() });
-          oldContentRef.current = newContent;
+        } else if (response?.resync) {
+          // Our base is stale - replace the server buffer with our content
+          sendFullContent(content);
         } else {
+          setIsSyncing(false);
           console.error('[useDeltaSync] Update failed:', response?.message);
           setSyncStatus(fileId, { synced: false, error: response?.message });
         }
       });
     }, 200); // 200ms debounce
-  }, [isInitialized, projectId, fileId, setSyncStatus]);
+  }, [isInitialized, projectId, fileId, setSyncStatus, sendFullContent]);
 
   /**
    * Save file and create snapshot
@@ -252,6 +290,8 @@ export function useDeltaSync(projectId, fileId, initialContent = '') {
           
           currentContentRef.current = response.content;
           oldContentRef.current = response.content;
+          serverContentRef.current = response.content;
+          serverChecksumRef.current = response.checksum;
           
           addSnapshot(fileId, response.snapshot);
           setCurrentVersion(fileId, response.snapshot.versionNumber);
@@ -269,20 +309,25 @@ export function useDeltaSync(projectId, fileId, initialContent = '') {
   }, [isInitialized, projectId, fileId, addSnapshot, setCurrentVersion, setSyncStatus]);
 
   /**
-   * Get version history
+   * Get one page of version history, newest first
+   * Resolves { snapshots, nextCursor }; pass nextCursor back for the next
+   * page (null when there is none)
    */
-  const getVersionHistory = useCallback((limit = 50, skip = 0) => {
+  const getVersionHistory = useCallback((limit = 50, cursor = null) => {
     const socket = socketRef.current;
-    if (!socket || !isInitialized) return Promise.resolve([]);
+    if (!socket || !isInitialized) return Promise.resolve({ snapshots: [], nextCursor: null });
 
     return new Promise((resolve, reject) => {
       socket.emit('delta:get-history', {
         fileId,
         limit,
-        skip
+        cursor
       }, (response) => {
         if (response.success) {
-          resolve(response.snapshots);
+          resolve({
+            snapshots: response.snapshots,
+            nextCursor: response.nextCursor ?? null
+          });
         } else {
           reject(new Error(response.message));
         }
@@ -346,10 +391,29 @@ export function useDeltaSync(projectId, fileId, initialContent = '') {
     const handleDeltaSync = (data) => {
       if (data.fileId === fileId && data.userId !== socket.id) {
         console.log('[useDeltaSync] Received delta sync from:', data.username);
-        
+
+        const { delta } = data;
+
+        if (delta.full) {
+          serverContentRef.current = delta.newContent;
+        } else if (delta.baseChecksum === serverChecksumRef.current) {
+          serverContentRef.current = applyOps(serverContentRef.current, delta.ops);
+        } else {
+          // Missed an update - fetch the server buffer
+          socket.emit('delta:resync', { fileId }, (response) => {
+            if (response?.success) {
+              serverContentRef.current = response.content;
+              serverChecksumRef.current = response.checksum;
+              currentContentRef.current = response.content;
+            }
+          });
+          return;
+        }
+
         // Update content
-        currentContentRef.current = data.delta.newContent;
-        setLastChecksum(data.delta.checksum);
+        serverChecksumRef.current = delta.checksum;
+        currentContentRef.current = serverContentRef.current;
+        setLastChecksum(delta.checksum);
         setSyncStatus(fileId, { synced: true, lastRemoteSync: Date.now() });
       }
     };
@@ -369,6 +433,8 @@ export function useDeltaSync(projectId, fileId, initialContent = '') {
         
         currentContentRef.current = data.content;
         oldContentRef.current = data.content;
+        serverContentRef.current = data.content;
+        serverChecksumRef.current = data.checksum;
         setLastChecksum(data.snapshot.checksum);
       }
     };
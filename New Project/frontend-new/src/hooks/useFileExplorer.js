@@ -1,7 +1,21 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import * as fileAPI from '../services/fileAPI';
 import toast from 'react-hot-toast';
 
+/**
+ * Tree paths start with 'root'; server pushes may omit it
+ */
+const normalizePath = (path = []) => (path[0] === 'root' ? path.slice(1) : path);
+
+/**
+ * Node as held in the tree: folders start unloaded (children undefined)
+ */
+const toTreeNode = (node) => (
+  node.type === 'folder'
+    ? { id: node.id, name: node.name, type: 'folder', childCount: node.childCount || 0 }
+    : { id: node.id, name: node.name, type: 'file' }
+);
+
 /**
  * Custom hook for managing file explorer state and operations
  * @param {string} projectId - The current project ID
@@ -16,9 +30,81 @@ export const useFileExplorer = (projectId, socket) => {
   const [selectedNode, setSelectedNode] = useState(null);
   const [renamingNode, setRenamingNode] = useState(null);
   const [contextMenu, setContextMenu] = useState(null);
+  const structureRef = useRef(null);
+  const versionRef = useRef(null); // Server structure version last seen
+
+  useEffect(() => {
+    structureRef.current = fileStructure;
+  }, [fileStructure]);
+
+  /**
+   * Find node by path
+   */
+  const findNodeByPath = useCallback((structure, path) => {
+    if (!structure || !path) return structure;
+
+    let current = structure;
+    for (const id of normalizePath(path)) {
+      if (!current.children) return null;
+      current = current.children.find(child => child.id === id);
+      if (!current) return null;
+    }
+    return current;
+  }, []);
 
   /**
-   * Load file structure from server
+   * Fetch all pages of a folder's children (names and types only)
+   */
+  const fetchChildren = useCallback(async (path) => {
+    let children = [];
+    let version = null;
+    let cursor = 0;
+
+    while (cursor !== null) {
+      const response = await fileAPI.getFolderChildren(projectId, path, cursor);
+      if (!response.success) {
+        throw new Error(response.message || 'Failed to load folder');
+      }
+
+      const page = response.data;
+      if (version !== null && page.version !== version) {
+        // Tree changed between pages: start over
+        children = [];
+        cursor = 0;
+      } else {
+        children.push(...page.children.map(toTreeNode));
+        cursor = page.nextCursor;
+      }
+      version = page.version;
+    }
+
+    versionRef.current = version;
+    return children;
+  }, [projectId]);
+
+  /**
+   * Load (or refresh) one folder's children, keeping loaded subfolders
+   */
+  const loadFolder = useCallback(async (path) => {
+    const children = await fetchChildren(path);
+
+    setFileStructure(prev => {
+      const folder = findNodeByPath(prev, path);
+      if (!folder) return prev;
+
+      const previous = new Map((folder.children || []).map(child => [child.id, child]));
+      folder.children = children.map(child => {
+        const loaded = previous.get(child.id);
+        return loaded?.children ? { ...child, children: loaded.children } : child;
+      });
+      folder.childCount = children.length;
+
+      return { ...prev };
+    });
+  }, [fetchChildren, findNodeByPath]);
+
+  /**
+   * Load file structure from server (top level only; folders load on expand)
    */
   const loadFileStructure = useCallback(async () => {
     if (!projectId) return;
@@ -26,13 +112,15 @@ export const useFileExplorer = (projectId, socket) => {
     try {
       setLoading(true);
       setError(null);
-      const response = await fileAPI.getFileStructure(projectId);
-      
-      if (response.success) {
-        setFileStructure(response.data);
-      } else {
-        throw new Error(response.message || 'Failed to load file structure');
-      }
+      const children = await fetchChildren(['root']);
+
+      setFileStructure({
+        id: 'root',
+        name: 'root',
+        type: 'folder',
+        childCount: children.length,
+        children
+      });
     } catch (err) {
       console.error('Load file structure error:', err);
       setError(err.message);
@@ -40,8 +128,95 @@ export const useFileExplorer = (projectId, socket) => {
     } finally {
       setLoading(false);
     }
+  }, [projectId, fetchChildren]);
+
+  /**
+   * Revalidate every loaded folder (after missing pushes, e.g. a reconnect)
+   */
+  const refreshFileStructure = useCallback(async () => {
+    if (!structureRef.current) return loadFileStructure();
+
+    const paths = [];
+    const collect = (node, path) => {
+      if (node.type !== 'folder' || !node.children) return;
+      paths.push(path);
+      node.children.forEach(child => collect(child, [...path, child.id]));
+    };
+    collect(structureRef.current, ['root']);
+
+    // Folders deleted meanwhile 404; their parents' refresh drops them
+    await Promise.all(paths.map(path => loadFolder(path).catch(() => {})));
+  }, [loadFileStructure, loadFolder]);
+
+  /**
+   * Fetch a file's content when it is opened
+   */
+  const loadFileContent = useCallback(async (path) => {
+    const response = await fileAPI.getFileContent(projectId, path);
+    if (!response.success) {
+      throw new Error(response.message || 'Failed to load file');
+    }
+    return response.data.content;
   }, [projectId]);
 
+  /**
+   * Apply tree changes (from our own requests and from server pushes)
+   */
+  const applyCreated = useCallback(({ node, parentPath = [] }) => {
+    setFileStructure(prev => {
+      const parent = findNodeByPath(prev, parentPath);
+      // Unloaded folders pick the node up when they are expanded
+      if (!parent || parent.type !== 'folder' || !parent.children) return prev;
+
+      if (!parent.children.some(child => child.id === node.id)) {
+        const created = toTreeNode(node);
+        if (created.type === 'folder') created.children = [];
+        parent.children.push(created);
+        parent.childCount = parent.children.length;
+      }
+
+      return { ...prev };
+    });
+  }, [findNodeByPath]);
+
+  const applyRenamed = useCallback(({ path, newName }) => {
+    setFileStructure(prev => {
+      const node = findNodeByPath(prev, path);
+      if (!node) return prev;
+
+      node.name = newName;
+      return { ...prev };
+    });
+  }, [findNodeByPath]);
+
+  const applyDeleted = useCallback(({ path }) => {
+    setFileStructure(prev => {
+      const nodePath = normalizePath(path);
+      if (!prev || nodePath.length === 0) return prev;
+
+      const parent = findNodeByPath(prev, nodePath.slice(0, -1));
+      const nodeId = nodePath[nodePath.length - 1];
+
+      if (parent && parent.children) {
+        parent.children = parent.children.filter(child => child.id !== nodeId);
+        parent.childCount = parent.children.length;
+      }
+
+      return { ...prev };
+    });
+  }, [findNodeByPath]);
+
+  const applyFileUpdated = useCallback(({ path, etag }) => {
+    setFileStructure(prev => {
+      const node = findNodeByPath(prev, path);
+      if (!node) return prev;
+
+      // Content is fetched (and revalidated by ETag) when the file is opened
+      node.etag = etag;
+      return { ...prev };
+    });
+  }, [findNodeByPath]);
+
   /**
    * Create a new file or folder
    */
@@ -57,17 +232,8 @@ export const useFileExplorer = (projectId, socket) => {
       });
 
       if (response.success) {
-        // Update local structure
-        await loadFileStructure();
-        
-        // Emit socket event for real-time sync
-        if (socket?.connected) {
-          socket.emit('filesystem:created', {
-            projectId,
-            node: response.data,
-            parentPath
-          });
-        }
+        // Others get the change pushed by the server
+        applyCreated({ node: response.data, parentPath });
 
         toast.success(`${type === 'file' ? 'File' : 'Folder'} created successfully`);
         return response.data;
@@ -79,7 +245,7 @@ export const useFileExplorer = (projectId, socket) => {
       toast.error(err.response?.data?.message || err.message || 'Failed to create');
       throw err;
     }
-  }, [projectId, socket, loadFileStructure]);
+  }, [projectId, applyCreated]);
 
   /**
    * Rename a file or folder
@@ -94,18 +260,7 @@ export const useFileExplorer = (projectId, socket) => {
       });
 
       if (response.success) {
-        // Update local structure
-        await loadFileStructure();
-        
-        // Emit socket event
-        if (socket?.connected) {
-          socket.emit('filesystem:renamed', {
-            projectId,
-            path,
-            oldName: response.data.oldName,
-            newName
-          });
-        }
+        applyRenamed({ path, newName });
 
         toast.success('Renamed successfully');
         setRenamingNode(null);
@@ -118,7 +273,7 @@ export const useFileExplorer = (projectId, socket) => {
       toast.error(err.response?.data?.message || err.message || 'Failed to rename');
       throw err;
     }
-  }, [projectId, socket, loadFileStructure]);
+  }, [projectId, applyRenamed]);
 
   /**
    * Delete a file or folder
@@ -130,17 +285,7 @@ export const useFileExplorer = (projectId, socket) => {
       const response = await fileAPI.deleteFileOrFolder(projectId, { path });
 
       if (response.success) {
-        // Update local structure
-        await loadFileStructure();
-        
-        // Emit socket event
-        if (socket?.connected) {
-          socket.emit('filesystem:deleted', {
-            projectId,
-            path,
-            deletedNode: response.data
-          });
-        }
+        applyDeleted({ path });
 
         toast.success('Deleted successfully');
         return response.data;
@@ -152,12 +297,31 @@ export const useFileExplorer = (projectId, socket) => {
       toast.error(err.response?.data?.message || err.message || 'Failed to delete');
       throw err;
     }
-  }, [projectId, socket, loadFileStructure]);
+  }, [projectId, applyDeleted]);
+
+  /**
+   * Load a folder's children the first time it is expanded
+   */
+  const ensureFolderLoaded = useCallback((path) => {
+    if (!path) return;
+
+    const node = findNodeByPath(structureRef.current, path);
+    if (node && node.type === 'folder' && !node.children) {
+      loadFolder(path).catch(err => {
+        console.error('Load folder error:', err);
+        toast.error('Failed to load folder');
+      });
+    }
+  }, [findNodeByPath, loadFolder]);
 
   /**
    * Toggle folder expansion
    */
-  const toggleFolder = useCallback((nodeId) => {
+  const toggleFolder = useCallback((nodeId, path) => {
+    if (!expandedFolders.has(nodeId)) {
+      ensureFolderLoaded(path);
+    }
+
     setExpandedFolders(prev => {
       const next = new Set(prev);
       if (next.has(nodeId)) {
@@ -167,14 +331,15 @@ export const useFileExplorer = (projectId, socket) => {
       }
       return next;
     });
-  }, []);
+  }, [expandedFolders, ensureFolderLoaded]);
 
   /**
    * Expand folder
    */
-  const expandFolder = useCallback((nodeId) => {
+  const expandFolder = useCallback((nodeId, path) => {
+    ensureFolderLoaded(path);
     setExpandedFolders(prev => new Set([...prev, nodeId]));
-  }, []);
+  }, [ensureFolderLoaded]);
 
   /**
    * Collapse folder
@@ -229,104 +394,58 @@ export const useFileExplorer = (projectId, socket) => {
   }, []);
 
   /**
-   * Find node by path
-   */
-  const findNodeByPath = useCallback((structure, path) => {
-    if (!structure || !path || path.length === 0) return structure;
-
-    let current = structure;
-    for (let i = 0; i < path.length; i++) {
-      if (!current.children) return null;
-      current = current.children.find(child => child.id === path[i]);
-      if (!current) return null;
-    }
-    return current;
-  }, []);
-
-  /**
-   * Update node in structure
-   */
-  const updateNodeInStructure = useCallback((structure, path, updates) => {
-    const node = findNodeByPath(structure, path);
-    if (node) {
-      Object.assign(node, updates);
-    }
-    return { ...structure };
-  }, [findNodeByPath]);
-
-  /**
-   * Real-time socket event handlers
+   * Subscribe to server pushes of changed nodes
    */
   useEffect(() => {
     if (!socket || !projectId) return;
 
-    // File/Folder created
-    const handleCreated = ({ node, parentPath }) => {
-      setFileStructure(prev => {
-        if (!prev) return prev;
-        
-        const parent = parentPath.length === 0 ? prev : findNodeByPath(prev, parentPath);
-        if (parent && parent.type === 'folder') {
-          if (!parent.children) parent.children = [];
-          
-          // Check if already exists
-          const exists = parent.children.some(child => child.id === node.id);
-          if (!exists) {
-            parent.children.push(node);
-          }
-        }
-        
-        return { ...prev };
-      });
+    // Every push carries the structure version after the change
+    const track = (apply) => (payload) => {
+      if (payload.projectId && payload.projectId !== projectId) return;
+      if (payload.version) versionRef.current = payload.version;
+      apply(payload);
     };
 
-    // File/Folder renamed
-    const handleRenamed = ({ path, newName }) => {
-      setFileStructure(prev => {
-        if (!prev) return prev;
-        return updateNodeInStructure(prev, path, { name: newName });
-      });
-    };
+    const handleCreated = track(applyCreated);
+    const handleRenamed = track(applyRenamed);
+    const handleDeleted = track(applyDeleted);
+    const handleFileUpdated = track(applyFileUpdated);
 
-    // File/Folder deleted
-    const handleDeleted = ({ path }) => {
-      setFileStructure(prev => {
-        if (!prev || path.length === 0) return prev;
-        
-        const parentPath = path.slice(0, -1);
-        const nodeId = path[path.length - 1];
-        const parent = parentPath.length === 0 ? prev : findNodeByPath(prev, parentPath);
-        
-        if (parent && parent.children) {
-          parent.children = parent.children.filter(child => child.id !== nodeId);
-        }
-        
-        return { ...prev };
-      });
+    const handleSync = ({ version }) => {
+      if (versionRef.current && version !== versionRef.current) {
+        refreshFileStructure();
+      }
     };
 
-    // File content updated
-    const handleFileUpdated = ({ path, content }) => {
-      setFileStructure(prev => {
-        if (!prev) return prev;
-        return updateNodeInStructure(prev, path, { content });
+    // (Re)subscribe on every connect; pushes missed while away are caught
+    // up by revalidating the loaded folders
+    const subscribe = () => {
+      socket.emit('filesystem:subscribe', { projectId, version: versionRef.current }, (response) => {
+        if (response?.success && response.stale && versionRef.current) {
+          refreshFileStructure();
+        }
       });
     };
 
-    // Listen to events
     socket.on('filesystem:created', handleCreated);
     socket.on('filesystem:renamed', handleRenamed);
     socket.on('filesystem:deleted', handleDeleted);
     socket.on('filesystem:file-updated', handleFileUpdated);
+    socket.on('filesystem:sync', handleSync);
+    socket.on('connect', subscribe);
+    if (socket.connected) subscribe();
 
     // Cleanup
     return () => {
+      socket.emit('filesystem:unsubscribe', { projectId });
       socket.off('filesystem:created', handleCreated);
       socket.off('filesystem:renamed', handleRenamed);
       socket.off('filesystem:deleted', handleDeleted);
       socket.off('filesystem:file-updated', handleFileUpdated);
+      socket.off('filesystem:sync', handleSync);
+      socket.off('connect', subscribe);
     };
-  }, [socket, projectId, findNodeByPath, updateNodeInStructure]);
+  }, [socket, projectId, applyCreated, applyRenamed, applyDeleted, applyFileUpdated, refreshFileStructure]);
 
   /**
    * Load initial structure on mount
@@ -347,6 +466,8 @@ export const useFileExplorer = (projectId, socket) => {
 
     // Methods
     loadFileStructure,
+    refreshFileStructure,
+    loadFileContent,
     createNode,
     renameNode,
     deleteNode,
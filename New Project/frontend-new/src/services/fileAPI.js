@@ -22,6 +22,25 @@ export const getFileStructure = async (projectId) => {
   }
 };
 
+/**
+ * Get one page of a folder's children (no file contents)
+ * @param {string} projectId - The project ID
+ * @param {Array} path - Path array to the folder
+ * @param {number} cursor - Offset returned as nextCursor by the previous page
+ * @returns {Promise} - { version, node, children, total, nextCursor }
+ */
+export const getFolderChildren = async (projectId, path = [], cursor = 0) => {
+  try {
+    const response = await apiClient.get(`${baseURL}/${projectId}/children`, {
+      params: { path: JSON.stringify(path), cursor }
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Get folder children error:', error);
+    throw error;
+  }
+};
+
 /**
  * Create a new file or folder
  * @param {string} projectId - The project ID
@@ -106,6 +125,7 @@ export const updateFileContent = async (projectId, data) => {
 
 export default {
   getFileStructure,
+  getFolderChildren,
   createFileOrFolder,
   renameFileOrFolder,
   deleteFileOrFolder,
@@ -0,0 +1,53 @@
+/**
+ * Edit operation helpers for the delta:update wire format
+ * Mirrors backend/services/DeltaEngine/utils/editOps.js
+ *
+ * Ops are `{ from, to, insert }` with offsets relative to the base
+ * document, sorted ascending and non-overlapping.
+ */
+
+/**
+ * Compute a single replace op by trimming common prefix and suffix
+ */
+export function computeEditOps(oldContent, newContent) {
+  const oldText = oldContent || '';
+  const newText = newContent || '';
+
+  if (oldText === newText) return [];
+
+  let start = 0;
+  const minLength = Math.min(oldText.length, newText.length);
+  while (start < minLength && oldText.charCodeAt(start) === newText.charCodeAt(start)) {
+    start++;
+  }
+
+  let oldEnd = oldText.length;
+  let newEnd = newText.length;
+  while (oldEnd > start && newEnd > start &&
+    oldText.charCodeAt(oldEnd - 1) === newText.charCodeAt(newEnd - 1)) {
+    oldEnd--;
+    newEnd--;
+  }
+
+  return [{ from: start, to: oldEnd, insert: newText.slice(start, newEnd) }];
+}
+
+/**
+ * Apply ops to a base document
+ */
+export function applyOps(base, ops) {
+  if (!ops || ops.length === 0) return base;
+
+  const parts = [];
+  let cursor = 0;
+
+  for (const op of ops) {
+    parts.push(base.slice(cursor, op.from));
+    if (op.insert) parts.push(op.insert);
+    cursor = op.to;
+  }
+
+  parts.push(base.slice(cursor));
+
+  return parts.join('');
+}
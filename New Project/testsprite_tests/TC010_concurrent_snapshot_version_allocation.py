@@ -0,0 +1,87 @@
+import requests
+import uuid
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = "http://localhost:5000"
+TIMEOUT = 30
+
+JWT_TOKEN = os.getenv("CODE_SYNC_JWT", "your_jwt_token_here")
+
+HEADERS = {
+    "Content-Type": "application/json",
+    "Authorization": f"Bearer {JWT_TOKEN}"
+}
+
+CONCURRENT_WRITERS = 20
+
+
+def test_concurrent_snapshot_version_allocation():
+    project_id = uuid.uuid4().hex[:24]
+    file_id = uuid.uuid4().hex[:24]
+    initial_content = "line1\nline2\n"
+
+    init_payload = {
+        "projectId": project_id,
+        "fileId": file_id,
+        "initialContent": initial_content
+    }
+
+    init_resp = requests.post(f"{BASE_URL}/delta/init", json=init_payload, headers=HEADERS, timeout=TIMEOUT)
+    assert init_resp.status_code == 200, f"Init failed: {init_resp.text}"
+    init_data = init_resp.json()
+    assert init_data.get("success") is True
+    initial_version = init_data["snapshot"]["versionNumber"]
+
+    def create_snapshot(i):
+        payload = {
+            "projectId": project_id,
+            "fileId": file_id,
+            "newContent": initial_content + f"writer {i}\n",
+            "oldContent": initial_content,
+            "message": f"Concurrent writer {i}"
+        }
+        resp = requests.post(f"{BASE_URL}/delta/snapshot", json=payload, headers=HEADERS, timeout=TIMEOUT)
+        assert resp.status_code == 200, f"Snapshot {i} failed: {resp.text}"
+        data = resp.json()
+        assert data.get("success") is True
+        return data["snapshot"]
+
+    # Fire all writers at once against the same file
+    with ThreadPoolExecutor(max_workers=CONCURRENT_WRITERS) as pool:
+        snapshots = list(pool.map(create_snapshot, range(CONCURRENT_WRITERS)))
+
+    versions = sorted(s["versionNumber"] for s in snapshots)
+
+    # Every writer must get its own version, with no gaps
+    assert len(set(versions)) == CONCURRENT_WRITERS, f"Duplicate version numbers allocated: {versions}"
+    assert versions == list(range(initial_version + 1, initial_version + 1 + CONCURRENT_WRITERS)), \
+        f"Version numbers are not contiguous: {versions}"
+
+    # Each snapshot's baseVersion must point at a distinct predecessor (a single chain)
+    base_versions = []
+    for s in snapshots:
+        resp = requests.get(f"{BASE_URL}/delta/snapshot/{s['snapshotId']}", headers=HEADERS, timeout=TIMEOUT)
+        assert resp.status_code == 200, f"Get snapshot failed: {resp.text}"
+        base_versions.append(resp.json()["snapshot"]["baseVersion"])
+
+    assert len(set(base_versions)) == CONCURRENT_WRITERS, "Two snapshots share the same base version"
+    assert init_data["snapshot"]["snapshotId"] in base_versions, "Chain does not start at the initial snapshot"
+
+    # Every version must reconstruct to exactly the content its writer posted,
+    # whichever predecessor it ended up chained to
+    posted = {s["versionNumber"]: initial_content + f"writer {i}\n" for i, s in enumerate(snapshots)}
+    for version, expected in posted.items():
+        resp = requests.get(
+            f"{BASE_URL}/delta/content/{file_id}",
+            params={"version": version},
+            headers=HEADERS,
+            timeout=TIMEOUT
+        )
+        assert resp.status_code == 200, f"Get content v{version} failed: {resp.text}"
+        data = resp.json()
+        assert data.get("success") is True
+        assert data["versionNumber"] == version
+        assert data["content"] == expected, f"Version {version} reconstructs to {data['content']!r}, expected {expected!r}"
+
+test_concurrent_snapshot_version_allocation()
@@ -0,0 +1,50 @@
+import requests
+import uuid
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = "http://localhost:5000"
+TIMEOUT = 30
+
+JWT_TOKEN = os.getenv("CODE_SYNC_JWT", "your_jwt_token_here")
+
+HEADERS = {
+    "Content-Type": "application/json",
+    "Authorization": f"Bearer {JWT_TOKEN}"
+}
+
+CONCURRENT_INITIALIZERS = 10
+
+
+def test_concurrent_delta_init_single_initial_snapshot():
+    project_id = uuid.uuid4().hex[:24]
+    file_id = uuid.uuid4().hex[:24]
+
+    init_payload = {
+        "projectId": project_id,
+        "fileId": file_id,
+        "initialContent": "shared initial content\n"
+    }
+
+    def init_file(_):
+        resp = requests.post(f"{BASE_URL}/delta/init", json=init_payload, headers=HEADERS, timeout=TIMEOUT)
+        assert resp.status_code == 200, f"Init failed: {resp.text}"
+        data = resp.json()
+        assert data.get("success") is True
+        return data["snapshot"]
+
+    with ThreadPoolExecutor(max_workers=CONCURRENT_INITIALIZERS) as pool:
+        snapshots = list(pool.map(init_file, range(CONCURRENT_INITIALIZERS)))
+
+    # All initializers must agree on a single version 1 snapshot
+    snapshot_ids = {s["snapshotId"] for s in snapshots}
+    assert len(snapshot_ids) == 1, f"Multiple initial snapshots created: {snapshot_ids}"
+    assert all(s["versionNumber"] == 1 for s in snapshots)
+
+    history_resp = requests.get(f"{BASE_URL}/delta/history/{file_id}", headers=HEADERS, timeout=TIMEOUT)
+    assert history_resp.status_code == 200, f"History failed: {history_resp.text}"
+    history = history_resp.json()["snapshots"]
+    assert len(history) == 1, f"Expected one snapshot in history, got {len(history)}"
+
+
+test_concurrent_delta_init_single_initial_snapshot()